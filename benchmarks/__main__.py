@@ -0,0 +1,103 @@
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+import orjson
+
+from benchmarks.archive import ArchiveGenerator, ArchiveSpec
+from benchmarks.harness import BenchmarkRunner, collect_benchmarks, compare_reports, format_comparison, save_report
+
+
+def run(args: argparse.Namespace) -> int:
+    """ベンチマークを計測して結果を保存する"""
+    # 計測対象が出力する INFO ログは計測結果の表示の邪魔になるため出さない
+    logging.disable(logging.INFO)
+    runner = BenchmarkRunner.create(args.repeat, args.param, args.filter)
+    report = runner.run(collect_benchmarks(args.module or None))
+    path = save_report(report, Path(args.output) if args.output else None)
+    print(f"Benchmark result -> {path}")
+    return 0
+
+
+def compare(args: argparse.Namespace) -> int:
+    """2つの計測結果を比較し、閾値を超えて遅くなったベンチマークがあれば 1 を返す"""
+    base = orjson.loads(Path(args.base).read_bytes())
+    target = orjson.loads(Path(args.target).read_bytes())
+    comparison_list = compare_reports(base, target)
+    print(f"base: {base['commit']} ({base['created_at']}), target: {target['commit']} ({target['created_at']})")
+    print(format_comparison(comparison_list, args.threshold))
+    return 1 if any(comparison.is_regression(args.threshold) for comparison in comparison_list) else 0
+
+
+def generate(args: argparse.Namespace) -> int:
+    """シードから本番規模のアーカイブを生成する"""
+    logging.disable(logging.INFO)
+    spec = ArchiveSpec(
+        args.seed,
+        args.fav,
+        args.retweet,
+        args.external_link,
+        args.media_files,
+        args.authors,
+        args.works,
+        args.media_size,
+    )
+    try:
+        summary = ArchiveGenerator(spec, Path(args.output)).generate()
+    except ValueError as e:
+        print(e.args[0], file=sys.stderr)
+        return 1
+    for name, count in summary.items():
+        print(f"{name:<20} {count:>10}")
+    print(f"Archive -> {args.output} (config: {Path(args.output) / 'config.json'})")
+    return 0
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(prog="python -m benchmarks", description="media-gathering benchmarks")
+    sub_parsers = arg_parser.add_subparsers(dest="command", required=True)
+
+    run_parser = sub_parsers.add_parser("run", help="Run benchmarks and save the result as JSON")
+    run_parser.add_argument("module", nargs="*", help="Benchmark modules to run (e.g. bench_parser), default all")
+    run_parser.add_argument("--repeat", type=int, default=5, help="Number of samples for each benchmark")
+    run_parser.add_argument(
+        "--param", action="append", default=[], help="Override a benchmark size, NAME=INTEGER (e.g. ROW_NUM=1000000)"
+    )
+    run_parser.add_argument("--filter", default="", help="Run only benchmarks whose name contains this string")
+    run_parser.add_argument("--output", default="", help="Result file path, default benchmarks/results/")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = sub_parsers.add_parser("compare", help="Compare two saved results")
+    compare_parser.add_argument("base", help="Result file of the base version")
+    compare_parser.add_argument("target", help="Result file of the target version")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=0.1, help="Slowdown ratio reported as a regression (0.1 = 10%%)"
+    )
+    compare_parser.set_defaults(func=compare)
+
+    default_spec = ArchiveSpec()
+    generate_parser = sub_parsers.add_parser("generate", help="Generate a synthetic archive for load testing")
+    generate_parser.add_argument("output", help="Output directory (must be empty or not exist)")
+    generate_parser.add_argument("--seed", type=int, default=default_spec.seed, help="Random seed")
+    generate_parser.add_argument("--fav", type=int, default=default_spec.fav_num, help="Number of Favorite rows")
+    generate_parser.add_argument(
+        "--retweet", type=int, default=default_spec.retweet_num, help="Number of Retweet rows"
+    )
+    generate_parser.add_argument(
+        "--external-link", type=int, default=default_spec.external_link_num, help="Number of ExternalLink rows"
+    )
+    generate_parser.add_argument(
+        "--media-files", type=int, default=default_spec.media_file_num, help="Number of media files per save directory"
+    )
+    generate_parser.add_argument(
+        "--authors", type=int, default=default_spec.author_num, help="Number of author directories per site"
+    )
+    generate_parser.add_argument("--works", type=int, default=default_spec.work_num, help="Mean works per author")
+    generate_parser.add_argument(
+        "--media-size", type=int, default=default_spec.media_size, help="Size of each media file in bytes"
+    )
+    generate_parser.set_defaults(func=generate)
+
+    args = arg_parser.parse_args()
+    sys.exit(args.func(args))
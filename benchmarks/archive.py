@@ -0,0 +1,395 @@
+import os
+import random
+import string
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import orjson
+from sqlalchemy import Connection, insert
+
+from benchmarks.fixtures import make_config
+from media_gathering.fav_db_controller import FavDBController
+from media_gathering.link_search.nico_seiga.authorname import Authorname as NicoSeigaAuthorname
+from media_gathering.link_search.nico_seiga.illustname import Illustname
+from media_gathering.link_search.nijie.authorname import Authorname as NijieAuthorname
+from media_gathering.link_search.nijie.worktitle import Worktitle as NijieWorktitle
+from media_gathering.link_search.pixiv.authorname import Authorname as PixivAuthorname
+from media_gathering.link_search.pixiv.worktitle import Worktitle as PixivWorktitle
+from media_gathering.media_store import MediaStore
+from media_gathering.model import ExternalLink, Media, StoredMedia
+
+
+@dataclass(frozen=True)
+class ArchiveSite:
+    """外部リンク先サイトの保存ディレクトリの命名規則
+
+    {save_base_path}/{作者名}({作者ID})/{作品タイトル}({作品ID}).{拡張子}（1ページの作品）
+    {save_base_path}/{作者名}({作者ID})/{作品タイトル}({作品ID})/{作品タイトル}({作品ID})_{連番}.{拡張子}（複数ページの作品）
+    """
+
+    config_key: str  # 設定ファイルの項目名
+    url_format: str  # 作品ページURL（{}を作品IDで置き換える）
+    author_name: Callable[[str], str]  # 作者名のサニタイズ
+    work_title: Callable[[str], str]  # 作品タイトルのサニタイズ
+    page_start: int  # 複数ページの作品の連番の開始値
+    max_pages: int  # 1作品のページ数の上限
+
+
+# 各 *SaveDirectoryPath/*Downloader と同じ規則で作品を配置する
+ARCHIVE_SITES = [
+    ArchiveSite(
+        "pixiv",
+        "https://www.pixiv.net/artworks/{}",
+        lambda name: PixivAuthorname(name).name,
+        lambda title: PixivWorktitle(title).title,
+        1,
+        10,
+    ),
+    ArchiveSite(
+        "nijie",
+        "http://nijie.info/view_popup.php?id={}",
+        lambda name: NijieAuthorname(name).name,
+        lambda title: NijieWorktitle(title).title,
+        0,
+        10,
+    ),
+    ArchiveSite(
+        "nico_seiga",
+        "https://seiga.nicovideo.jp/seiga/im{}",
+        lambda name: NicoSeigaAuthorname(name).name,
+        lambda title: Illustname(title).name,
+        0,
+        1,
+    ),
+]
+
+# 名前の生成に使う文字列
+KANA_LIST = list("アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワン")
+WORD_LIST = ["夏", "冬", "海", "空", "花", "猫", "星", "夜", "雨", "桜", "らくがき", "まとめ", "習作", "落書き", "log"]
+VIA_LIST = ["Twitter Web App", "Twitter for iPhone", "Twitter for Android", "TweetDeck"]
+TOKEN_CHARS = string.ascii_letters + string.digits
+
+
+@dataclass(frozen=True)
+class ArchiveSpec:
+    """生成するアーカイブの規模"""
+
+    seed: int = 0  # 乱数のシード（同じシードと規模からは同じアーカイブを生成する）
+    fav_num: int = 100000  # Favorite のレコード数
+    retweet_num: int = 100000  # Retweet のレコード数
+    external_link_num: int = 50000  # ExternalLink のレコード数
+    media_file_num: int = 20000  # 保存先ごとに実際にファイルを置くメディア数（新しいレコードから）
+    author_num: int = 1000  # サイトごとの作者ディレクトリ数
+    work_num: int = 10  # 作者ごとの平均作品数
+    media_size: int = 1024  # メディアファイル1つのサイズ[byte]
+
+    def __post_init__(self) -> None:
+        self._is_valid()
+
+    def _is_valid(self) -> bool:
+        for name, value in vars(self).items():
+            if not isinstance(value, int):
+                raise TypeError(f"{name} is not int.")
+            if value < 0:
+                raise ValueError(f"{name} must be 0 <= {name}.")
+        if self.media_size <= 0:
+            raise ValueError("media_size must be 0 < media_size.")
+        return True
+
+
+class ArchiveGenerator:
+    """本番規模のアーカイブ（DB、保存先のメディア、外部リンク先の作品ディレクトリ）を合成する
+
+    DB は model.py のスキーマをそのまま使い、保存先のメディアは MediaStore の実体へのリンクとして配置する
+    乱数は生成する対象ごとにシードから作るため、ある対象の規模を変えても他の対象の内容は変わらない
+    """
+
+    # 最も古いツイートの日時
+    START_DATETIME = datetime(2018, 1, 1)
+    # ツイートIDの基準時刻（snowflake の epoch）
+    TWEET_EPOCH_MS = 1288834974657
+    # 動画ツイート、複数ページの作品、DL済の作品へのリンクの割合
+    VIDEO_RATIO = 0.1
+    MULTI_PAGE_RATIO = 0.3
+    EXIST_WORK_RATIO = 0.8
+    # 1回の executemany で挿入するレコード数
+    CHUNK = 10000
+
+    def __init__(self, spec: ArchiveSpec, base_path: Path) -> None:
+        """初期化
+
+        Args:
+            spec (ArchiveSpec): 生成するアーカイブの規模
+            base_path (Path): 生成先ディレクトリ（存在しないか空であること）
+        """
+        if not isinstance(spec, ArchiveSpec):
+            raise TypeError("spec must be ArchiveSpec.")
+        if not isinstance(base_path, Path):
+            raise TypeError("base_path must be Path.")
+        self.spec = spec
+        self.base_path = base_path
+        self.config = make_config(base_path)
+
+    def make_random(self, section: str) -> random.Random:
+        """生成する対象ごとの乱数生成器を返す"""
+        return random.Random(f"{self.spec.seed}:{section}")
+
+    def generate(self) -> dict[str, int]:
+        """アーカイブを生成し、config.json を書き出す
+
+        Returns:
+            dict[str, int]: 生成した対象ごとの件数
+        """
+        if self.base_path.exists() and any(self.base_path.iterdir()):
+            raise ValueError(f"{self.base_path} is not empty.")
+        self.base_path.mkdir(parents=True, exist_ok=True)
+        config_path = self.base_path / "config.json"
+        config_path.write_bytes(orjson.dumps(self.config, option=orjson.OPT_INDENT_2))
+
+        summary = {}
+        work_ids = {}
+        for site in ARCHIVE_SITES:
+            work_ids[site.config_key] = self.generate_site(site)
+            summary[f"{site.config_key}_works"] = len(work_ids[site.config_key])
+
+        config = self.config["db"]
+        db_path = Path(config["save_path"])
+        db_path.mkdir(parents=True, exist_ok=True)
+        db_cont = FavDBController(db_path / config["save_file_name"])
+        try:
+            with db_cont.engine.begin() as conn:
+                config = self.config["save_directory"]
+                media_store = MediaStore(Path(config["save_store_path"]))
+                summary["Fav"], summary["Fav_files"] = self.generate_media(
+                    conn, media_store, "Fav", self.spec.fav_num, Path(config["save_fav_path"])
+                )
+                summary["RT"], summary["RT_files"] = self.generate_media(
+                    conn, media_store, "RT", self.spec.retweet_num, Path(config["save_retweet_path"])
+                )
+                summary["ExternalLink"] = self.generate_external_links(conn, work_ids)
+        finally:
+            db_cont.engine.dispose()
+        return summary
+
+    def make_name(self, rng: random.Random, min_len: int, max_len: int) -> str:
+        return "".join(rng.choices(KANA_LIST, k=rng.randint(min_len, max_len)))
+
+    def make_user_list(self, rng: random.Random, user_num: int) -> list[dict]:
+        """ツイートの投稿者を作成する"""
+        return [
+            {
+                "user_id": str(100000 + index * 7919),
+                "user_name": self.make_name(rng, 2, 6),
+                "screan_name": "".join(rng.choices(TOKEN_CHARS, k=6)) + f"_{index}",
+            }
+            for index in range(max(1, user_num))
+        ]
+
+    def make_tweet_text(self, rng: random.Random, url: str = "") -> str:
+        words = rng.choices(WORD_LIST, k=rng.randint(1, 6))
+        return " ".join(words + ([url] if url else [])) + f" #{rng.choice(WORD_LIST)}"
+
+    def to_timestamp(self, created_at: datetime) -> float:
+        """JST の投稿日時を UNIX 時間にする（実行環境のタイムゾーンによらず同じ値にする）"""
+        return (created_at - timedelta(hours=9) - datetime(1970, 1, 1)).total_seconds()
+
+    def make_tweet_id(self, created_at: datetime, sequence: int) -> str:
+        """投稿日時から snowflake 形式のツイートIDを作る（sequence で同時刻のIDを区別する）"""
+        ms = int(self.to_timestamp(created_at) * 1000) - self.TWEET_EPOCH_MS
+        return str((ms << 22) + sequence % (1 << 22))
+
+    def insert_rows(self, conn: Connection, table, rows: list[dict], force: bool = False) -> None:
+        """rows が CHUNK 件以上たまっていれば（force なら常に）挿入して空にする"""
+        if rows and (force or len(rows) >= self.CHUNK):
+            conn.execute(insert(table), rows)
+            rows.clear()
+
+    def generate_media(
+        self, conn: Connection, media_store: MediaStore, source: str, row_num: int, save_path: Path
+    ) -> tuple[int, int]:
+        """メディアのレコードと、新しい方から media_file_num 件のメディアファイルを生成する
+
+        ファイルはストアの実体へのリンクとし、更新日時はツイートの投稿日時にする（tweet_media_saver と同じ）
+
+        Args:
+            conn (Connection): 挿入先のDB接続
+            media_store (MediaStore): メディア実体のストア
+            source (str): "Fav" or "RT"
+            row_num (int): レコード数
+            save_path (Path): メディアの保存先
+
+        Returns:
+            tuple[int, int]: (レコード数, ファイル数)
+        """
+        rng = self.make_random(source)
+        save_path.mkdir(parents=True, exist_ok=True)
+        user_list = self.make_user_list(rng, row_num // 20)
+        file_start = row_num - min(self.spec.media_file_num, row_num)
+        dts_format = "%Y-%m-%d %H:%M:%S"
+
+        media_rows, stored_rows = [], []
+        created_at = self.START_DATETIME
+        index = tweet_index = file_num = 0
+        while index < row_num:
+            created_at += timedelta(seconds=rng.randint(1, 3600))
+            tweet_id = self.make_tweet_id(created_at, tweet_index)
+            tweet_index += 1
+            user = rng.choice(user_list)
+            is_video = rng.random() < self.VIDEO_RATIO
+            media_num = 1 if is_video else rng.choice([1, 1, 1, 2, 3, 4])
+            tweet_text = self.make_tweet_text(rng)
+            tweet_via = rng.choice(VIA_LIST)
+            for page in range(min(media_num, row_num - index)):
+                token = "".join(rng.choices(TOKEN_CHARS, k=8)) + f"{index:07x}"
+                if is_video:
+                    filename = f"{token}.mp4"
+                    url = f"https://video.twimg.com/ext_tw_video/{tweet_id}/pu/vid/1280x720/{filename}"
+                    url_thumbnail = f"https://pbs.twimg.com/ext_tw_video_thumb/{tweet_id}/pu/img/{token}.jpg:orig"
+                    tweet_url = f"https://twitter.com/{user['screan_name']}/status/{tweet_id}/video/1"
+                else:
+                    filename = f"{token}.jpg"
+                    url = f"https://pbs.twimg.com/media/{filename}:orig"
+                    url_thumbnail = f"https://pbs.twimg.com/media/{filename}:large"
+                    tweet_url = f"https://twitter.com/{user['screan_name']}/status/{tweet_id}/photo/{page + 1}"
+                saved_localpath = (save_path / filename).absolute()
+                has_file = index >= file_start
+                saved_created_at = created_at.strftime(dts_format)
+                if has_file:
+                    data = filename.encode() + rng.randbytes(self.spec.media_size)
+                    sha256, object_path, media_size = media_store.save([data])
+                    MediaStore.link(object_path, saved_localpath)
+                    timestamp = self.to_timestamp(created_at)
+                    os.utime(saved_localpath, (timestamp, timestamp))
+                    stored_rows.append({
+                        "sha256": sha256,
+                        "url": url,
+                        "saved_localpath": str(saved_localpath),
+                        "media_size": media_size,
+                        "saved_created_at": saved_created_at,
+                    })
+                    file_num += 1
+                media_rows.append({
+                    "source": source,
+                    "is_exist_saved_file": has_file,
+                    "img_filename": filename,
+                    "url": url,
+                    "url_thumbnail": url_thumbnail,
+                    "tweet_id": tweet_id,
+                    "tweet_url": tweet_url,
+                    "created_at": created_at.strftime(dts_format),
+                    "user_id": user["user_id"],
+                    "user_name": user["user_name"],
+                    "screan_name": user["screan_name"],
+                    "tweet_text": tweet_text,
+                    "tweet_via": tweet_via,
+                    "saved_localpath": str(saved_localpath),
+                    "saved_created_at": saved_created_at,
+                    "media_size": self.spec.media_size + len(filename),
+                    "media_blob": None,
+                    "blob_id": None,
+                })
+                index += 1
+            self.insert_rows(conn, Media.__table__, media_rows)
+            self.insert_rows(conn, StoredMedia.__table__, stored_rows)
+        self.insert_rows(conn, Media.__table__, media_rows, True)
+        self.insert_rows(conn, StoredMedia.__table__, stored_rows, True)
+        return row_num, file_num
+
+    def generate_site(self, site: ArchiveSite) -> list[int]:
+        """外部リンク先サイトの作者ディレクトリと作品を生成する
+
+        Args:
+            site (ArchiveSite): 対象サイト
+
+        Returns:
+            list[int]: 生成した作品IDのリスト
+        """
+        rng = self.make_random(site.config_key)
+        base_path = Path(self.config[site.config_key]["save_base_path"])
+        base_path.mkdir(parents=True, exist_ok=True)
+        work_ids = []
+        work_id = rng.randint(100000, 999999)
+        created_at = self.START_DATETIME
+        for index in range(self.spec.author_num):
+            author_id = 10000 + index * 97 + rng.randint(0, 96)
+            author_name = site.author_name(self.make_name(rng, 2, 8))
+            author_path = base_path / f"{author_name}({author_id})"
+            author_path.mkdir()
+            work_num = rng.randint(1, 2 * self.spec.work_num - 1) if self.spec.work_num > 0 else 0
+            for _ in range(work_num):
+                work_id += rng.randint(1, 1000)
+                work_title = site.work_title(f"{rng.choice(WORD_LIST)}{self.make_name(rng, 1, 4)}")
+                work_name = f"{work_title}({work_id})"
+                page_num = 1
+                if site.max_pages > 1 and rng.random() < self.MULTI_PAGE_RATIO:
+                    page_num = rng.randint(2, site.max_pages)
+                created_at += timedelta(seconds=rng.randint(1, 86400))
+                timestamp = self.to_timestamp(created_at)
+                if page_num == 1:
+                    work_path = author_path / f"{work_name}.jpg"
+                    work_path.write_bytes(work_name.encode())
+                else:
+                    work_path = author_path / work_name
+                    work_path.mkdir()
+                    for page in range(site.page_start, site.page_start + page_num):
+                        page_path = work_path / f"{work_name}_{page:03}.jpg"
+                        page_path.write_bytes(work_name.encode())
+                        os.utime(page_path, (timestamp, timestamp))
+                os.utime(work_path, (timestamp, timestamp))
+                work_ids.append(work_id)
+            # 保存先ディレクトリの解決は作者ディレクトリを更新日時順に走査するため、更新日時も固定する
+            timestamp = self.to_timestamp(created_at)
+            os.utime(author_path, (timestamp, timestamp))
+        return work_ids
+
+    def generate_external_links(self, conn: Connection, work_ids: dict[str, list[int]]) -> int:
+        """外部リンクのレコードを生成する
+
+        リンク先は EXIST_WORK_RATIO の割合で生成済（DL済）の作品、それ以外は未取得の作品とする
+
+        Args:
+            conn (Connection): 挿入先のDB接続
+            work_ids (dict[str, list[int]]): サイトごとの生成済の作品IDのリスト
+
+        Returns:
+            int: レコード数
+        """
+        rng = self.make_random("ExternalLink")
+        user_list = self.make_user_list(rng, self.spec.external_link_num // 20)
+        dts_format = "%Y-%m-%d %H:%M:%S"
+        rows = []
+        created_at = self.START_DATETIME
+        for index in range(self.spec.external_link_num):
+            created_at += timedelta(seconds=rng.randint(1, 3600))
+            site = rng.choice(ARCHIVE_SITES)
+            exist_ids = work_ids[site.config_key]
+            if exist_ids and rng.random() < self.EXIST_WORK_RATIO:
+                work_id = rng.choice(exist_ids)
+            else:
+                work_id = rng.randint(10_000_000, 99_999_999)
+            url = site.url_format.format(work_id)
+            user = rng.choice(user_list)
+            tweet_id = self.make_tweet_id(created_at, index)
+            rows.append({
+                "external_link_url": url,
+                "tweet_id": tweet_id,
+                "tweet_url": f"https://twitter.com/{user['screan_name']}/status/{tweet_id}",
+                "created_at": created_at.strftime(dts_format),
+                "user_id": user["user_id"],
+                "user_name": user["user_name"],
+                "screan_name": user["screan_name"],
+                "tweet_text": self.make_tweet_text(rng, url),
+                "tweet_via": rng.choice(VIA_LIST),
+                "saved_created_at": created_at.strftime(dts_format),
+                "link_type": "",
+            })
+            self.insert_rows(conn, ExternalLink.__table__, rows)
+        self.insert_rows(conn, ExternalLink.__table__, rows, True)
+        return self.spec.external_link_num
+
+
+if __name__ == "__main__":
+    spec = ArchiveSpec(fav_num=1000, retweet_num=1000, external_link_num=500, media_file_num=100, author_num=10)
+    print(ArchiveGenerator(spec, Path("./archive_sample")).generate())
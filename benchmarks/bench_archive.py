@@ -0,0 +1,134 @@
+import random
+import re
+from pathlib import Path
+from types import SimpleNamespace
+
+from benchmarks.archive import ArchiveGenerator, ArchiveSpec
+from benchmarks.fixtures import create_fav_crawler, make_workspace, remove_workspace
+from media_gathering.html_writer.gallery_writer import GalleryWriter
+from media_gathering.html_writer.html_writer import HtmlWriter
+from media_gathering.link_search.nico_seiga.authorid import Authorid as NicoSeigaAuthorid
+from media_gathering.link_search.nico_seiga.authorname import Authorname as NicoSeigaAuthorname
+from media_gathering.link_search.nico_seiga.illustid import Illustid
+from media_gathering.link_search.nico_seiga.illustname import Illustname
+from media_gathering.link_search.nico_seiga.nico_seiga_info import NicoSeigaInfo
+from media_gathering.link_search.nico_seiga.nico_seiga_save_directory_path import NicoSeigaSaveDirectoryPath
+from media_gathering.link_search.nijie.authorid import Authorid as NijieAuthorid
+from media_gathering.link_search.nijie.authorname import Authorname as NijieAuthorname
+from media_gathering.link_search.nijie.nijie_page_info import NijiePageInfo
+from media_gathering.link_search.nijie.nijie_save_directory_path import NijieSaveDirectoryPath
+from media_gathering.link_search.nijie.nijie_source_list import NijieSourceList
+from media_gathering.link_search.nijie.nijie_url import NijieURL
+from media_gathering.link_search.nijie.worktitle import Worktitle as NijieWorktitle
+from media_gathering.link_search.pixiv.pixiv_save_directory_path import PixivSaveDirectoryPath
+from media_gathering.link_search.pixiv.pixiv_work_url import PixivWorkURL
+
+# {作者名}({作者ID}) の形式にマッチする
+AUTHOR_DIRECTORY_PATTERN = re.compile(r"^(.*)\(([0-9]+)\)$")
+
+
+class ArchiveAppPixivAPI:
+    """作品詳細の取得結果のみを返す AppPixivAPI の代わり（通信しない）"""
+
+    def __init__(self, author_name: str, author_id: int) -> None:
+        self.author_name = author_name
+        self.author_id = author_id
+
+    def illust_detail(self, work_id: int) -> SimpleNamespace:
+        user = SimpleNamespace(name=self.author_name, id=self.author_id)
+        return SimpleNamespace(error=None, illust=SimpleNamespace(title=f"新作{work_id}", user=user))
+
+
+class ArchiveBench:
+    """合成した本番規模のアーカイブに対する保存先の整理、html出力、保存先ディレクトリの解決"""
+
+    # アーカイブの規模（ArchiveSpec の各項目）
+    SEED = 0
+    FAV_NUM = 100000
+    RETWEET_NUM = 10000
+    EXTERNAL_LINK_NUM = 10000
+    MEDIA_FILE_NUM = 20000
+    AUTHOR_NUM = 1000
+    WORK_NUM = 10
+    # 1回の計測で保存先ディレクトリを解決する作品数
+    RESOLVE_NUM = 100
+
+    def setup_class(self) -> None:
+        self.base_path = make_workspace()
+        spec = ArchiveSpec(
+            self.SEED,
+            self.FAV_NUM,
+            self.RETWEET_NUM,
+            self.EXTERNAL_LINK_NUM,
+            self.MEDIA_FILE_NUM,
+            self.AUTHOR_NUM,
+            self.WORK_NUM,
+        )
+        generator = ArchiveGenerator(spec, self.base_path)
+        generator.generate()
+        self.crawler = create_fav_crawler(self.base_path)
+
+        # html の出力先をアーカイブ配下に向ける
+        self.original_paths = (HtmlWriter.FAV_HTML_PATH, GalleryWriter.FAV_GALLERY_PATH)
+        HtmlWriter.FAV_HTML_PATH = str(self.base_path / "html/FavMediaGathering.html")
+        GalleryWriter.FAV_GALLERY_PATH = str(self.base_path / "html/FavGallery")
+
+        # 既存の作者の新しい作品の保存先を解決する（作者ディレクトリの走査が最も長くなる場合）
+        self.authors = {}
+        for site in ["pixiv", "nijie", "nico_seiga"]:
+            base_path = Path(generator.config[site]["save_base_path"])
+            author_list = sorted(sp.name for sp in base_path.iterdir() if sp.is_dir())
+            rng = random.Random(f"{self.SEED}:{site}")
+            self.authors[site] = (base_path, rng.choices(author_list, k=self.RESOLVE_NUM) if author_list else [])
+
+    def teardown_class(self) -> None:
+        HtmlWriter.FAV_HTML_PATH, GalleryWriter.FAV_GALLERY_PATH = self.original_paths
+        self.crawler.thumbnail_cache.shutdown()
+        self.crawler.db_cont.engine.dispose()
+        remove_workspace(self.base_path)
+
+    def time_get_exist_filelist(self) -> None:
+        self.crawler.get_exist_filelist()
+
+    def time_shrink_folder(self) -> None:
+        # 全ファイルを保持数以内にして削除を起こさず、走査とフラグ更新とストアの整理の時間を計る
+        self.crawler.shrink_folder(self.MEDIA_FILE_NUM)
+
+    def time_write_result_html(self) -> None:
+        HtmlWriter("Fav", self.crawler.db_cont).write_result_html(force=True)
+
+    def time_write_gallery(self) -> None:
+        GalleryWriter("Fav", self.crawler.db_cont).write_gallery(force=True)
+
+    def time_pixiv_save_directory_path(self) -> None:
+        base_path, author_list = self.authors["pixiv"]
+        for work_id, author_dir in enumerate(author_list, start=1):
+            author_name, author_id = AUTHOR_DIRECTORY_PATTERN.match(author_dir).groups()
+            aapi = ArchiveAppPixivAPI(author_name, int(author_id))
+            pixiv_url = PixivWorkURL.create(f"https://www.pixiv.net/artworks/{work_id}")
+            PixivSaveDirectoryPath.create(aapi, pixiv_url, base_path)
+
+    def time_nijie_save_directory_path(self) -> None:
+        base_path, author_list = self.authors["nijie"]
+        for work_id, author_dir in enumerate(author_list, start=1):
+            author_name, author_id = AUTHOR_DIRECTORY_PATTERN.match(author_dir).groups()
+            nijie_url = NijieURL.create(f"http://nijie.info/view_popup.php?id={work_id}")
+            page_info = NijiePageInfo(
+                NijieSourceList.create([f"https://pic.nijie.net/01/nijie/{work_id}.jpg"]),
+                NijieAuthorname(author_name),
+                NijieAuthorid(int(author_id)),
+                NijieWorktitle(f"新作{work_id}"),
+            )
+            NijieSaveDirectoryPath.create(nijie_url, page_info, base_path)
+
+    def time_nico_seiga_save_directory_path(self) -> None:
+        base_path, author_list = self.authors["nico_seiga"]
+        for work_id, author_dir in enumerate(author_list, start=1):
+            author_name, author_id = AUTHOR_DIRECTORY_PATTERN.match(author_dir).groups()
+            illust_info = NicoSeigaInfo(
+                Illustid(work_id),
+                Illustname(f"新作{work_id}"),
+                NicoSeigaAuthorid(int(author_id)),
+                NicoSeigaAuthorname(author_name),
+            )
+            NicoSeigaSaveDirectoryPath.create(illust_info, base_path)
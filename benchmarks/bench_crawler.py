@@ -0,0 +1,126 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.fixtures import (
+    create_fav_crawler,
+    insert_media_rows,
+    make_media_params,
+    make_workspace,
+    remove_workspace,
+)
+from media_gathering.http_client_registry import HttpClientRegistry
+from media_gathering.tac.tweet_info import TweetInfo
+
+
+class ShrinkFolderBench:
+    """保存先ディレクトリの走査と、保持数を超えたファイルの削除"""
+
+    # 保存先に作成するファイル数
+    FILE_NUM = 5000
+    # ファイルを振り分けるサブディレクトリ数（0なら直下のみ）
+    DIR_NUM = 10
+    # この件数ごとに動画ファイルにする（動画は URL を DB に問い合わせる）
+    VIDEO_INTERVAL = 10
+
+    def setup_class(self) -> None:
+        self.base_path = make_workspace()
+        self.crawler = create_fav_crawler(self.base_path)
+        insert_media_rows(self.crawler.db_cont.engine, "Fav", self.FILE_NUM, self.VIDEO_INTERVAL)
+
+    def teardown_class(self) -> None:
+        self.crawler.thumbnail_cache.shutdown()
+        self.crawler.db_cont.engine.dispose()
+        remove_workspace(self.base_path)
+
+    def setup(self) -> None:
+        # shrink_folder で削除されたファイルを作り直す（更新日時はファイルごとにずらす）
+        for index in range(self.FILE_NUM):
+            filename = make_media_params(index, index % self.VIDEO_INTERVAL == 0)["img_filename"]
+            directory = self.crawler.save_path
+            if self.DIR_NUM > 0:
+                directory = directory / f"{index % self.DIR_NUM:02d}"
+            path = directory / filename
+            if not path.exists():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.write_bytes(b"\x00" * 64)
+                os.utime(path, (1_600_000_000 + index, 1_600_000_000 + index))
+
+    def time_get_exist_filelist(self) -> None:
+        self.crawler.get_exist_filelist()
+
+    def time_shrink_folder(self) -> None:
+        self.crawler.shrink_folder(self.FILE_NUM // 2)
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    """どのパスにも、パスごとに内容の異なる固定長のメディアを返す"""
+
+    def do_GET(self) -> None:
+        body = self.path.encode().ljust(self.server.media_size, b"\x00")
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class TweetMediaSaverBench:
+    """ローカルの HTTP サーバーからのメディアの保存"""
+
+    # 1回の計測で保存するメディア数
+    MEDIA_NUM = 100
+    # メディア1つのサイズ[byte]
+    MEDIA_SIZE = 256 * 1024
+
+    def setup_class(self) -> None:
+        self.base_path = make_workspace()
+        self.crawler = create_fav_crawler(self.base_path)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), MediaHandler)
+        self.server.media_size = self.MEDIA_SIZE
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+        # 保存するメディアの番号（計測ごとに未取得のメディアにする）
+        self.next_index = 0
+
+    def teardown_class(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        HttpClientRegistry.close("twitter")
+        self.crawler.thumbnail_cache.shutdown()
+        self.crawler.db_cont.engine.dispose()
+        remove_workspace(self.base_path)
+
+    def setup(self) -> None:
+        host, port = self.server.server_address
+        self.tweet_info_list = []
+        for index in range(self.next_index, self.next_index + self.MEDIA_NUM):
+            params = make_media_params(index)
+            filename = params["img_filename"]
+            self.tweet_info_list.append(
+                TweetInfo(
+                    filename,
+                    f"http://{host}:{port}/media/{filename}",
+                    f"http://{host}:{port}/media/{filename}:large",
+                    params["tweet_id"],
+                    params["tweet_url"],
+                    params["created_at"],
+                    params["user_id"],
+                    params["user_name"],
+                    params["screan_name"],
+                    params["tweet_text"],
+                    params["tweet_via"],
+                )
+            )
+        self.next_index += self.MEDIA_NUM
+
+    def teardown(self) -> None:
+        # サムネイル作成は計測に含めない
+        self.crawler.thumbnail_cache.wait()
+
+    def time_tweet_media_saver(self) -> None:
+        for tweet_info in self.tweet_info_list:
+            self.crawler.tweet_media_saver(tweet_info, 1_600_000_000, 1_600_000_000)
@@ -0,0 +1,59 @@
+import random
+
+from sqlalchemy import update
+
+from benchmarks.fixtures import insert_media_rows, make_media_params, make_workspace, remove_workspace
+from media_gathering.fav_db_controller import FavDBController
+from media_gathering.model import Media
+
+
+class FavDBControllerBench:
+    """合成した大きな DB に対する FavDBController の操作"""
+
+    # DB に事前に挿入しておくレコード数（1000000 まで想定）
+    ROW_NUM = 100000
+    # 1回の計測で upsert/select するレコード数
+    OPERATION_NUM = 200
+    # update_flag で更新するレコード数（shrink_folder で残すファイル数相当）
+    FLAG_NUM = 1000
+
+    def setup_class(self) -> None:
+        self.base_path = make_workspace()
+        self.db_cont = FavDBController(self.base_path / "PG_DB.db")
+        insert_media_rows(self.db_cont.engine, "Fav", self.ROW_NUM)
+        self.random = random.Random(0)
+        # upsert で新規に挿入するレコードの番号
+        self.next_index = self.ROW_NUM
+
+    def teardown_class(self) -> None:
+        self.db_cont.engine.dispose()
+        remove_workspace(self.base_path)
+
+    def setup(self) -> None:
+        # clear_flag が毎回全レコードを対象にするよう、フラグを立て直す
+        with self.db_cont.engine.begin() as conn:
+            conn.execute(update(Media).values(is_exist_saved_file=True))
+        self.sample_index_list = self.random.sample(range(self.ROW_NUM), self.FLAG_NUM)
+
+    def time_upsert_insert(self) -> None:
+        for index in range(self.next_index, self.next_index + self.OPERATION_NUM):
+            self.db_cont.upsert(make_media_params(index))
+        self.next_index += self.OPERATION_NUM
+
+    def time_upsert_update(self) -> None:
+        for index in self.sample_index_list[: self.OPERATION_NUM]:
+            self.db_cont.upsert(make_media_params(index))
+
+    def time_select(self) -> None:
+        self.db_cont.select(limit=300)
+
+    def time_select_from_media_url(self) -> None:
+        for index in self.sample_index_list[: self.OPERATION_NUM]:
+            self.db_cont.select_from_media_url(make_media_params(index)["img_filename"])
+
+    def time_update_flag(self) -> None:
+        filename_list = [make_media_params(index)["img_filename"] for index in self.sample_index_list]
+        self.db_cont.update_flag(filename_list, 1)
+
+    def time_clear_flag(self) -> None:
+        self.db_cont.clear_flag()
@@ -0,0 +1,27 @@
+from benchmarks.fixtures import replicate_tweets
+from media_gathering.link_search.link_searcher import LinkSearcher
+from media_gathering.tac.like_parser import LikeParser
+from media_gathering.tac.retweet_parser import RetweetParser
+
+
+class LikeParserBench:
+    """いいね一覧の取得結果の解析"""
+
+    # 解析するツイート数
+    TWEET_NUM = 10000
+    CACHE_NAME = "content_cache_likes_test.json"
+    parser_class = LikeParser
+
+    def setup_class(self) -> None:
+        self.fetched_tweets = replicate_tweets(self.CACHE_NAME, self.TWEET_NUM)
+        self.link_searcher = LinkSearcher()
+
+    def time_parse_to_TweetInfo(self) -> None:
+        self.parser_class(self.fetched_tweets, self.link_searcher).parse_to_TweetInfo()
+
+
+class RetweetParserBench(LikeParserBench):
+    """ユーザータイムライン（RT含む）の取得結果の解析"""
+
+    CACHE_NAME = "content_cache_timeline_test.json"
+    parser_class = RetweetParser
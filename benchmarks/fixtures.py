@@ -0,0 +1,166 @@
+import re
+import shutil
+import tempfile
+from pathlib import Path
+
+import orjson
+from sqlalchemy import Engine, insert
+
+from media_gathering.fav_crawler import FavCrawler
+from media_gathering.link_search.link_searcher import LinkSearcher
+from media_gathering.model import Media
+from media_gathering.thumbnail_cache import ThumbnailCache
+from media_gathering.util import find_values
+
+# リポジトリのルート
+ROOT_PATH = Path(__file__).parent.parent
+# 解析対象のキャッシュ（単体テストの期待値と同じもの）
+TWEET_CACHE_PATH = ROOT_PATH / "tests/tac/cache/expect"
+# 設定ファイルのひな形
+CONFIG_SAMPLE_PATH = ROOT_PATH / "config/config_sample.json"
+
+# 複製時に書き換える id の項目
+ID_PATTERN = re.compile(rb'("(?:id_str|rest_id)":\s*")(\d+)(")')
+
+
+def make_workspace() -> Path:
+    """ベンチマーク用の一時ディレクトリを作成する"""
+    return Path(tempfile.mkdtemp(prefix="media_gathering_bench_"))
+
+
+def remove_workspace(base_path: Path) -> None:
+    """ベンチマーク用の一時ディレクトリを削除する"""
+    shutil.rmtree(base_path, ignore_errors=True)
+
+
+def replicate_tweets(cache_name: str, tweet_num: int) -> list[dict]:
+    """キャッシュのツイート取得結果を複製し、tweet_num 件以上のツイートを含むページのリストを作成する
+
+    解析時に id_str で重複を除くため、複製ごとに id を書き換えて別のツイートにする
+
+    Args:
+        cache_name (str): TWEET_CACHE_PATH 配下のキャッシュのファイル名
+        tweet_num (int): 作成するツイート数の下限
+
+    Returns:
+        list[dict]: 取得結果のページのリスト（parser の fetched_tweets）
+    """
+    page_bytes = (TWEET_CACHE_PATH / cache_name).read_bytes()
+    per_page = len(find_values(orjson.loads(page_bytes), "tweet_results"))
+    page_num = -(-tweet_num // per_page)
+    fetched_tweets = []
+    for i in range(page_num):
+        replaced = ID_PATTERN.sub(lambda m: m[1] + m[2] + f"{i:06d}".encode() + m[3], page_bytes)
+        fetched_tweets.append(orjson.loads(replaced))
+    return fetched_tweets
+
+
+def make_media_params(index: int, is_video: bool = False) -> dict:
+    """index 番目の合成メディアの DB レコードを作成する
+
+    Args:
+        index (int): 合成メディアの番号（ファイル名、URLが番号ごとに一意になる）
+        is_video (bool): 動画のレコードにするか
+
+    Returns:
+        dict: FavDBController.upsert の params
+    """
+    filename = f"bench_{index:08d}.mp4" if is_video else f"bench_{index:08d}.jpg"
+    if is_video:
+        url = f"https://video.twimg.com/ext_tw_video/{index}/pu/vid/1280x720/{filename}?tag=12"
+    else:
+        url = f"http://pbs.twimg.com/media/{filename}:orig"
+    tweet_id = str(1_000_000_000_000_000_000 + index)
+    return {
+        "is_exist_saved_file": True,
+        "img_filename": filename,
+        "url": url,
+        "url_thumbnail": f"http://pbs.twimg.com/media/{filename}:large",
+        "tweet_id": tweet_id,
+        "tweet_url": f"https://twitter.com/bench_user/status/{tweet_id}/photo/1",
+        "created_at": "2022-10-24 10:00:00",
+        "user_id": "12345678",
+        "user_name": "bench_user_name",
+        "screan_name": "bench_user",
+        "tweet_text": f"benchmark tweet {index}",
+        "tweet_via": "Twitter Web App",
+        "saved_localpath": f"/bench/{filename}",
+        "saved_created_at": "2022-10-24 10:00:00",
+        "media_size": 1024,
+        "media_blob": None,
+    }
+
+
+def insert_media_rows(engine: Engine, source: str, row_num: int, video_interval: int = 0, chunk: int = 10000) -> None:
+    """合成メディアのレコードを Media テーブルに一括で挿入する
+
+    ORM を経由せずに executemany で挿入し、大きな DB を短時間で作成する
+
+    Args:
+        engine (Engine): 挿入先のエンジン
+        source (str): レコードの source（"Fav" or "RT"）
+        row_num (int): 挿入するレコード数
+        video_interval (int): この件数ごとに動画のレコードにする、0なら全て画像
+        chunk (int): 1回の executemany で挿入するレコード数
+    """
+    with engine.begin() as conn:
+        for start in range(0, row_num, chunk):
+            rows = []
+            for index in range(start, min(start + chunk, row_num)):
+                is_video = video_interval > 0 and index % video_interval == 0
+                rows.append(make_media_params(index, is_video) | {"source": source})
+            conn.execute(insert(Media.__table__), rows)
+
+
+def make_config(base_path: Path) -> dict:
+    """base_path 配下に保存する、外部サービスに接続しない設定を作成する
+
+    Args:
+        base_path (Path): 保存先やDBを置くディレクトリ
+
+    Returns:
+        dict: 設定
+    """
+    config = orjson.loads(CONFIG_SAMPLE_PATH.read_bytes())
+    config["twitter_api_client"] |= {
+        "ct0": "bench_ct0",
+        "auth_token": "bench_auth_token",
+        "target_screen_name": "bench_user",
+        "target_id": 12345678,
+    }
+    config["save_directory"] = {
+        "save_fav_path": str(base_path / "twitterFav"),
+        "save_retweet_path": str(base_path / "twitterRetweet"),
+        "save_store_path": str(base_path / ".media_store"),
+    }
+    config["save_permanent"]["save_permanent_media_flag"] = False
+    config["db"] |= {"save_path": str(base_path / "db"), "save_blob": False}
+    config["pixiv"] |= {"is_pixiv_trace": False, "save_base_path": str(base_path / "PG_Pixiv")}
+    config["nijie"] |= {"is_nijie_trace": False, "save_base_path": str(base_path / "PG_Nijie")}
+    config["nico_seiga"] |= {"is_seiga_trace": False, "save_base_path": str(base_path / "PG_Seiga")}
+    return config
+
+
+def create_fav_crawler(base_path: Path) -> FavCrawler:
+    """base_path 配下に保存する FavCrawler を作成する
+
+    サムネイルも base_path 配下に作成し、リポジトリの html/ を汚さない
+
+    Args:
+        base_path (Path): 保存先やDBを置くディレクトリ
+
+    Returns:
+        FavCrawler: クローラー
+    """
+    config_path = base_path / "config.json"
+    config_path.write_bytes(orjson.dumps(make_config(base_path)))
+    crawler_class = type("BenchFavCrawler", (FavCrawler,), {"CONFIG_FILE_NAME": str(config_path)})
+    crawler = crawler_class(link_searcher=LinkSearcher())
+    crawler.thumbnail_cache.shutdown()
+    crawler.thumbnail_cache = ThumbnailCache(base_path / "thumbnails")
+    return crawler
+
+
+if __name__ == "__main__":
+    fetched_tweets = replicate_tweets("content_cache_likes_test.json", 100)
+    print(len(fetched_tweets))
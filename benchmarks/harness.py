@@ -0,0 +1,298 @@
+import importlib
+import inspect
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Self
+
+import orjson
+
+# ベンチマークモジュールの置き場所（bench_*.py を収集する）
+BENCHMARK_DIR = Path(__file__).parent
+# 結果の保存先
+RESULT_DIR = BENCHMARK_DIR / "results"
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    """1つのベンチマークの計測結果（秒）"""
+
+    name: str  # モジュール名.クラス名.メソッド名
+    samples: list[float]  # 繰り返しごとの処理時間
+
+    def __post_init__(self) -> None:
+        self._is_valid()
+
+    def _is_valid(self) -> bool:
+        if not isinstance(self.name, str):
+            raise TypeError("name is not str.")
+        if not isinstance(self.samples, list):
+            raise TypeError("samples is not list.")
+        if not self.samples:
+            raise ValueError("samples is empty.")
+        return True
+
+    def to_dict(self) -> dict:
+        return {
+            "repeat": len(self.samples),
+            "min": min(self.samples),
+            "median": statistics.median(self.samples),
+            "mean": statistics.mean(self.samples),
+            "stdev": statistics.stdev(self.samples) if len(self.samples) > 1 else 0.0,
+            "samples": self.samples,
+        }
+
+
+@dataclass(frozen=True)
+class Comparison:
+    """2つの結果の同じベンチマークの中央値の比較"""
+
+    name: str
+    base: float | None  # 比較元の中央値[秒]、比較元に無い場合はNone
+    target: float | None  # 比較先の中央値[秒]、比較先に無い場合はNone
+
+    @property
+    def ratio(self) -> float | None:
+        """比較先 / 比較元（1より大きいほど遅くなっている）"""
+        if self.base is None or self.target is None or self.base == 0:
+            return None
+        return self.target / self.base
+
+    def is_regression(self, threshold: float) -> bool:
+        """threshold の割合を超えて遅くなっているか"""
+        return self.ratio is not None and self.ratio > 1 + threshold
+
+
+def collect_benchmarks(module_names: list[str] | None = None) -> list[type]:
+    """ベンチマーククラスを収集する
+
+    benchmarks/bench_*.py のうち time_ で始まるメソッドを持つクラスをベンチマーククラスとする
+
+    Args:
+        module_names (list[str] | None): 対象のモジュール名（"bench_parser" など）、Noneなら全て
+
+    Returns:
+        list[type]: ベンチマーククラスのリスト
+    """
+    if module_names is None:
+        module_names = sorted(path.stem for path in BENCHMARK_DIR.glob("bench_*.py"))
+    class_list = []
+    for module_name in module_names:
+        module = importlib.import_module(f"benchmarks.{module_name}")
+        for _, cls in inspect.getmembers(module, inspect.isclass):
+            if cls.__module__ != module.__name__:
+                continue
+            if any(name.startswith("time_") for name in dir(cls)):
+                class_list.append(cls)
+    return class_list
+
+
+def run_benchmark_class(
+    cls: type, repeat: int, params: dict[str, int], name_filter: str = ""
+) -> list[BenchmarkResult]:
+    """ベンチマーククラスの time_ メソッドをそれぞれ repeat 回ずつ計測する
+
+    クラスの setup_class/teardown_class は最初と最後に1回だけ、
+    setup/teardown は計測の繰り返しごとに呼び出し、計測には含めない
+
+    Args:
+        cls (type): ベンチマーククラス
+        repeat (int): 計測の繰り返し回数
+        params (dict[str, int]): 上書きする規模のクラス属性（"ROW_NUM" など）
+        name_filter (str): この文字列を名前に含むベンチマークのみ計測する
+
+    Returns:
+        list[BenchmarkResult]: 計測結果のリスト
+    """
+    method_names = [
+        name
+        for name in sorted(dir(cls))
+        if name.startswith("time_") and name_filter in f"{cls.__module__}.{cls.__name__}.{name}"
+    ]
+    if not method_names:
+        return []
+
+    bench = cls()
+    for key, value in params.items():
+        if hasattr(bench, key):
+            setattr(bench, key, value)
+
+    result_list = []
+    getattr(bench, "setup_class", lambda: None)()
+    try:
+        for method_name in method_names:
+            samples = []
+            for _ in range(repeat):
+                getattr(bench, "setup", lambda: None)()
+                try:
+                    start = time.perf_counter()
+                    getattr(bench, method_name)()
+                    samples.append(time.perf_counter() - start)
+                finally:
+                    getattr(bench, "teardown", lambda: None)()
+            name = f"{cls.__module__.removeprefix('benchmarks.')}.{cls.__name__}.{method_name}"
+            result_list.append(BenchmarkResult(name, samples))
+    finally:
+        getattr(bench, "teardown_class", lambda: None)()
+    return result_list
+
+
+def get_commit() -> str:
+    """計測したソースのコミットハッシュ（取得できない場合は空文字）"""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True, cwd=BENCHMARK_DIR
+        )
+        return result.stdout.strip()
+    except Exception:
+        return ""
+
+
+def make_report(result_list: list[BenchmarkResult], repeat: int, params: dict[str, int]) -> dict:
+    """計測結果をバージョン間で比較できるよう、環境の情報と合わせて辞書にまとめる
+
+    Args:
+        result_list (list[BenchmarkResult]): 計測結果のリスト
+        repeat (int): 計測の繰り返し回数
+        params (dict[str, int]): 上書きした規模
+
+    Returns:
+        dict: 保存する計測結果
+    """
+    return {
+        "commit": get_commit(),
+        "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "params": params,
+        "results": {result.name: result.to_dict() for result in result_list},
+    }
+
+
+def save_report(report: dict, path: Path | None = None) -> Path:
+    """計測結果をJSONで保存する
+
+    Args:
+        report (dict): 計測結果
+        path (Path | None): 保存先、Noneなら results/{日時}_{コミット}.json
+
+    Returns:
+        Path: 保存先
+    """
+    if path is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = RESULT_DIR / f"{timestamp}_{report['commit'] or 'unknown'}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+    return path
+
+
+def compare_reports(base: dict, target: dict) -> list[Comparison]:
+    """2つの計測結果をベンチマークごとに比較する
+
+    Args:
+        base (dict): 比較元の計測結果
+        target (dict): 比較先の計測結果
+
+    Returns:
+        list[Comparison]: 名前順の比較結果
+    """
+    base_results, target_results = base["results"], target["results"]
+    return [
+        Comparison(
+            name,
+            base_results[name]["median"] if name in base_results else None,
+            target_results[name]["median"] if name in target_results else None,
+        )
+        for name in sorted(base_results.keys() | target_results.keys())
+    ]
+
+
+def format_comparison(comparison_list: list[Comparison], threshold: float) -> str:
+    """比較結果を表形式の文字列にする"""
+
+    def format_time(value: float | None) -> str:
+        return "-" if value is None else f"{value * 1000:.3f}ms"
+
+    lines = [f"{'benchmark':<70} {'base':>14} {'target':>14} {'ratio':>8}"]
+    for comparison in comparison_list:
+        ratio = "-" if comparison.ratio is None else f"{comparison.ratio:.2f}"
+        mark = " REGRESSION" if comparison.is_regression(threshold) else ""
+        lines.append(
+            f"{comparison.name:<70} {format_time(comparison.base):>14} {format_time(comparison.target):>14}"
+            f" {ratio:>8}{mark}"
+        )
+    return "\n".join(lines)
+
+
+@dataclass(frozen=True)
+class BenchmarkRunner:
+    """ベンチマークを収集して計測し、結果を保存する"""
+
+    repeat: int = 5  # 計測の繰り返し回数
+    params: dict[str, int] | None = None  # 上書きする規模のクラス属性
+    name_filter: str = ""  # この文字列を名前に含むベンチマークのみ計測する
+
+    def __post_init__(self) -> None:
+        self._is_valid()
+
+    def _is_valid(self) -> bool:
+        if not isinstance(self.repeat, int):
+            raise TypeError("repeat is not int.")
+        if self.repeat <= 0:
+            raise ValueError("repeat must be 0 < repeat.")
+        if self.params is not None and not isinstance(self.params, dict):
+            raise TypeError("params is not dict.")
+        if not isinstance(self.name_filter, str):
+            raise TypeError("name_filter is not str.")
+        return True
+
+    @classmethod
+    def create(cls, repeat: int, param_list: list[str], name_filter: str = "") -> Self:
+        """コマンドライン引数から作成する
+
+        Args:
+            repeat (int): 計測の繰り返し回数
+            param_list (list[str]): "ROW_NUM=1000000" 形式の規模の上書き
+            name_filter (str): この文字列を名前に含むベンチマークのみ計測する
+
+        Returns:
+            Self: ランナー
+        """
+        params = {}
+        for param in param_list:
+            key, sep, value = param.partition("=")
+            if not sep or not value.isdecimal():
+                raise ValueError(f"param '{param}' must be NAME=INTEGER.")
+            params[key] = int(value)
+        return cls(repeat, params, name_filter)
+
+    def run(self, class_list: list[type], log=print) -> dict:
+        """ベンチマークを計測する
+
+        Args:
+            class_list (list[type]): ベンチマーククラスのリスト
+            log (Callable[[str], None]): 進捗の出力先
+
+        Returns:
+            dict: 保存する計測結果
+        """
+        params = self.params or {}
+        result_list = []
+        for cls in class_list:
+            for result in run_benchmark_class(cls, self.repeat, params, self.name_filter):
+                log(f"{result.name:<70} {statistics.median(result.samples) * 1000:>12.3f}ms")
+                result_list.append(result)
+        return make_report(result_list, self.repeat, params)
+
+
+if __name__ == "__main__":
+    runner = BenchmarkRunner(repeat=1, params={"TWEET_NUM": 100})
+    report = runner.run(collect_benchmarks(["bench_parser"]))
+    print(format_comparison(compare_reports(report, report), 0.1))
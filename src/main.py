@@ -1,50 +1,165 @@
 import argparse
-import logging.config
+import signal
 from logging import INFO, getLogger
 from pathlib import Path
 
-from media_gathering.fav_crawler import FavCrawler
+import orjson
+
+from media_gathering.log_config import configure_logging, get_log_directory
 from media_gathering.log_message import MSG
-from media_gathering.retweet_crawler import RetweetCrawler
+from media_gathering.profiler import CrawlProfiler
+from media_gathering.run_lock import RunLock
 
-logging.config.fileConfig("./log/logging.ini", disable_existing_loggers=False)
-for name in logging.root.manager.loggerDict:
-    # 自分以外のすべてのライブラリのログ出力を抑制
-    if "media_gathering" not in name:
-        getLogger(name).disabled = True
+# クローラーとDBコントローラーは重い依存を持つため、実行する処理に応じて必要なものだけ import する
 logger = getLogger(__name__)
 logger.setLevel(INFO)
 
 PREVENT_MULTIPLE_RUN_PATH = "./prevent_multiple_run"
 
-if __name__ == "__main__":
-    logger.info(MSG.HORIZONTAL_LINE.value)
-    logger.info(MSG.APPLICATION_START.value)
 
+def load_crawler(crawl_type: str) -> type:
+    """クロール対象に対応するクローラークラスを import して返す
+
+    Args:
+        crawl_type (str): クロール対象（"Fav" or "RT"）
+
+    Returns:
+        type: クローラークラス
+    """
+    if crawl_type == "RT":
+        from media_gathering.retweet_crawler import RetweetCrawler
+
+        return RetweetCrawler
+    from media_gathering.fav_crawler import FavCrawler
+
+    return FavCrawler
+
+
+def load_profiler(profile_mode: str | None) -> CrawlProfiler | None:
+    """プロファイル種別に対応するプロファイラを作成する
+
+    結果はログファイルと同じディレクトリに書き出す
+
+    Args:
+        profile_mode (str | None): プロファイル種別（"cpu" or "mem"）、プロファイルしない場合はNone
+
+    Returns:
+        CrawlProfiler | None: プロファイラ
+    """
+    if profile_mode is None:
+        return None
+    return CrawlProfiler(profile_mode, get_log_directory())
+
+
+def run_daemon(crawler_class_dict: dict[str, type], profiler: CrawlProfiler | None = None) -> None:
+    """クロールを設定された間隔で定期実行し続ける
+
+    SIGINT/SIGTERM を受け取ると実行中のクロールが終わり次第終了する
+    SIGUSR1/SIGUSR2 を受け取ると次回のクロールを1回だけ cpu/mem プロファイルする（シグナルが使えるOSのみ）
+
+    Args:
+        crawler_class_dict (dict[str, type]): クロール対象とクローラークラスの辞書
+        profiler (CrawlProfiler | None): 毎回のクロールに使うプロファイラ
+    """
+    from media_gathering.daemon import CrawlDaemon
+
+    daemon = CrawlDaemon.create(crawler_class_dict, profiler)
+    signal.signal(signal.SIGINT, lambda signum, frame: daemon.stop())
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: daemon.request_profile(load_profiler(CrawlProfiler.CPU)))
+        signal.signal(
+            signal.SIGUSR2, lambda signum, frame: daemon.request_profile(load_profiler(CrawlProfiler.MEMORY))
+        )
+    daemon.run()
+
+
+def search(args: argparse.Namespace) -> None:
+    """保存済のツイートを全文検索して表示する"""
+    from media_gathering.crawler import Crawler
+    from media_gathering.fav_db_controller import FavDBController
+
+    config = orjson.loads(Path(Crawler.CONFIG_FILE_NAME).read_bytes())["db"]
+    db_fullpath = Path(config["save_path"]) / config["save_file_name"]
+    db_cont = FavDBController(db_fullpath)
+    records = db_cont.search(args.query, args.source, args.limit, args.cursor)
+    for record in records:
+        print(f"[{record['source']}] {record['id']} @{record['screan_name']} {record['tweet_url']}")
+        print(f"    {record['tweet_text']}")
+    if len(records) == args.limit:
+        print(f"next: --cursor {records[-1]['id']}")
+
+
+if __name__ == "__main__":
     arg_parser = argparse.ArgumentParser(description="Twitter Crawler")
-    arg_parser.add_argument("--type", choices=["Fav", "RT"], default="Fav", help="Crawl target: Fav or RT")
+    arg_parser.add_argument(
+        "--type",
+        choices=["Fav", "RT", "all"],
+        default="Fav",
+        help="Crawl target: Fav, RT or all (Fav and RT concurrently)",
+    )
+    arg_parser.add_argument("--daemon", action="store_true", help="Keep running and crawl Fav and RT periodically")
+    arg_parser.add_argument(
+        "--accounts",
+        action="store_true",
+        help="Crawl --type target (Fav, RT or all) of every account in config 'accounts' with a worker pool",
+    )
+    arg_parser.add_argument(
+        "--resume", action="store_true", help="Resume the interrupted crawl from its checkpoint if one is left"
+    )
+    arg_parser.add_argument(
+        "--profile",
+        choices=["cpu", "mem"],
+        default=None,
+        help="Profile crawl with cProfile (cpu) or tracemalloc (mem)",
+    )
+    sub_parsers = arg_parser.add_subparsers(dest="command")
+    search_parser = sub_parsers.add_parser("search", help="Search saved tweets")
+    search_parser.add_argument("query", help="Search words separated by spaces")
+    search_parser.add_argument("--source", choices=["Fav", "RT", "ExternalLink"], default=None, help="Search target")
+    search_parser.add_argument("--limit", type=int, default=20, help="Max number of results")
+    search_parser.add_argument("--cursor", type=int, default=None, help="Show results older than this id")
     args = arg_parser.parse_args()
+    # 複数アカウントの収集はアカウントごとのプロセスで行うため、常駐/再開/プロファイルには対応しない
+    if args.accounts and (args.daemon or args.resume or args.profile):
+        arg_parser.error("--accounts cannot be used with --daemon, --resume or --profile")
 
-    c = None
-    if args.type == "Fav":
-        c = FavCrawler()
-    elif args.type == "RT":
-        c = RetweetCrawler()
-
-    if c is not None:
-        p = Path(PREVENT_MULTIPLE_RUN_PATH)
-        try:
-            if not p.exists():
-                p.touch()
-                c.crawl()
-            else:
-                logger.warning(MSG.APPLICATION_MULTIPLE_RUN.value)
-        except Exception as e:
-            logger.exception(e)
-        finally:
-            p.unlink(missing_ok=True)
+    # import 時にルートロガーの設定を書き換えるライブラリ（tweeterpy）があるため、クローラーを import してから設定する
+    crawler_class_dict = {}
+    if args.command is None:
+        crawl_types = ["Fav", "RT"] if args.daemon or args.type == "all" else [args.type]
+        crawler_class_dict = {crawl_type: load_crawler(crawl_type) for crawl_type in crawl_types}
+    configure_logging()
+    logger.info(MSG.HORIZONTAL_LINE.value)
+    logger.info(MSG.APPLICATION_START.value)
+
+    if args.command == "search":
+        search(args)
     else:
-        arg_parser.print_help()
+        # クロールは多重起動しない（デーモンは起動している間ロックを保持し続ける）
+        with RunLock(Path(PREVENT_MULTIPLE_RUN_PATH)) as run_lock:
+            try:
+                if not run_lock.acquire():
+                    logger.warning(MSG.APPLICATION_MULTIPLE_RUN.value)
+                elif args.daemon:
+                    run_daemon(crawler_class_dict, load_profiler(args.profile))
+                elif args.accounts:
+                    from media_gathering.account_crawl import crawl_accounts
+
+                    crawl_accounts(list(crawler_class_dict.values()))
+                elif args.type == "all":
+                    from media_gathering.concurrent_crawl import crawl_all
+
+                    crawl_all(
+                        crawler_class_dict["Fav"], crawler_class_dict["RT"], args.resume, load_profiler(args.profile)
+                    )
+                else:
+                    crawler = crawler_class_dict[args.type]()
+                    crawler.resume = args.resume
+                    crawler.profiler = load_profiler(args.profile)
+                    crawler.crawl()
+            except Exception as e:
+                logger.exception(e)
 
     logger.info(MSG.APPLICATION_DONE.value)
     logger.info(MSG.HORIZONTAL_LINE.value)
@@ -0,0 +1,155 @@
+import hashlib
+import time
+from concurrent.futures import ProcessPoolExecutor
+from logging import INFO, getLogger
+from pathlib import Path
+
+import orjson
+
+from media_gathering.crawler import Crawler
+from media_gathering.fav_db_controller import FavDBController
+from media_gathering.log_config import configure_logging
+from media_gathering.log_message import MSG
+from media_gathering.media_store import MediaStore
+from media_gathering.util import Result
+
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+def get_auth_token(account: dict) -> str:
+    """アカウントのクロールに使う認証情報（auth_token）を返す
+
+    アカウントで上書きしていない場合は元の設定の認証情報を使うため空文字を返す
+    """
+    return account.get("twitter_api_client", {}).get("auth_token", "")
+
+
+def shard_account_list(account_list: list[dict], workers: int) -> list[list[dict]]:
+    """アカウントをワーカーごとのシャードに振り分ける
+
+    同じ認証情報のアカウントは同じシャードに入れ、別のプロセスから同時に使われないようにする
+    振り分けは auth_token のハッシュで決めるため、実行のたびに変わることはない
+
+    Args:
+        account_list (list[dict]): 設定ファイルの accounts 項目のアカウントのリスト
+        workers (int): ワーカー数
+
+    Returns:
+        list[list[dict]]: 空でないシャードのリスト
+    """
+    if workers <= 0:
+        raise ValueError("workers must be 0 < workers.")
+    shard_list: list[list[dict]] = [[] for _ in range(workers)]
+    for account in account_list:
+        digest = hashlib.sha256(get_auth_token(account).encode()).digest()
+        shard_list[int.from_bytes(digest[:8], "big") % workers].append(account)
+    return [shard for shard in shard_list if shard]
+
+
+def crawl_shard(
+    crawler_class_list: list[type[Crawler]], account_list: list[dict], rate_limit_interval: float
+) -> tuple[list[str], list[str]]:
+    """1つのワーカープロセスでシャード内のアカウントを順番にクロールする
+
+    ログイン済の外部リンク探索はシャード内のクローラーで使い回す
+    同じ認証情報でクロールする間隔は rate_limit_interval 秒以上空ける
+    ストアの整理は他のワーカーが保存途中の実体を消さないよう、整理対象を返して呼び出し側でまとめて行う
+
+    Args:
+        crawler_class_list (list[type[Crawler]]): アカウントごとに実行するクローラークラスのリスト
+        account_list (list[dict]): クロールするアカウントのリスト
+        rate_limit_interval (float): 同じ認証情報でクロールする間隔[秒]
+
+    Returns:
+        tuple[list[str], list[str]]: (失敗したクロールの "アカウント名:クローラークラス名" のリスト,
+                                      ストアの整理対象の実体の sha256 のリスト)
+    """
+    link_searcher = None
+    last_used: dict[str, float] = {}
+    failed_list = []
+    prune_candidate_set: set[str] = set()
+    for account in account_list:
+        auth_token = get_auth_token(account)
+        for crawler_class in crawler_class_list:
+            if auth_token in last_used:
+                wait_time = last_used[auth_token] + rate_limit_interval - time.monotonic()
+                if wait_time > 0:
+                    time.sleep(wait_time)
+            crawler = None
+            try:
+                crawler = crawler_class(link_searcher, None, account)
+                crawler.prune_media_store = False
+                link_searcher = crawler.lsb
+                crawler.crawl()
+            except Exception as e:
+                logger.error(f"{account.get('name')} {crawler_class.__name__} crawl failed.", exc_info=e)
+                failed_list.append(f"{account.get('name')}:{crawler_class.__name__}")
+            finally:
+                last_used[auth_token] = time.monotonic()
+                if crawler is not None:
+                    prune_candidate_set.update(crawler.prune_candidate_set)
+    return failed_list, sorted(prune_candidate_set)
+
+
+def crawl_accounts(crawler_class_list: list[type[Crawler]]) -> Result:
+    """設定ファイルの accounts 項目の全アカウントをワーカープロセスに振り分けてクロールする
+
+    各アカウントは保存先とDBを個別に持ち、メディア実体のストアとその記録は共有する
+    別のアカウントで取得済のメディアはダウンロードせずにストアの実体を参照する
+
+    Args:
+        crawler_class_list (list[type[Crawler]]): アカウントごとに実行するクローラークラスのリスト
+
+    Returns:
+        Result: 全てのクロールが成功した場合 Result.success, 1つでも失敗した場合 Result.failed
+    """
+    config = orjson.loads(Path(Crawler.CONFIG_FILE_NAME).read_bytes())
+    accounts_config = config.get("accounts", {})
+    account_list = accounts_config.get("account_list", [])
+    if not account_list:
+        logger.info(MSG.ACCOUNT_CRAWL_EMPTY.value)
+        return Result.success
+    name_list = [account.get("name") for account in account_list]
+    if len(set(name_list)) != len(name_list):
+        raise ValueError("account 'name' must be unique.")
+
+    workers = accounts_config.get("workers", 2)
+    rate_limit_interval = accounts_config.get("rate_limit_interval_seconds", 60)
+    shard_list = shard_account_list(account_list, workers)
+    logger.info(MSG.ACCOUNT_CRAWL_START.value.format(len(account_list), len(shard_list)))
+
+    failed_list = []
+    prune_candidate_set: set[str] = set()
+    # spawn で起動したワーカーは親プロセスのログ設定を引き継がないため、起動時に読み込み直す
+    with ProcessPoolExecutor(max_workers=len(shard_list), initializer=configure_logging) as executor:
+        future_list = [
+            executor.submit(crawl_shard, crawler_class_list, shard, rate_limit_interval) for shard in shard_list
+        ]
+        for shard, future in zip(shard_list, future_list):
+            try:
+                shard_failed_list, shard_prune_candidate_list = future.result()
+                failed_list.extend(shard_failed_list)
+                prune_candidate_set.update(shard_prune_candidate_list)
+            except Exception as e:
+                logger.error("account crawl worker failed.", exc_info=e)
+                failed_list.extend(account.get("name") for account in shard)
+
+    # ストアの実体の記録は元の設定のDBにまとめられている
+    store_db_cont = FavDBController(Path(config["db"]["save_path"]) / config["db"]["save_file_name"])
+    media_store = MediaStore(Crawler.get_store_path(config["save_directory"]))
+    Crawler.prune_store(media_store, store_db_cont, prune_candidate_set)
+    store_db_cont.engine.dispose()
+    if failed_list:
+        logger.error(f"failed account crawl: {failed_list}")
+    logger.info(MSG.ACCOUNT_CRAWL_DONE.value)
+    return Result.failed if failed_list else Result.success
+
+
+if __name__ == "__main__":
+    from media_gathering.fav_crawler import FavCrawler
+    from media_gathering.log_config import configure_logging
+    from media_gathering.retweet_crawler import RetweetCrawler
+
+    configure_logging()
+    crawl_accounts([FavCrawler, RetweetCrawler])
@@ -0,0 +1,179 @@
+import hashlib
+import sqlite3
+import threading
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+@dataclass(frozen=True)
+class BlobStore:
+    """メディア本体を保持するブロブストア
+
+    メタデータを保持するDBとは別のSQLiteファイルにメディア本体を保存する
+    メタデータのレコードからは id で参照するため、メタデータのB-treeにメディア本体が含まれない
+    書き込み/読み込みは sqlite3 のインクリメンタルブロブI/Oでチャンクごとに行う
+
+    Blob テーブル:
+        [id] INTEGER PRIMARY KEY,
+        [sha256] TEXT NOT NULL UNIQUE,
+        [size] INTEGER NOT NULL,
+        [data] BLOB NOT NULL
+    """
+
+    db_fullpath: Path  # ブロブストアのDBファイルパス
+    _conn: sqlite3.Connection | None = field(init=False, default=None, compare=False, repr=False)
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock, compare=False, repr=False)
+
+    # 読み書きのチャンクサイズ
+    CHUNK_SIZE = 1024 * 1024
+
+    def __post_init__(self) -> None:
+        self._is_valid()
+
+    def _is_valid(self) -> bool:
+        if not isinstance(self.db_fullpath, Path):
+            raise TypeError("db_fullpath is not Path.")
+        return True
+
+    @classmethod
+    def blob_db_path(cls, db_fullpath: Path) -> Path:
+        """メタデータのDBファイルパスに対応するブロブストアのパスを返す
+
+        バックアップ時にまとめて扱えるよう、同じディレクトリに置く
+
+        Args:
+            db_fullpath (Path): メタデータのDBファイルパス
+
+        Returns:
+            Path: ブロブストアのDBファイルパス（PG_DB.db -> PG_DB_blob.db）
+        """
+        return db_fullpath.with_name(f"{db_fullpath.stem}_blob{db_fullpath.suffix}")
+
+    def connect(self) -> sqlite3.Connection:
+        """ブロブストアへの接続を返す
+
+        初回呼び出し時にDBファイルとテーブルを作成する
+
+        Returns:
+            sqlite3.Connection: ブロブストアへの接続
+        """
+        with self._lock:
+            if self._conn is None:
+                self.db_fullpath.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(self.db_fullpath, check_same_thread=False)
+                conn.execute(
+                    "create table if not exists Blob ("
+                    "id INTEGER PRIMARY KEY, sha256 TEXT NOT NULL UNIQUE, size INTEGER NOT NULL, data BLOB NOT NULL)"
+                )
+                conn.commit()
+                object.__setattr__(self, "_conn", conn)
+            return self._conn
+
+    def find(self, sha256: str) -> int | None:
+        """sha256 に対応するブロブの id を返す
+
+        Args:
+            sha256 (str): メディア内容のハッシュ値
+
+        Returns:
+            int | None: ブロブの id、存在しない場合はNone
+        """
+        row = self.connect().execute("select id from Blob where sha256 = ?", (sha256,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, media_path: Path, sha256: str | None = None) -> int:
+        """メディアをブロブストアに保存する
+
+        先に zeroblob で領域を確保し、ファイルからチャンクごとに書き込む
+        同じ内容のブロブが既にある場合は書き込まずにその id を返す
+        （別のインスタンスが同時に同じ内容を保存した場合も含む）
+
+        Args:
+            media_path (Path): 保存するメディアのパス
+            sha256 (str | None): メディア内容のハッシュ値、省略時は計算する
+
+        Returns:
+            int: ブロブの id
+        """
+        if sha256 is None:
+            with media_path.open("rb") as fin:
+                sha256 = hashlib.file_digest(fin, "sha256").hexdigest()
+        blob_id = self.find(sha256)
+        if blob_id is not None:
+            return blob_id
+
+        conn = self.connect()
+        size = media_path.stat().st_size
+        with conn, media_path.open("rb") as fin:
+            cursor = conn.execute(
+                "insert or ignore into Blob (sha256, size, data) values (?, ?, zeroblob(?))", (sha256, size, size)
+            )
+            if cursor.rowcount == 0:
+                return self.find(sha256)
+            blob_id = cursor.lastrowid
+            with conn.blobopen("Blob", "data", blob_id) as blob:
+                while chunk := fin.read(self.CHUNK_SIZE):
+                    blob.write(chunk)
+        return blob_id
+
+    def put_bytes(self, data: bytes) -> int:
+        """メモリ上のメディアをブロブストアに保存する
+
+        Args:
+            data (bytes): 保存するメディア
+
+        Returns:
+            int: ブロブの id
+        """
+        sha256 = hashlib.sha256(data).hexdigest()
+        blob_id = self.find(sha256)
+        if blob_id is not None:
+            return blob_id
+
+        conn = self.connect()
+        with conn:
+            cursor = conn.execute(
+                "insert or ignore into Blob (sha256, size, data) values (?, ?, ?)", (sha256, len(data), data)
+            )
+        if cursor.rowcount == 0:
+            return self.find(sha256)
+        return cursor.lastrowid
+
+    def iter_chunks(self, blob_id: int) -> Iterator[bytes]:
+        """ブロブをチャンクごとに読み込む
+
+        Args:
+            blob_id (int): ブロブの id
+
+        Yields:
+            bytes: ブロブのチャンク
+        """
+        with self.connect().blobopen("Blob", "data", blob_id, readonly=True) as blob:
+            while chunk := blob.read(self.CHUNK_SIZE):
+                yield chunk
+
+    def get(self, blob_id: int) -> bytes:
+        """ブロブ全体を読み込む
+
+        Args:
+            blob_id (int): ブロブの id
+
+        Returns:
+            bytes: ブロブの内容
+        """
+        return b"".join(self.iter_chunks(blob_id))
+
+    def close(self) -> None:
+        """ブロブストアへの接続を閉じる"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                object.__setattr__(self, "_conn", None)
+
+
+if __name__ == "__main__":
+    blob_store = BlobStore(BlobStore.blob_db_path(Path("./PG_DB.db")))
+    blob_id = blob_store.put_bytes(b"sample")
+    print(blob_id, blob_store.get(blob_id))
+    blob_store.close()
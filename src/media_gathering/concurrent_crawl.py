@@ -0,0 +1,68 @@
+from concurrent.futures import ThreadPoolExecutor
+from logging import INFO, getLogger
+
+from media_gathering.crawler import Crawler
+from media_gathering.log_message import MSG
+from media_gathering.profiler import CrawlProfiler
+from media_gathering.util import Result
+
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+def crawl_all(
+    fav_crawler_class: type[Crawler],
+    rt_crawler_class: type[Crawler],
+    resume: bool = False,
+    profiler: CrawlProfiler | None = None,
+) -> Result:
+    """Fav と RT のクロールを1つのプロセスで並行して実行する
+
+    ログイン済の外部リンク探索とDBエンジンは Fav のクローラーのものを RT のクローラーでも使う
+    HTTPクライアントは HttpClientRegistry によってプロセス全体で共有される
+    DBへの書き込みはエンジン側で順番に行われる
+    ブロブストアとアーカイブは同じファイルを各クローラーが別の接続で開く
+    （1つの接続を2つのスレッドで使うとトランザクションが混ざるため共有しない）
+    同じ内容のブロブの同時保存は BlobStore.put で、パックへの同時追記は MediaArchive.archive のファイルロックで調整する
+    保存途中のメディアを消さないよう、ストアの整理は両方のクロールが終わってからまとめて行う
+
+    Args:
+        fav_crawler_class (type[Crawler]): Fav のクローラークラス
+        rt_crawler_class (type[Crawler]): RT のクローラークラス
+        resume (bool): 中断したクロールのチェックポイントが残っていれば続きから再開するか
+        profiler (CrawlProfiler | None): クロールのプロファイラ（同時にプロファイルされるのは先に開始した方のみ）
+
+    Returns:
+        Result: 両方のクロールが成功した場合 Result.success, どちらかが例外で終了した場合 Result.failed
+    """
+    logger.info(MSG.CONCURRENT_CRAWL_START.value)
+    fav_crawler = fav_crawler_class()
+    rt_crawler = rt_crawler_class(fav_crawler.lsb, fav_crawler.db_cont.engine)
+    crawler_list = [fav_crawler, rt_crawler]
+    for crawler in crawler_list:
+        crawler.prune_media_store = False
+        crawler.resume = resume
+        crawler.profiler = profiler
+
+    with ThreadPoolExecutor(max_workers=len(crawler_list), thread_name_prefix="crawl") as executor:
+        future_list = [executor.submit(crawler.crawl) for crawler in crawler_list]
+
+    result = Result.success
+    for crawler, future in zip(crawler_list, future_list):
+        if (e := future.exception()) is not None:
+            logger.error(f"{crawler.type} crawl failed.", exc_info=e)
+            result = Result.failed
+
+    sha256_set = fav_crawler.prune_candidate_set | rt_crawler.prune_candidate_set
+    fav_crawler.prune_store(fav_crawler.media_store, fav_crawler.store_db_cont, sha256_set)
+    logger.info(MSG.CONCURRENT_CRAWL_DONE.value)
+    return result
+
+
+if __name__ == "__main__":
+    from media_gathering.fav_crawler import FavCrawler
+    from media_gathering.log_config import configure_logging
+    from media_gathering.retweet_crawler import RetweetCrawler
+
+    configure_logging()
+    crawl_all(FavCrawler, RetweetCrawler)
@@ -1,34 +1,42 @@
+import copy
 import enum
-import logging.config
 import os
-import shutil
 import ssl
 import time
 from abc import ABCMeta, abstractmethod
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
 from datetime import datetime
 from logging import INFO, getLogger
 from pathlib import Path
+from urllib.parse import urlparse
 
-import certifi
 import httpx
 import orjson
-from plyer import notification
-from slack_sdk.webhook import WebhookClient
 
+from media_gathering.blob_store import BlobStore
 from media_gathering.db_controller_base import DBControllerBase
-from media_gathering.html_writer.html_writer import HtmlWriter
+from media_gathering.http_client_registry import HttpClientRegistry
+from media_gathering.job_retry_policy import JobRetryPolicy
 from media_gathering.link_search.link_searcher import LinkSearcher
 from media_gathering.log_message import MSG
-from media_gathering.model import ExternalLink
+from media_gathering.media_archive import MediaArchive
+from media_gathering.media_store import MediaStore
+from media_gathering.metrics import Metrics, collect
+from media_gathering.model import DownloadJob, ExternalLink, StoredMedia
+from media_gathering.profiler import CrawlProfiler
 from media_gathering.tac.tweet_info import TweetInfo
-from media_gathering.tac.twitter_api_client_adapter import TwitterAPIClientAdapter
-from media_gathering.util import Result
-
-logging.config.fileConfig("./log/logging.ini", disable_existing_loggers=False)
-for name in logging.root.manager.loggerDict:
-    # 自分以外のすべてのライブラリのログ出力を抑制
-    if "media_gathering" not in name:
-        getLogger(name).disabled = True
+from media_gathering.thumbnail_cache import ThumbnailCache
+from media_gathering.util import LazyImport, Result
+
+# 通知、html出力、Twitterクライアントは使うときまで import しない
+certifi = LazyImport("certifi")
+notification = LazyImport("plyer", "notification")
+WebhookClient = LazyImport("slack_sdk.webhook", "WebhookClient")
+GalleryWriter = LazyImport("media_gathering.html_writer.gallery_writer", "GalleryWriter")
+HtmlWriter = LazyImport("media_gathering.html_writer.html_writer", "HtmlWriter")
+TwitterAPIClientAdapter = LazyImport("media_gathering.tac.twitter_api_client_adapter", "TwitterAPIClientAdapter")
+
 logger = getLogger(__name__)
 logger.setLevel(INFO)
 
@@ -62,11 +70,38 @@ class Crawler(metaclass=ABCMeta):
         del_cnt (int): 削除したメディアの数
         add_url_list (list): 新規追加したメディアのURLリスト
         del_url_list (list): 削除したメディアのURLリスト
+        thumbnail_cache (ThumbnailCache): html表示用サムネイルのキャッシュ
+        media_store (MediaStore): 各保存先が参照するメディア実体のストア
+        blob_store (BlobStore): save_blob 設定時にメディア本体を保存するブロブストア
+        media_archive (MediaArchive | None): 保存先から削除したメディアのアーカイブ
+        fetcher (FetcherBase | None): 認証済のツイート取得クラス（初回クロール時に作成し、以降は使い回す）
+        retry_policy (JobRetryPolicy): 失敗したダウンロードの再試行間隔
+        retry_job_limit (int): 1回のクロールで再試行するジョブ数の上限
+        resume (bool): 前回中断したクロールのチェックポイントが残っていれば続きから再開するか
+        metrics (Metrics): 1回のクロールの段階ごとの処理時間、件数、ホストごとの通信量の計測値
+        profiler (CrawlProfiler | None): クロールのプロファイラ（プロファイルしない場合はNone）
+        metrics_textfile_directory (str): 計測値をPrometheusのテキスト形式で書き出すディレクトリ（空なら書き出さない）
+        prune_media_store (bool): shrink_folder でストアの整理まで行うか
+        prune_candidate_set (set[str]): 保存先から削除して参照が減った、ストアの整理対象の実体の sha256
+        account_name (str): クロール対象のアカウント名（設定ファイルの accounts 項目、指定が無ければ空文字）
+        store_db_fullpath (Path): ストアの実体の記録先DBパス（全アカウントで共有する）
     """
 
     CONFIG_FILE_NAME = "./config/config.json"
+    # アカウントごとに上書きできる設定項目（archive などそれ以外の項目は全アカウントで共有する）
+    ACCOUNT_SECTION_LIST = ["twitter_api_client", "tweet_timeline", "save_directory", "db"]
+    # チェックポイントの処理済件数を記録する間隔[件]
+    CHECKPOINT_INTERVAL = 10
+
+    def __init__(self, link_searcher: LinkSearcher | None = None, account: dict | None = None) -> None:
+        """初期化
 
-    def __init__(self) -> None:
+        Args:
+            link_searcher (LinkSearcher | None): 他のクローラーと共有する外部リンク探索機構、
+                                                 指定しない場合は設定に従って作成する
+            account (dict | None): 設定ファイルの accounts 項目のアカウント、
+                                   指定した場合はその項目で設定を上書きしてクロールする
+        """
         logger.info(MSG.CRAWLER_INIT_START.value)
 
         def notify(error_message: str):
@@ -78,16 +113,49 @@ class Crawler(metaclass=ABCMeta):
             self.validate_config_file(self.CONFIG_FILE_NAME)
 
             self.config = orjson.loads(Path(self.CONFIG_FILE_NAME).read_bytes())
+            # ストアの実体の記録は全アカウントで元の設定のDBにまとめる
+            config = self.config["db"]
+            self.store_db_fullpath = Path(config["save_path"]) / config["save_file_name"]
+            self.account_name = ""
+            if account is not None:
+                self.config = self.merge_account_config(self.config, account)
+                self.validate_config(self.config)
+                self.account_name = account["name"]
+
             config = self.config["save_directory"]
             Path(config["save_fav_path"]).mkdir(parents=True, exist_ok=True)
             Path(config["save_retweet_path"]).mkdir(parents=True, exist_ok=True)
+            self.media_store = MediaStore(self.get_store_path(config))
+
+            # save_blob 設定時のメディア本体はメタデータのDBと同じ場所の別ファイルに保存する
+            config = self.config["db"]
+            db_fullpath = Path(config["save_path"]) / config["save_file_name"]
+            self.blob_store = BlobStore(BlobStore.blob_db_path(db_fullpath))
+
+            # 保存先から削除するメディアのアーカイブ（設定が無い場合は使わない）
+            config = self.config.get("archive", {})
+            self.media_archive = None
+            if config.get("archive_media_flag", False):
+                pack_size = config.get("archive_pack_size_mb", 1024) * 1024 * 1024
+                self.media_archive = MediaArchive(Path(config["archive_path"]), pack_size)
 
             config = self.config["save_permanent"]
             if config["save_permanent_media_flag"]:
                 Path(config["save_permanent_media_path"]).mkdir(parents=True, exist_ok=True)
 
-            # 外部リンク探索機構のセットアップ
-            self.link_search_register()
+            # 失敗したダウンロードの再試行（設定が無い場合はデフォルト値を使う）
+            config = self.config.get("job_queue", {})
+            self.retry_policy = JobRetryPolicy.create(config)
+            self.retry_job_limit = config.get("retry_job_limit", 100)
+
+            # 計測値の書き出し先（設定が無い場合はDBへの実行サマリーの保存のみ行う）
+            self.metrics_textfile_directory = self.config.get("metrics", {}).get("textfile_directory", "")
+
+            # 外部リンク探索機構のセットアップ（共有する場合はログインし直さない）
+            if link_searcher is None:
+                self.link_search_register()
+            else:
+                self.lsb = link_searcher
         except KeyError as e:
             error_message = "invalid config file error."
             logger.exception(e)
@@ -107,17 +175,100 @@ class Crawler(metaclass=ABCMeta):
         # 派生クラスで実体が代入されるメンバ
         # 情報保持DBコントローラー
         self.db_cont: DBControllerBase = None
+        # ストアの実体の記録用DBコントローラー（アカウント指定時のみ、それ以外は db_cont を使う）
+        self._store_db_cont: DBControllerBase | None = None
         # 保存先パス
         self.save_path = Path()
         # クローラタイプ = ["Fav", "RT"]
         self.type = ""
+        # ツイート取得クラス（セッション生成が重いため、デーモンモードでは作成済のものを使い回す）
+        self.fetcher = None
+        # 並行してクロールする場合は他のクローラーが保存途中の実体を消さないよう、ストアの整理は呼び出し側で行う
+        self.prune_media_store = True
+        # 保存先から削除して参照が減った、ストアの整理対象の実体の sha256
+        self.prune_candidate_set: set[str] = set()
+        # 中断したクロールを再開するか、プロファイルするかは呼び出し側で決める
+        self.resume = False
+        self.profiler: CrawlProfiler | None = None
 
         # 処理中～処理完了後に使用する追加削除カウント・リスト
+        self.reset_counter()
+
+        # 保存したメディアからhtml表示用のサムネイルを作成する
+        self.thumbnail_cache = ThumbnailCache(Path(ThumbnailCache.THUMBNAIL_PATH))
+        logger.info(MSG.CRAWLER_INIT_DONE.value)
+
+    def reset_counter(self) -> None:
+        """1回のクロールで使用する追加削除カウント・リストと計測値を初期化する
+
+        デーモンモードでは同じインスタンスで繰り返しクロールするため、クロールのたびに呼び出す
+        """
         self.add_cnt = 0
         self.del_cnt = 0
         self.add_url_list = []
         self.del_url_list = []
-        logger.info(MSG.CRAWLER_INIT_DONE.value)
+        self.metrics = Metrics()
+
+    @property
+    def store_db_cont(self) -> DBControllerBase:
+        """ストアの実体の記録に使うDBコントローラー
+
+        アカウント指定時は元の設定のDBを使い、アカウント間で取得済のメディアを共有する
+        """
+        return self.db_cont if self._store_db_cont is None else self._store_db_cont
+
+    @classmethod
+    def get_store_path(cls, save_directory_config: dict) -> Path:
+        """設定の save_directory 項目からメディア実体のストアのパスを返す
+
+        ハードリンクを張るため、ストアはデフォルトで保存先と同じ階層に置く
+
+        Args:
+            save_directory_config (dict): 設定の save_directory 項目
+
+        Returns:
+            Path: ストアのパス
+        """
+        default_path = Path(save_directory_config["save_fav_path"]).parent / ".media_store"
+        return Path(save_directory_config.get("save_store_path", default_path))
+
+    @classmethod
+    def merge_account_config(cls, config: dict, account: dict) -> dict:
+        """設定をアカウントの項目で上書きした設定を返す
+
+        上書きできるのは ACCOUNT_SECTION_LIST の項目のみで、項目内のキー単位で上書きする
+        ストアは全アカウントで共有するため、元の設定のストアのパスに固定する
+        保存先とDBはアカウントごとに分ける必要がある
+
+        Args:
+            config (dict): 元の設定
+            account (dict): 設定ファイルの accounts 項目のアカウント
+
+        Returns:
+            dict: アカウント用の設定（元の設定は変更しない）
+
+        Raise:
+            アカウントの設定が不正ならばValueError
+        """
+        name = account.get("name")
+        if not isinstance(name, str) or not name:
+            raise ValueError("account 'name' must be non-empty str.")
+        unknown_key_list = sorted(set(account) - {"name", *cls.ACCOUNT_SECTION_LIST})
+        if unknown_key_list:
+            raise ValueError(f"account '{name}' has unknown key {unknown_key_list}.")
+
+        merged = copy.deepcopy(config)
+        for section in cls.ACCOUNT_SECTION_LIST:
+            merged[section].update(account.get(section, {}))
+        merged["save_directory"]["save_store_path"] = str(cls.get_store_path(config["save_directory"]))
+
+        for key in ["save_fav_path", "save_retweet_path"]:
+            if Path(merged["save_directory"][key]) == Path(config["save_directory"][key]):
+                raise ValueError(f"account '{name}' must have its own '{key}'.")
+        db_fullpath = Path(merged["db"]["save_path"]) / merged["db"]["save_file_name"]
+        if db_fullpath == Path(config["db"]["save_path"]) / config["db"]["save_file_name"]:
+            raise ValueError(f"account '{name}' must have its own 'db'.")
+        return merged
 
     def validate_config_file(self, config_file_path: str) -> Result:
         """コンフィグファイルが正当な内容か簡易的に調べる
@@ -137,7 +288,17 @@ class Crawler(metaclass=ABCMeta):
         if not path.is_file():
             raise ValueError(f"{path.name} is not exist.")
         config = orjson.loads(path.read_bytes())
+        return self.validate_config(config)
+
+    def validate_config(self, config: dict) -> Result:
+        """設定のTwitterクライアント項目がダミー値のままでないか調べる
+
+        Args:
+            config (dict): 設定
 
+        Raise:
+            設定が不正ならばValueError
+        """
         ct0 = config["twitter_api_client"]["ct0"]
         auth_token = config["twitter_api_client"]["auth_token"]
         target_screen_name = config["twitter_api_client"]["target_screen_name"]
@@ -195,6 +356,7 @@ class Crawler(metaclass=ABCMeta):
         # http://pbs.twimg.com/media/{file.basename}.jpg:orig
         # 動画ファイルのURLはDBに問い合わせる
         add_img_filename = []
+        del_path_list = []
         for i, file in enumerate(filelist):
             url = ""
             file_path = Path(file)
@@ -208,17 +370,53 @@ class Crawler(metaclass=ABCMeta):
                 url = image_base_url.format(file_path.name)
 
             if i > holding_file_num:
-                file_path.unlink(missing_ok=True)
+                del_path_list.append(file_path)
                 self.del_cnt += 1
                 self.del_url_list.append(url)
             else:
                 # self.add_url_list.append(url)
                 add_img_filename.append(file_path.name)
 
+        # 削除するメディアは先にアーカイブに格納する
+        if self.media_archive:
+            self.media_archive.archive(del_path_list)
+        for file_path in del_path_list:
+            file_path.unlink(missing_ok=True)
+
+        # 削除したメディアが参照していた実体をストアの整理対象にする
+        saved_localpath_list = [str(file_path.absolute()) for file_path in del_path_list]
+        stored_media_list = self.store_db_cont.select_stored_media_from_localpath(saved_localpath_list)
+        self.prune_candidate_set.update(stored_media["sha256"] for stored_media in stored_media_list)
+
         # 存在マーキングを更新する
         self.update_db_exist_mark(add_img_filename)
+
+        # どの保存先からも参照されなくなった実体をストアから削除する
+        if self.prune_media_store:
+            self.prune_store(self.media_store, self.store_db_cont, self.prune_candidate_set)
+            self.prune_candidate_set.clear()
         return Result.success
 
+    @classmethod
+    def prune_store(cls, media_store: MediaStore, store_db_cont: DBControllerBase, sha256_set: set[str]) -> int:
+        """整理対象の実体のうち、どの保存先からも参照されなくなったものをストアから削除する
+
+        参照はストアの実体の記録（StoredMedia）の保存先パスが存在するかで判定する
+
+        Args:
+            media_store (MediaStore): 整理するストア
+            store_db_cont (DBControllerBase): ストアの実体の記録先DB
+            sha256_set (set[str]): 整理対象の実体の sha256
+
+        Returns:
+            int: 削除した実体の数
+        """
+        reference_dict = {
+            sha256: [r["saved_localpath"] for r in store_db_cont.select_stored_media_from_sha256(sha256)]
+            for sha256 in sorted(sha256_set)
+        }
+        return media_store.prune(reference_dict)
+
     def update_db_exist_mark(self, add_img_filename) -> Result:
         # 存在マーキングを更新する
         self.db_cont.clear_flag()
@@ -251,7 +449,18 @@ class Crawler(metaclass=ABCMeta):
 
         done_msg = self.make_done_message()
         config = self.config
-        HtmlWriter(self.type, self.db_cont).write_result_html()
+        # html出力先はアカウントで分かれていないため、htmlは元の設定のアカウントのみ出力する
+        if not self.account_name:
+            with self.stage_timer("html"):
+                # 追加も削除も無く既にhtmlが存在する場合はDBにもファイルにも触れない
+                html_path = HtmlWriter.get_save_path(self.type)
+                if self.add_cnt != 0 or self.del_cnt != 0 or html_path is None or not html_path.is_file():
+                    HtmlWriter(self.type, self.db_cont).write_result_html()
+
+                # ギャラリーは追記のみのため、追加が無く出力済であれば何もしない
+                gallery_path = GalleryWriter.get_gallery_path(self.type)
+                if self.add_cnt != 0 or gallery_path is None or not (gallery_path / "manifest.json").is_file():
+                    GalleryWriter(self.type, self.db_cont).write_gallery()
 
         logger.info("\t".join(done_msg.splitlines()))
 
@@ -300,7 +509,8 @@ class Crawler(metaclass=ABCMeta):
                     logger.exception(e)
                     logger.warn("Slack notify post failed.")
 
-        logger.info("End Of " + self.type + " Crawl Process.")
+        account_label = f" ({self.account_name})" if self.account_name else ""
+        logger.info("End Of " + self.type + " Crawl Process" + account_label + ".")
         return Result.success
 
     def post_discord_notify(self, message: str, is_embed: bool = True) -> Result:
@@ -350,7 +560,7 @@ class Crawler(metaclass=ABCMeta):
         if not payload:
             payload = {"content": message}
 
-        response = httpx.post(url, headers=headers, data=orjson.dumps(payload).decode())
+        response = HttpClientRegistry.get("discord").post(url, headers=headers, data=orjson.dumps(payload).decode())
         response.raise_for_status()
 
         # if response.status_code != 204:  # 成功すると204 No Contentが返ってくる
@@ -374,7 +584,7 @@ class Crawler(metaclass=ABCMeta):
         headers = {"Authorization": "Bearer " + token}
         payload = {"message": message}
 
-        response = httpx.post(url, headers=headers, params=payload)
+        response = HttpClientRegistry.get("line").post(url, headers=headers, params=payload)
         response.raise_for_status()
 
         # if response.status_code != 200:
@@ -402,6 +612,43 @@ class Crawler(metaclass=ABCMeta):
             return Result.failed
         return Result.success
 
+    def find_local_media(self, url_orig: str, file_name: str) -> tuple[str, Path] | None:
+        """他の保存先で取得済のメディアをストアから探す
+
+        ストアに無くても Favorite/Retweet のどちらかに保存済のファイルが残っていればストアに取り込む
+        保存先から削除済でもアーカイブに格納されていればそこから取り込む
+
+        Args:
+            url_orig (str): メディアの取得元URL
+            file_name (str): メディアのファイル名
+
+        Returns:
+            tuple[str, Path] | None: (sha256, ストア内の実体のパス)、ローカルに存在しない場合はNone
+        """
+        for stored_media in self.store_db_cont.select_stored_media_from_url(url_orig):
+            object_path = self.media_store.object_path(stored_media["sha256"])
+            if object_path.is_file():
+                return stored_media["sha256"], object_path
+
+        for seen_media in self.db_cont.select_seen_media(file_name):
+            saved_localpath = seen_media["saved_localpath"]
+            if not saved_localpath or not Path(saved_localpath).is_file():
+                continue
+            sha256, object_path, media_size = self.media_store.adopt(Path(saved_localpath))
+            dts_format = "%Y-%m-%d %H:%M:%S"
+            saved_created_at = datetime.now().strftime(dts_format)
+            self.store_db_cont.upsert_stored_media([
+                StoredMedia(sha256, seen_media["url"], saved_localpath, media_size, saved_created_at)
+            ])
+            return sha256, object_path
+
+        if self.media_archive:
+            media = self.media_archive.read(file_name)
+            if media is not None:
+                sha256, object_path, _ = self.media_store.save([media])
+                return sha256, object_path
+        return None
+
     def tweet_media_saver(
         self, tweet_info: TweetInfo, atime: float, mtime: float, session: httpx.Client | None = None
     ) -> MediaSaveResult:
@@ -411,7 +658,7 @@ class Crawler(metaclass=ABCMeta):
             tweet_info (TweetInfo): メディア含むツイート情報
             atime (float): 指定更新日時
             mtime (float): 指定更新日時
-            session (httpx.Client | None): 保存時に使うセッション
+            session (httpx.Client | None): 保存時に使うセッション、省略時は共有クライアントを使う
 
         Returns:
             MediaSaveResult:
@@ -421,8 +668,7 @@ class Crawler(metaclass=ABCMeta):
                 failed: 失敗（メディア辞書構造がエラー、urlが取得できない）
         """
         if not session:
-            transport = httpx.HTTPTransport(retries=3)
-            session = httpx.Client(follow_redirects=True, transport=transport)
+            session = HttpClientRegistry.get("twitter")
         url_orig = tweet_info.media_url
         url_thumbnail = tweet_info.media_thumbnail_url
         file_name = tweet_info.media_filename
@@ -435,16 +681,34 @@ class Crawler(metaclass=ABCMeta):
             return MediaSaveResult.past_done
 
         if not save_file_fullpath.is_file():
-            # URLからメディアを取得してローカルに保存
-            try:
-                response = session.get(url_orig, timeout=60)
-                response.raise_for_status()
-                save_file_fullpath.write_bytes(response.content)
-            except Exception:
-                # URLからのメディア取得に失敗
-                # 削除されていた場合など
-                logger.info(save_file_fullpath.name + " -> failed (maybe removed).")
-                return MediaSaveResult.failed
+            # 他の保存先で取得済のメディアならローカルの実体を参照するだけでよい
+            local_media = self.find_local_media(url_orig, file_name)
+            if local_media:
+                sha256, object_path = local_media
+                logger.debug(save_file_fullpath.name + " -> found in local")
+            else:
+                # URLからメディアを取得し、ハッシュを計算しながらストアに保存
+                try:
+                    with session.stream("GET", url_orig, timeout=60) as response:
+                        response.raise_for_status()
+                        sha256, object_path, _ = self.media_store.save(response.iter_bytes())
+                except Exception as e:
+                    # URLからのメディア取得に失敗
+                    # 削除されていた場合など
+                    logger.info(save_file_fullpath.name + " -> failed (maybe removed).")
+                    # 一時的な失敗に備えて再試行ジョブに記録する（削除済の場合は再試行しない）
+                    is_removed = isinstance(e, httpx.HTTPStatusError) and e.response.status_code in [404, 410]
+                    self.db_cont.record_job_failure(
+                        DownloadJob.MEDIA,
+                        self.type,
+                        url_orig,
+                        tweet_info.to_dict(),
+                        repr(e),
+                        self.retry_policy,
+                        is_removed,
+                    )
+                    return MediaSaveResult.failed
+            MediaStore.link(object_path, save_file_fullpath)
             self.add_url_list.append(url_orig)
 
             # DB操作
@@ -466,42 +730,88 @@ class Crawler(metaclass=ABCMeta):
                 "saved_localpath": str(save_file_fullpath),
                 "saved_created_at": datetime.now().strftime(dts_format),
             }
-            media_size = 0
-            save_blob_flag = self.config["db"]["save_blob"]
-            if save_blob_flag:
-                params["media_blob"] = save_file_fullpath.read_bytes()
-                media_size = len(params["media_blob"])
-                params["media_size"] = media_size
-            else:
-                params["media_blob"] = None
-                media_size = save_file_fullpath.stat().st_size
-                params["media_size"] = media_size
+            media_size = save_file_fullpath.stat().st_size
+            params["media_size"] = media_size
+            params["media_blob"] = None
+            params["blob_id"] = None
 
             if media_size == 0:
                 logger.warning(save_file_fullpath.name + " -> failed (0 byte file).")
+                # 空のファイルは残さず、再試行ジョブに記録して次回以降に取得し直す
+                save_file_fullpath.unlink(missing_ok=True)
+                self.db_cont.record_job_failure(
+                    DownloadJob.MEDIA,
+                    self.type,
+                    url_orig,
+                    tweet_info.to_dict(),
+                    "0 byte file",
+                    self.retry_policy,
+                )
                 return MediaSaveResult.failed
 
-            self.db_cont.upsert(params)
+            save_blob_flag = self.config["db"]["save_blob"]
+            if save_blob_flag:
+                # メディア本体はブロブストアに書き込み、メタデータの行からは id で参照する
+                params["blob_id"] = self.blob_store.put(save_file_fullpath, sha256)
+
+            with self.metrics.timer("db_upsert_seconds"):
+                self.db_cont.upsert(params)
+            self.metrics.inc("media_bytes_total", media_size)
+            stored_media_list = [
+                StoredMedia(sha256, url_orig, str(save_file_fullpath), media_size, params["saved_created_at"])
+            ]
 
             # 更新日時を上書き
             os.utime(save_file_fullpath, (atime, mtime))
 
+            # サムネイル作成はワーカーで行う
+            self.thumbnail_cache.submit(save_file_fullpath)
+
             # ログ書き出し
             logger.info(save_file_fullpath.name + " -> done")
             self.add_cnt += 1
 
-            # 常に保存する設定の場合はコピーする
+            # 常に保存する設定の場合はストアの実体を参照させる
             config = self.config["save_permanent"]
             if config["save_permanent_media_flag"]:
-                dst_path = Path(config["save_permanent_media_path"])
-                shutil.copy2(save_file_fullpath, dst_path)
+                dst_path = (Path(config["save_permanent_media_path"]) / file_name).absolute()
+                MediaStore.link(object_path, dst_path)
+                stored_media_list.append(
+                    StoredMedia(sha256, url_orig, str(dst_path), media_size, params["saved_created_at"])
+                )
+            self.store_db_cont.upsert_stored_media(stored_media_list)
         else:
             # 既に存在している場合
             logger.debug(save_file_fullpath.name + " -> exist")
             return MediaSaveResult.now_exist
         return MediaSaveResult.success
 
-    def interpret_tweets(self, tweet_info_list: list[TweetInfo]) -> Result:
+    def get_media_timestamp(self, tweet_info: TweetInfo) -> float:
+        """保存したメディアに設定する更新日時（ツイート投稿日時）を返す
+
+        Args:
+            tweet_info (TweetInfo): メディア含むツイート情報
+
+        Returns:
+            float: ツイート投稿日時のタイムスタンプ
+        """
+        dts_format = "%Y-%m-%d %H:%M:%S"
+        created_time = time.strptime(tweet_info.created_at, dts_format)
+        return time.mktime((
+            created_time.tm_year,
+            created_time.tm_mon,
+            created_time.tm_mday,
+            created_time.tm_hour,
+            created_time.tm_min,
+            created_time.tm_sec,
+            0,
+            0,
+            -1,
+        ))
+
+    def interpret_tweets(
+        self, tweet_info_list: list[TweetInfo], on_progress: Callable[[int], None] | None = None
+    ) -> Result:
         """tweet_info_list を解釈してメディアを収集する
 
         タイムスタンプについて
@@ -515,58 +825,278 @@ class Crawler(metaclass=ABCMeta):
 
         Args:
             tweet_info_list (list[TweetInfo]): 対象の tweet_info_list
+            on_progress (Callable[[int], None] | None): 1件処理するごとに処理済件数を渡して呼び出す関数
 
         Returns:
             Result: 成功時 Result.success, 一つでもメディア保存に失敗したならば Result.failed
         """
         result_list: list[MediaSaveResult] = []
-        transport = httpx.HTTPTransport(retries=3)
-        session = httpx.Client(follow_redirects=True, transport=transport)
+        session = HttpClientRegistry.get("twitter")
         for tweet_info in tweet_info_list:
-            dts_format = "%Y-%m-%d %H:%M:%S"
-            media_tweet_created_time = tweet_info.created_at
-            created_time = time.strptime(media_tweet_created_time, dts_format)
-            atime = mtime = time.mktime((
-                created_time.tm_year,
-                created_time.tm_mon,
-                created_time.tm_mday,
-                created_time.tm_hour,
-                created_time.tm_min,
-                created_time.tm_sec,
-                0,
-                0,
-                -1,
-            ))
+            atime = mtime = self.get_media_timestamp(tweet_info)
 
             # メディア保存
             result: MediaSaveResult = self.tweet_media_saver(tweet_info, atime, mtime, session)
             result_list.append(result)
+            self.metrics.inc("media_total", result=result.name)
+            if on_progress is not None:
+                on_progress(len(result_list))
+
+        # html出力前にサムネイル作成の完了を待つ
+        self.thumbnail_cache.wait()
         if [r for r in result_list if r == MediaSaveResult.failed]:
             return Result.failed
         return Result.success
 
-    def trace_external_link(self, external_link_list: list[ExternalLink]) -> Result:
+    def trace_external_link(
+        self, external_link_list: list[ExternalLink], on_progress: Callable[[int], None] | None = None
+    ) -> Result:
         """外部リンク探索
 
         Args:
             external_link_list (list[ExternalLink]): 対象の external_link_list
+            on_progress (Callable[[int], None] | None): 1件処理するごとに処理済件数を渡して呼び出す関数
 
         Returns:
             Result: 成功時 Result.success
         """
-        for external_link in external_link_list:
-            url = external_link.external_link_url
-            # 過去に取得済かどうか調べる
-            if self.db_cont.select_external_link(url) != []:
-                logger.debug(url + " : in DB exist -> skip")
-                continue
-            if self.lsb.can_fetch(url):
-                # 外部リンク先を取得して保存
+        # 失敗したサイトへのリンクは取得を試みずに再試行ジョブに回し、クロール全体が滞らないようにする
+        failed_host_set = set()
+        for i, external_link in enumerate(external_link_list, start=1):
+            self.trace_one_external_link(external_link, failed_host_set)
+            if on_progress is not None:
+                on_progress(i)
+        return Result.success
+
+    def trace_one_external_link(self, external_link: ExternalLink, failed_host_set: set[str]) -> None:
+        """外部リンクを1件探索する
+
+        Args:
+            external_link (ExternalLink): 対象の外部リンク
+            failed_host_set (set[str]): 今回の探索で取得に失敗したサイト、失敗した場合は追加する
+        """
+        url = external_link.external_link_url
+        # 過去に取得済かどうか調べる
+        if self.db_cont.select_external_link(url) != []:
+            logger.debug(url + " : in DB exist -> skip")
+            return
+        if not self.lsb.can_fetch(url):
+            return
+        host = urlparse(url).netloc
+        if host in failed_host_set:
+            payload = external_link.to_dict()
+            self.db_cont.enqueue_job(DownloadJob.EXTERNAL_LINK, self.type, url, payload, datetime.now())
+            return
+        if self.fetch_external_link(external_link) == Result.failed:
+            failed_host_set.add(host)
+
+    def fetch_external_link(self, external_link: ExternalLink) -> Result:
+        """外部リンク先を取得して保存する
+
+        失敗した場合は再試行ジョブに記録する
+
+        Args:
+            external_link (ExternalLink): 対象の外部リンク
+
+        Returns:
+            Result: 成功時 Result.success, 取得に失敗した場合 Result.failed
+        """
+        url = external_link.external_link_url
+        host = urlparse(url).netloc
+        try:
+            # 外部リンク先を取得して保存
+            with self.metrics.timer("external_link_fetch_seconds", host=host):
                 self.lsb.fetch(url)
-                # DBにアドレス情報を保存
-                self.db_cont.upsert_external_link([external_link])
+        except Exception as e:
+            logger.warning(f"{url} -> failed ({e!r}).")
+            self.metrics.inc("external_link_total", host=host, result="failed")
+            self.db_cont.record_job_failure(
+                DownloadJob.EXTERNAL_LINK, self.type, url, external_link.to_dict(), repr(e), self.retry_policy
+            )
+            return Result.failed
+        self.metrics.inc("external_link_total", host=host, result="success")
+        # DBにアドレス情報を保存
+        self.db_cont.upsert_external_link([external_link])
+        self.db_cont.complete_job(DownloadJob.EXTERNAL_LINK, self.type, url)
         return Result.success
 
+    def retry_jobs(self) -> int:
+        """再試行日時を過ぎた失敗済のダウンロードを再試行する
+
+        再試行でも失敗した場合は失敗回数を増やし、指数バックオフで決めた次回の再試行日時まで待たせる
+        外部リンクの取得に失敗したサイトは、今回の再試行ではそれ以上取得を試みない
+
+        Returns:
+            int: 再試行したジョブの数
+        """
+        logger.info(MSG.RETRY_JOB_START.value)
+        job_list = self.db_cont.select_due_jobs(self.type, datetime.now(), self.retry_job_limit)
+        failed_host_set = set()
+        count = 0
+        for job in job_list:
+            payload = orjson.loads(job["payload"])
+            if job["job_type"] == DownloadJob.MEDIA:
+                tweet_info = TweetInfo.create(payload)
+                atime = mtime = self.get_media_timestamp(tweet_info)
+                # 失敗した場合は tweet_media_saver の中で記録される
+                if self.tweet_media_saver(tweet_info, atime, mtime) != MediaSaveResult.failed:
+                    self.db_cont.complete_job(DownloadJob.MEDIA, self.type, job["url"])
+            elif job["job_type"] == DownloadJob.EXTERNAL_LINK:
+                host = urlparse(job["url"]).netloc
+                if host in failed_host_set:
+                    continue
+                if self.fetch_external_link(ExternalLink.create(payload)) == Result.failed:
+                    failed_host_set.add(host)
+            count += 1
+
+        # html出力前にサムネイル作成の完了を待つ
+        self.thumbnail_cache.wait()
+        self.metrics.inc("retry_jobs_total", count)
+        logger.info(MSG.RETRY_JOB_DONE.value.format(count))
+        return count
+
+    def make_checkpoint_callback(self, start: int, total: int, key: str) -> Callable[[int], None]:
+        """処理済件数をチェックポイントに記録する関数を返す
+
+        DBへの書き込みを抑えるため、CHECKPOINT_INTERVAL 件ごとと最後の1件でのみ記録する
+
+        Args:
+            start (int): 再開時に処理済だった件数
+            total (int): 今回処理する件数
+            key (str): 記録する処理済件数の引数名（"media_index" or "external_link_index"）
+
+        Returns:
+            Callable[[int], None]: 今回の処理済件数を受け取る関数
+        """
+
+        def on_progress(count: int) -> None:
+            if count % self.CHECKPOINT_INTERVAL == 0 or count == total:
+                self.db_cont.update_checkpoint(self.type, **{key: start + count})
+
+        return on_progress
+
+    @contextmanager
+    def stage_timer(self, stage: str) -> Iterator[None]:
+        """クロールの段階の処理時間を計測する
+
+        メモリプロファイル中は段階の前後でスナップショットも取る
+
+        Args:
+            stage (str): 段階名
+        """
+        with self.metrics.timer("crawl_stage_seconds", stage=stage):
+            if self.profiler is None:
+                yield
+            else:
+                with self.profiler.stage(stage):
+                    yield
+
+    @contextmanager
+    def profile(self) -> Iterator[None]:
+        """プロファイラが設定されていれば with ブロックのクロールをプロファイルする"""
+        if self.profiler is None:
+            yield
+        else:
+            label = f"{self.type}_{self.account_name}" if self.account_name else self.type
+            with self.profiler.profile(label):
+                yield
+
+    def export_metrics(self, started_at: datetime, finished_at: datetime, result: Result) -> None:
+        """1回のクロールの計測値を書き出す
+
+        実行サマリーをDBに保存し、設定されていれば Prometheus のテキスト形式でも書き出す
+        書き出しに失敗してもクロールの結果には影響させない
+
+        Args:
+            started_at (datetime): クロール開始日時
+            finished_at (datetime): クロール終了日時
+            result (Result): クロール結果
+        """
+        try:
+            self.db_cont.insert_crawl_run(self.type, started_at, finished_at, result.name, self.metrics.to_dict())
+            if self.metrics_textfile_directory:
+                suffix = f"_{self.account_name}" if self.account_name else ""
+                path = Path(self.metrics_textfile_directory) / f"media_gathering_{self.type}{suffix}.prom"
+                self.metrics.write_textfile(path, source=self.type, account=self.account_name)
+        except Exception as e:
+            logger.warning(f"Metrics export failed ({e!r}).")
+
+    def crawl_stages(self, fetch: Callable[[], list[dict]], parser_class: type) -> Result:
+        """ツイート取得、メディア保存、外部リンク収集、再試行、後処理を順に実行する
+
+        取得したツイートと各段階の処理済件数をチェックポイントとしてDBに記録する
+        self.resume が True でチェックポイントが残っている場合は、ツイートを取得し直さずに続きから再開する
+        最後まで完了したらチェックポイントは削除する
+        各段階の処理時間などの計測値とプロファイル結果は、途中で例外が発生した場合も書き出す
+
+        Args:
+            fetch (Callable[[], list[dict]]): ツイートを取得する関数
+            parser_class (type): 取得したツイートの解析クラス
+
+        Returns:
+            Result: 成功時 Result.success
+        """
+        started_at = datetime.now()
+        result = Result.failed
+        try:
+            with collect(self.metrics), self.profile():
+                self.run_stages(fetch, parser_class)
+            result = Result.success
+        finally:
+            self.export_metrics(started_at, datetime.now(), result)
+        return result
+
+    def run_stages(self, fetch: Callable[[], list[dict]], parser_class: type) -> None:
+        """crawl_stages の各段階を計測しながら実行する
+
+        Args:
+            fetch (Callable[[], list[dict]]): ツイートを取得する関数
+            parser_class (type): 取得したツイートの解析クラス
+        """
+        checkpoint = self.db_cont.select_checkpoint(self.type) if self.resume else None
+        if checkpoint:
+            logger.info(MSG.CHECKPOINT_RESUME.value.format(self.type, checkpoint["created_at"]))
+            fetched_tweets = checkpoint["fetched_tweets"]
+            media_index, external_link_index = checkpoint["media_index"], checkpoint["external_link_index"]
+        else:
+            with self.stage_timer("fetch"):
+                fetched_tweets = fetch()
+            self.metrics.inc("tweets_fetched_total", len(fetched_tweets))
+            self.db_cont.save_checkpoint(self.type, fetched_tweets)
+            media_index, external_link_index = 0, 0
+
+        with self.stage_timer("parse"):
+            parser = parser_class(fetched_tweets, self.lsb)
+            tweet_info_list = parser.parse_to_TweetInfo()[media_index:]
+            external_link_list = parser.parse_to_ExternalLink()[external_link_index:]
+
+        # メディア取得
+        logger.info(MSG.MEDIA_DOWNLOAD_START.value)
+        on_progress = self.make_checkpoint_callback(media_index, len(tweet_info_list), "media_index")
+        with self.stage_timer("download"):
+            self.interpret_tweets(tweet_info_list, on_progress)
+        logger.info(MSG.MEDIA_DOWNLOAD_DONE.value)
+
+        # 外部リンク収集
+        logger.info(MSG.GETTING_EXTERNAL_LINK_START.value)
+        on_progress = self.make_checkpoint_callback(
+            external_link_index, len(external_link_list), "external_link_index"
+        )
+        with self.stage_timer("external_link"):
+            self.trace_external_link(external_link_list, on_progress)
+        logger.info(MSG.GETTING_EXTERNAL_LINK_DONE.value)
+
+        # 過去に失敗したダウンロードの再試行
+        with self.stage_timer("retry"):
+            self.retry_jobs()
+
+        # 後処理
+        with self.stage_timer("shrink"):
+            self.shrink_folder(int(self.config["holding"]["holding_file_num"]))
+        with self.stage_timer("end_of_process"):
+            self.end_of_process()
+        self.db_cont.delete_checkpoint(self.type)
+
     @abstractmethod
     def crawl(self) -> Result:
         """一連の実行メソッドをまとめる
@@ -579,6 +1109,8 @@ class Crawler(metaclass=ABCMeta):
 
 if __name__ == "__main__":
     import media_gathering.fav_crawler as FavCrawler
+    from media_gathering.log_config import configure_logging
 
+    configure_logging()
     c = FavCrawler.FavCrawler()
     c.crawl()
@@ -0,0 +1,194 @@
+import random
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from logging import INFO, getLogger
+from pathlib import Path
+from typing import Self
+
+import orjson
+
+from media_gathering.crawler import Crawler
+from media_gathering.log_message import MSG
+from media_gathering.profiler import CrawlProfiler
+from media_gathering.util import Result
+
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+@dataclass(frozen=True)
+class CrawlJob:
+    """デーモンモードで定期実行するクロール"""
+
+    crawl_type: str  # クローラタイプ = ["Fav", "RT"]
+    crawler_factory: Callable[[], Crawler]  # クローラーを作成する関数（初回実行時に呼び出す）
+    interval: float  # 実行間隔[秒]
+
+    def __post_init__(self) -> None:
+        self._is_valid()
+
+    def _is_valid(self) -> bool:
+        if not isinstance(self.crawl_type, str):
+            raise TypeError("crawl_type is not str.")
+        if not callable(self.crawler_factory):
+            raise TypeError("crawler_factory is not callable.")
+        if not isinstance(self.interval, int | float):
+            raise TypeError("interval is not int or float.")
+        if self.interval <= 0:
+            raise ValueError("interval must be 0 < interval.")
+        return True
+
+
+@dataclass(frozen=True)
+class CrawlDaemon:
+    """常駐して Fav/RT クロールを定期実行する
+
+    クローラーは初回実行時に作成し、以降は同じインスタンスを使い回す
+    外部リンク探索のログイン、ツイート取得のセッション、DBエンジン、各種キャッシュが維持されるため、
+    2回目以降のクロールは差分の処理だけで済む
+    クロールが例外で終了した場合は、セッション切れなどに備えて次回はクローラーを作り直す
+    各ジョブの次回実行時刻は実行間隔に 0～jitter 秒のランダムな揺らぎを加えて決める
+    request_profile() でプロファイルを要求すると、各ジョブの次回のクロールを1回だけプロファイルする
+    """
+
+    job_list: list[CrawlJob]  # 定期実行するクロールのリスト
+    jitter: float = 0.0  # 実行間隔に加える揺らぎの最大値[秒]
+    profiler: CrawlProfiler | None = None  # 毎回のクロールに使うプロファイラ（プロファイルしない場合はNone）
+    _crawlers: dict[str, Crawler] = field(init=False, default_factory=dict, compare=False, repr=False)
+    _profile_requests: dict[str, CrawlProfiler] = field(init=False, default_factory=dict, compare=False, repr=False)
+    _next_run: dict[str, float] = field(init=False, default_factory=dict, compare=False, repr=False)
+    _stop_event: threading.Event = field(init=False, default_factory=threading.Event, compare=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._is_valid()
+
+    def _is_valid(self) -> bool:
+        if not isinstance(self.job_list, list):
+            raise TypeError("job_list is not list.")
+        if not all(isinstance(job, CrawlJob) for job in self.job_list):
+            raise TypeError("job_list contains not CrawlJob element.")
+        if not self.job_list:
+            raise ValueError("job_list is empty.")
+        if not isinstance(self.jitter, int | float):
+            raise TypeError("jitter is not int or float.")
+        if self.jitter < 0:
+            raise ValueError("jitter must be 0 <= jitter.")
+        if self.profiler is not None and not isinstance(self.profiler, CrawlProfiler):
+            raise TypeError("profiler is not CrawlProfiler.")
+        return True
+
+    @classmethod
+    def create(
+        cls, crawler_class_dict: dict[str, Callable[[], Crawler]], profiler: CrawlProfiler | None = None
+    ) -> Self:
+        """設定ファイルの daemon 項目からデーモンを作成する
+
+        実行間隔が 0 のクロールは実行しない
+
+        Args:
+            crawler_class_dict (dict[str, Callable[[], Crawler]]): クローラタイプとクローラークラスの辞書
+            profiler (CrawlProfiler | None): 毎回のクロールに使うプロファイラ
+
+        Returns:
+            Self: デーモン
+        """
+        config = orjson.loads(Path(Crawler.CONFIG_FILE_NAME).read_bytes()).get("daemon", {})
+        interval_dict = {
+            "Fav": config.get("fav_interval_minutes", 60) * 60,
+            "RT": config.get("retweet_interval_minutes", 60) * 60,
+        }
+        job_list = [
+            CrawlJob(crawl_type, crawler_class, interval_dict[crawl_type])
+            for crawl_type, crawler_class in crawler_class_dict.items()
+            if interval_dict.get(crawl_type, 0) > 0
+        ]
+        return cls(job_list, config.get("jitter_minutes", 5) * 60, profiler)
+
+    @property
+    def next_run(self) -> dict[str, float]:
+        """クローラタイプごとの次回実行時刻（time.monotonic() 基準）"""
+        return dict(self._next_run)
+
+    def run_job(self, job: CrawlJob) -> Result:
+        """ジョブを1回実行する
+
+        Args:
+            job (CrawlJob): 実行するジョブ
+
+        Returns:
+            Result: 成功時 Result.success, 例外が発生した場合は Result.failed
+        """
+        logger.info(MSG.DAEMON_JOB_START.value.format(job.crawl_type))
+        try:
+            crawler = self._crawlers.get(job.crawl_type)
+            if crawler is None:
+                crawler = job.crawler_factory()
+                self._crawlers[job.crawl_type] = crawler
+            crawler.profiler = self._profile_requests.pop(job.crawl_type, self.profiler)
+            crawler.crawl()
+        except Exception as e:
+            logger.exception(e)
+            self._crawlers.pop(job.crawl_type, None)
+            return Result.failed
+        logger.info(MSG.DAEMON_JOB_DONE.value.format(job.crawl_type))
+        return Result.success
+
+    def run_pending(self, now: float) -> list[str]:
+        """実行時刻を過ぎたジョブを実行し、次回実行時刻を決める
+
+        Args:
+            now (float): 現在時刻（time.monotonic() 基準）
+
+        Returns:
+            list[str]: 実行したジョブのクローラタイプのリスト
+        """
+        done = []
+        for job in self.job_list:
+            if self._stop_event.is_set():
+                break
+            if now < self._next_run.setdefault(job.crawl_type, now):
+                continue
+            self.run_job(job)
+            self._next_run[job.crawl_type] = time.monotonic() + job.interval + random.uniform(0, self.jitter)
+            done.append(job.crawl_type)
+        return done
+
+    def run(self) -> None:
+        """stop() が呼ばれるまでジョブを定期実行する
+
+        起動直後に全ジョブを一度実行し、以降は次回実行時刻まで待機する
+        """
+        logger.info(MSG.DAEMON_START.value)
+        while not self._stop_event.is_set():
+            self.run_pending(time.monotonic())
+            wait_time = min(self._next_run.values()) - time.monotonic()
+            self._stop_event.wait(max(0.0, wait_time))
+        logger.info(MSG.DAEMON_STOP.value)
+
+    def request_profile(self, profiler: CrawlProfiler) -> None:
+        """各ジョブの次回のクロールを1回だけプロファイルする
+
+        シグナルハンドラから呼び出すことを想定し、要求を記録するだけで待機中のクロールは前倒ししない
+
+        Args:
+            profiler (CrawlProfiler): 次回のクロールに使うプロファイラ
+        """
+        for job in self.job_list:
+            self._profile_requests[job.crawl_type] = profiler
+        logger.info(MSG.PROFILE_REQUESTED.value.format(profiler.mode))
+
+    def stop(self) -> None:
+        """実行中のクロールが終わり次第 run() を終了させる"""
+        self._stop_event.set()
+
+
+if __name__ == "__main__":
+    from media_gathering.fav_crawler import FavCrawler
+    from media_gathering.log_config import configure_logging
+    from media_gathering.retweet_crawler import RetweetCrawler
+
+    configure_logging()
+    daemon = CrawlDaemon.create({"Fav": FavCrawler, "RT": RetweetCrawler})
+    daemon.run()
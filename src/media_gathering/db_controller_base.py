@@ -1,22 +1,195 @@
 import re
+import zlib
 from abc import ABCMeta, abstractmethod
 from datetime import date, datetime, timedelta
 from pathlib import Path
 
-from sqlalchemy import and_, create_engine, or_
+import orjson
+from sqlalchemy import Engine, and_, column, create_engine, literal, literal_column, or_, table
 from sqlalchemy.exc import NoResultFound
-from sqlalchemy.orm import sessionmaker
-
-from media_gathering.model import Base, DeleteTarget, ExternalLink
+from sqlalchemy.orm import sessionmaker, undefer
+
+from media_gathering.blob_store import BlobStore
+from media_gathering.job_retry_policy import JobRetryPolicy
+from media_gathering.model import (
+    LEGACY_MEDIA_TABLES,
+    SEARCH_INDEX_TABLES,
+    Base,
+    CrawlCheckpoint,
+    CrawlRun,
+    DeleteTarget,
+    DownloadJob,
+    ExternalLink,
+    Media,
+    StoredMedia,
+)
 
 DEBUG = False
 
 
 class DBControllerBase(metaclass=ABCMeta):
-    def __init__(self, db_fullpath="PG_DB.db"):
+    # 他のスレッドのトランザクションが終わるまで待つ最大秒数
+    BUSY_TIMEOUT = 30.0
+    # DownloadJob/CrawlCheckpoint/CrawlRun の日時の書式（文字列の大小で前後を比較する）
+    JOB_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+    def __init__(self, db_fullpath="PG_DB.db", engine: Engine | None = None):
         self.dbname = db_fullpath
-        self.engine = create_engine(f"sqlite:///{self.dbname}", echo=False)
+        if engine is not None:
+            # 同じDBを扱う他のコントローラーのエンジンを共有する（テーブル等は作成済）
+            self.engine = engine
+            return
+        self.engine = self.open_engine(self.dbname)
         Base.metadata.create_all(self.engine)
+        self.ensure_columns()
+        self.migrate_legacy_media_table()
+        self.migrate_media_blob()
+        self.ensure_indexes()
+        self.ensure_search_index()
+
+    @classmethod
+    def open_engine(cls, db_fullpath) -> Engine:
+        """DBのエンジンを作成する
+
+        Notes:
+            Fav/RT を並行してクロールする場合は1つのエンジンを複数のスレッドから使う
+            書き込みのトランザクションは最初の書き込み時に開始され、コミットまで書き込みロックを保持する
+            他のスレッドが書き込み中の場合は BUSY_TIMEOUT 秒までロックの解放を待ってから書き込む
+
+        Args:
+            db_fullpath: DBファイルパス
+
+        Returns:
+            Engine: 作成したエンジン
+        """
+        return create_engine(f"sqlite:///{db_fullpath}", echo=False, connect_args={"timeout": cls.BUSY_TIMEOUT})
+
+    def ensure_columns(self) -> list[str]:
+        """モデルに定義された列のうち既存テーブルに存在しないものを追加する
+
+        Notes:
+            create_all は既存テーブルに後から追加した列を作成しないため、
+            既存のDBに対してはここで ALTER TABLE ADD COLUMN する
+            後から追加する列は NULL 許容であること
+
+        Returns:
+            list[str]: 追加した列名のリスト（{テーブル名}.{列名}）
+        """
+        added = []
+        with self.engine.begin() as conn:
+            for table in Base.metadata.sorted_tables:
+                rows = conn.exec_driver_sql(f"pragma table_info({table.name})")
+                exist_column_names = {row[1] for row in rows}
+                for column in table.columns:
+                    if column.name in exist_column_names:
+                        continue
+                    column_type = column.type.compile(dialect=self.engine.dialect)
+                    conn.exec_driver_sql(f"alter table {table.name} add column {column.name} {column_type}")
+                    added.append(f"{table.name}.{column.name}")
+        return added
+
+    def ensure_indexes(self) -> list[str]:
+        """モデルに定義されたインデックスのうちDBに存在しないものを作成する
+
+        Notes:
+            create_all は既存テーブルに後から追加したインデックスを作成しないため、
+            既存のDBに対してはここで作成する
+
+        Returns:
+            list[str]: 作成したインデックス名のリスト
+        """
+        created = []
+        with self.engine.begin() as conn:
+            rows = conn.exec_driver_sql("select name from sqlite_master where type = 'index'")
+            exist_index_names = {name for (name,) in rows}
+            for table in Base.metadata.sorted_tables:
+                for index in sorted(table.indexes, key=lambda i: i.name):
+                    if index.name in exist_index_names:
+                        continue
+                    index.create(conn)
+                    created.append(index.name)
+        return created
+
+    def ensure_search_index(self) -> list[str]:
+        """全文検索インデックスと、それを対象テーブルに追従させるトリガーを作成する
+
+        Notes:
+            FTS5 の外部コンテンツテーブルとして作成し、本文は対象テーブルのみに保持する
+            日本語は空白で区切られないため trigram で分割する
+            インデックスかトリガーを新たに作成した場合は既存レコードからインデックスを作り直す
+
+        Returns:
+            list[str]: 作り直した全文検索インデックス名のリスト
+        """
+        rebuilt = []
+        with self.engine.begin() as conn:
+            rows = conn.exec_driver_sql("select name from sqlite_master where type in ('table', 'trigger')")
+            exist_names = {name for (name,) in rows}
+            for index_name, (table_name, columns) in SEARCH_INDEX_TABLES.items():
+                column_str = ", ".join(columns)
+                new_str = ", ".join(f"new.{c}" for c in columns)
+                old_str = ", ".join(f"old.{c}" for c in columns)
+                insert_new = f"insert into {index_name} (rowid, {column_str}) values (new.id, {new_str});"
+                delete_old = (
+                    f"insert into {index_name} ({index_name}, rowid, {column_str}) "
+                    f"values ('delete', old.id, {old_str});"
+                )
+                statements = {
+                    index_name: (
+                        f"create virtual table {index_name} using fts5("
+                        f"{column_str}, content='{table_name}', content_rowid='id', tokenize='trigram')"
+                    ),
+                    f"{index_name}_ai": (
+                        f"create trigger {index_name}_ai after insert on {table_name} begin {insert_new} end"
+                    ),
+                    f"{index_name}_ad": (
+                        f"create trigger {index_name}_ad after delete on {table_name} begin {delete_old} end"
+                    ),
+                    f"{index_name}_au": (
+                        f"create trigger {index_name}_au after update of {column_str} on {table_name} "
+                        f"begin {delete_old} {insert_new} end"
+                    ),
+                }
+                is_created = False
+                for name, statement in statements.items():
+                    if name not in exist_names:
+                        conn.exec_driver_sql(statement)
+                        is_created = True
+                if is_created:
+                    conn.exec_driver_sql(f"insert into {index_name} ({index_name}) values ('rebuild')")
+                    rebuilt.append(index_name)
+        return rebuilt
+
+    def migrate_legacy_media_table(self) -> None:
+        """旧 Favorite/Retweet テーブルのレコードを Media テーブルに移行する
+
+        Notes:
+            旧テーブルが存在する場合のみ移行し、移行後に旧テーブルを削除する
+            Favorite の id はそのまま引き継ぎ、Retweet の id は振り直す
+            旧テーブル名を参照する外部ツールのために、同名の互換ビューを作成する
+        """
+        columns = [c.name for c in Media.__table__.columns if c.name not in ("id", "source")]
+        column_str = ", ".join(columns)
+        with self.engine.begin() as conn:
+            rows = conn.exec_driver_sql("select name, type from sqlite_master where type in ('table', 'view')")
+            kinds = {name: kind for name, kind in rows}
+            for table_name, source in LEGACY_MEDIA_TABLES.items():
+                if kinds.get(table_name) == "table":
+                    # 旧テーブルに存在する列のみ移行する
+                    rows = conn.exec_driver_sql(f"pragma table_info({table_name})")
+                    legacy_column_names = {row[1] for row in rows}
+                    legacy_column_str = ", ".join(c for c in columns if c in legacy_column_names)
+                    id_column = "id, " if table_name == "Favorite" else ""
+                    conn.exec_driver_sql(
+                        f"insert into Media ({id_column}source, {legacy_column_str}) "
+                        f"select {id_column}'{source}', {legacy_column_str} from {table_name} order by id"
+                    )
+                    conn.exec_driver_sql(f"drop table {table_name}")
+                    kinds.pop(table_name)
+                if table_name not in kinds:
+                    conn.exec_driver_sql(
+                        f"create view {table_name} as select id, {column_str} from Media where source = '{source}'"
+                    )
 
     @abstractmethod
     def upsert(self, params: dict) -> None:
@@ -62,6 +235,23 @@ class DBControllerBase(metaclass=ABCMeta):
         """
         return []
 
+    @abstractmethod
+    def select_gallery_since(self, last_id: int = 0, limit: int = 1000) -> list[dict]:
+        """ギャラリー表示に必要な列を id の昇順でSELECTする
+
+        Note:
+            f"select id, img_filename, url, url_thumbnail, tweet_url from Media
+              where source = {source} and id > {last_id} order by id asc limit {limit}"
+
+        Args:
+            last_id (int): このidより大きいレコードを対象とする
+            limit (int): 取得レコード数上限
+
+        Returns:
+            list[dict]: SELECTしたレコードの辞書リスト
+        """
+        return []
+
     @abstractmethod
     def select_from_media_url(self, filename) -> list[dict]:
         """filename を条件としてSELECTする
@@ -253,6 +443,529 @@ class DBControllerBase(metaclass=ABCMeta):
         session.close()
         return res_dict
 
+    def select_seen_media(self, filename: str) -> list[dict]:
+        """お気に入り/リツイートをまたいで filename を条件としてSELECTする
+
+        Note:
+            f"select source, img_filename, url, saved_localpath from Media where img_filename = {filename}"
+            ファイル名はメディアキーを含むため、source をまたいだメディアの同一性判定に使える
+
+        Args:
+            filename (str): 取得対象のファイル名
+
+        Returns:
+            list[dict]: SELECTしたレコードの辞書リスト
+        """
+        Session = sessionmaker(bind=self.engine)
+        session = Session()
+
+        res = (
+            session.query(Media.source, Media.img_filename, Media.url, Media.saved_localpath)
+            .filter(Media.img_filename == filename)
+            .all()
+        )
+        res_dict = [r._asdict() for r in res]  # 辞書リストに変換
+
+        session.close()
+        return res_dict
+
+    def search(self, query: str, source: str | None = None, limit: int = 100, cursor: int | None = None) -> list[dict]:
+        """tweet_text, user_name, screan_name を全文検索する
+
+        Notes:
+            空白で区切った検索語をすべて含むレコードを id の降順で返す
+            3文字以上の検索語は全文検索インデックスで、3文字未満の検索語は部分一致で絞り込む
+            続きは返した最後の id を cursor に指定して取得する
+
+        Args:
+            query (str): 検索語
+            source (str | None): 検索対象 [None: Media 全体, "Fav", "RT", "ExternalLink"]
+            limit (int): 取得レコード数上限
+            cursor (int | None): このidより小さいレコードを対象とする
+
+        Returns:
+            list[dict]: 検索結果の辞書リスト（重い列は含まない）
+        """
+        if source not in (None, "Fav", "RT", "ExternalLink"):
+            raise ValueError(f"source '{source}' is invalid.")
+        if limit <= 0:
+            raise ValueError("limit must be 0 < limit.")
+        terms = query.split()
+        if not terms:
+            return []
+
+        if source == "ExternalLink":
+            model, index_name = ExternalLink, "ExternalLinkSearch"
+            columns = [ExternalLink.id, literal("ExternalLink").label("source"), ExternalLink.external_link_url]
+            columns += [ExternalLink.link_type]
+        else:
+            model, index_name = Media, "MediaSearch"
+            columns = [Media.id, Media.source, Media.img_filename, Media.url, Media.url_thumbnail]
+            columns += [Media.saved_localpath]
+        columns += [model.tweet_id, model.tweet_url, model.created_at, model.user_id, model.user_name]
+        columns += [model.screan_name, model.tweet_text]
+
+        _, search_column_names = SEARCH_INDEX_TABLES[index_name]
+        search_table = table(index_name, column("rowid"), *[column(c) for c in search_column_names])
+
+        Session = sessionmaker(bind=self.engine)
+        session = Session()
+
+        q = session.query(*columns).join(search_table, search_table.c.rowid == model.id)
+        match_terms = [t for t in terms if len(t) >= 3]
+        if match_terms:
+            match_query = " AND ".join('"' + t.replace('"', '""') + '"' for t in match_terms)
+            q = q.filter(literal_column(index_name).op("MATCH")(match_query))
+        for t in [t for t in terms if len(t) < 3]:
+            pattern = "%" + re.sub(r"([\\%_])", r"\\\1", t) + "%"
+            q = q.filter(or_(*[search_table.c[c].like(pattern, escape="\\") for c in search_column_names]))
+        if source in ("Fav", "RT"):
+            q = q.filter(Media.source == source)
+        if cursor is not None:
+            q = q.filter(search_table.c.rowid < cursor)
+        res = q.order_by(search_table.c.rowid.desc()).limit(limit).all()
+        res_dict = [r._asdict() for r in res]  # 辞書リストに変換
+
+        session.close()
+        return res_dict
+
+    def migrate_media_blob(self, limit: int = 100) -> int:
+        """旧形式で Media.media_blob に保存されたメディア本体をブロブストアに移行する
+
+        Notes:
+            DBを開く際に呼ばれ、対象の行がある場合のみ
+            DBファイルと同じ場所のブロブストア（BlobStore.blob_db_path）を開いて移行する
+            移行は limit 件ずつのトランザクションに分けて行う
+
+        Args:
+            limit (int): 1トランザクションで移行する件数
+
+        Returns:
+            int: 移行した件数
+        """
+        with self.engine.connect() as conn:
+            row = conn.exec_driver_sql("select 1 from Media where media_blob is not null limit 1").first()
+        if row is None:
+            return 0
+
+        blob_store = BlobStore(BlobStore.blob_db_path(Path(self.dbname)))
+        try:
+            return self.move_media_blob(blob_store, limit)
+        finally:
+            blob_store.close()
+
+    def move_media_blob(self, blob_store: BlobStore, limit: int = 100) -> int:
+        """Media.media_blob に保存されているメディア本体をブロブストアに移す
+
+        Notes:
+            旧形式でメタデータの行に直接保存されたメディア本体を対象とする
+            移した行は media_blob を NULL にして blob_id で参照する
+            DBファイル自体を縮小するには移行後に VACUUM が必要
+
+        Args:
+            blob_store (BlobStore): 移行先のブロブストア
+            limit (int): 1トランザクションで移行する件数
+
+        Returns:
+            int: 移行した件数
+        """
+        Session = sessionmaker(bind=self.engine)
+        session = Session()
+
+        count = 0
+        while True:
+            records = (
+                session.query(Media)
+                .options(undefer(Media.media_blob))
+                .filter(Media.media_blob.is_not(None))
+                .limit(limit)
+                .all()
+            )
+            if not records:
+                break
+            for record in records:
+                record.blob_id = blob_store.put_bytes(record.media_blob)
+                record.media_blob = None
+                count += 1
+            session.commit()
+
+        session.close()
+        return count
+
+    def upsert_stored_media(self, stored_media_list: list[StoredMedia]) -> None:
+        """StoredMediaにUPSERTする
+
+        Notes:
+            一致しているかの判定は saved_localpath が完全一致している場合、とする
+
+        Args:
+            stored_media_list (list[StoredMedia]): ストア実体と保存先パスの対応リスト
+        """
+        Session = sessionmaker(bind=self.engine)
+        session = Session()
+
+        for r in stored_media_list:
+            try:
+                p = session.query(StoredMedia).filter(StoredMedia.saved_localpath == r.saved_localpath).one()
+            except NoResultFound:
+                # INSERT
+                session.add(r)
+            else:
+                # UPDATE
+                p.sha256 = r.sha256
+                p.url = r.url
+                p.media_size = r.media_size
+                p.saved_created_at = r.saved_created_at
+
+        session.commit()
+        session.close()
+
+    def select_stored_media_from_url(self, url: str) -> list[dict]:
+        """取得元URLが url であるStoredMediaをSELECTする
+
+        Args:
+            url (str): メディアの取得元URL
+
+        Returns:
+            list[dict]: SELECTしたレコードの辞書リスト
+        """
+        Session = sessionmaker(bind=self.engine)
+        session = Session()
+
+        res = session.query(StoredMedia).filter_by(url=url).all()
+        res_dict = [r.to_dict() for r in res]  # 辞書リストに変換
+
+        session.close()
+        return res_dict
+
+    def select_stored_media_from_sha256(self, sha256: str) -> list[dict]:
+        """ストア実体 sha256 を参照しているStoredMediaをSELECTする
+
+        Args:
+            sha256 (str): ストア実体のハッシュ値
+
+        Returns:
+            list[dict]: SELECTしたレコードの辞書リスト
+        """
+        Session = sessionmaker(bind=self.engine)
+        session = Session()
+
+        res = session.query(StoredMedia).filter_by(sha256=sha256).all()
+        res_dict = [r.to_dict() for r in res]  # 辞書リストに変換
+
+        session.close()
+        return res_dict
+
+    def select_stored_media_from_localpath(self, saved_localpath_list: list[str]) -> list[dict]:
+        """保存先パスが saved_localpath_list のいずれかであるStoredMediaをSELECTする
+
+        Notes:
+            SQLiteの変数の上限を超えないよう、saved_localpath_list を分割して問い合わせる
+
+        Args:
+            saved_localpath_list (list[str]): 保存先パスのリスト
+
+        Returns:
+            list[dict]: SELECTしたレコードの辞書リスト
+        """
+        Session = sessionmaker(bind=self.engine)
+        session = Session()
+
+        res_dict = []
+        for start in range(0, len(saved_localpath_list), 500):
+            chunk = saved_localpath_list[start : start + 500]
+            res = session.query(StoredMedia).filter(StoredMedia.saved_localpath.in_(chunk)).all()
+            res_dict.extend(r.to_dict() for r in res)  # 辞書リストに変換
+
+        session.close()
+        return res_dict
+
+    def enqueue_job(self, job_type: str, source: str, url: str, payload: dict, next_retry_at: datetime) -> None:
+        """ダウンロードを試行せずに再試行ジョブとして登録する
+
+        Notes:
+            既に登録済のジョブは変更しない
+
+        Args:
+            job_type (str): ジョブ種別（DownloadJob.MEDIA or DownloadJob.EXTERNAL_LINK）
+            source (str): 登録したクローラタイプ（"Fav" or "RT"）
+            url (str): ダウンロード対象のURL
+            payload (dict): 再試行に必要な情報
+            next_retry_at (datetime): 再試行する日時
+        """
+        Session = sessionmaker(bind=self.engine)
+        session = Session()
+
+        try:
+            session.query(DownloadJob).filter_by(job_type=job_type, source=source, url=url).one()
+        except NoResultFound:
+            now_str = datetime.now().strftime(self.JOB_DATETIME_FORMAT)
+            next_retry_at_str = next_retry_at.strftime(self.JOB_DATETIME_FORMAT)
+            payload_str = orjson.dumps(payload).decode()
+            session.add(
+                DownloadJob(
+                    job_type, source, url, payload_str, DownloadJob.PENDING, 0, next_retry_at_str, "", now_str, now_str
+                )
+            )
+
+        session.commit()
+        session.close()
+
+    def record_job_failure(
+        self,
+        job_type: str,
+        source: str,
+        url: str,
+        payload: dict,
+        error: str,
+        retry_policy: JobRetryPolicy,
+        permanent: bool = False,
+    ) -> dict:
+        """ダウンロードの失敗を再試行ジョブに記録する
+
+        Notes:
+            未登録ならば登録し、失敗回数を1増やして次回の再試行日時を retry_policy で決める
+            再試行を打ち切る失敗回数に達した場合と、permanent が True の場合は再試行しない（DownloadJob.DEAD）
+            完了済のジョブが再び失敗した場合は失敗回数を数え直す
+
+        Args:
+            job_type (str): ジョブ種別（DownloadJob.MEDIA or DownloadJob.EXTERNAL_LINK）
+            source (str): 登録したクローラタイプ（"Fav" or "RT"）
+            url (str): ダウンロード対象のURL
+            payload (dict): 再試行に必要な情報
+            error (str): 失敗の内容
+            retry_policy (JobRetryPolicy): 再試行間隔の設定
+            permanent (bool): 再試行しても成功しない失敗か（削除済など）
+
+        Returns:
+            dict: 記録後のジョブの辞書
+        """
+        Session = sessionmaker(bind=self.engine)
+        session = Session()
+
+        now = datetime.now()
+        now_str = now.strftime(self.JOB_DATETIME_FORMAT)
+        try:
+            p = session.query(DownloadJob).filter_by(job_type=job_type, source=source, url=url).one()
+        except NoResultFound:
+            payload_str = orjson.dumps(payload).decode()
+            p = DownloadJob(job_type, source, url, payload_str, DownloadJob.PENDING, 0, now_str, "", now_str, now_str)
+            session.add(p)
+        if p.state == DownloadJob.DONE:
+            # 完了後に再び失敗した場合は数え直す
+            p.attempt = 0
+
+        p.attempt += 1
+        p.last_error = error[:512]
+        p.updated_at = now_str
+        delay = None if permanent else retry_policy.delay(p.attempt)
+        if delay is None:
+            p.state = DownloadJob.DEAD
+        else:
+            p.state = DownloadJob.PENDING
+            p.next_retry_at = (now + timedelta(seconds=delay)).strftime(self.JOB_DATETIME_FORMAT)
+        session.commit()
+        res_dict = p.to_dict()
+
+        session.close()
+        return res_dict
+
+    def complete_job(self, job_type: str, source: str, url: str) -> None:
+        """再試行ジョブを完了にする
+
+        Notes:
+            登録されていない場合は何もしない
+
+        Args:
+            job_type (str): ジョブ種別（DownloadJob.MEDIA or DownloadJob.EXTERNAL_LINK）
+            source (str): 登録したクローラタイプ（"Fav" or "RT"）
+            url (str): ダウンロード対象のURL
+        """
+        Session = sessionmaker(bind=self.engine)
+        session = Session()
+
+        now_str = datetime.now().strftime(self.JOB_DATETIME_FORMAT)
+        session.query(DownloadJob).filter_by(job_type=job_type, source=source, url=url).update({
+            DownloadJob.state: DownloadJob.DONE,
+            DownloadJob.updated_at: now_str,
+        })
+
+        session.commit()
+        session.close()
+
+    def select_due_jobs(self, source: str, now: datetime, limit: int = 100) -> list[dict]:
+        """再試行日時を過ぎた再試行待ちのジョブを再試行日時の昇順でSELECTする
+
+        Note:
+            f"select * from DownloadJob where state = 'pending' and source = {source}
+              and next_retry_at <= {now} order by next_retry_at asc limit {limit}"
+
+        Args:
+            source (str): 登録したクローラタイプ（"Fav" or "RT"）
+            now (datetime): 現在日時
+            limit (int): 取得レコード数上限
+
+        Returns:
+            list[dict]: SELECTしたレコードの辞書リスト
+        """
+        Session = sessionmaker(bind=self.engine)
+        session = Session()
+
+        now_str = now.strftime(self.JOB_DATETIME_FORMAT)
+        res = (
+            session.query(DownloadJob)
+            .filter(
+                DownloadJob.state == DownloadJob.PENDING,
+                DownloadJob.source == source,
+                DownloadJob.next_retry_at <= now_str,
+            )
+            .order_by(DownloadJob.next_retry_at.asc())
+            .limit(limit)
+            .all()
+        )
+        res_dict = [r.to_dict() for r in res]  # 辞書リストに変換
+
+        session.close()
+        return res_dict
+
+    def save_checkpoint(self, source: str, fetched_tweets: list[dict]) -> None:
+        """取得したツイートをチェックポイントとして保存する
+
+        Notes:
+            source のチェックポイントが既にある場合は置き換え、処理済件数は0に戻す
+
+        Args:
+            source (str): クローラタイプ（"Fav" or "RT"）
+            fetched_tweets (list[dict]): 取得したツイート
+        """
+        Session = sessionmaker(bind=self.engine)
+        session = Session()
+
+        now_str = datetime.now().strftime(self.JOB_DATETIME_FORMAT)
+        compressed = zlib.compress(orjson.dumps(fetched_tweets))
+        session.query(CrawlCheckpoint).filter_by(source=source).delete()
+        session.add(CrawlCheckpoint(source, compressed, 0, 0, now_str, now_str))
+
+        session.commit()
+        session.close()
+
+    def update_checkpoint(
+        self, source: str, media_index: int | None = None, external_link_index: int | None = None
+    ) -> None:
+        """チェックポイントの処理済件数を更新する
+
+        Args:
+            source (str): クローラタイプ（"Fav" or "RT"）
+            media_index (int | None): メディア保存の処理済件数、Noneなら更新しない
+            external_link_index (int | None): 外部リンク収集の処理済件数、Noneなら更新しない
+        """
+        Session = sessionmaker(bind=self.engine)
+        session = Session()
+
+        values = {CrawlCheckpoint.updated_at: datetime.now().strftime(self.JOB_DATETIME_FORMAT)}
+        if media_index is not None:
+            values[CrawlCheckpoint.media_index] = media_index
+        if external_link_index is not None:
+            values[CrawlCheckpoint.external_link_index] = external_link_index
+        session.query(CrawlCheckpoint).filter_by(source=source).update(values)
+
+        session.commit()
+        session.close()
+
+    def select_checkpoint(self, source: str) -> dict | None:
+        """チェックポイントをSELECTする
+
+        Args:
+            source (str): クローラタイプ（"Fav" or "RT"）
+
+        Returns:
+            dict | None: fetched_tweets を展開したチェックポイントの辞書、無ければNone
+        """
+        Session = sessionmaker(bind=self.engine)
+        session = Session()
+
+        record = session.query(CrawlCheckpoint).options(undefer(CrawlCheckpoint.fetched_tweets))
+        record = record.filter_by(source=source).one_or_none()
+        res_dict = None
+        if record is not None:
+            res_dict = record.to_dict()
+            res_dict["fetched_tweets"] = orjson.loads(zlib.decompress(res_dict["fetched_tweets"]))
+
+        session.close()
+        return res_dict
+
+    def delete_checkpoint(self, source: str) -> None:
+        """チェックポイントを削除する
+
+        Args:
+            source (str): クローラタイプ（"Fav" or "RT"）
+        """
+        Session = sessionmaker(bind=self.engine)
+        session = Session()
+
+        session.query(CrawlCheckpoint).filter_by(source=source).delete()
+
+        session.commit()
+        session.close()
+
+    def insert_crawl_run(
+        self, source: str, started_at: datetime, finished_at: datetime, result: str, summary: dict
+    ) -> None:
+        """クロールの実行サマリーを保存する
+
+        Args:
+            source (str): クローラタイプ（"Fav" or "RT"）
+            started_at (datetime): クロール開始日時
+            finished_at (datetime): クロール終了日時
+            result (str): クロール結果（"success" or "failed"）
+            summary (dict): 計測値（Metrics.to_dict()）
+        """
+        Session = sessionmaker(bind=self.engine)
+        session = Session()
+
+        session.add(
+            CrawlRun(
+                source,
+                started_at.strftime(self.JOB_DATETIME_FORMAT),
+                finished_at.strftime(self.JOB_DATETIME_FORMAT),
+                result,
+                orjson.dumps(summary).decode(),
+            )
+        )
+
+        session.commit()
+        session.close()
+
+    def select_crawl_runs(self, source: str, limit: int = 10) -> list[dict]:
+        """クロールの実行サマリーを新しい順にSELECTする
+
+        Note:
+            f"select * from CrawlRun where source = {source} order by started_at desc, id desc limit {limit}"
+
+        Args:
+            source (str): クローラタイプ（"Fav" or "RT"）
+            limit (int): 取得レコード数上限
+
+        Returns:
+            list[dict]: summary を展開したレコードの辞書リスト
+        """
+        Session = sessionmaker(bind=self.engine)
+        session = Session()
+
+        res = (
+            session.query(CrawlRun)
+            .filter(CrawlRun.source == source)
+            .order_by(CrawlRun.started_at.desc(), CrawlRun.id.desc())
+            .limit(limit)
+            .all()
+        )
+        res_dict = [r.to_dict() for r in res]  # 辞書リストに変換
+        for r in res_dict:
+            r["summary"] = orjson.loads(r["summary"])
+
+        session.close()
+        return res_dict
+
 
 if __name__ == "__main__":
     from media_gathering.fav_db_controller import FavDBController
@@ -3,8 +3,11 @@ from datetime import datetime
 from logging import INFO, getLogger
 from pathlib import Path
 
+from sqlalchemy import Engine
+
 from media_gathering.crawler import Crawler
 from media_gathering.fav_db_controller import FavDBController
+from media_gathering.link_search.link_searcher import LinkSearcher
 from media_gathering.log_message import MSG
 from media_gathering.tac.like_fetcher import LikeFetcher
 from media_gathering.tac.like_parser import LikeParser
@@ -15,15 +18,21 @@ logger.setLevel(INFO)
 
 
 class FavCrawler(Crawler):
-    def __init__(self) -> None:
+    def __init__(
+        self, link_searcher: LinkSearcher | None = None, engine: Engine | None = None, account: dict | None = None
+    ) -> None:
         logger.info(MSG.FAVCRAWLER_INIT_START.value)
-        super().__init__()
+        super().__init__(link_searcher, account)
         try:
             config = self.config["db"]
             save_path = Path(config["save_path"])
             save_path.mkdir(parents=True, exist_ok=True)
             db_fullpath = save_path / config["save_file_name"]
-            self.db_cont = FavDBController(db_fullpath)  # テーブルはFavoriteを使用
+            self.db_cont = FavDBController(db_fullpath, engine)  # テーブルはFavoriteを使用
+            # アカウント指定時はストアの実体の記録を元の設定のDBで共有する
+            if db_fullpath != self.store_db_fullpath:
+                self.store_db_fullpath.parent.mkdir(parents=True, exist_ok=True)
+                self._store_db_cont = FavDBController(self.store_db_fullpath)
 
             config = self.config["save_permanent"]
             if config["save_permanent_media_flag"]:
@@ -60,33 +69,17 @@ class FavCrawler(Crawler):
         logger.info(MSG.FAVCRAWLER_CRAWL_START.value)
         logger.info(MSG.FAVCRAWLER_MODE.value)
 
-        config = self.config["twitter_api_client"]
-        ct0 = config["ct0"]
-        auth_token = config["auth_token"]
-        target_screen_name = config["target_screen_name"]
-        target_id = int(config["target_id"])
-        like = LikeFetcher(ct0, auth_token, target_screen_name, target_id)
+        self.reset_counter()
+        if self.fetcher is None:
+            config = self.config["twitter_api_client"]
+            ct0 = config["ct0"]
+            auth_token = config["auth_token"]
+            target_screen_name = config["target_screen_name"]
+            target_id = int(config["target_id"])
+            self.fetcher = LikeFetcher(ct0, auth_token, target_screen_name, target_id)
 
         limit = int(self.config["tweet_timeline"]["likes_get_max_count"])
-        fetched_tweets = like.fetch(limit)
-
-        parser = LikeParser(fetched_tweets, self.lsb)
-
-        # メディア取得
-        logger.info(MSG.MEDIA_DOWNLOAD_START.value)
-        tweet_info_list = parser.parse_to_TweetInfo()
-        self.interpret_tweets(tweet_info_list)
-        logger.info(MSG.MEDIA_DOWNLOAD_DONE.value)
-
-        # 外部リンク収集
-        logger.info(MSG.GETTING_EXTERNAL_LINK_START.value)
-        external_link_list = parser.parse_to_ExternalLink()
-        self.trace_external_link(external_link_list)
-        logger.info(MSG.GETTING_EXTERNAL_LINK_DONE.value)
-
-        # 後処理
-        self.shrink_folder(int(self.config["holding"]["holding_file_num"]))
-        self.end_of_process()
+        self.crawl_stages(lambda: self.fetcher.fetch(limit), LikeParser)
         logger.info(MSG.FAVCRAWLER_CRAWL_DONE.value)
 
         return Result.success
@@ -1,18 +1,18 @@
 from pathlib import Path
 
-from sqlalchemy import or_, desc
+from sqlalchemy import Engine, asc, desc, or_, select
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.orm import sessionmaker
 
 from media_gathering.db_controller_base import DBControllerBase
-from media_gathering.model import Favorite
+from media_gathering.model import Favorite, Media
 
 DEBUG = False
 
 
 class FavDBController(DBControllerBase):
-    def __init__(self, db_fullpath="PG_DB.db"):
-        super().__init__(db_fullpath)
+    def __init__(self, db_fullpath="PG_DB.db", engine: Engine | None = None):
+        super().__init__(db_fullpath, engine)
 
     def upsert(self, params: dict) -> None:
         """FavoriteにUPSERTする
@@ -46,13 +46,16 @@ class FavDBController(DBControllerBase):
         records = [Favorite.create(params)]
         for r in records:
             try:
-                q = session.query(Favorite).filter(
+                # source の条件と OR を並べると source のインデックスで走査されるため、
+                # 一意キーのインデックスで引いた id で絞り込む
+                matched_id = select(Media.id).where(
                     or_(
-                        Favorite.img_filename == r.img_filename,
-                        Favorite.url == r.url,
-                        Favorite.url_thumbnail == r.url_thumbnail,
+                        Media.img_filename == r.img_filename,
+                        Media.url == r.url,
+                        Media.url_thumbnail == r.url_thumbnail,
                     )
                 )
+                q = session.query(Favorite).filter(Favorite.id.in_(matched_id))
                 ex = q.one()
             except NoResultFound:
                 # INSERT
@@ -75,6 +78,7 @@ class FavDBController(DBControllerBase):
                 ex.saved_created_at = r.saved_created_at
                 ex.media_size = r.media_size
                 ex.media_blob = r.media_blob
+                ex.blob_id = r.blob_id
 
         # TODO::操作履歴保存未対応
         session.commit()
@@ -101,6 +105,36 @@ class FavDBController(DBControllerBase):
         session.close()
         return res_dict
 
+    def select_gallery_since(self, last_id: int = 0, limit: int = 1000) -> list[dict]:
+        """Favoriteからギャラリー表示に必要な列を id の昇順でSELECTする
+
+        Note:
+            f"select id, img_filename, url, url_thumbnail, tweet_url from Media
+              where source = 'Fav' and id > {last_id} order by id asc limit {limit}"
+            media_blob などの重い列は読み込まない
+
+        Args:
+            last_id (int): このidより大きいレコードを対象とする
+            limit (int): 取得レコード数上限
+
+        Returns:
+            list[dict]: SELECTしたレコードの辞書リスト
+        """
+        Session = sessionmaker(bind=self.engine)
+        session = Session()
+
+        res = (
+            session.query(Favorite.id, Favorite.img_filename, Favorite.url, Favorite.url_thumbnail, Favorite.tweet_url)
+            .filter(Favorite.id > last_id)
+            .order_by(asc(Favorite.id))
+            .limit(limit)
+            .all()
+        )
+        res_dict = [r._asdict() for r in res]  # 辞書リストに変換
+
+        session.close()
+        return res_dict
+
     def select_from_media_url(self, filename) -> list[dict]:
         """Favoriteからfilenameを条件としてSELECTする
 
@@ -0,0 +1,229 @@
+import shutil
+from pathlib import Path
+from typing import Literal
+
+import orjson
+
+from media_gathering.db_controller_base import DBControllerBase
+from media_gathering.html_writer.html_writer import TEMPLATE_ENVIRONMENT
+from media_gathering.thumbnail_cache import ThumbnailCache
+from media_gathering.util import Result
+
+
+class GalleryWriter:
+    """全履歴を閲覧できるページ分割ギャラリーを出力する
+
+    レコードを id の昇順に shard_size 件ずつのシャードに分けて出力する
+    シャードは一度満杯になると以降書き換えないため、各実行で書き換えるのは末尾のシャードと manifest のみとなる
+    ブラウザ側ではスクロールに応じてシャードとサムネイルを遅延読み込みする
+
+    出力構成:
+        {gallery_path}/index.html      : 静的なhtmlシェル
+        {gallery_path}/manifest.json   : 増分出力用の状態
+        {gallery_path}/manifest.js     : ブラウザ向けの manifest
+        {gallery_path}/shards/{n:06}.js: n 番目のシャード
+    """
+
+    POINTER_PATH = "../pointer.png"
+    FAV_GALLERY_PATH = "./html/FavGallery"
+    RETWEET_GALLERY_PATH = "./html/RetweetGallery"
+    TEMPLATE_NAME = "gallery.txt"
+    # manifest の形式やレコードの id 体系が変わった場合に上げる
+    # 2: Media テーブルへの統合でリツイートの id が振り直された
+    MANIFEST_VERSION = 2
+
+    def __init__(
+        self,
+        op_type: Literal["Fav", "RT"],
+        db_controller: DBControllerBase,
+        shard_size: int = 500,
+        pic_width: int = 256,
+    ) -> None:
+        if not isinstance(op_type, str):
+            raise TypeError('op_type must be type str ["Fav", "RT"].')
+        if not isinstance(db_controller, DBControllerBase):
+            raise TypeError("db_controller must be DBControllerBase.")
+        if not isinstance(shard_size, int):
+            raise TypeError("shard_size must be int.")
+        if not isinstance(pic_width, int):
+            raise TypeError("pic_width must be int.")
+        if op_type not in ["Fav", "RT"]:
+            raise ValueError('op_type must be ["Fav", "RT"].')
+        if shard_size <= 0:
+            raise ValueError("shard_size must be 0 < shard_size.")
+        if pic_width < 0:
+            raise ValueError("pic_width must be 0 < pic_width.")
+        self.op_type = op_type
+        self.db_controller = db_controller
+        self.shard_size = shard_size
+        self.pic_width = pic_width
+        self.template = TEMPLATE_ENVIRONMENT.get_template(GalleryWriter.TEMPLATE_NAME)
+
+    @classmethod
+    def get_gallery_path(cls, op_type: str) -> Path | None:
+        """op_type に対応するギャラリーの出力先ディレクトリを返す
+
+        Args:
+            op_type (str): "Fav" or "RT"
+
+        Returns:
+            Path | None: 出力先ディレクトリ、op_type が不正な場合はNone
+        """
+        if op_type == "Fav":
+            return Path(cls.FAV_GALLERY_PATH)
+        if op_type == "RT":
+            return Path(cls.RETWEET_GALLERY_PATH)
+        return None
+
+    @classmethod
+    def shard_path(cls, gallery_path: Path, index: int) -> Path:
+        """index 番目のシャードのパスを返す"""
+        return gallery_path / "shards" / f"{index:06}.js"
+
+    @classmethod
+    def dump_jsonp(cls, callback: str, args: list) -> bytes:
+        """JSONを関数呼び出しで包んだスクリプトを作成する
+
+        2行目にJSON本体のみを置くため、load_jsonp で読み戻せる
+
+        Args:
+            callback (str): 呼び出す関数名
+            args (list): 関数に渡す引数リスト、各要素はJSONに変換される
+
+        Returns:
+            bytes: 出力するスクリプト
+        """
+        return f"{callback}(\n".encode() + orjson.dumps(args) + b"\n);\n"
+
+    @classmethod
+    def load_jsonp(cls, path: Path) -> list:
+        """dump_jsonp で出力したスクリプトから引数リストを読み戻す
+
+        Args:
+            path (Path): 読み込むファイルパス
+
+        Returns:
+            list: 関数に渡していた引数リスト
+        """
+        lines = path.read_bytes().splitlines()
+        return orjson.loads(lines[1])
+
+    def make_manifest(self, shard_count: int, total: int, last_id: int) -> dict:
+        """出力状態を表す manifest を作成する
+
+        Args:
+            shard_count (int): シャード数
+            total (int): 出力済のレコード数
+            last_id (int): 出力済のレコードの最大id
+
+        Returns:
+            dict: 出力状態
+        """
+        return {
+            "version": GalleryWriter.MANIFEST_VERSION,
+            "shard_size": self.shard_size,
+            "shard_count": shard_count,
+            "total": total,
+            "last_id": last_id,
+        }
+
+    def load_manifest(self, gallery_path: Path) -> dict:
+        """前回出力時の状態を読み込む
+
+        存在しない場合やシャードサイズ、manifest のバージョンが変わっていた場合は初期状態を返す
+
+        Args:
+            gallery_path (Path): ギャラリーの出力先ディレクトリ
+
+        Returns:
+            dict: 出力状態
+        """
+        initial = self.make_manifest(0, 0, 0)
+        manifest_path = gallery_path / "manifest.json"
+        if not manifest_path.is_file():
+            return initial
+        try:
+            manifest: dict = orjson.loads(manifest_path.read_bytes())
+        except orjson.JSONDecodeError:
+            return initial
+        if manifest.get("version") != GalleryWriter.MANIFEST_VERSION or manifest.get("shard_size") != self.shard_size:
+            return initial
+        return manifest
+
+    def write_gallery(self, force: bool = False) -> Result:
+        """前回出力時以降に追加されたレコードをギャラリーに追記する
+
+        Args:
+            force (bool): Trueの場合既存の出力を破棄して全件から作り直す
+
+        Returns:
+            Result: 成功時Result.success
+        """
+        gallery_path = GalleryWriter.get_gallery_path(self.op_type)
+        if gallery_path is None:
+            return Result.failed
+
+        manifest = {} if force else self.load_manifest(gallery_path)
+        if manifest.get("shard_count", 0) == 0:
+            # 作り直す場合は古いシャードを削除する
+            shutil.rmtree(gallery_path / "shards", ignore_errors=True)
+            manifest = self.make_manifest(0, 0, 0)
+        (gallery_path / "shards").mkdir(parents=True, exist_ok=True)
+
+        # 末尾のシャードが満杯でなければ続きから詰める
+        shard_count = manifest["shard_count"]
+        index, rows = shard_count, []
+        if shard_count > 0:
+            last_shard_path = GalleryWriter.shard_path(gallery_path, shard_count - 1)
+            last_rows = GalleryWriter.load_jsonp(last_shard_path)[1]
+            if len(last_rows) < self.shard_size:
+                index, rows = shard_count - 1, last_rows
+
+        last_id, total = manifest["last_id"], manifest["total"]
+        is_dirty = False
+        while True:
+            record_list = self.db_controller.select_gallery_since(last_id, self.shard_size)
+            if not record_list:
+                break
+            for record in record_list:
+                # ローカルにサムネイルがあればそちらを参照する
+                url_thumbnail = ThumbnailCache.thumbnail_url(record.get("img_filename"), record["url_thumbnail"], "..")
+                rows.append({
+                    "url": record["url"],
+                    "url_thumbnail": url_thumbnail,
+                    "tweet_url": record["tweet_url"],
+                })
+                is_dirty = True
+                if len(rows) == self.shard_size:
+                    GalleryWriter.shard_path(gallery_path, index).write_bytes(
+                        GalleryWriter.dump_jsonp("MediaGathering.shard", [index, rows])
+                    )
+                    index, rows, is_dirty = index + 1, [], False
+            last_id = record_list[-1]["id"]
+            total += len(record_list)
+        if is_dirty:
+            GalleryWriter.shard_path(gallery_path, index).write_bytes(
+                GalleryWriter.dump_jsonp("MediaGathering.shard", [index, rows])
+            )
+        shard_count = index + 1 if rows else index
+
+        manifest = self.make_manifest(shard_count, total, last_id)
+        (gallery_path / "manifest.json").write_bytes(orjson.dumps(manifest))
+        (gallery_path / "manifest.js").write_bytes(GalleryWriter.dump_jsonp("MediaGathering.manifest", [manifest]))
+
+        # htmlシェルは内容が変わった場合のみ書き換える
+        title = "FavMediaGathering" if self.op_type == "Fav" else "RetweetMediaGathering"
+        html = self.template.render(title=title, pic_width=self.pic_width, pointer_path=GalleryWriter.POINTER_PATH)
+        index_path = gallery_path / "index.html"
+        if not index_path.is_file() or index_path.read_text(encoding="utf-8") != html:
+            index_path.write_text(html, encoding="utf-8")
+        return Result.success
+
+
+if __name__ == "__main__":
+    from media_gathering.fav_db_controller import FavDBController
+
+    SAMPLE_DB_PATH = Path(__file__).parent / "sample/PG_DB.db"
+    db_controller = FavDBController(db_fullpath=SAMPLE_DB_PATH)
+    gallery_writer = GalleryWriter("Fav", db_controller)
+    gallery_writer.write_gallery()
@@ -1,16 +1,27 @@
+import hashlib
+import os
 from pathlib import Path
 from typing import Literal
 
-from jinja2 import Template
+import orjson
+from jinja2 import Environment, FileSystemLoader, Template
 
 from media_gathering.db_controller_base import DBControllerBase
+from media_gathering.thumbnail_cache import ThumbnailCache
 from media_gathering.util import Result
 
+# テンプレートはプロセス内で一度だけコンパイルし、以降は Environment のキャッシュを使う
+# テンプレートファイルが更新された場合は auto_reload により再コンパイルされる
+TEMPLATE_ENVIRONMENT = Environment(loader=FileSystemLoader(Path(__file__).parent / "template"), auto_reload=True)
+
 
 class HtmlWriter:
     POINTER_PATH = "./pointer.png"
     FAV_HTML_PATH = "./html/FavMediaGathering.html"
     RETWEET_HTML_PATH = "./html/RetweetMediaGathering.html"
+    TEMPLATE_NAME = "template.txt"
+    # 前回出力時の内容のフィンガープリントを保存するファイルの拡張子
+    FINGERPRINT_SUFFIX = ".fingerprint"
 
     def __init__(
         self,
@@ -43,36 +54,85 @@ class HtmlWriter:
         self.limit = limit
         self.column_num = column_num
         self.pic_width = pic_width
-        self.template = (Path(__file__).parent / "template/template.txt").read_text(encoding="utf-8")
+        self.template: Template = TEMPLATE_ENVIRONMENT.get_template(HtmlWriter.TEMPLATE_NAME)
 
-    def write_result_html(self) -> Result:
-        save_path: Path = None
-        record_list: list[dict] = self.db_controller.select(self.limit)
-        if self.op_type == "Fav":
-            save_path = Path(HtmlWriter.FAV_HTML_PATH)
-        elif self.op_type == "RT":
-            save_path = Path(HtmlWriter.RETWEET_HTML_PATH)
-        else:
+    @classmethod
+    def get_save_path(cls, op_type: str) -> Path | None:
+        """op_type に対応するhtmlの保存先を返す
+
+        Args:
+            op_type (str): "Fav" or "RT"
+
+        Returns:
+            Path | None: htmlの保存先、op_type が不正な場合はNone
+        """
+        if op_type == "Fav":
+            return Path(cls.FAV_HTML_PATH)
+        if op_type == "RT":
+            return Path(cls.RETWEET_HTML_PATH)
+        return None
+
+    def make_fingerprint(self, source_list: list[dict]) -> str:
+        """出力内容を決める要素からフィンガープリントを作成する
+
+        Args:
+            source_list (list[dict]): 出力対象のレコード情報
+
+        Returns:
+            str: フィンガープリント
+        """
+        # テンプレートの更新も検知できるようにファイル名と更新日時を含める
+        template_mtime = Path(self.template.filename).stat().st_mtime if self.template.filename else 0
+        key = [source_list, self.column_num, self.pic_width, HtmlWriter.POINTER_PATH, template_mtime]
+        return hashlib.sha256(orjson.dumps(key)).hexdigest()
+
+    def write_result_html(self, force: bool = False) -> Result:
+        """DBの最新レコードからhtmlを出力する
+
+        前回出力時とフィンガープリントが一致する場合は再出力しない
+        出力は一時ファイルに書き込んでから置き換えるため、途中の状態のhtmlが見えることはない
+
+        Args:
+            force (bool): Trueの場合フィンガープリントによらず出力する
+
+        Returns:
+            Result: 成功時（出力不要だった場合を含む）Result.success
+        """
+        save_path = HtmlWriter.get_save_path(self.op_type)
+        if save_path is None:
             return Result.failed
+        record_list: list[dict] = self.db_controller.select(self.limit)
 
         source_list = [
             {
                 "url": record["url"],
-                "url_thumbnail": record["url_thumbnail"],
+                # ローカルにサムネイルがあればそちらを参照する
+                "url_thumbnail": ThumbnailCache.thumbnail_url(record.get("img_filename"), record["url_thumbnail"]),
                 "tweet_url": record["tweet_url"],
             }
             for record in record_list
         ]
 
-        template: Template = Template(source=self.template)
-        html = template.render(
+        # 最新レコードが前回出力時から変わっていなければ何もしない
+        fingerprint = self.make_fingerprint(source_list)
+        fingerprint_path = save_path.with_name(save_path.name + HtmlWriter.FINGERPRINT_SUFFIX)
+        if not force and save_path.is_file() and fingerprint_path.is_file():
+            if fingerprint_path.read_text(encoding="utf-8") == fingerprint:
+                return Result.success
+
+        html = self.template.render(
             source_list=source_list,
             column_num=self.column_num,
             pic_width=self.pic_width,
             pointer_path=HtmlWriter.POINTER_PATH,
         )
 
-        save_path.write_text(html, encoding="utf-8")
+        # 一時ファイルに書き込んでから置き換える
+        save_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = save_path.with_name(save_path.name + ".tmp")
+        tmp_path.write_text(html, encoding="utf-8")
+        os.replace(tmp_path, save_path)
+        fingerprint_path.write_text(fingerprint, encoding="utf-8")
         return Result.success
 
 
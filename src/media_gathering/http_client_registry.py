@@ -0,0 +1,234 @@
+import atexit
+import importlib.util
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from logging import INFO, getLogger
+
+import httpx
+
+from media_gathering.metrics import Metrics, current_metrics
+
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+# h2 がインストールされている場合のみ HTTP/2 を有効にする
+# 接続時にALPNでネゴシエートされ、非対応のホストとは HTTP/1.1 で通信する
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """リトライ方針
+
+    接続エラーはトランスポート層で、一時的なエラーレスポンスは RetryTransport でリトライする
+    """
+
+    retries: int = 3  # 最大リトライ回数
+    backoff_factor: float = 0.5  # 待機時間の基数[s]、backoff_factor * 2^試行回数 だけ待機する
+    max_backoff: float = 30.0  # 待機時間の上限[s]
+
+    # リトライ対象のステータスコード
+    RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+    # リトライ対象のメソッド（冪等なもののみ）
+    RETRY_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+    def __post_init__(self) -> None:
+        self._is_valid()
+
+    def _is_valid(self) -> bool:
+        if not isinstance(self.retries, int):
+            raise TypeError("retries is not int.")
+        if not isinstance(self.backoff_factor, int | float):
+            raise TypeError("backoff_factor is not float.")
+        if not isinstance(self.max_backoff, int | float):
+            raise TypeError("max_backoff is not float.")
+        if self.retries < 0 or self.backoff_factor < 0 or self.max_backoff < 0:
+            raise ValueError("RetryPolicy must be non-negative.")
+        return True
+
+    def is_retryable(self, request: httpx.Request, response: httpx.Response) -> bool:
+        """レスポンスがリトライ対象か判定する
+
+        Args:
+            request (httpx.Request): 送信したリクエスト
+            response (httpx.Response): 受信したレスポンス
+
+        Returns:
+            bool: リトライ対象ならTrue
+        """
+        return request.method in self.RETRY_METHODS and response.status_code in self.RETRY_STATUS_CODES
+
+    def backoff(self, attempt: int, response: httpx.Response | None = None) -> float:
+        """attempt 回目の失敗後に待機する時間を返す
+
+        レスポンスに Retry-After ヘッダ（秒数）がある場合はそちらを優先する
+
+        Args:
+            attempt (int): 0始まりの試行回数
+            response (httpx.Response | None): 失敗時のレスポンス
+
+        Returns:
+            float: 待機時間[s]
+        """
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdecimal():
+                return min(float(retry_after), self.max_backoff)
+        return min(self.backoff_factor * (2**attempt), self.max_backoff)
+
+
+class RetryTransport(httpx.BaseTransport):
+    """一時的なエラーレスポンスを指数バックオフでリトライするトランスポート"""
+
+    def __init__(self, transport: httpx.BaseTransport, policy: RetryPolicy) -> None:
+        self._transport = transport
+        self._policy = policy
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        for attempt in range(self._policy.retries + 1):
+            response = self._transport.handle_request(request)
+            if attempt >= self._policy.retries or not self._policy.is_retryable(request, response):
+                return response
+            wait = self._policy.backoff(attempt, response)
+            response.close()
+            logger.debug(f"{request.method} {request.url} -> {response.status_code}, retry after {wait}s.")
+            time.sleep(wait)
+        return response
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class MeteredByteStream(httpx.SyncByteStream):
+    """読み出したレスポンスボディのバイト数を計測値に加算するストリーム"""
+
+    def __init__(self, stream: httpx.SyncByteStream, metrics: Metrics, host: str) -> None:
+        self._stream = stream
+        self._metrics = metrics
+        self._host = host
+
+    def __iter__(self) -> Iterator[bytes]:
+        total = 0
+        try:
+            for chunk in self._stream:
+                total += len(chunk)
+                yield chunk
+        finally:
+            self._metrics.inc("http_response_bytes_total", total, host=self._host)
+
+    def close(self) -> None:
+        self._stream.close()
+
+
+class MeteredTransport(httpx.BaseTransport):
+    """実行中のクロールの計測値に、ホストごとのリクエスト数と応答時間、受信バイト数を記録するトランスポート
+
+    クロール中でない（collect() で計測値を有効にしていない）場合は何も記録しない
+    """
+
+    def __init__(self, transport: httpx.BaseTransport) -> None:
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        metrics = current_metrics()
+        if metrics is None:
+            return self._transport.handle_request(request)
+
+        host = request.url.host
+        start = time.perf_counter()
+        try:
+            response = self._transport.handle_request(request)
+        except Exception:
+            metrics.inc("http_requests_total", host=host, status="error")
+            raise
+        # ヘッダを受信するまでの時間（ボディの受信はストリームで計測する）
+        metrics.observe("http_request_seconds", time.perf_counter() - start, host=host)
+        metrics.inc("http_requests_total", host=host, status=response.status_code)
+        response.stream = MeteredByteStream(response.stream, metrics, host)
+        return response
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class HttpClientRegistry:
+    """プロセス全体で共有する httpx.Client をサイトごとに保持するレジストリ
+
+    同一サイトへの通信は同じコネクションプールを使い回すため、TLSハンドシェイクが繰り返されない
+    クライアントは初回取得時に作成され、プロセス終了時にまとめて閉じられる
+    """
+
+    # サイト名 -> 共有クライアント
+    _clients: dict[str, httpx.Client] = {}
+    _lock = threading.Lock()
+
+    # 全サイト共通の設定
+    TIMEOUT = 60.0
+    LIMITS = httpx.Limits(max_connections=16, max_keepalive_connections=8, keepalive_expiry=30.0)
+    RETRY_POLICY = RetryPolicy()
+
+    @classmethod
+    def create_client(cls) -> httpx.Client:
+        """共通の設定で httpx.Client を作成する
+
+        Returns:
+            httpx.Client: 作成したクライアント
+        """
+        transport = httpx.HTTPTransport(retries=cls.RETRY_POLICY.retries, http2=HTTP2_AVAILABLE, limits=cls.LIMITS)
+        return httpx.Client(
+            follow_redirects=True,
+            timeout=cls.TIMEOUT,
+            transport=RetryTransport(MeteredTransport(transport), cls.RETRY_POLICY),
+        )
+
+    @classmethod
+    def get(cls, site: str) -> httpx.Client:
+        """サイトに対応する共有クライアントを取得する
+
+        Args:
+            site (str): サイト名
+
+        Returns:
+            httpx.Client: 共有クライアント
+        """
+        if not isinstance(site, str) or site == "":
+            raise ValueError("site is invalid.")
+        with cls._lock:
+            client = cls._clients.get(site)
+            if client is None or client.is_closed:
+                client = cls.create_client()
+                cls._clients[site] = client
+            return client
+
+    @classmethod
+    def close(cls, site: str) -> None:
+        """サイトに対応する共有クライアントを閉じる
+
+        Args:
+            site (str): サイト名
+        """
+        with cls._lock:
+            client = cls._clients.pop(site, None)
+        if client is not None:
+            client.close()
+
+    @classmethod
+    def close_all(cls) -> None:
+        """すべての共有クライアントを閉じる"""
+        with cls._lock:
+            clients = list(cls._clients.values())
+            cls._clients.clear()
+        for client in clients:
+            client.close()
+
+
+atexit.register(HttpClientRegistry.close_all)
+
+
+if __name__ == "__main__":
+    client = HttpClientRegistry.get("sample")
+    print(client is HttpClientRegistry.get("sample"))
+    print(HTTP2_AVAILABLE)
+    HttpClientRegistry.close_all()
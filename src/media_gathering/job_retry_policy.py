@@ -0,0 +1,69 @@
+from dataclasses import dataclass
+from typing import Self
+
+
+@dataclass(frozen=True)
+class JobRetryPolicy:
+    """失敗したダウンロードの再試行間隔を決める指数バックオフ
+
+    n 回目の失敗後は base_delay * 2^(n-1) 秒後に再試行し、間隔は max_delay 秒で頭打ちにする
+    max_attempts 回失敗したら再試行を打ち切る
+    """
+
+    base_delay: float = 600.0  # 初回失敗後の再試行間隔[秒]
+    max_delay: float = 86400.0  # 再試行間隔の上限[秒]
+    max_attempts: int = 8  # 再試行を打ち切るまでの失敗回数
+
+    def __post_init__(self) -> None:
+        self._is_valid()
+
+    def _is_valid(self) -> bool:
+        if not isinstance(self.base_delay, int | float):
+            raise TypeError("base_delay is not int or float.")
+        if not isinstance(self.max_delay, int | float):
+            raise TypeError("max_delay is not int or float.")
+        if not isinstance(self.max_attempts, int):
+            raise TypeError("max_attempts is not int.")
+        if self.base_delay < 0:
+            raise ValueError("base_delay must be 0 <= base_delay.")
+        if self.max_delay < self.base_delay:
+            raise ValueError("max_delay must be base_delay <= max_delay.")
+        if self.max_attempts <= 0:
+            raise ValueError("max_attempts must be 0 < max_attempts.")
+        return True
+
+    @classmethod
+    def create(cls, config: dict) -> Self:
+        """設定ファイルの job_queue 項目から作成する
+
+        Args:
+            config (dict): 設定ファイルの job_queue 項目
+
+        Returns:
+            Self: 再試行間隔の設定
+        """
+        return cls(
+            config.get("base_delay_minutes", 10) * 60,
+            config.get("max_delay_minutes", 1440) * 60,
+            config.get("max_attempts", 8),
+        )
+
+    def delay(self, attempt: int) -> float | None:
+        """attempt 回目の失敗後、次に再試行するまでの秒数を返す
+
+        Args:
+            attempt (int): これまでの失敗回数（1以上）
+
+        Returns:
+            float | None: 再試行までの秒数、再試行を打ち切る場合はNone
+        """
+        if attempt >= self.max_attempts:
+            return None
+        # 失敗回数が大きくても桁あふれしないよう指数を抑える
+        return min(self.base_delay * 2 ** min(attempt - 1, 32), self.max_delay)
+
+
+if __name__ == "__main__":
+    retry_policy = JobRetryPolicy()
+    for attempt in range(1, retry_policy.max_attempts + 1):
+        print(attempt, retry_policy.delay(attempt))
@@ -0,0 +1,104 @@
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Self
+
+
+@dataclass(frozen=True)
+class DownloadedIndex:
+    """DL済作品IDのインデックス
+
+    サイトごとに保存ディレクトリベースパス直下にDL済作品IDを1行1IDで保持する
+    DL済かどうかの判定はメモリ上のsetで行うため、保存済作品数によらずO(1)で済む
+    インデックスファイルが存在しない場合は、初回のみ既存の保存ディレクトリを走査して作成する
+    """
+
+    path: Path  # インデックスファイルパス
+    _ids: set[int] = field(default_factory=set)  # DL済作品IDの集合
+    _lock: threading.Lock = field(default_factory=threading.Lock, compare=False)
+
+    # インデックスファイル名（{site_name}で置き換える）
+    INDEX_FILE_NAME = ".{}_downloaded_index"
+    # {作品タイトル}({作品ID})[.{拡張子}] の形式にマッチする
+    WORK_ID_PATTERN = re.compile(r"^.*\(([0-9]+)\)(\.[^.()]+)?$")
+
+    def __post_init__(self) -> None:
+        self._is_valid()
+
+    def _is_valid(self) -> bool:
+        if not isinstance(self.path, Path):
+            raise TypeError("path is not Path.")
+        if not isinstance(self._ids, set):
+            raise TypeError("_ids is not set.")
+        return True
+
+    def __contains__(self, work_id: int) -> bool:
+        return work_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, work_id: int) -> None:
+        """DL済作品IDを追加する
+
+        インデックスファイルにも追記する
+
+        Args:
+            work_id (int): DL済となった作品ID
+        """
+        if not isinstance(work_id, int):
+            raise TypeError("work_id is not int.")
+        with self._lock:
+            if work_id in self._ids:
+                return
+            self._ids.add(work_id)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open(mode="a", encoding="utf-8") as fout:
+                fout.write(f"{work_id}\n")
+
+    @classmethod
+    def create(cls, base_path: Path, site_name: str, is_target: Callable[[Path], bool] = lambda p: True) -> Self:
+        """DownloadedIndex インスタンスを作成する
+
+        インデックスファイルが存在しない場合は
+        {base_path}/{作者名}({作者ID})/ 直下のファイルとディレクトリ名から作品IDを収集して作成する
+
+        Args:
+            base_path (Path): 保存ディレクトリベースパス
+            site_name (str): サイト名、インデックスファイル名に使用する
+            is_target (Callable[[Path], bool]): 初回作成時に作品として扱うパスかどうかの判定関数
+
+        Returns:
+            DownloadedIndex: DL済作品IDのインデックス
+        """
+        if not isinstance(base_path, Path):
+            raise TypeError("base_path is not Path.")
+        if not isinstance(site_name, str) or site_name == "":
+            raise ValueError("site_name is invalid.")
+
+        index_path = base_path / cls.INDEX_FILE_NAME.format(site_name)
+        if index_path.is_file():
+            lines = index_path.read_text(encoding="utf-8").splitlines()
+            ids = {int(line) for line in lines if line.strip().isdecimal()}
+            return cls(index_path, ids)
+
+        # 既存の保存ディレクトリからインデックスを作成する
+        ids = set()
+        for sp in base_path.glob("*/*"):
+            if not is_target(sp):
+                continue
+            result = cls.WORK_ID_PATTERN.match(sp.name)
+            if result:
+                ids.add(int(result.group(1)))
+
+        base_path.mkdir(parents=True, exist_ok=True)
+        index_path.write_text("".join(f"{work_id}\n" for work_id in sorted(ids)), encoding="utf-8")
+        return cls(index_path, ids)
+
+
+if __name__ == "__main__":
+    base_path = Path("./media_gathering/link_search/")
+    downloaded_index = DownloadedIndex.create(base_path, "sample")
+    print(len(downloaded_index))
+    print(12345678 in downloaded_index)
@@ -1,19 +1,22 @@
 import configparser
+import threading
 from logging import INFO, getLogger
 from pathlib import Path
 from typing import Self
 
-from plyer import notification
-
 from media_gathering.link_search.fetcher_base import FetcherBase
-from media_gathering.link_search.nico_seiga.nico_seiga_fetcher import NicoSeigaFetcher
-from media_gathering.link_search.nijie.nijie_fetcher import NijieFetcher
 from media_gathering.link_search.password import Password
-from media_gathering.link_search.pixiv.pixiv_fetcher import PixivFetcher
-from media_gathering.link_search.pixiv_novel.pixiv_novel_fetcher import PixivNovelFetcher
 from media_gathering.link_search.url import URL
 from media_gathering.link_search.username import Username
 from media_gathering.log_message import MSG
+from media_gathering.util import LazyImport
+
+# 各フェッチャーは設定で有効になっているものだけ登録時に import する
+notification = LazyImport("plyer", "notification")
+NicoSeigaFetcher = LazyImport("media_gathering.link_search.nico_seiga.nico_seiga_fetcher", "NicoSeigaFetcher")
+NijieFetcher = LazyImport("media_gathering.link_search.nijie.nijie_fetcher", "NijieFetcher")
+PixivFetcher = LazyImport("media_gathering.link_search.pixiv.pixiv_fetcher", "PixivFetcher")
+PixivNovelFetcher = LazyImport("media_gathering.link_search.pixiv_novel.pixiv_novel_fetcher", "PixivNovelFetcher")
 
 logger = getLogger(__name__)
 logger.setLevel(INFO)
@@ -22,6 +25,8 @@ logger.setLevel(INFO)
 class LinkSearcher:
     def __init__(self):
         self.fetcher_list: list[FetcherBase] = []
+        # 複数のクローラーで共有する場合に、各フェッチャーのセッションを同時に使わないためのロック
+        self._lock = threading.Lock()
 
     def register(self, fetcher) -> None:
         interface_check = hasattr(fetcher, "is_target_url") and hasattr(fetcher, "fetch")
@@ -37,7 +42,8 @@ class LinkSearcher:
             if p.is_target_url(URL(url)):
                 fetcher_class = p.__class__.__name__
                 logger.info(MSG.LINKSEARCHER_FETCHER_FOUND.value.format(url, fetcher_class))
-                p.fetch(url)
+                with self._lock:
+                    p.fetch(url)
                 break
         else:
             raise ValueError("Fetcher not found.")
@@ -90,7 +96,12 @@ class LinkSearcher:
         try:
             c = config["nijie"]
             if c["is_nijie_trace"]:
-                fetcher = NijieFetcher(Username(c["email"]), Password(c["password"]), Path(c["save_base_path"]))
+                fetcher = NijieFetcher(
+                    Username(c["email"]),
+                    Password(c["password"]),
+                    Path(c["save_base_path"]),
+                    c.get("cookie_validation_window", NijieFetcher.COOKIE_VALIDATION_WINDOW),
+                )
                 ls.register(fetcher)
         except Exception:
             notify("nijie")
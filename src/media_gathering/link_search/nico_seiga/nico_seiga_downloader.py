@@ -1,9 +1,9 @@
 import enum
-import re
 from dataclasses import dataclass
 from logging import INFO, getLogger
 from pathlib import Path
 
+from media_gathering.link_search.downloaded_index import DownloadedIndex
 from media_gathering.link_search.nico_seiga.illust_extension import IllustExtension
 from media_gathering.link_search.nico_seiga.nico_seiga_info import NicoSeigaInfo
 from media_gathering.link_search.nico_seiga.nico_seiga_save_directory_path import NicoSeigaSaveDirectoryPath
@@ -27,6 +27,7 @@ class NicoSeigaDownloader:
     nicoseiga_url: NicoSeigaURL  # ニコニコ静画作品ページURL
     base_path: Path  # 保存ディレクトリベースパス
     session: NicoSeigaSession  # 認証済セッション
+    downloaded_index: DownloadedIndex  # DL済作品IDのインデックス
 
     def __post_init__(self):
         self._is_valid()
@@ -38,18 +39,22 @@ class NicoSeigaDownloader:
             raise TypeError("base_path is not Path.")
         if not isinstance(self.session, NicoSeigaSession):
             raise TypeError("session is not NicoSeigaSession.")
+        if not isinstance(self.downloaded_index, DownloadedIndex):
+            raise TypeError("downloaded_index is not DownloadedIndex.")
         return True
 
     def download(self) -> DownloadResult:
         """ニコニコ静画作品ページURLからダウンロードする"""
-        # イラスト情報取得
         illust_id = self.nicoseiga_url.illust_id
-        author_id = self.session.get_author_id(illust_id)
-        illust_title = self.session.get_illust_title(illust_id)
-        author_name = self.session.get_author_name(author_id)
 
-        # イラスト情報をまとめる
-        illust_info = NicoSeigaInfo(illust_id, illust_title, author_id, author_name)
+        # 既にDL済なら再DLしないでスキップ
+        # 拡張子は実際にDLするまで分からないため、ファイルの存在ではなくDL済インデックスで判定する
+        if illust_id.id in self.downloaded_index:
+            logger.info(f"Download nico_seiga illust: im{illust_id.id} -> exist")
+            return DownloadResult.PASSED
+
+        # イラスト情報取得
+        illust_info: NicoSeigaInfo = self.session.get_illust_info(illust_id)
 
         # 画像保存先パスを取得
         save_directory_path = NicoSeigaSaveDirectoryPath.create(illust_info, self.base_path)
@@ -58,19 +63,6 @@ class NicoSeigaDownloader:
         # {作者名}ディレクトリ作成
         sd_path.parent.mkdir(parents=True, exist_ok=True)
 
-        # ファイルが既に存在しているか調べる
-        # 拡張子は実際にDLするまで分からない
-        # そのため、対象フォルダ内にillust_idを含むファイル名を持つファイルが存在するか調べることで代用する
-        name = sd_path.name
-        pattern = r"^.*\(" + str(illust_id.id) + r"\).*$"
-        same_name_list = [f for f in sd_path.parent.glob("**/*") if re.search(pattern, str(f))]
-
-        # 既に存在しているなら再DLしないでスキップ
-        if same_name_list:
-            name = same_name_list[0].name
-            logger.info("Download nico_seiga illust: " + name + " -> exist")
-            return DownloadResult.PASSED
-
         # 画像直リンクを取得
         source_url = self.session.get_source_url(illust_id)
 
@@ -86,6 +78,7 @@ class NicoSeigaDownloader:
         # {作者名}ディレクトリ直下に保存
         with Path(sd_path.parent / name).open(mode="wb") as fout:
             fout.write(content)
+        self.downloaded_index.add(illust_id.id)
         logger.info("Download seiga illust: " + name + " -> done")
 
         return DownloadResult.SUCCESS
@@ -2,6 +2,7 @@ from dataclasses import dataclass
 from logging import INFO, getLogger
 from pathlib import Path
 
+from media_gathering.link_search.downloaded_index import DownloadedIndex
 from media_gathering.link_search.fetcher_base import FetcherBase
 from media_gathering.link_search.nico_seiga.nico_seiga_downloader import NicoSeigaDownloader
 from media_gathering.link_search.nico_seiga.nico_seiga_session import NicoSeigaSession
@@ -20,6 +21,10 @@ class NicoSeigaFetcher(FetcherBase):
 
     session: NicoSeigaSession  # 取得に使う認証済セッション
     base_path: Path  # 保存ディレクトリベースパス
+    downloaded_index: DownloadedIndex  # DL済作品IDのインデックス
+
+    # DL済インデックスのサイト名
+    SITE_NAME = "nico_seiga"
 
     def __init__(self, username: Username, password: Password, base_path: Path):
         """初期化処理
@@ -42,6 +47,7 @@ class NicoSeigaFetcher(FetcherBase):
 
         object.__setattr__(self, "session", NicoSeigaSession(username, password))
         object.__setattr__(self, "base_path", base_path)
+        object.__setattr__(self, "downloaded_index", DownloadedIndex.create(base_path, self.SITE_NAME))
 
     def is_target_url(self, url: URL) -> bool:
         """担当URLかどうか判定する
@@ -65,7 +71,7 @@ class NicoSeigaFetcher(FetcherBase):
             url (URL): 処理対象url
         """
         nicoseiga_url = NicoSeigaURL.create(url)
-        NicoSeigaDownloader(nicoseiga_url, self.base_path, self.session).download()
+        NicoSeigaDownloader(nicoseiga_url, self.base_path, self.session, self.downloaded_index).download()
 
 
 if __name__ == "__main__":
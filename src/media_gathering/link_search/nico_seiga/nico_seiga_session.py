@@ -1,13 +1,18 @@
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
 
 import httpx
 import xmltodict
 from bs4 import BeautifulSoup
 
+from media_gathering.http_client_registry import HttpClientRegistry
 from media_gathering.link_search.nico_seiga.authorid import Authorid
 from media_gathering.link_search.nico_seiga.authorname import Authorname
 from media_gathering.link_search.nico_seiga.illustid import Illustid
 from media_gathering.link_search.nico_seiga.illustname import Illustname
+from media_gathering.link_search.nico_seiga.nico_seiga_info import NicoSeigaInfo
 from media_gathering.link_search.password import Password
 from media_gathering.link_search.url import URL
 from media_gathering.link_search.username import Username
@@ -23,6 +28,8 @@ class NicoSeigaSession:
     """
 
     _session: httpx.Client  # 認証済セッション
+    _author_name_cache: OrderedDict[int, tuple[float, Authorname]]  # 作者名キャッシュ{作者ID: (取得時刻, 作者名)}
+    _author_name_cache_lock: threading.Lock  # 作者名キャッシュ操作用ロック
 
     # 接続時に使用するヘッダー
     chrome_ver = "Chrome/88.0.4324.190 Safari/537.36"
@@ -37,14 +44,22 @@ class NicoSeigaSession:
     USERNAME_API_ENDPOINT_BASE = "https://seiga.nicovideo.jp/api/user/info?id="
     # 静画直リンクエンドポイントベース
     IMAGE_SOUECE_API_ENDPOINT_BASE = "https://seiga.nicovideo.jp/image/source?id="
+    # 作者名キャッシュの最大保持数
+    AUTHOR_NAME_CACHE_SIZE = 256
+    # 作者名キャッシュの有効期間[s]
+    AUTHOR_NAME_CACHE_TTL = 60 * 60
 
     def __init__(self, username: Username, password: Password) -> None:
         object.__setattr__(self, "_session", self.login(username, password))
+        object.__setattr__(self, "_author_name_cache", OrderedDict())
+        object.__setattr__(self, "_author_name_cache_lock", threading.Lock())
         self._is_valid()
 
     def _is_valid(self) -> bool:
         if not isinstance(self._session, httpx.Client):
             raise TypeError("_session is not httpx.Client.")
+        if not isinstance(self._author_name_cache, OrderedDict):
+            raise TypeError("_author_name_cache is not OrderedDict.")
         return True
 
     def login(self, username: Username, password: Password) -> httpx.Client:
@@ -57,9 +72,8 @@ class NicoSeigaSession:
         Returns:
             session (NicoSeigaSession): 認証済セッション
         """
-        # セッション開始
-        transport = httpx.HTTPTransport(retries=5)
-        session = httpx.Client(follow_redirects=True, timeout=60.0, transport=transport)
+        # セッション開始（共有クライアントを使う）
+        session = HttpClientRegistry.get("nico_seiga")
 
         # ログイン
         params = {
@@ -70,14 +84,14 @@ class NicoSeigaSession:
         response.raise_for_status()
         return session
 
-    def get_author_id(self, illust_id: Illustid) -> Authorid:
-        """作者IDを取得する
+    def _get_illust_info_dict(self, illust_id: Illustid) -> dict:
+        """静画情報を取得して解析する
 
         Args:
             illust_id (Illustid): イラストID
 
         Returns:
-            Authorid: 作者ID
+            dict: 静画情報APIのレスポンスを解析した辞書
         """
         # 静画情報を取得する
         info_url = self.IMAGE_INFO_API_ENDPOINT_BASE + str(illust_id.id)
@@ -85,7 +99,36 @@ class NicoSeigaSession:
         response.raise_for_status()
 
         # 静画情報解析
-        response_dict = xmltodict.parse(response.text)
+        return xmltodict.parse(response.text)
+
+    def get_illust_info(self, illust_id: Illustid) -> NicoSeigaInfo:
+        """静画情報をまとめて取得する
+
+        作者IDとイラストタイトルは1回の静画情報取得で解析する
+        作者名はキャッシュがあればそれを使う
+
+        Args:
+            illust_id (Illustid): イラストID
+
+        Returns:
+            NicoSeigaInfo: 静画情報
+        """
+        response_dict = self._get_illust_info_dict(illust_id)
+        author_id = Authorid(int(find_values(response_dict, "user_id", True, [], [])))
+        illust_title = Illustname(find_values(response_dict, "title", True, [], []))
+        author_name = self.get_author_name(author_id)
+        return NicoSeigaInfo(illust_id, illust_title, author_id, author_name)
+
+    def get_author_id(self, illust_id: Illustid) -> Authorid:
+        """作者IDを取得する
+
+        Args:
+            illust_id (Illustid): イラストID
+
+        Returns:
+            Authorid: 作者ID
+        """
+        response_dict = self._get_illust_info_dict(illust_id)
         author_id_str = find_values(response_dict, "user_id", True, [], [])
         author_id = int(author_id_str)
         return Authorid(author_id)
@@ -93,12 +136,23 @@ class NicoSeigaSession:
     def get_author_name(self, author_id: Authorid) -> Authorname:
         """作者名を取得する
 
+        同じ作者について繰り返し問い合わせないように
+        取得した作者名はAUTHOR_NAME_CACHE_TTL秒の間、最大AUTHOR_NAME_CACHE_SIZE件までキャッシュする
+
         Args:
-            illust_id (Illustid): イラストID
+            author_id (Authorid): 作者ID
 
         Returns:
             Authorname: 作者名
         """
+        # キャッシュに有効な作者名があるか調べる
+        now = time.monotonic()
+        with self._author_name_cache_lock:
+            cached = self._author_name_cache.get(author_id.id)
+            if cached and now - cached[0] < self.AUTHOR_NAME_CACHE_TTL:
+                self._author_name_cache.move_to_end(author_id.id)
+                return cached[1]
+
         # 作者情報を取得する
         username_info_url = self.USERNAME_API_ENDPOINT_BASE + str(author_id.id)
         response = self._session.get(username_info_url, headers=self.HEADERS)
@@ -106,8 +160,15 @@ class NicoSeigaSession:
 
         # 作者情報解析
         response_dict = xmltodict.parse(response.text)
-        author_name = find_values(response_dict, "nickname", True, [], [])
-        return Authorname(author_name)
+        author_name = Authorname(find_values(response_dict, "nickname", True, [], []))
+
+        # キャッシュに保存し、古いものから溢れた分を捨てる
+        with self._author_name_cache_lock:
+            self._author_name_cache[author_id.id] = (now, author_name)
+            self._author_name_cache.move_to_end(author_id.id)
+            while len(self._author_name_cache) > self.AUTHOR_NAME_CACHE_SIZE:
+                self._author_name_cache.popitem(last=False)
+        return author_name
 
     def get_illust_title(self, illust_id: Illustid) -> Illustname:
         """イラストタイトルを取得する
@@ -118,13 +179,7 @@ class NicoSeigaSession:
         Returns:
             Illustname: イラストタイトル
         """
-        # 静画情報を取得する
-        info_url = self.IMAGE_INFO_API_ENDPOINT_BASE + str(illust_id.id)
-        response = self._session.get(info_url, headers=self.HEADERS)
-        response.raise_for_status()
-
-        # 静画情報解析
-        response_dict = xmltodict.parse(response.text)
+        response_dict = self._get_illust_info_dict(illust_id)
         illust_title = find_values(response_dict, "title", True, [], [])
         return Illustname(illust_title)
 
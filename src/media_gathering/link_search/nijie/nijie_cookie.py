@@ -1,17 +1,35 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 import httpx
 
+from media_gathering.http_client_registry import HttpClientRegistry
+
+
+class NijieCookieExpiredError(ValueError):
+    """nijieのクッキーが失効していることを表す例外
+
+    リクエストが年齢確認画面にリダイレクトされた場合に送出する
+    """
+
+    pass
+
 
 @dataclass(frozen=True)
 class NijieCookie:
-    """nijieのクッキー"""
+    """nijieのクッキー
+
+    生成時にトップページをGETしてクッキーが有効か確認する
+    直近で有効性を確認済の場合は _skip_validation=True としてこの確認を省略できる
+    """
 
     _cookies: httpx.Cookies  # クッキー
     _headers: dict  # ヘッダー
+    _skip_validation: bool = field(default=False, compare=False)  # トップページへの確認を省略するか
 
     # nijieトップページ
     NIJIE_TOP_URL = "http://nijie.info/index.php"
+    # 年齢確認画面のパス
+    NIJIE_AGE_JUMP_PATH = "/age_jump.php"
 
     def __post_init__(self) -> None:
         self._is_valid()
@@ -25,8 +43,12 @@ class NijieCookie:
         if not (self._headers and self._cookies):
             raise ValueError("NijieCookie _headers or _cookies is invalid.")
 
+        if self._skip_validation:
+            return True
+
         # トップページをGETしてクッキーが有効かどうか調べる
-        response = httpx.get(self.NIJIE_TOP_URL, headers=self._headers, cookies=self._cookies, follow_redirects=True)
+        session = HttpClientRegistry.get("nijie")
+        response = session.get(self.NIJIE_TOP_URL, headers=self._headers, cookies=self._cookies)
         response.raise_for_status()
 
         # 返ってきたレスポンスがトップページのものかチェック
@@ -39,6 +61,20 @@ class NijieCookie:
             raise ValueError("NijieCookie is invalid.")
         return True
 
+    @classmethod
+    def is_age_check_response(cls, response: httpx.Response) -> bool:
+        """レスポンスが年齢確認画面へリダイレクトされたものか判定する
+
+        クッキーが失効している場合、各ページへのリクエストは年齢確認画面に飛ばされる
+
+        Args:
+            response (httpx.Response): 判定対象のレスポンス
+
+        Returns:
+            bool: 年齢確認画面へリダイレクトされていた場合True
+        """
+        return httpx.URL(str(response.url)).path == cls.NIJIE_AGE_JUMP_PATH
+
 
 if __name__ == "__main__":
     from pathlib import Path
@@ -1,18 +1,20 @@
+import contextvars
 import enum
-import logging
 import re
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from logging import INFO, getLogger
 from pathlib import Path
-from time import sleep
 
 import httpx
-from bs4 import BeautifulSoup
 
-from media_gathering.link_search.nijie.nijie_cookie import NijieCookie
+from media_gathering.link_search.downloaded_index import DownloadedIndex
+from media_gathering.link_search.nijie.nijie_cookie import NijieCookie, NijieCookieExpiredError
 from media_gathering.link_search.nijie.nijie_page_info import NijiePageInfo
 from media_gathering.link_search.nijie.nijie_save_directory_path import NijieSaveDirectoryPath
 from media_gathering.link_search.nijie.nijie_url import NijieURL
+from media_gathering.link_search.rate_limiter import RateLimiter
+from media_gathering.link_search.url import URL
 
 logger = getLogger(__name__)
 logger.setLevel(INFO)
@@ -31,6 +33,14 @@ class NijieDownloader:
     nijie_url: NijieURL  # nijie作品ページURL
     base_path: Path  # 保存ディレクトリベースパス
     cookies: NijieCookie  # nijieのクッキー
+    downloaded_index: DownloadedIndex  # DL済作品IDのインデックス
+    session: httpx.Client  # nijieとの通信に使うセッション（fetcherで共有）
+    rate_limiter: RateLimiter  # 画像DLのリクエスト間隔制限（fetcherで共有）
+
+    # 作品概要ページから作者IDを取得するパターン
+    AUTHOR_ID_PATTERN = re.compile(r"https://nijie\.info/members\.php\?id=(\d+)")
+    # 漫画形式の画像を並行してDLする際の最大スレッド数
+    MAX_WORKERS = 4
 
     def __post_init__(self):
         self._is_valid()
@@ -42,38 +52,57 @@ class NijieDownloader:
             raise TypeError("base_path is not Path.")
         if not isinstance(self.cookies, NijieCookie):
             raise TypeError("cookies is not NijieCookie.")
+        if not isinstance(self.downloaded_index, DownloadedIndex):
+            raise TypeError("downloaded_index is not DownloadedIndex.")
+        if not isinstance(self.session, httpx.Client):
+            raise TypeError("session is not httpx.Client.")
+        if not isinstance(self.rate_limiter, RateLimiter):
+            raise TypeError("rate_limiter is not RateLimiter.")
         return True
 
+    def _download_image(self, url: URL, save_file_path: Path) -> None:
+        """画像をDLして保存する
+
+        Args:
+            url (URL): 画像への直リンク
+            save_file_path (Path): 保存先ファイルパス
+        """
+        self.rate_limiter.wait()
+        res = self.session.get(url.original_url, headers=self.cookies._headers, cookies=self.cookies._cookies)
+        res.raise_for_status()
+        save_file_path.write_bytes(res.content)
+
     def download(self) -> DownloadResult:
         """nijie作品ページURLから作品をダウンロードしてbase_path以下に保存する"""
         work_id = self.nijie_url.work_id.id
 
+        # 既にDL済なら作品ページを取得せずにスキップ
+        if work_id in self.downloaded_index:
+            logger.info(f"Download nijie work: id={work_id} -> exist")
+            return DownloadResult.PASSED
+
         # 作品概要ページをGET
         work_url = f"https://nijie.info/view.php?id={work_id}"
         headers = self.cookies._headers
         cookies = self.cookies._cookies
-        transport = httpx.HTTPTransport(retries=5)
-        session = httpx.Client(follow_redirects=True, timeout=60.0, transport=transport)
-        res = session.get(work_url, headers=headers, cookies=cookies)
+        res = self.session.get(work_url, headers=headers, cookies=cookies)
         res.raise_for_status()
+        if NijieCookie.is_age_check_response(res):
+            raise NijieCookieExpiredError("NijieCookie is expired.")
 
         # author_idを取得
-        pattern = r"https://nijie\.info/members\.php\?id=(\d+)"
-        m = re.findall(pattern, res.text)
-        author_id = int(m[0]) if m else 0
+        m = self.AUTHOR_ID_PATTERN.search(res.text)
+        author_id = int(m.group(1)) if m else 0
 
         # 作品詳細ページをGET
         work_url = f"http://nijie.info/view_popup.php?id={work_id}"
-        headers = self.cookies._headers
-        cookies = self.cookies._cookies
-        transport = httpx.HTTPTransport(retries=5)
-        session = httpx.Client(follow_redirects=True, timeout=60.0, transport=transport)
-        res = session.get(work_url, headers=headers, cookies=cookies)
+        res = self.session.get(work_url, headers=headers, cookies=cookies)
         res.raise_for_status()
+        if NijieCookie.is_age_check_response(res):
+            raise NijieCookieExpiredError("NijieCookie is expired.")
 
-        # BeautifulSoupを用いてhtml解析を行う
-        soup = BeautifulSoup(res.text, "html.parser")
-        page_info = NijiePageInfo.create(soup, author_id)
+        # 必要なタグのみを対象にhtml解析を行う
+        page_info = NijiePageInfo.create_from_html(res.text, author_id)
 
         # 保存先ディレクトリを取得
         save_directory_path = NijieSaveDirectoryPath.create(self.nijie_url, page_info, self.base_path)
@@ -89,6 +118,7 @@ class NijieDownloader:
             # 既に存在しているなら再DLしないでスキップ
             if sd_path.is_dir():
                 logger.info("\t\t: exist -> skip")
+                self.downloaded_index.add(work_id)
                 return DownloadResult.PASSED
 
             # {作者名}/{作品名}ディレクトリ作成
@@ -96,17 +126,21 @@ class NijieDownloader:
 
             # 画像をDLする
             # ファイル名は{イラストタイトル}({イラストID})_{3ケタの連番}.{拡張子}
-            for i, url in enumerate(urls):
-                res = session.get(url.original_url, headers=headers, cookies=cookies)
-                res.raise_for_status()
-
+            # リクエスト間隔はrate_limiterで制限しつつ並行してDLする
+            # ワーカースレッドはコンテキストを引き継がないため、実行中のクロールの計測値に記録されるようコピーして渡す
+            def download_page(i: int, url: URL) -> None:
                 ext = Path(url.original_url).suffix
                 file_name = f"{sd_path.name}_{i:03}{ext}"
-                with Path(sd_path / file_name).open(mode="wb") as fout:
-                    fout.write(res.content)
-
+                self._download_image(url, sd_path / file_name)
                 logger.info(f"\t\t: {file_name} -> done({i + 1}/{pages})")
-                sleep(0.5)
+
+            with ThreadPoolExecutor(max_workers=self.MAX_WORKERS) as executor:
+                futures = [
+                    executor.submit(contextvars.copy_context().run, download_page, i, url)
+                    for i, url in enumerate(urls)
+                ]
+                for future in futures:
+                    future.result()
         elif pages == 1:  # 一枚絵、うごイラ一枚
             # {作者名}ディレクトリ作成
             sd_path.parent.mkdir(parents=True, exist_ok=True)
@@ -120,19 +154,16 @@ class NijieDownloader:
             # 既に存在しているなら再DLしないでスキップ
             if (sd_path.parent / name).is_file():
                 logger.info(f"Download nijie work: {author_name_id} / {name} -> exist")
+                self.downloaded_index.add(work_id)
                 return DownloadResult.PASSED
 
-            # 画像をDLする
-            res = session.get(url.original_url, headers=headers, cookies=cookies)
-            res.raise_for_status()
-
-            # {作者名}ディレクトリ直下に保存
-            with Path(sd_path.parent / name).open(mode="wb") as fout:
-                fout.write(res.content)
+            # 画像をDLして{作者名}ディレクトリ直下に保存
+            self._download_image(url, sd_path.parent / name)
             logger.info(f"Download nijie work: {author_name_id} / {name} -> done")
         else:  # エラー
             raise ValueError("download nijie work failed.")
 
+        self.downloaded_index.add(work_id)
         return DownloadResult.SUCCESS
 
 
@@ -1,3 +1,4 @@
+import time
 import urllib.parse
 from dataclasses import dataclass
 from http.cookiejar import Cookie
@@ -7,11 +8,14 @@ from pathlib import Path
 import httpx
 import orjson
 
+from media_gathering.http_client_registry import HttpClientRegistry
+from media_gathering.link_search.downloaded_index import DownloadedIndex
 from media_gathering.link_search.fetcher_base import FetcherBase
-from media_gathering.link_search.nijie.nijie_cookie import NijieCookie
+from media_gathering.link_search.nijie.nijie_cookie import NijieCookie, NijieCookieExpiredError
 from media_gathering.link_search.nijie.nijie_downloader import NijieDownloader
 from media_gathering.link_search.nijie.nijie_url import NijieURL
 from media_gathering.link_search.password import Password
+from media_gathering.link_search.rate_limiter import RateLimiter
 from media_gathering.link_search.url import URL
 from media_gathering.link_search.username import Username
 
@@ -23,8 +27,14 @@ logger.setLevel(INFO)
 class NijieFetcher(FetcherBase):
     """nijie作品を取得するクラス"""
 
+    username: Username  # nijieログイン用ユーザーID、クッキー失効時の再ログインに使用する
+    password: Password  # nijieログイン用パスワード
+    cookie_validation_window: float  # クッキーの有効性確認を省略する期間[s]
     cookies: NijieCookie  # nijieで使用するクッキー
     base_path: Path  # 保存ディレクトリベースパス
+    downloaded_index: DownloadedIndex  # DL済作品IDのインデックス
+    session: httpx.Client  # 作品取得に使うセッション、全作品で接続を使い回す
+    rate_limiter: RateLimiter  # 画像DLのリクエスト間隔制限
 
     # 接続時に使用するヘッダー
     agent_browser = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
@@ -33,8 +43,22 @@ class NijieFetcher(FetcherBase):
     HEADERS = {"User-Agent": " ".join([agent_browser, agent_webkit, agent_chrome])}
     # ログイン情報を保持するクッキーファイル置き場
     NIJIE_COOKIE_PATH = "./config/nijie_cookie.json"
-
-    def __init__(self, username: Username, password: Password, base_path: Path):
+    # クッキーの有効性確認結果を保存するファイルパス
+    NIJIE_COOKIE_META_PATH = "./config/nijie_cookie_meta.json"
+    # クッキーの有効性確認を省略する期間のデフォルト値[s]
+    COOKIE_VALIDATION_WINDOW = 24 * 60 * 60
+    # DL済インデックスのサイト名
+    SITE_NAME = "nijie"
+    # 画像DLのリクエスト間隔[s]
+    REQUEST_INTERVAL = 0.5
+
+    def __init__(
+        self,
+        username: Username,
+        password: Password,
+        base_path: Path,
+        cookie_validation_window: float = COOKIE_VALIDATION_WINDOW,
+    ):
         """初期化処理
 
         バリデーションとクッキー取得
@@ -43,6 +67,7 @@ class NijieFetcher(FetcherBase):
             username (Username): nijieログイン用ユーザーID
             password (Password):  nijieログイン用パスワード
             base_path (Path): 保存ディレクトリベースパス
+            cookie_validation_window (float): クッキーの有効性確認を省略する期間[s]
         """
         super().__init__()
 
@@ -52,13 +77,90 @@ class NijieFetcher(FetcherBase):
             raise TypeError("password is not Password.")
         if not isinstance(base_path, Path):
             raise TypeError("base_path is not Path.")
+        if not isinstance(cookie_validation_window, int | float):
+            raise TypeError("cookie_validation_window is not float.")
 
+        object.__setattr__(self, "username", username)
+        object.__setattr__(self, "password", password)
+        object.__setattr__(self, "cookie_validation_window", cookie_validation_window)
         object.__setattr__(self, "cookies", self.login(username, password))
         object.__setattr__(self, "base_path", base_path)
+        object.__setattr__(self, "downloaded_index", DownloadedIndex.create(base_path, self.SITE_NAME))
+        object.__setattr__(self, "session", self.create_session())
+        object.__setattr__(self, "rate_limiter", RateLimiter(self.REQUEST_INTERVAL))
+
+    def create_session(self) -> httpx.Client:
+        """作品取得に使うセッションを取得する
+
+        プロセス全体で共有するnijie用クライアントを使い、同一実行中の全作品で接続を使い回す
+
+        Returns:
+            httpx.Client: 作品取得に使うセッション
+        """
+        return HttpClientRegistry.get(self.SITE_NAME)
+
+    def _load_validated_at(self, cookies_dict: list[dict]) -> float | None:
+        """保存済のクッキー有効性確認時刻を取得する
+
+        確認結果が存在しない、またはクッキーの有効期限を過ぎている場合はNoneを返す
+
+        Args:
+            cookies_dict (list[dict]): 保存済クッキー情報
+
+        Returns:
+            float | None: 最後にクッキーが有効と確認できた時刻(UNIX時間)
+        """
+        meta_path = Path(self.NIJIE_COOKIE_META_PATH)
+        if not meta_path.is_file():
+            return None
+        try:
+            meta: dict = orjson.loads(meta_path.read_bytes())
+            validated_at = float(meta["validated_at"])
+        except Exception:
+            return None
+
+        # クッキーの有効期限が切れている場合は確認結果を使わない
+        now = time.time()
+        expires_list = [c["expires"] for c in cookies_dict if c.get("expires")]
+        if expires_list and min(expires_list) <= now:
+            return None
+        return validated_at
+
+    def _save_validated_at(self, cookies_dict: list[dict]) -> None:
+        """クッキーが有効と確認できた時刻をクッキーの有効期限とともに保存する
+
+        Args:
+            cookies_dict (list[dict]): 確認したクッキー情報
+        """
+        expires_list = [c["expires"] for c in cookies_dict if c.get("expires")]
+        meta = {
+            "validated_at": time.time(),
+            "expires": min(expires_list) if expires_list else None,
+        }
+        meta_path = Path(self.NIJIE_COOKIE_META_PATH)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        meta_path.write_bytes(orjson.dumps(meta, option=orjson.OPT_INDENT_2))
+
+    def relogin(self) -> NijieCookie:
+        """保存済クッキーを破棄して再ログインする
+
+        クッキーの失効を検知した場合に呼ばれる
+
+        Returns:
+            cookies (NijieCookie): ログイン情報を保持したクッキー
+        """
+        Path(self.NIJIE_COOKIE_PATH).unlink(missing_ok=True)
+        Path(self.NIJIE_COOKIE_META_PATH).unlink(missing_ok=True)
+        cookies = self.login(self.username, self.password)
+        object.__setattr__(self, "cookies", cookies)
+        return cookies
 
     def login(self, username: Username, password: Password) -> NijieCookie:
         """nijieページにログインし、ログイン情報を保持したクッキーを返す
 
+        保存済クッキーの有効性を cookie_validation_window 以内に確認済であれば
+        トップページへの確認リクエストは行わない
+
         Args:
             username (Username): nijieユーザーID(登録したemailアドレス)
             password (Password): nijieユーザーIDのパスワード
@@ -82,8 +184,14 @@ class NijieFetcher(FetcherBase):
                     # TODO::expires を反映させたい場合は cookies.jar.set_cookie を参照
                     cookies.set(c["name"], c["value"], domain=c["domain"], path=c["path"])
 
+                # 直近で有効性を確認済ならばリクエストせずにそのまま使う
+                validated_at = self._load_validated_at(cookies_dict)
+                if validated_at is not None and time.time() - validated_at < self.cookie_validation_window:
+                    return NijieCookie(cookies, self.HEADERS, _skip_validation=True)
+
                 # クッキーが有効かチェック
                 res = NijieCookie(cookies, self.HEADERS)
+                self._save_validated_at(cookies_dict)
                 return res
             except Exception:
                 pass
@@ -91,7 +199,8 @@ class NijieFetcher(FetcherBase):
         # クッキーが存在していない場合、または有効なクッキーではなかった場合
         # 年齢確認で「はい」を選択したあとのURLにアクセス
         auth_url = "https://nijie.info/age_jump.php?url="
-        response = httpx.get(auth_url, headers=self.HEADERS, follow_redirects=True)
+        session = HttpClientRegistry.get(self.SITE_NAME)
+        response = session.get(auth_url, headers=self.HEADERS)
         response.raise_for_status()
 
         # 認証用URLクエリを取得する
@@ -105,7 +214,7 @@ class NijieFetcher(FetcherBase):
 
         # ログインする
         login_url = "https://nijie.info/login_int.php"
-        response = httpx.post(login_url, data=payload, follow_redirects=True)
+        response = session.post(login_url, data=payload)
         response.raise_for_status()
 
         # 以降はクッキーに認証情報が含まれているため、これを用いて各ページをGETする
@@ -130,6 +239,7 @@ class NijieFetcher(FetcherBase):
 
         # クッキー情報をファイルに保存する
         ncp.write_bytes(orjson.dumps(cookies_dict, option=orjson.OPT_INDENT_2))
+        self._save_validated_at(cookies_dict)
         return res
 
     def is_target_url(self, url: URL) -> bool:
@@ -158,7 +268,17 @@ class NijieFetcher(FetcherBase):
         if not isinstance(url, str | URL):
             raise TypeError("url is not str | URL.")
         novel_url = NijieURL.create(url)
-        NijieDownloader(novel_url, self.base_path, self.cookies).download()
+        try:
+            NijieDownloader(
+                novel_url, self.base_path, self.cookies, self.downloaded_index, self.session, self.rate_limiter
+            ).download()
+        except NijieCookieExpiredError:
+            # 年齢確認画面に飛ばされた場合のみ再ログインして一度だけ再試行する
+            logger.info("nijie cookie expired, relogin.")
+            self.relogin()
+            NijieDownloader(
+                novel_url, self.base_path, self.cookies, self.downloaded_index, self.session, self.rate_limiter
+            ).download()
 
 
 if __name__ == "__main__":
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 
-from bs4 import BeautifulSoup, Tag
+from bs4 import BeautifulSoup, SoupStrainer, Tag
 
 from media_gathering.link_search.nijie.authorid import Authorid
 from media_gathering.link_search.nijie.authorname import Authorname
@@ -21,6 +21,11 @@ class NijiePageInfo:
     author_id: Authorid  # 作者ID
     work_title: Worktitle  # 作品名
 
+    # 解析に必要なタグ（メディアが置かれているdivとtitle）のみを抽出する
+    PARSE_ONLY = SoupStrainer(
+        lambda name, attrs: name == "title" or (name == "div" and attrs.get("id") == "img_filter")
+    )
+
     def __post_init__(self) -> None:
         """初期化処理
 
@@ -39,6 +44,24 @@ class NijiePageInfo:
             raise TypeError("work_title must be Worktitle.")
         return True
 
+    @classmethod
+    def create_from_html(cls, html: str, author_id: int) -> "NijiePageInfo":
+        """nijie作品詳細ページのhtml文字列を解析する
+
+        ページ全体のツリーは作らず、div#img_filter と title のみを解析対象とする
+
+        Args:
+            html (str): 解析対象のhtml文字列
+            author_id (int): 作者ID
+
+        Returns:
+            NijiePageInfo: nijieページの詳細情報オブジェクト
+        """
+        if not isinstance(html, str):
+            raise TypeError("html must be str.")
+        soup = BeautifulSoup(html, "html.parser", parse_only=cls.PARSE_ONLY)
+        return cls.create(soup, author_id)
+
     @classmethod
     def create(cls, soup: BeautifulSoup, author_id: int) -> "NijiePageInfo":
         """nijie作品詳細ページを解析する
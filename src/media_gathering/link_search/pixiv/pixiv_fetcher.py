@@ -4,6 +4,7 @@ from pathlib import Path
 
 from pixivpy3 import AppPixivAPI
 
+from media_gathering.link_search.downloaded_index import DownloadedIndex
 from media_gathering.link_search.fetcher_base import FetcherBase
 from media_gathering.link_search.password import Password
 from media_gathering.link_search.pixiv.pixiv_save_directory_path import PixivSaveDirectoryPath
@@ -23,9 +24,12 @@ class PixivFetcher(FetcherBase):
 
     aapi: AppPixivAPI  # 非公式pixivAPI操作インスタンス
     base_path: Path  # 保存ディレクトリベースパス
+    downloaded_index: DownloadedIndex  # DL済作品IDのインデックス
 
     # refresh_tokenファイルパス
     REFRESH_TOKEN_PATH = "./config/refresh_token.ini"
+    # DL済インデックスのサイト名
+    SITE_NAME = "pixiv"
 
     def __init__(self, username: Username, password: Password, base_path: Path) -> None:
         """初期化処理
@@ -48,6 +52,9 @@ class PixivFetcher(FetcherBase):
 
         object.__setattr__(self, "aapi", self.login(username, password))
         object.__setattr__(self, "base_path", base_path)
+        # pixiv小説と保存ディレクトリを共有するため、小説(.txt)は作品として扱わない
+        downloaded_index = DownloadedIndex.create(base_path, self.SITE_NAME, lambda p: p.suffix != ".txt")
+        object.__setattr__(self, "downloaded_index", downloaded_index)
 
     def login(self, username: Username, password: Password) -> AppPixivAPI:
         """pixivログインして非公式pixivAPIインスタンスを取得する
@@ -107,14 +114,19 @@ class PixivFetcher(FetcherBase):
         """担当処理：pixiv作品を取得する
 
         FetcherBaseオーバーライド
+        DL済の作品は作品情報の取得（API呼び出し）と保存先の探索の前にスキップする
 
         Args:
             url (URL): 処理対象url
         """
         pixiv_url = PixivWorkURL.create(url)
+        work_id = pixiv_url.work_id.id
+        if work_id in self.downloaded_index:
+            logger.info(f"Download pixiv work: id={work_id} -> exist")
+            return
         source_list = PixivSourceList.create(self.aapi, pixiv_url)
         save_directory_path = PixivSaveDirectoryPath.create(self.aapi, pixiv_url, self.base_path)
-        PixivWorkDownloader(self.aapi, source_list, save_directory_path).download()
+        PixivWorkDownloader(self.aapi, source_list, save_directory_path, self.downloaded_index).download()
 
 
 if __name__ == "__main__":
@@ -7,6 +7,7 @@ from time import sleep
 
 from pixivpy3 import AppPixivAPI
 
+from media_gathering.link_search.downloaded_index import DownloadedIndex
 from media_gathering.link_search.pixiv.pixiv_save_directory_path import PixivSaveDirectoryPath
 from media_gathering.link_search.pixiv.pixiv_source_list import PixivSourceList
 from media_gathering.link_search.pixiv.pixiv_ugoira_downloader import PixivUgoiraDownloader
@@ -29,6 +30,7 @@ class PixivWorkDownloader:
     aapi: AppPixivAPI  # 非公式pixivAPI操作インスタンス
     source_list: PixivSourceList  # 直リンクURLリスト
     save_directory_path: PixivSaveDirectoryPath  # 保存先ディレクトリパス
+    downloaded_index: DownloadedIndex  # DL済作品IDのインデックス
 
     def __post_init__(self) -> None:
         self._is_valid()
@@ -40,6 +42,8 @@ class PixivWorkDownloader:
             raise TypeError("source_list is not PixivSourceList.")
         if not isinstance(self.save_directory_path, PixivSaveDirectoryPath):
             raise TypeError("save_directory_path is not PixivSaveDirectoryPath.")
+        if not isinstance(self.downloaded_index, DownloadedIndex):
+            raise TypeError("downloaded_index is not DownloadedIndex.")
         return True
 
     def download(self) -> DownloadResult:
@@ -62,6 +66,15 @@ class PixivWorkDownloader:
         """
         pages = len(self.source_list)
         sd_path = self.save_directory_path.path
+
+        # 既にDL済なら再DLしないでスキップ
+        regex = re.compile(r".*\(([0-9]*)\)$")
+        result = regex.match(sd_path.name)
+        work_id = Workid(int(result.group(1))) if result else None
+        if work_id and work_id.id in self.downloaded_index:
+            logger.info(f"Download pixiv work: {sd_path.parent.name} / {sd_path.name} -> exist")
+            return DownloadResult.PASSED
+
         if pages > 1:  # 漫画形式
             author_name_id = sd_path.parent.name
             work_name_id = sd_path.name
@@ -70,6 +83,8 @@ class PixivWorkDownloader:
             # 既に存在しているなら再DLしないでスキップ
             if sd_path.is_dir():
                 logger.info("\t\t: exist -> skip")
+                if work_id:
+                    self.downloaded_index.add(work_id.id)
                 return DownloadResult.PASSED
 
             sd_path.mkdir(parents=True, exist_ok=True)
@@ -90,19 +105,21 @@ class PixivWorkDownloader:
             # 既に存在しているなら再DLしないでスキップ
             if (sd_path.parent / name).is_file():
                 logger.info(f"Download pixiv work: {author_name_id} / {name} -> exist")
+                if work_id:
+                    self.downloaded_index.add(work_id.id)
                 return DownloadResult.PASSED
 
             self.aapi.download(url, path=str(sd_path.parent), name=name)
             logger.info(f"Download pixiv work: {author_name_id} / {name} -> done")
 
             # うごイラの場合は追加で保存する
-            regex = re.compile(r".*\(([0-9]*)\)$")
-            result = regex.match(sd_path.name)
-            if result:
-                work_id = Workid(int(result.group(1)))
+            if work_id:
                 PixivUgoiraDownloader(self.aapi, work_id, sd_path.parent).download()
         else:  # エラー
             raise ValueError("download pixiv work failed.")
+
+        if work_id:
+            self.downloaded_index.add(work_id.id)
         return DownloadResult.SUCCESS
 
 
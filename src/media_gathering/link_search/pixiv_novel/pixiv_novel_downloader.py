@@ -5,6 +5,7 @@ from logging import INFO, getLogger
 from bs4 import BeautifulSoup
 from pixivpy3 import AppPixivAPI
 
+from media_gathering.link_search.downloaded_index import DownloadedIndex
 from media_gathering.link_search.pixiv_novel.pixiv_novel_save_directory_path import PixivNovelSaveDirectoryPath
 from media_gathering.link_search.pixiv_novel.pixiv_novel_url import PixivNovelURL
 
@@ -25,6 +26,7 @@ class PixivNovelDownloader:
     aapi: AppPixivAPI  # 非公式pixivAPI操作インスタンス
     novel_url: PixivNovelURL  # ノベルURL
     save_directory_path: PixivNovelSaveDirectoryPath  # 保存ディレクトリベースパス
+    downloaded_index: DownloadedIndex  # DL済作品IDのインデックス
 
     def __post_init__(self) -> None:
         self._is_valid()
@@ -36,6 +38,8 @@ class PixivNovelDownloader:
             raise TypeError("urls is not PixivNovelURL.")
         if not isinstance(self.save_directory_path, PixivNovelSaveDirectoryPath):
             raise TypeError("save_directory_path is not PixivNovelSaveDirectoryPath.")
+        if not isinstance(self.downloaded_index, DownloadedIndex):
+            raise TypeError("downloaded_index is not DownloadedIndex.")
         return True
 
     def download(self) -> DownloadResult:
@@ -58,6 +62,11 @@ class PixivNovelDownloader:
         url = self.novel_url.original_url
         novel_id = self.novel_url.novel_id.id
 
+        # 既にDL済なら再DLしないでスキップ
+        if novel_id in self.downloaded_index:
+            logger.info(f"Download pixiv novel: {url} -> exist")
+            return DownloadResult.PASSED
+
         # ノベル詳細取得
         works = self.aapi.novel_detail(novel_id)
         if works.error or (works.novel is None):
@@ -80,6 +89,7 @@ class PixivNovelDownloader:
         # 既に存在しているなら再DLしないでスキップ
         if (sd_path.parent / name).is_file():
             logger.info("Download pixiv novel: " + name + " -> exist")
+            self.downloaded_index.add(novel_id)
             return DownloadResult.PASSED
 
         # ノベル詳細から作者・キャプション等付与情報を取得する
@@ -93,7 +103,7 @@ class PixivNovelDownloader:
             f"text_length:{work.text_length}\n"
         )
         soup = BeautifulSoup(work.caption, "html.parser")
-        caption = f"[caption]\n" f"{soup.prettify()}\n"
+        caption = f"[caption]\n{soup.prettify()}\n"
 
         # ノベルテキストの全文を保存する
         # 改ページは"[newpage]"の内部タグで表現される
@@ -102,6 +112,7 @@ class PixivNovelDownloader:
             fout.write(info_tag + "\n")
             fout.write(caption + "\n")
             fout.write("[text]\n" + work_text.novel_text + "\n")
+        self.downloaded_index.add(novel_id)
 
         logger.info("Download pixiv novel: " + name + " -> done")
         return DownloadResult.SUCCESS
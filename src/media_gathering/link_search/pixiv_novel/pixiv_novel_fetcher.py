@@ -4,6 +4,7 @@ from pathlib import Path
 
 from pixivpy3 import AppPixivAPI
 
+from media_gathering.link_search.downloaded_index import DownloadedIndex
 from media_gathering.link_search.fetcher_base import FetcherBase
 from media_gathering.link_search.password import Password
 from media_gathering.link_search.pixiv_novel.pixiv_novel_downloader import PixivNovelDownloader
@@ -22,9 +23,12 @@ class PixivNovelFetcher(FetcherBase):
 
     aapi: AppPixivAPI  # 非公式pixivAPI操作インスタンス
     base_path: Path  # 保存ディレクトリベースパス
+    downloaded_index: DownloadedIndex  # DL済作品IDのインデックス
 
     # refresh_tokenファイルパス
     REFRESH_TOKEN_PATH = "./config/refresh_token.ini"
+    # DL済インデックスのサイト名
+    SITE_NAME = "pixiv_novel"
 
     def __init__(self, username: Username, password: Password, base_path: Path) -> None:
         """初期化処理
@@ -47,6 +51,11 @@ class PixivNovelFetcher(FetcherBase):
 
         object.__setattr__(self, "aapi", self.login(username, password))
         object.__setattr__(self, "base_path", base_path)
+        # pixiv作品と保存ディレクトリを共有するため、小説(.txt)のみを作品として扱う
+        downloaded_index = DownloadedIndex.create(
+            base_path, self.SITE_NAME, lambda p: p.is_file() and p.suffix == ".txt"
+        )
+        object.__setattr__(self, "downloaded_index", downloaded_index)
 
     def login(self, username: Username, password: Password) -> AppPixivAPI:
         """pixivログインして非公式pixivAPIインスタンスを取得する
@@ -112,7 +121,7 @@ class PixivNovelFetcher(FetcherBase):
         """
         novel_url = PixivNovelURL.create(url)
         save_directory_path = PixivNovelSaveDirectoryPath.create(self.aapi, novel_url, self.base_path)
-        PixivNovelDownloader(self.aapi, novel_url, save_directory_path).download()
+        PixivNovelDownloader(self.aapi, novel_url, save_directory_path, self.downloaded_index).download()
 
 
 if __name__ == "__main__":
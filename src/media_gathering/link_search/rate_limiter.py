@@ -0,0 +1,41 @@
+import threading
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass(frozen=True)
+class RateLimiter:
+    """リクエスト間隔を制限するクラス
+
+    複数スレッドから呼ばれても、wait()から戻る時刻の間隔が少なくともinterval秒空くようにする
+    """
+
+    interval: float  # リクエスト間隔[s]
+    _lock: threading.Lock = field(default_factory=threading.Lock, compare=False)
+    _next_time: list[float] = field(default_factory=lambda: [0.0], compare=False)  # 次に許可する時刻
+
+    def __post_init__(self) -> None:
+        self._is_valid()
+
+    def _is_valid(self) -> bool:
+        if not isinstance(self.interval, int | float):
+            raise TypeError("interval is not float.")
+        if self.interval < 0:
+            raise ValueError("interval must be 0 <= interval.")
+        return True
+
+    def wait(self) -> None:
+        """前回の許可からinterval秒経過するまで待機する"""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_time[0])
+            self._next_time[0] = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+if __name__ == "__main__":
+    rate_limiter = RateLimiter(0.5)
+    for i in range(3):
+        rate_limiter.wait()
+        print(i, time.monotonic())
@@ -0,0 +1,42 @@
+import logging.config
+from logging import FileHandler, Filter, getLogger
+from pathlib import Path
+
+# ログ設定ファイルパス
+LOGGING_INI_PATH = "./log/logging.ini"
+
+
+def configure_logging(ini_path: str = LOGGING_INI_PATH) -> None:
+    """ログ設定を読み込み、自分以外のすべてのライブラリのログ出力を抑制する
+
+    既に作成されているロガーは無効化し、ルートロガーのハンドラには media_gathering 配下のログだけを通すフィルタを付ける
+    遅延 import で後から読み込まれたライブラリのロガーもフィルタで抑制される
+    import 時にルートロガーの設定を書き換えるライブラリ（tweeterpy）があるため、それらの import 後に呼び出すこと
+
+    Args:
+        ini_path (str): ログ設定ファイルパス
+    """
+    logging.config.fileConfig(ini_path, disable_existing_loggers=False)
+    for name in logging.root.manager.loggerDict:
+        if "media_gathering" not in name:
+            getLogger(name).disabled = True
+    for handler in logging.root.handlers:
+        handler.addFilter(Filter("media_gathering"))
+
+
+def get_log_directory() -> Path:
+    """ログファイルの出力先ディレクトリを返す
+
+    Returns:
+        Path: ルートロガーのファイルハンドラの出力先ディレクトリ、ファイルに出力していない場合はカレントディレクトリ
+    """
+    for handler in logging.root.handlers:
+        if isinstance(handler, FileHandler):
+            return Path(handler.baseFilename).parent
+    return Path(".")
+
+
+if __name__ == "__main__":
+    configure_logging()
+    getLogger("media_gathering.log_config").warning("configured.")
+    print(get_log_directory())
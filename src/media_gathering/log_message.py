@@ -9,6 +9,18 @@ class MSG(enum.Enum):
     APPLICATION_DONE = "Media Gathering -> done"
     APPLICATION_MULTIPLE_RUN = "Media Gathering is now running. This instance is not start."
 
+    DAEMON_START = "Crawl daemon -> start"
+    DAEMON_STOP = "Crawl daemon -> stop"
+    DAEMON_JOB_START = "Crawl daemon {} job -> start"
+    DAEMON_JOB_DONE = "Crawl daemon {} job -> done"
+
+    CONCURRENT_CRAWL_START = "Concurrent Fav and RT crawl -> start"
+    CONCURRENT_CRAWL_DONE = "Concurrent Fav and RT crawl -> done"
+
+    ACCOUNT_CRAWL_START = "Account crawl ({} accounts, {} workers) -> start"
+    ACCOUNT_CRAWL_DONE = "Account crawl -> done"
+    ACCOUNT_CRAWL_EMPTY = "Account crawl -> no accounts in config"
+
     CRAWLER_INIT_START = "Crawler init -> start"
     CRAWLER_INIT_DONE = "Crawler init -> done"
 
@@ -34,3 +46,13 @@ class MSG(enum.Enum):
 
     GETTING_EXTERNAL_LINK_START = "Getting external link -> start"
     GETTING_EXTERNAL_LINK_DONE = "Getting external link -> done"
+
+    PROFILE_START = "Profile ({}) {} crawl -> start"
+    PROFILE_DUMPED = "Profile result -> {}"
+    PROFILE_SKIPPED = "Profile ({}) {} crawl -> skipped (another crawl is being profiled)"
+    PROFILE_REQUESTED = "Profile ({}) requested for the next crawl"
+
+    CHECKPOINT_RESUME = "Resume {} crawl from checkpoint saved at {}"
+
+    RETRY_JOB_START = "Retry failed download jobs -> start"
+    RETRY_JOB_DONE = "Retry failed download jobs -> done ({} jobs)"
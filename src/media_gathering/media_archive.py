@@ -0,0 +1,292 @@
+import mmap
+import os
+import sqlite3
+import threading
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from logging import INFO, getLogger
+from pathlib import Path
+
+from media_gathering.run_lock import RunLock
+
+try:
+    import zstandard
+except ImportError:  # zstandard が無い環境では zlib で圧縮する
+    zstandard = None
+
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+@dataclass(frozen=True)
+class MediaArchive:
+    """保存先から削除したメディアを保持する追記型のアーカイブ
+
+    メディアは {archive_path}/pack_{番号}.pack に追記していき、pack_size を超えたら次のパックに移る
+    Fav/RT のクローラーや複数アカウントのプロセスが同じアーカイブに追記するため、
+    追記は {archive_path}/archive.lock のファイルロックを取得して1つずつ行う
+    既に圧縮済の形式（JPEG, MP4 など）はそのまま、それ以外（PNG など）は圧縮して格納する
+    各メディアのパック内の位置は {archive_path}/index.db で管理し、読み出しは mmap で行う
+
+    Packed テーブル:
+        [name] TEXT PRIMARY KEY,
+        [pack_no] INTEGER NOT NULL,
+        [offset] INTEGER NOT NULL,
+        [size] INTEGER NOT NULL,
+        [media_size] INTEGER NOT NULL,
+        [codec] TEXT NOT NULL,
+        [mtime] REAL NOT NULL,
+        [archived_at] TEXT NOT NULL
+    """
+
+    archive_path: Path  # アーカイブのルートディレクトリ
+    pack_size: int = 1024 * 1024 * 1024  # 1パックの最大バイト数の目安
+    _conn: sqlite3.Connection | None = field(init=False, default=None, compare=False, repr=False)
+    _maps: dict[int, mmap.mmap] = field(init=False, default_factory=dict, compare=False, repr=False)
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock, compare=False, repr=False)
+
+    # 圧縮して格納するメディアの拡張子
+    COMPRESS_SUFFIXES = (".png", ".bmp")
+    # 圧縮方式
+    CODEC = "zstd" if zstandard else "zlib"
+
+    def __post_init__(self) -> None:
+        self._is_valid()
+
+    def _is_valid(self) -> bool:
+        if not isinstance(self.archive_path, Path):
+            raise TypeError("archive_path is not Path.")
+        if not isinstance(self.pack_size, int):
+            raise TypeError("pack_size is not int.")
+        if self.pack_size <= 0:
+            raise ValueError("pack_size must be 0 < pack_size.")
+        return True
+
+    def pack_path(self, pack_no: int) -> Path:
+        """パック番号に対応するパックのパスを返す
+
+        Args:
+            pack_no (int): パック番号
+
+        Returns:
+            Path: パックのパス
+        """
+        return self.archive_path / f"pack_{pack_no:05}.pack"
+
+    def connect(self) -> sqlite3.Connection:
+        """インデックスへの接続を返す
+
+        初回呼び出し時にディレクトリとテーブルを作成する
+
+        Returns:
+            sqlite3.Connection: インデックスへの接続
+        """
+        with self._lock:
+            if self._conn is None:
+                self.archive_path.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(self.archive_path / "index.db", check_same_thread=False)
+                conn.execute(
+                    "create table if not exists Packed ("
+                    "name TEXT PRIMARY KEY, pack_no INTEGER NOT NULL, offset INTEGER NOT NULL, size INTEGER NOT NULL, "
+                    "media_size INTEGER NOT NULL, codec TEXT NOT NULL, mtime REAL NOT NULL, archived_at TEXT NOT NULL)"
+                )
+                conn.commit()
+                object.__setattr__(self, "_conn", conn)
+            return self._conn
+
+    @classmethod
+    def compress(cls, data: bytes) -> bytes:
+        """CODEC で data を圧縮する"""
+        if cls.CODEC == "zstd":
+            return zstandard.ZstdCompressor().compress(data)
+        return zlib.compress(data)
+
+    @classmethod
+    def decompress(cls, data: bytes, codec: str) -> bytes:
+        """codec で圧縮された data を展開する
+
+        Raises:
+            ValueError: codec に対応していない場合
+        """
+        match codec:
+            case "raw":
+                return data
+            case "zstd" if zstandard:
+                return zstandard.ZstdDecompressor().decompress(data)
+            case "zlib":
+                return zlib.decompress(data)
+            case _:
+                raise ValueError(f"codec '{codec}' is not supported.")
+
+    def archive(self, media_path_list: list[Path]) -> list[Path]:
+        """メディアをパックに追記する
+
+        パックへの追記を fsync してからインデックスをまとめてコミットする
+        途中で失敗してもパックに参照されない領域が残るだけでインデックスは壊れない
+        アーカイブ済のファイル名は追記しない
+        パックの選択からインデックスのコミットまでは他のインスタンス/プロセスと排他する
+
+        Args:
+            media_path_list (list[Path]): アーカイブするメディアのパスリスト
+
+        Returns:
+            list[Path]: アーカイブ済になったメディアのパスリスト（元から格納済のものも含む）
+        """
+        conn = self.connect()
+        with RunLock(self.archive_path / "archive.lock") as archive_lock:
+            archive_lock.acquire(blocking=True)
+            row = conn.execute("select max(pack_no) from Packed").fetchone()
+            pack_no = row[0] or 0
+
+            result = []
+            records = []
+            fout = None
+            try:
+                for media_path in media_path_list:
+                    if not media_path.is_file() or media_path.stat().st_size == 0:
+                        continue
+                    if self.find(media_path.name):
+                        result.append(media_path)
+                        continue
+                    stat = media_path.stat()
+                    data = media_path.read_bytes()
+                    codec = "raw"
+                    if media_path.suffix.lower() in self.COMPRESS_SUFFIXES:
+                        compressed = self.compress(data)
+                        if len(compressed) < len(data):
+                            data, codec = compressed, self.CODEC
+
+                    # パックが一杯なら次のパックに切り替える（空のパックには大きさによらず格納する）
+                    if fout is not None and 0 < fout.tell() and fout.tell() + len(data) > self.pack_size:
+                        fout.flush()
+                        os.fsync(fout.fileno())
+                        fout.close()
+                        fout = None
+                        pack_no += 1
+                    if fout is None:
+                        pack_path = self.pack_path(pack_no)
+                        current_size = pack_path.stat().st_size if pack_path.is_file() else 0
+                        if 0 < current_size and current_size + len(data) > self.pack_size:
+                            pack_no += 1
+                        fout = self.pack_path(pack_no).open("ab")
+
+                    # 他のインスタンスの追記後の末尾から書き込む
+                    offset = fout.seek(0, os.SEEK_END)
+                    fout.write(data)
+                    dts_format = "%Y-%m-%d %H:%M:%S"
+                    archived_at = datetime.now().strftime(dts_format)
+                    record = (
+                        media_path.name,
+                        pack_no,
+                        offset,
+                        len(data),
+                        stat.st_size,
+                        codec,
+                        stat.st_mtime,
+                        archived_at,
+                    )
+                    records.append(record)
+                    result.append(media_path)
+                if fout:
+                    fout.flush()
+                    os.fsync(fout.fileno())
+            finally:
+                if fout:
+                    fout.close()
+
+            with conn:
+                conn.executemany("insert or ignore into Packed values (?, ?, ?, ?, ?, ?, ?, ?)", records)
+        if records:
+            logger.info(f"{len(records)} media archived to pack.")
+        return result
+
+    def find(self, name: str) -> dict | None:
+        """ファイル名に対応するインデックスのレコードを返す
+
+        Args:
+            name (str): メディアのファイル名
+
+        Returns:
+            dict | None: インデックスのレコード、アーカイブされていない場合はNone
+        """
+        cursor = self.connect().execute("select * from Packed where name = ?", (name,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        return dict(zip([column[0] for column in cursor.description], row))
+
+    def _map(self, pack_no: int, end: int) -> mmap.mmap:
+        """パックを mmap する
+
+        追記によって既存のマップより後ろを読む必要がある場合はマップし直す
+        """
+        with self._lock:
+            mm = self._maps.get(pack_no)
+            if mm is None or len(mm) < end:
+                if mm is not None:
+                    mm.close()
+                with self.pack_path(pack_no).open("rb") as fin:
+                    mm = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[pack_no] = mm
+            return mm
+
+    def read(self, name: str) -> bytes | None:
+        """アーカイブからメディアを読み出す
+
+        Args:
+            name (str): メディアのファイル名
+
+        Returns:
+            bytes | None: メディアの内容、アーカイブされていない場合はNone
+        """
+        record = self.find(name)
+        if not record:
+            return None
+        offset, size = record["offset"], record["size"]
+        mm = self._map(record["pack_no"], offset + size)
+        return self.decompress(mm[offset : offset + size], record["codec"])
+
+    def restore(self, name: str, dst_path: Path) -> Path | None:
+        """アーカイブからメディアを復元する
+
+        更新日時はアーカイブした時点の値に戻す
+
+        Args:
+            name (str): メディアのファイル名
+            dst_path (Path): 復元先のパス
+
+        Returns:
+            Path | None: 復元先のパス、アーカイブされていない場合はNone
+        """
+        record = self.find(name)
+        data = self.read(name)
+        if data is None:
+            return None
+        dst_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = dst_path.with_name(dst_path.name + ".tmp")
+        tmp_path.write_bytes(data)
+        tmp_path.replace(dst_path)
+        os.utime(dst_path, (record["mtime"], record["mtime"]))
+        return dst_path
+
+    def close(self) -> None:
+        """インデックスへの接続とパックのマップを閉じる"""
+        with self._lock:
+            for mm in self._maps.values():
+                mm.close()
+            self._maps.clear()
+            if self._conn is not None:
+                self._conn.close()
+                object.__setattr__(self, "_conn", None)
+
+
+if __name__ == "__main__":
+    import sys
+
+    media_archive = MediaArchive(Path("./archive"))
+    media_path_list = list(Path(sys.argv[1] if len(sys.argv) > 1 else "./media").glob("*"))
+    print(len(media_archive.archive(media_path_list)))
+    for media_path in media_path_list:
+        print(media_path.name, len(media_archive.read(media_path.name) or b""))
+    media_archive.close()
@@ -0,0 +1,192 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from collections.abc import Iterable
+from dataclasses import dataclass
+from logging import INFO, getLogger
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows では reflink を使わない
+    fcntl = None
+
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+# Linux の FICLONE ioctl 番号（btrfs, xfs などでブロックを共有したコピーを作る）
+FICLONE = 0x40049409
+
+
+@dataclass(frozen=True)
+class MediaStore:
+    """コンテンツアドレス型のメディアストア
+
+    メディアの実体は内容の sha256 をファイル名として {store_path}/{sha256[:2]}/{sha256} に1つだけ保存する
+    Fav/RT/永続保存の各保存先にはストアの実体へのハードリンク（不可能ならreflink、それも不可能ならコピー）を置く
+    """
+
+    store_path: Path  # ストアのルートディレクトリ
+
+    def __post_init__(self) -> None:
+        self._is_valid()
+
+    def _is_valid(self) -> bool:
+        if not isinstance(self.store_path, Path):
+            raise TypeError("store_path is not Path.")
+        return True
+
+    def object_path(self, sha256: str) -> Path:
+        """sha256 に対応するストア内の実体のパスを返す
+
+        Args:
+            sha256 (str): メディア内容のハッシュ値
+
+        Returns:
+            Path: ストア内の実体のパス
+        """
+        return self.store_path / sha256[:2] / sha256
+
+    def save(self, chunks: Iterable[bytes]) -> tuple[str, Path, int]:
+        """受信中のメディアをハッシュを計算しながらストアに保存する
+
+        同じ内容の実体が既にストアにある場合は書き込んだ一時ファイルを破棄する
+
+        Args:
+            chunks (Iterable[bytes]): メディア内容のチャンク列
+
+        Returns:
+            tuple[str, Path, int]: (sha256, ストア内の実体のパス, メディアサイズ)
+        """
+        self.store_path.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(suffix=".tmp", dir=self.store_path)
+        tmp_path = Path(tmp_name)
+        try:
+            hasher = hashlib.sha256()
+            media_size = 0
+            with os.fdopen(fd, "wb") as fout:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    fout.write(chunk)
+                    media_size += len(chunk)
+            sha256 = hasher.hexdigest()
+            object_path = self.object_path(sha256)
+            if object_path.is_file():
+                tmp_path.unlink()
+            else:
+                object_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path.replace(object_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return sha256, object_path, media_size
+
+    def adopt(self, media_path: Path) -> tuple[str, Path, int]:
+        """保存済のファイルをストアに取り込む
+
+        ストアに同じ内容の実体が無ければ media_path 自体を実体としてリンクする
+
+        Args:
+            media_path (Path): 保存済のファイルパス
+
+        Returns:
+            tuple[str, Path, int]: (sha256, ストア内の実体のパス, メディアサイズ)
+        """
+        with media_path.open("rb") as fin:
+            sha256 = hashlib.file_digest(fin, "sha256").hexdigest()
+        media_size = media_path.stat().st_size
+        object_path = self.object_path(sha256)
+        if not object_path.is_file():
+            object_path.parent.mkdir(parents=True, exist_ok=True)
+            self.link(media_path, object_path)
+        return sha256, object_path, media_size
+
+    @classmethod
+    def reflink(cls, src_path: Path, dst_path: Path) -> None:
+        """src_path とブロックを共有するコピーを dst_path に作成する
+
+        Args:
+            src_path (Path): コピー元
+            dst_path (Path): コピー先
+
+        Raises:
+            OSError: ファイルシステムやOSが reflink に対応していない場合
+        """
+        if fcntl is None:
+            raise OSError("reflink is not supported on this platform.")
+        try:
+            with src_path.open("rb") as fin, dst_path.open("wb") as fout:
+                fcntl.ioctl(fout.fileno(), FICLONE, fin.fileno())
+        except OSError:
+            dst_path.unlink(missing_ok=True)
+            raise
+        shutil.copystat(src_path, dst_path)
+
+    @classmethod
+    def link(cls, src_path: Path, dst_path: Path) -> str:
+        """ストア内の実体 src_path を dst_path から参照できるようにする
+
+        ハードリンク、reflink、コピーの順に試す
+        dst_path が既に存在する場合は置き換える
+
+        Args:
+            src_path (Path): ストア内の実体のパス
+            dst_path (Path): 保存先パス
+
+        Returns:
+            str: 使用した方法 ["hardlink", "reflink", "copy"]
+        """
+        if dst_path.is_file() and os.path.samefile(src_path, dst_path):
+            return "hardlink"
+
+        # 置き換えを原子的に行うため一時ファイル名で作成してから置き換える
+        tmp_path = dst_path.with_name(dst_path.name + ".tmp")
+        tmp_path.unlink(missing_ok=True)
+        try:
+            os.link(src_path, tmp_path)
+            method = "hardlink"
+        except OSError:
+            try:
+                cls.reflink(src_path, tmp_path)
+                method = "reflink"
+            except OSError:
+                shutil.copy2(src_path, tmp_path)
+                method = "copy"
+        tmp_path.replace(dst_path)
+        return method
+
+    def prune(self, reference_dict: dict[str, list[str]]) -> int:
+        """どの保存先からも参照されなくなった実体を削除する
+
+        対象は reference_dict に含まれる実体（保存先から削除されて参照が減ったもの）のみとし、ストア全体は走査しない
+        ハードリンクが残っている実体と、記録された保存先のいずれかが存在する実体は削除しない
+        （ハードリンクできずに reflink/コピーした保存先は、実体のハードリンク数に現れないため）
+
+        Args:
+            reference_dict (dict[str, list[str]]): 整理対象の実体の sha256 と、それを参照していた保存先パスのリスト
+
+        Returns:
+            int: 削除した実体の数
+        """
+        count = 0
+        for sha256, saved_localpath_list in reference_dict.items():
+            object_path = self.object_path(sha256)
+            if not object_path.is_file() or object_path.stat().st_nlink > 1:
+                continue
+            if any(Path(saved_localpath).is_file() for saved_localpath in saved_localpath_list):
+                continue
+            object_path.unlink(missing_ok=True)
+            count += 1
+        if count:
+            logger.info(f"{count} unreferenced media pruned from store.")
+        return count
+
+
+if __name__ == "__main__":
+    media_store = MediaStore(Path("./media_store"))
+    sha256, object_path, media_size = media_store.save([b"sample"])
+    print(sha256, object_path, media_size)
+    print(MediaStore.link(object_path, Path("./sample.bin")))
+    Path("./sample.bin").unlink()
+    print(media_store.prune({sha256: ["./sample.bin"]}))
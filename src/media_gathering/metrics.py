@@ -0,0 +1,210 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+
+class Histogram:
+    """観測値を上限値ごとのバケットに数えるヒストグラム
+
+    Prometheus と同じく、各バケットには上限値以下の観測数を累積せずに数え、出力時に累積する
+    """
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)  # 末尾は +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative_counts(self) -> list[int]:
+        """上限値ごとの累積観測数（末尾は +Inf で count と等しい）"""
+        result, total = [], 0
+        for bucket_count in self.bucket_counts:
+            total += bucket_count
+            result.append(total)
+        return result
+
+
+class Metrics:
+    """カウンタとヒストグラムを保持する計測値のレジストリ
+
+    1回のクロールにつき1つ作成し、クロール中は collect() で有効にしておく
+    有効にしている間は共有HTTPクライアント（HttpClientRegistry）の通信もこのレジストリに記録される
+    スレッドセーフで、並行してクロールする場合もクローラーごとに別のレジストリに記録される
+    """
+
+    # 出力時にメトリクス名に付与する接頭辞
+    PREFIX = "media_gathering_"
+    # ヒストグラムのバケット上限値（秒単位の処理時間を想定）
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # (メトリクス名, ラベルの組) -> 値
+        self._counters: dict[tuple[str, tuple[tuple[str, str], ...]], float] = {}
+        self._histograms: dict[tuple[str, tuple[tuple[str, str], ...]], Histogram] = {}
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple[str, tuple[tuple[str, str], ...]]:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """カウンタを加算する
+
+        Args:
+            name (str): メトリクス名
+            value (float): 加算する値
+            labels: ラベル
+        """
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """ヒストグラムに観測値を記録する
+
+        Args:
+            name (str): メトリクス名
+            value (float): 観測値
+            labels: ラベル
+        """
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.BUCKETS)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """with ブロックの処理時間[秒]をヒストグラムに記録する（例外で抜けた場合も記録する）
+
+        Args:
+            name (str): メトリクス名
+            labels: ラベル
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def get_counter(self, name: str, **labels) -> float:
+        """カウンタの現在値を返す（未記録なら0）"""
+        with self._lock:
+            return self._counters.get(self._key(name, labels), 0)
+
+    def to_dict(self) -> dict:
+        """DBに保存する実行サマリー用の辞書を返す
+
+        Returns:
+            dict: {"counters": [{name, labels, value}], "histograms": [{name, labels, count, sum}]}
+        """
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {"name": name, "labels": dict(labels), "count": histogram.count, "sum": histogram.sum}
+                for (name, labels), histogram in sorted(self._histograms.items())
+            ]
+        return {"counters": counters, "histograms": histograms}
+
+    def to_prometheus(self, **const_labels) -> str:
+        """Prometheus のテキスト形式に変換する
+
+        Args:
+            const_labels: 全メトリクスに付与するラベル
+
+        Returns:
+            str: テキスト形式の計測値
+        """
+
+        def format_labels(labels: tuple[tuple[str, str], ...], **extra) -> str:
+            pairs = [*sorted((k, str(v)) for k, v in const_labels.items()), *labels, *extra.items()]
+            if not pairs:
+                return ""
+            escaped = [(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in pairs]
+            return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {self.PREFIX}{name} counter")
+                    typed.add(name)
+                lines.append(f"{self.PREFIX}{name}{format_labels(labels)} {value}")
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {self.PREFIX}{name} histogram")
+                    typed.add(name)
+                bounds = [str(bucket) for bucket in histogram.buckets] + ["+Inf"]
+                for bound, count in zip(bounds, histogram.cumulative_counts()):
+                    lines.append(f"{self.PREFIX}{name}_bucket{format_labels(labels, le=bound)} {count}")
+                lines.append(f"{self.PREFIX}{name}_sum{format_labels(labels)} {histogram.sum}")
+                lines.append(f"{self.PREFIX}{name}_count{format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: Path, **const_labels) -> None:
+        """node_exporter の textfile collector 用のファイルに書き出す
+
+        収集中に書きかけのファイルを読まれないよう、一時ファイルに書いてから置き換える
+
+        Args:
+            path (Path): 書き出し先のファイルパス（拡張子 .prom）
+            const_labels: 全メトリクスに付与するラベル
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(self.to_prometheus(**const_labels), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+# 実行中のクロールの計測値のレジストリ（どのクロールにも属さない計測は記録しない）
+_current_metrics: ContextVar[Metrics | None] = ContextVar("current_metrics", default=None)
+
+
+def current_metrics() -> Metrics | None:
+    """実行中のクロールの計測値のレジストリを返す
+
+    Returns:
+        Metrics | None: collect() で有効にしているレジストリ、無ければNone
+    """
+    return _current_metrics.get()
+
+
+@contextmanager
+def collect(metrics: Metrics) -> Iterator[Metrics]:
+    """with ブロックの間、metrics を実行中のクロールの計測先にする
+
+    コンテキスト変数で保持するため、スレッドごとに別のレジストリを有効にできる
+
+    Args:
+        metrics (Metrics): 計測先のレジストリ
+    """
+    token = _current_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_metrics.reset(token)
+
+
+if __name__ == "__main__":
+    metrics = Metrics()
+    with collect(metrics):
+        with metrics.timer("crawl_stage_seconds", source="Fav", stage="sample"):
+            time.sleep(0.01)
+        current_metrics().inc("http_requests_total", host="example.com", status=200)
+    print(metrics.to_prometheus(account=""))
+    print(metrics.to_dict())
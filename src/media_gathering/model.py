@@ -1,20 +1,25 @@
 from typing import Self
 
-from sqlalchemy import BLOB, INTEGER, Boolean, Column, Integer, String, create_engine, text
+from sqlalchemy import BLOB, INTEGER, Boolean, Column, Index, Integer, String, UniqueConstraint, create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Session, deferred
 
 Base = declarative_base()
 
 
-class Favorite(Base):
-    """お気に入りツイートモデル
+class Media(Base):
+    """保存したメディアのモデル
+
+    お気に入りとリツイートを source 列で区別して1つのテーブルに保持する
+    Favorite/Retweet はこのテーブルの単一テーブル継承として定義され、
+    それぞれの source の行のみを対象とする
 
     [id] INTEGER,
+    [source] TEXT NOT NULL,
     [is_exist_saved_file] BOOLEAN DEFAULT 'True',
-    [img_filename] TEXT NOT NULL UNIQUE,
-    [url] TEXT NOT NULL UNIQUE,
-    [url_thumbnail] TEXT NOT NULL UNIQUE,
+    [img_filename] TEXT NOT NULL,
+    [url] TEXT NOT NULL,
+    [url_thumbnail] TEXT NOT NULL,
     [tweet_id] TEXT NOT NULL,
     [tweet_url] TEXT NOT NULL,
     [created_at] TEXT,
@@ -27,16 +32,25 @@ class Favorite(Base):
     [saved_created_at] TEXT,
     [media_size] INTEGER,
     [media_blob] BLOB,
-    PRIMARY KEY([id])
+    [blob_id] INTEGER,
+    PRIMARY KEY([id]),
+    UNIQUE([img_filename], [source]),
+    UNIQUE([url], [source]),
+    UNIQUE([url_thumbnail], [source]),
+    INDEX ix_Media_source_id([source], [id]),
+    INDEX ix_Media_source_is_exist_saved_file([source], [is_exist_saved_file]),
+    INDEX ix_Media_source_created_at([source], [created_at]),
+    INDEX ix_Media_tweet_id([tweet_id])
     """
 
-    __tablename__ = "Favorite"
+    __tablename__ = "Media"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
+    source = Column(String(16), nullable=False)
     is_exist_saved_file = Column(Boolean, server_default=text("True"))
-    img_filename = Column(String(256), nullable=False, unique=True)
-    url = Column(String(512), nullable=False, unique=True)
-    url_thumbnail = Column(String(512), nullable=False, unique=True)
+    img_filename = Column(String(256), nullable=False)
+    url = Column(String(512), nullable=False)
+    url_thumbnail = Column(String(512), nullable=False)
     tweet_id = Column(String(256), nullable=False)
     tweet_url = Column(String(512), nullable=False)
     created_at = Column(String(32))
@@ -49,6 +63,20 @@ class Favorite(Base):
     saved_created_at = Column(String(32))
     media_size = Column(INTEGER())
     media_blob = deferred(Column(BLOB()))
+    # メディア本体はブロブストアに保存し、その id で参照する（media_blob は旧形式）
+    blob_id = Column(Integer)
+
+    # 一意制約はファイル名等を先頭に置き、source をまたいだ検索にも使えるようにする
+    __table_args__ = (
+        UniqueConstraint("img_filename", "source"),
+        UniqueConstraint("url", "source"),
+        UniqueConstraint("url_thumbnail", "source"),
+        Index("ix_Media_source_id", "source", "id"),
+        Index("ix_Media_source_is_exist_saved_file", "source", "is_exist_saved_file"),
+        Index("ix_Media_source_created_at", "source", "created_at"),
+        Index("ix_Media_tweet_id", "tweet_id"),
+    )
+    __mapper_args__ = {"polymorphic_on": source}
 
     def __init__(
         self,
@@ -68,6 +96,7 @@ class Favorite(Base):
         saved_created_at: str,
         media_size: int,
         media_blob: bytes | None,
+        blob_id: int | None = None,
     ) -> None:
         if not isinstance(is_exist_saved_file, bool):
             raise TypeError("is_exist_saved_file must be bool.")
@@ -101,6 +130,8 @@ class Favorite(Base):
             raise TypeError("media_size must be int.")
         if media_blob and not isinstance(media_blob, bytes):
             raise TypeError("media_blob must be none or bytes.")
+        if blob_id is not None and not isinstance(blob_id, int):
+            raise TypeError("blob_id must be none or int.")
 
         if media_size <= 0:
             raise ValueError("media_size must be 0 < media_size.")
@@ -121,13 +152,14 @@ class Favorite(Base):
         self.saved_created_at = saved_created_at
         self.media_size = media_size
         self.media_blob = media_blob
+        self.blob_id = blob_id
 
     def __repr__(self) -> str:
         columns = ", ".join([f"{k}={v}" for k, v in self.__dict__.items() if k[0] != "_"])
         return f"<{self.__class__.__name__}({columns})>"
 
     def __eq__(self, other: Self) -> bool:
-        return isinstance(other, Favorite) and other.img_filename == self.img_filename
+        return isinstance(other, Media) and other.source == self.source and other.img_filename == self.img_filename
 
     def to_dict(self) -> dict:
         return {
@@ -148,6 +180,7 @@ class Favorite(Base):
             "saved_created_at": self.saved_created_at,
             "media_size": self.media_size,
             "media_blob": self.media_blob,
+            "blob_id": self.blob_id,
         }
 
     @classmethod
@@ -188,193 +221,38 @@ class Favorite(Base):
                     saved_created_at,
                     media_size,
                     media_blob,
+                    arg_dict.get("blob_id"),
                 )
             case _:
-                raise ValueError("Favorite create failed.")
+                raise ValueError(f"{cls.__name__} create failed.")
 
 
-class Retweet(Base):
-    """リツイートツイートモデル
+class Favorite(Media):
+    """お気に入りツイートモデル
 
-    [id] INTEGER,
-    [is_exist_saved_file] BOOLEAN DEFAULT 'True',
-    [img_filename] TEXT NOT NULL UNIQUE,
-    [url] TEXT NOT NULL UNIQUE,
-    [url_thumbnail] TEXT NOT NULL UNIQUE,
-    [tweet_id] TEXT NOT NULL,
-    [tweet_url] TEXT NOT NULL,
-    [created_at] TEXT,
-    [user_id] TEXT NOT NULL,
-    [user_name] TEXT NOT NULL,
-    [screan_name] TEXT NOT NULL,
-    [tweet_text] TEXT,
-    [tweet_via] TEXT,
-    [saved_localpath] TEXT,
-    [saved_created_at] TEXT,
-    PRIMARY KEY([id])
+    Media のうち source = "Fav" の行
     """
 
-    __tablename__ = "Retweet"
-
-    id = Column(Integer, primary_key=True)
-    is_exist_saved_file = Column(Boolean, server_default=text("True"))
-    img_filename = Column(String(256), nullable=False, unique=True)
-    url = Column(String(512), nullable=False, unique=True)
-    url_thumbnail = Column(String(512), nullable=False, unique=True)
-    tweet_id = Column(String(256), nullable=False)
-    tweet_url = Column(String(512), nullable=False)
-    created_at = Column(String(32))
-    user_id = Column(String(256), nullable=False)
-    user_name = Column(String(256), nullable=False)
-    screan_name = Column(String(256), nullable=False)
-    tweet_text = Column(String(512))
-    tweet_via = Column(String(512))
-    saved_localpath = Column(String(256))
-    saved_created_at = Column(String(32))
-    media_size = Column(INTEGER())
-    media_blob = deferred(Column(BLOB()))
+    __mapper_args__ = {"polymorphic_identity": "Fav"}
 
-    def __init__(
-        self,
-        is_exist_saved_file: bool,
-        img_filename: str,
-        url: str,
-        url_thumbnail: str,
-        tweet_id: str,
-        tweet_url: str,
-        created_at: str,
-        user_id: str,
-        user_name: str,
-        screan_name: str,
-        tweet_text: str,
-        tweet_via: str,
-        saved_localpath: str,
-        saved_created_at: str,
-        media_size: int,
-        media_blob: bytes | None,
-    ) -> None:
-        if not isinstance(is_exist_saved_file, bool):
-            raise TypeError("is_exist_saved_file must be bool.")
-        if not isinstance(img_filename, str):
-            raise TypeError("img_filename must be str.")
-        if not isinstance(url, str):
-            raise TypeError("url must be str.")
-        if not isinstance(url_thumbnail, str):
-            raise TypeError("url_thumbnail must be str.")
-        if not isinstance(tweet_id, str):
-            raise TypeError("tweet_id must be str.")
-        if not isinstance(tweet_url, str):
-            raise TypeError("tweet_url must be str.")
-        if not isinstance(created_at, str):
-            raise TypeError("created_at must be str.")
-        if not isinstance(user_id, str):
-            raise TypeError("user_id must be str.")
-        if not isinstance(user_name, str):
-            raise TypeError("user_name must be str.")
-        if not isinstance(screan_name, str):
-            raise TypeError("screan_name must be str.")
-        if not isinstance(tweet_text, str):
-            raise TypeError("tweet_text must be str.")
-        if not isinstance(tweet_via, str):
-            raise TypeError("tweet_via must be str.")
-        if not isinstance(saved_localpath, str):
-            raise TypeError("saved_localpath must be str.")
-        if not isinstance(saved_created_at, str):
-            raise TypeError("saved_created_at must be str.")
-        if not isinstance(media_size, int):
-            raise TypeError("media_size must be int.")
-        if media_blob and not isinstance(media_blob, bytes):
-            raise TypeError("media_blob must be none or bytes.")
 
-        if media_size <= 0:
-            raise ValueError("media_size must be 0 < media_size.")
+class Retweet(Media):
+    """リツイートツイートモデル
 
-        self.is_exist_saved_file = is_exist_saved_file
-        self.img_filename = img_filename
-        self.url = url
-        self.url_thumbnail = url_thumbnail
-        self.tweet_id = tweet_id
-        self.tweet_url = tweet_url
-        self.created_at = created_at
-        self.user_id = user_id
-        self.user_name = user_name
-        self.screan_name = screan_name
-        self.tweet_text = tweet_text
-        self.tweet_via = tweet_via
-        self.saved_localpath = saved_localpath
-        self.saved_created_at = saved_created_at
-        self.media_size = media_size
-        self.media_blob = media_blob
+    Media のうち source = "RT" の行
+    """
 
-    def __repr__(self) -> str:
-        columns = ", ".join([f"{k}={v}" for k, v in self.__dict__.items() if k[0] != "_"])
-        return f"<{self.__class__.__name__}({columns})>"
+    __mapper_args__ = {"polymorphic_identity": "RT"}
 
-    def __eq__(self, other: Self) -> bool:
-        return isinstance(other, Retweet) and other.img_filename == self.img_filename
 
-    def to_dict(self) -> dict:
-        return {
-            "id": self.id,
-            "is_exist_saved_file": self.is_exist_saved_file,
-            "img_filename": self.img_filename,
-            "url": self.url,
-            "url_thumbnail": self.url_thumbnail,
-            "tweet_id": self.tweet_id,
-            "tweet_url": self.tweet_url,
-            "created_at": self.created_at,
-            "user_id": self.user_id,
-            "user_name": self.user_name,
-            "screan_name": self.screan_name,
-            "tweet_text": self.tweet_text,
-            "tweet_via": self.tweet_via,
-            "saved_localpath": self.saved_localpath,
-            "saved_created_at": self.saved_created_at,
-            "media_size": self.media_size,
-            "media_blob": self.media_blob,
-        }
+# 旧テーブル名と source の対応
+LEGACY_MEDIA_TABLES = {"Favorite": "Fav", "Retweet": "RT"}
 
-    @classmethod
-    def create(cls, arg_dict: dict) -> Self:
-        match arg_dict:
-            case {
-                "is_exist_saved_file": is_exist_saved_file,
-                "img_filename": img_filename,
-                "url": url,
-                "url_thumbnail": url_thumbnail,
-                "tweet_id": tweet_id,
-                "tweet_url": tweet_url,
-                "created_at": created_at,
-                "user_id": user_id,
-                "user_name": user_name,
-                "screan_name": screan_name,
-                "tweet_text": tweet_text,
-                "tweet_via": tweet_via,
-                "saved_localpath": saved_localpath,
-                "saved_created_at": saved_created_at,
-                "media_size": media_size,
-                "media_blob": media_blob,
-            }:
-                return cls(
-                    is_exist_saved_file,
-                    img_filename,
-                    url,
-                    url_thumbnail,
-                    tweet_id,
-                    tweet_url,
-                    created_at,
-                    user_id,
-                    user_name,
-                    screan_name,
-                    tweet_text,
-                    tweet_via,
-                    saved_localpath,
-                    saved_created_at,
-                    media_size,
-                    media_blob,
-                )
-            case _:
-                raise ValueError("Retweet create failed.")
+# 全文検索インデックス（FTS5 の外部コンテンツテーブル）名と、対象テーブル及び対象列の対応
+SEARCH_INDEX_TABLES = {
+    "MediaSearch": ("Media", ("tweet_text", "user_name", "screan_name")),
+    "ExternalLinkSearch": ("ExternalLink", ("tweet_text", "user_name", "screan_name")),
+}
 
 
 class ExternalLink(Base):
@@ -392,10 +270,12 @@ class ExternalLink(Base):
     [tweet_via] TEXT,
     [saved_created_at] TEXT,
     [link_type] TEXT,
-    PRIMARY KEY([id])
+    PRIMARY KEY([id]),
+    INDEX ix_ExternalLink_external_link_url_tweet_url([external_link_url], [tweet_url])
     """
 
     __tablename__ = "ExternalLink"
+    __table_args__ = (Index("ix_ExternalLink_external_link_url_tweet_url", "external_link_url", "tweet_url"),)
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     external_link_url = Column(String(512), nullable=False)
@@ -519,6 +399,87 @@ class ExternalLink(Base):
                 raise ValueError("ExternalLink create failed.")
 
 
+class StoredMedia(Base):
+    """コンテンツアドレス型ストアの保存先テーブルモデル
+
+    ストア内の実体（sha256 で識別）と、それを参照する各保存先パスの対応を保持する
+    同じ実体を参照するパスの数だけレコードが存在する
+
+    [id] INTEGER,
+    [sha256] TEXT NOT NULL,
+    [url] TEXT NOT NULL,
+    [saved_localpath] TEXT NOT NULL UNIQUE,
+    [media_size] INTEGER NOT NULL,
+    [saved_created_at] TEXT,
+    PRIMARY KEY([id]),
+    INDEX ix_StoredMedia_sha256([sha256]),
+    INDEX ix_StoredMedia_url([url])
+    """
+
+    __tablename__ = "StoredMedia"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    sha256 = Column(String(64), nullable=False, index=True)
+    url = Column(String(512), nullable=False, index=True)
+    saved_localpath = Column(String(256), nullable=False, unique=True)
+    media_size = Column(Integer, nullable=False)
+    saved_created_at = Column(String(32))
+
+    def __init__(self, sha256: str, url: str, saved_localpath: str, media_size: int, saved_created_at: str):
+        if not isinstance(sha256, str):
+            raise TypeError("sha256 must be str.")
+        if not isinstance(url, str):
+            raise TypeError("url must be str.")
+        if not isinstance(saved_localpath, str):
+            raise TypeError("saved_localpath must be str.")
+        if not isinstance(media_size, int):
+            raise TypeError("media_size must be int.")
+        if not isinstance(saved_created_at, str):
+            raise TypeError("saved_created_at must be str.")
+
+        if len(sha256) != 64:
+            raise ValueError("sha256 must be 64 hex digits.")
+        if media_size < 0:
+            raise ValueError("media_size must be 0 <= media_size.")
+
+        self.sha256 = sha256
+        self.url = url
+        self.saved_localpath = saved_localpath
+        self.media_size = media_size
+        self.saved_created_at = saved_created_at
+
+    def __repr__(self) -> str:
+        columns = ", ".join([f"{k}={v}" for k, v in self.__dict__.items() if k[0] != "_"])
+        return f"<{self.__class__.__name__}({columns})>"
+
+    def __eq__(self, other: Self) -> bool:
+        return isinstance(other, StoredMedia) and other.saved_localpath == self.saved_localpath
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "sha256": self.sha256,
+            "url": self.url,
+            "saved_localpath": self.saved_localpath,
+            "media_size": self.media_size,
+            "saved_created_at": self.saved_created_at,
+        }
+
+    @classmethod
+    def create(cls, arg_dict: dict) -> Self:
+        match arg_dict:
+            case {
+                "sha256": sha256,
+                "url": url,
+                "saved_localpath": saved_localpath,
+                "media_size": media_size,
+                "saved_created_at": saved_created_at,
+            }:
+                return cls(sha256, url, saved_localpath, media_size, saved_created_at)
+            case _:
+                raise ValueError("StoredMedia create failed.")
+
+
 class DeleteTarget(Base):
     """削除対象ツイート保持テーブルモデル
 
@@ -530,10 +491,12 @@ class DeleteTarget(Base):
     [tweet_text] TEXT NOT NULL,
     [add_num] INTEGER NOT NULL,
     [del_num] INTEGER NOT NULL,
-    PRIMARY KEY(id)
+    PRIMARY KEY(id),
+    INDEX ix_DeleteTarget_delete_done_created_at([delete_done], [created_at])
     """
 
     __tablename__ = "DeleteTarget"
+    __table_args__ = (Index("ix_DeleteTarget_delete_done_created_at", "delete_done", "created_at"),)
 
     id = Column(Integer, primary_key=True)
     tweet_id = Column(String(256), nullable=False, unique=True)
@@ -609,6 +572,329 @@ class DeleteTarget(Base):
                 raise ValueError("DeleteTarget create failed.")
 
 
+class DownloadJob(Base):
+    """失敗したダウンロードの再試行ジョブテーブルモデル
+
+    メディアと外部リンクのダウンロードに失敗した場合に登録し、次回以降のクロールで再試行する
+    payload には再試行に必要な TweetInfo/ExternalLink の辞書をJSONで保持する
+
+    [id] INTEGER,
+    [job_type] TEXT NOT NULL,
+    [source] TEXT NOT NULL,
+    [url] TEXT NOT NULL,
+    [payload] TEXT NOT NULL,
+    [state] TEXT NOT NULL,
+    [attempt] INTEGER NOT NULL,
+    [next_retry_at] TEXT NOT NULL,
+    [last_error] TEXT,
+    [created_at] TEXT NOT NULL,
+    [updated_at] TEXT NOT NULL,
+    PRIMARY KEY([id]),
+    UNIQUE([job_type], [source], [url]),
+    INDEX ix_DownloadJob_state_source_next_retry_at([state], [source], [next_retry_at])
+    """
+
+    __tablename__ = "DownloadJob"
+    __table_args__ = (
+        UniqueConstraint("job_type", "source", "url"),
+        Index("ix_DownloadJob_state_source_next_retry_at", "state", "source", "next_retry_at"),
+    )
+
+    # ジョブ種別
+    MEDIA = "media"
+    EXTERNAL_LINK = "external_link"
+    # 状態（再試行待ち、完了、再試行打ち切り）
+    PENDING = "pending"
+    DONE = "done"
+    DEAD = "dead"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_type = Column(String(32), nullable=False)
+    source = Column(String(32), nullable=False)
+    url = Column(String(512), nullable=False)
+    payload = Column(String, nullable=False)
+    state = Column(String(32), nullable=False)
+    attempt = Column(Integer, nullable=False)
+    next_retry_at = Column(String(32), nullable=False)
+    last_error = Column(String(512))
+    created_at = Column(String(32), nullable=False)
+    updated_at = Column(String(32), nullable=False)
+
+    def __init__(
+        self,
+        job_type: str,
+        source: str,
+        url: str,
+        payload: str,
+        state: str,
+        attempt: int,
+        next_retry_at: str,
+        last_error: str,
+        created_at: str,
+        updated_at: str,
+    ):
+        if not isinstance(job_type, str):
+            raise TypeError("job_type must be str.")
+        if not isinstance(source, str):
+            raise TypeError("source must be str.")
+        if not isinstance(url, str):
+            raise TypeError("url must be str.")
+        if not isinstance(payload, str):
+            raise TypeError("payload must be str.")
+        if not isinstance(state, str):
+            raise TypeError("state must be str.")
+        if not isinstance(attempt, int):
+            raise TypeError("attempt must be int.")
+        if not isinstance(next_retry_at, str):
+            raise TypeError("next_retry_at must be str.")
+        if not isinstance(last_error, str):
+            raise TypeError("last_error must be str.")
+        if not isinstance(created_at, str):
+            raise TypeError("created_at must be str.")
+        if not isinstance(updated_at, str):
+            raise TypeError("updated_at must be str.")
+
+        if job_type not in [DownloadJob.MEDIA, DownloadJob.EXTERNAL_LINK]:
+            raise ValueError("job_type must be ['media', 'external_link'].")
+        if state not in [DownloadJob.PENDING, DownloadJob.DONE, DownloadJob.DEAD]:
+            raise ValueError("state must be ['pending', 'done', 'dead'].")
+        if attempt < 0:
+            raise ValueError("attempt must be 0 <= attempt.")
+
+        self.job_type = job_type
+        self.source = source
+        self.url = url
+        self.payload = payload
+        self.state = state
+        self.attempt = attempt
+        self.next_retry_at = next_retry_at
+        self.last_error = last_error
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    def __repr__(self) -> str:
+        columns = ", ".join([f"{k}={v}" for k, v in self.__dict__.items() if k[0] != "_"])
+        return f"<{self.__class__.__name__}({columns})>"
+
+    def __eq__(self, other: Self) -> bool:
+        return (
+            isinstance(other, DownloadJob)
+            and other.job_type == self.job_type
+            and other.source == self.source
+            and other.url == self.url
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "job_type": self.job_type,
+            "source": self.source,
+            "url": self.url,
+            "payload": self.payload,
+            "state": self.state,
+            "attempt": self.attempt,
+            "next_retry_at": self.next_retry_at,
+            "last_error": self.last_error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def create(cls, arg_dict: dict) -> Self:
+        match arg_dict:
+            case {
+                "job_type": job_type,
+                "source": source,
+                "url": url,
+                "payload": payload,
+                "state": state,
+                "attempt": attempt,
+                "next_retry_at": next_retry_at,
+                "last_error": last_error,
+                "created_at": created_at,
+                "updated_at": updated_at,
+            }:
+                return cls(
+                    job_type, source, url, payload, state, attempt, next_retry_at, last_error, created_at, updated_at
+                )
+            case _:
+                raise ValueError("DownloadJob create failed.")
+
+
+class CrawlCheckpoint(Base):
+    """中断したクロールを再開するためのチェックポイントテーブルモデル
+
+    クローラタイプごとに1レコードで、取得したツイートと各段階の処理済件数を保持する
+    クロールが最後まで完了したらレコードは削除される
+
+    [id] INTEGER,
+    [source] TEXT NOT NULL UNIQUE,
+    [fetched_tweets] BLOB NOT NULL,
+    [media_index] INTEGER NOT NULL,
+    [external_link_index] INTEGER NOT NULL,
+    [created_at] TEXT NOT NULL,
+    [updated_at] TEXT NOT NULL,
+    PRIMARY KEY([id])
+    """
+
+    __tablename__ = "CrawlCheckpoint"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    source = Column(String(32), nullable=False, unique=True)
+    # 取得したツイートのJSONを zlib で圧縮したもの（再開時以外は読まない）
+    fetched_tweets = deferred(Column(BLOB, nullable=False))
+    media_index = Column(Integer, nullable=False)
+    external_link_index = Column(Integer, nullable=False)
+    created_at = Column(String(32), nullable=False)
+    updated_at = Column(String(32), nullable=False)
+
+    def __init__(
+        self,
+        source: str,
+        fetched_tweets: bytes,
+        media_index: int,
+        external_link_index: int,
+        created_at: str,
+        updated_at: str,
+    ):
+        if not isinstance(source, str):
+            raise TypeError("source must be str.")
+        if not isinstance(fetched_tweets, bytes):
+            raise TypeError("fetched_tweets must be bytes.")
+        if not isinstance(media_index, int):
+            raise TypeError("media_index must be int.")
+        if not isinstance(external_link_index, int):
+            raise TypeError("external_link_index must be int.")
+        if not isinstance(created_at, str):
+            raise TypeError("created_at must be str.")
+        if not isinstance(updated_at, str):
+            raise TypeError("updated_at must be str.")
+
+        if media_index < 0:
+            raise ValueError("media_index must be 0 <= media_index.")
+        if external_link_index < 0:
+            raise ValueError("external_link_index must be 0 <= external_link_index.")
+
+        self.source = source
+        self.fetched_tweets = fetched_tweets
+        self.media_index = media_index
+        self.external_link_index = external_link_index
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    def __repr__(self) -> str:
+        columns = ", ".join([f"{k}={v}" for k, v in self.__dict__.items() if k[0] != "_" and k != "fetched_tweets"])
+        return f"<{self.__class__.__name__}({columns})>"
+
+    def __eq__(self, other: Self) -> bool:
+        return isinstance(other, CrawlCheckpoint) and other.source == self.source
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "source": self.source,
+            "fetched_tweets": self.fetched_tweets,
+            "media_index": self.media_index,
+            "external_link_index": self.external_link_index,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def create(cls, arg_dict: dict) -> Self:
+        match arg_dict:
+            case {
+                "source": source,
+                "fetched_tweets": fetched_tweets,
+                "media_index": media_index,
+                "external_link_index": external_link_index,
+                "created_at": created_at,
+                "updated_at": updated_at,
+            }:
+                return cls(source, fetched_tweets, media_index, external_link_index, created_at, updated_at)
+            case _:
+                raise ValueError("CrawlCheckpoint create failed.")
+
+
+class CrawlRun(Base):
+    """クロールの実行サマリーテーブルモデル
+
+    1回のクロールにつき1レコードで、段階ごとの処理時間や件数、ホストごとの通信量を
+    Metrics.to_dict() のJSONとして保持し、処理性能の推移を追えるようにする
+
+    [id] INTEGER,
+    [source] TEXT NOT NULL,
+    [started_at] TEXT NOT NULL,
+    [finished_at] TEXT NOT NULL,
+    [result] TEXT NOT NULL,
+    [summary] TEXT NOT NULL,
+    PRIMARY KEY([id]),
+    INDEX ix_CrawlRun_source_started_at([source], [started_at])
+    """
+
+    __tablename__ = "CrawlRun"
+    __table_args__ = (Index("ix_CrawlRun_source_started_at", "source", "started_at"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    source = Column(String(32), nullable=False)
+    started_at = Column(String(32), nullable=False)
+    finished_at = Column(String(32), nullable=False)
+    result = Column(String(32), nullable=False)
+    summary = Column(String, nullable=False)
+
+    def __init__(self, source: str, started_at: str, finished_at: str, result: str, summary: str):
+        if not isinstance(source, str):
+            raise TypeError("source must be str.")
+        if not isinstance(started_at, str):
+            raise TypeError("started_at must be str.")
+        if not isinstance(finished_at, str):
+            raise TypeError("finished_at must be str.")
+        if not isinstance(result, str):
+            raise TypeError("result must be str.")
+        if not isinstance(summary, str):
+            raise TypeError("summary must be str.")
+
+        if finished_at < started_at:
+            raise ValueError("finished_at must be started_at <= finished_at.")
+
+        self.source = source
+        self.started_at = started_at
+        self.finished_at = finished_at
+        self.result = result
+        self.summary = summary
+
+    def __repr__(self) -> str:
+        columns = ", ".join([f"{k}={v}" for k, v in self.__dict__.items() if k[0] != "_"])
+        return f"<{self.__class__.__name__}({columns})>"
+
+    def __eq__(self, other: Self) -> bool:
+        return isinstance(other, CrawlRun) and other.source == self.source and other.started_at == self.started_at
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "source": self.source,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "summary": self.summary,
+        }
+
+    @classmethod
+    def create(cls, arg_dict: dict) -> Self:
+        match arg_dict:
+            case {
+                "source": source,
+                "started_at": started_at,
+                "finished_at": finished_at,
+                "result": result,
+                "summary": summary,
+            }:
+                return cls(source, started_at, finished_at, result, summary)
+            case _:
+                raise ValueError("CrawlRun create failed.")
+
+
 if __name__ == "__main__":
     engine = create_engine("sqlite:///PG_DB.db", echo=True)
     Base.metadata.create_all(engine)
@@ -0,0 +1,178 @@
+import cProfile
+import io
+import pstats
+import threading
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import datetime
+from logging import INFO, getLogger
+from pathlib import Path
+
+from media_gathering.log_message import MSG
+
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+class CrawlProfiler:
+    """クロールの処理をプロファイルし、結果をファイルに書き出す
+
+    cpu: cProfile でクロール全体をプロファイルし、.prof ファイルと累積時間上位の関数の一覧を書き出す
+    mem: tracemalloc で段階ごとにスナップショットを取り、段階中に増えた割り当ての上位を書き出す
+
+    プロファイラと tracemalloc はプロセス全体で共有されるため、同時にプロファイルするクロールは1つだけとし、
+    他のクロールのプロファイル中に開始したクロールはプロファイルせずに実行する
+    """
+
+    CPU = "cpu"
+    MEMORY = "mem"
+    MODES = [CPU, MEMORY]
+    # レポートに書き出す関数/割り当て箇所の数
+    TOP_NUM = 30
+    # tracemalloc で保持するスタックフレーム数
+    TRACEMALLOC_FRAMES = 1
+
+    # 同時にプロファイルするクロールは1つだけにする
+    _lock = threading.Lock()
+
+    def __init__(self, mode: str, output_dir: Path) -> None:
+        """初期化
+
+        Args:
+            mode (str): プロファイル種別（"cpu" or "mem"）
+            output_dir (Path): 結果の書き出し先ディレクトリ
+        """
+        if not isinstance(mode, str):
+            raise TypeError("mode must be str.")
+        if not isinstance(output_dir, Path):
+            raise TypeError("output_dir must be Path.")
+        if mode not in self.MODES:
+            raise ValueError(f"mode must be {self.MODES}.")
+        self.mode = mode
+        self.output_dir = output_dir
+        # プロファイル中のスレッドと、メモリプロファイルのレポートの書き出し先
+        self._owner: int | None = None
+        self._report_path: Path | None = None
+
+    def make_output_path(self, label: str, suffix: str) -> Path:
+        """書き出し先のファイルパスを返す
+
+        Args:
+            label (str): プロファイル対象の名前
+            suffix (str): 拡張子を含むファイル名の末尾
+
+        Returns:
+            Path: output_dir/profile_{label}_{mode}_{日時}{suffix}
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return self.output_dir / f"profile_{label}_{self.mode}_{timestamp}{suffix}"
+
+    @contextmanager
+    def profile(self, label: str) -> Iterator[None]:
+        """with ブロックの処理をプロファイルし、終了時に結果を書き出す
+
+        例外で抜けた場合も結果を書き出す
+
+        Args:
+            label (str): プロファイル対象の名前（書き出すファイル名に使う）
+        """
+        if not self._lock.acquire(blocking=False):
+            logger.warning(MSG.PROFILE_SKIPPED.value.format(self.mode, label))
+            yield
+            return
+
+        logger.info(MSG.PROFILE_START.value.format(self.mode, label))
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self._owner = threading.get_ident()
+        try:
+            if self.mode == self.CPU:
+                with self._profile_cpu(label):
+                    yield
+            else:
+                with self._profile_memory(label):
+                    yield
+        finally:
+            self._owner = None
+            self._report_path = None
+            self._lock.release()
+
+    @contextmanager
+    def _profile_cpu(self, label: str) -> Iterator[None]:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            prof_path = self.make_output_path(label, ".prof")
+            profiler.dump_stats(prof_path)
+            # .prof を開くツールが無くても確認できるよう、累積時間の上位を文字列でも書き出す
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.TOP_NUM)
+            report_path = prof_path.with_suffix(".txt")
+            report_path.write_text(stream.getvalue(), encoding="utf-8")
+            logger.info(MSG.PROFILE_DUMPED.value.format(prof_path))
+
+    @contextmanager
+    def _profile_memory(self, label: str) -> Iterator[None]:
+        # 既に他で tracemalloc を開始している場合は止めない
+        is_started = not tracemalloc.is_tracing()
+        if is_started:
+            tracemalloc.start(self.TRACEMALLOC_FRAMES)
+        self._report_path = self.make_output_path(label, ".txt")
+        self._report_path.write_text(f"memory profile: {label}\n", encoding="utf-8")
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            statistics = self.take_snapshot().statistics("lineno")[: self.TOP_NUM]
+            lines = [f"\n[total] current={current / 1024**2:.1f}MiB, peak={peak / 1024**2:.1f}MiB"]
+            lines.extend(f"  {stat}" for stat in statistics)
+            self._write_report(lines)
+            if is_started:
+                tracemalloc.stop()
+            logger.info(MSG.PROFILE_DUMPED.value.format(self._report_path))
+
+    def take_snapshot(self) -> tracemalloc.Snapshot:
+        """tracemalloc 自身と import 機構の割り当てを除いたスナップショットを取る"""
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def _write_report(self, lines: list[str]) -> None:
+        with self._report_path.open("a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        """クロールの段階の前後でメモリのスナップショットを取り、段階中に増えた割り当ての上位を書き出す
+
+        メモリプロファイル中のスレッド以外から呼ばれた場合は何もしない
+
+        Args:
+            stage (str): 段階名
+        """
+        if self.mode != self.MEMORY or self._owner != threading.get_ident() or self._report_path is None:
+            yield
+            return
+
+        tracemalloc.reset_peak()
+        before = self.take_snapshot()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            statistics = self.take_snapshot().compare_to(before, "lineno")[: self.TOP_NUM]
+            lines = [f"\n[{stage}] current={current / 1024**2:.1f}MiB, peak={peak / 1024**2:.1f}MiB"]
+            lines.extend(f"  {stat}" for stat in statistics)
+            self._write_report(lines)
+
+
+if __name__ == "__main__":
+    profiler = CrawlProfiler(CrawlProfiler.MEMORY, Path("./profile_sample"))
+    with profiler.profile("sample"):
+        with profiler.stage("allocate"):
+            data = [bytes(1024) for _ in range(1000)]
@@ -1,11 +1,11 @@
 from pathlib import Path
 
-from sqlalchemy import or_, desc
+from sqlalchemy import Engine, asc, desc, or_, select
 from sqlalchemy.exc import NoResultFound
 from sqlalchemy.orm import sessionmaker
 
 from media_gathering.db_controller_base import DBControllerBase
-from media_gathering.model import Retweet
+from media_gathering.model import Media, Retweet
 
 DEBUG = False
 
@@ -14,8 +14,9 @@ class RetweetDBController(DBControllerBase):
     def __init__(
         self,
         db_fullpath="PG_DB.db",
+        engine: Engine | None = None,
     ):
-        super().__init__(db_fullpath)
+        super().__init__(db_fullpath, engine)
 
     def upsert(self, params: dict) -> None:
         """RetweetにUPSERTする
@@ -49,13 +50,16 @@ class RetweetDBController(DBControllerBase):
         records = [Retweet.create(params)]
         for r in records:
             try:
-                q = session.query(Retweet).filter(
+                # source の条件と OR を並べると source のインデックスで走査されるため、
+                # 一意キーのインデックスで引いた id で絞り込む
+                matched_id = select(Media.id).where(
                     or_(
-                        Retweet.img_filename == r.img_filename,
-                        Retweet.url == r.url,
-                        Retweet.url_thumbnail == r.url_thumbnail,
+                        Media.img_filename == r.img_filename,
+                        Media.url == r.url,
+                        Media.url_thumbnail == r.url_thumbnail,
                     )
                 )
+                q = session.query(Retweet).filter(Retweet.id.in_(matched_id))
                 ex = q.one()
             except NoResultFound:
                 # INSERT
@@ -78,6 +82,7 @@ class RetweetDBController(DBControllerBase):
                 ex.saved_created_at = r.saved_created_at
                 ex.media_size = r.media_size
                 ex.media_blob = r.media_blob
+                ex.blob_id = r.blob_id
 
         # TODO::操作履歴保存未対応
         session.commit()
@@ -104,6 +109,36 @@ class RetweetDBController(DBControllerBase):
         session.close()
         return res_dict
 
+    def select_gallery_since(self, last_id: int = 0, limit: int = 1000) -> list[dict]:
+        """Retweetからギャラリー表示に必要な列を id の昇順でSELECTする
+
+        Note:
+            f"select id, img_filename, url, url_thumbnail, tweet_url from Media
+              where source = 'RT' and id > {last_id} order by id asc limit {limit}"
+            media_blob などの重い列は読み込まない
+
+        Args:
+            last_id (int): このidより大きいレコードを対象とする
+            limit (int): 取得レコード数上限
+
+        Returns:
+            list[dict]: SELECTしたレコードの辞書リスト
+        """
+        Session = sessionmaker(bind=self.engine)
+        session = Session()
+
+        res = (
+            session.query(Retweet.id, Retweet.img_filename, Retweet.url, Retweet.url_thumbnail, Retweet.tweet_url)
+            .filter(Retweet.id > last_id)
+            .order_by(asc(Retweet.id))
+            .limit(limit)
+            .all()
+        )
+        res_dict = [r._asdict() for r in res]  # 辞書リストに変換
+
+        session.close()
+        return res_dict
+
     def select_from_media_url(self, filename) -> list[dict]:
         """Retweetからfilenameを条件としてSELECTする
 
@@ -0,0 +1,93 @@
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Self
+
+try:
+    import fcntl
+except ImportError:  # fcntl が無い環境（Windows）では msvcrt でロックする
+    fcntl = None
+    import msvcrt
+
+
+@dataclass(frozen=True)
+class RunLock:
+    """多重起動を防ぐためのファイルロック
+
+    ロックはOSがプロセス単位で管理するため、異常終了してもロックが残り続けることはない
+    ロックファイル自体は削除しない（削除と作成の間に別プロセスが割り込めてしまうため）
+    """
+
+    lock_path: Path  # ロックファイルパス
+    _fd: int | None = field(init=False, default=None, compare=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._is_valid()
+
+    def _is_valid(self) -> bool:
+        if not isinstance(self.lock_path, Path):
+            raise TypeError("lock_path is not Path.")
+        return True
+
+    @property
+    def is_locked(self) -> bool:
+        """このインスタンスがロックを保持しているか"""
+        return self._fd is not None
+
+    def acquire(self, blocking: bool = False) -> bool:
+        """ロックを取得する
+
+        既に他のプロセスがロックを保持している場合は待たずに False を返す
+        blocking を指定した場合は解放されるまで待つ
+
+        Args:
+            blocking (bool): ロックが解放されるまで待つか
+
+        Returns:
+            bool: ロックを取得できたら True
+        """
+        if self.is_locked:
+            return True
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        except OSError:
+            os.close(fd)
+            return False
+        # 調査用にロックを保持しているプロセスのIDを書いておく
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        object.__setattr__(self, "_fd", fd)
+        return True
+
+    def release(self) -> None:
+        """ロックを解放する"""
+        if self._fd is None:
+            return
+        fd = self._fd
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        os.close(fd)
+        object.__setattr__(self, "_fd", None)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.release()
+
+
+if __name__ == "__main__":
+    import time
+
+    run_lock = RunLock(Path("./prevent_multiple_run"))
+    print(run_lock.acquire())
+    time.sleep(10)
+    run_lock.release()
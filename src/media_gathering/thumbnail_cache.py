@@ -0,0 +1,198 @@
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from logging import INFO, getLogger
+from pathlib import Path
+from typing import Any
+
+from media_gathering.util import LazyImport
+
+# Pillowはサムネイルを作成するときまで import しない
+Image = LazyImport("PIL.Image")
+
+logger = getLogger(__name__)
+logger.setLevel(INFO)
+
+
+@functools.cache
+def thumbnail_format() -> tuple[str, str]:
+    """サムネイルの保存形式と拡張子を返す
+
+    WebPが使えるならWebP、使えない環境ではJPEGでサムネイルを保存する
+    判定にPillowが必要なため、初めて必要になったときに判定する
+
+    Returns:
+        tuple[str, str]: (保存形式, 拡張子)
+    """
+    from PIL import features
+
+    return ("WEBP", ".webp") if features.check("webp") else ("JPEG", ".jpg")
+
+
+def __getattr__(name: str) -> Any:
+    # THUMBNAIL_FORMAT, THUMBNAIL_SUFFIX は参照されたときに判定する
+    if name == "THUMBNAIL_FORMAT":
+        return thumbnail_format()[0]
+    if name == "THUMBNAIL_SUFFIX":
+        return thumbnail_format()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@dataclass(frozen=True)
+class ThumbnailCache:
+    """保存済メディアから作成したサムネイルのキャッシュ
+
+    htmlからはリモートの :large 画像ではなくここで作成したサムネイルを参照する
+    サムネイルはワーカースレッドで作成し、wait() で全件の完了を待つ
+    Pillowで読み込めないメディア（動画など）はサムネイルを作成しない
+    """
+
+    cache_path: Path  # サムネイル保存先ディレクトリ
+    size: int = 256  # サムネイルの長辺の最大ピクセル数
+    max_workers: int = 4  # サムネイル作成に使う最大スレッド数
+    _executor: ThreadPoolExecutor = field(init=False, compare=False, repr=False)
+    _futures: list[Future] = field(init=False, default_factory=list, compare=False, repr=False)
+    _lock: threading.Lock = field(init=False, default_factory=threading.Lock, compare=False, repr=False)
+
+    # サムネイル保存先のデフォルト（html出力先と同じディレクトリ配下）
+    THUMBNAIL_PATH = "./html/thumbnails"
+    # html出力先ディレクトリから見たサムネイル保存先
+    THUMBNAIL_URL_BASE = "thumbnails"
+
+    def __post_init__(self) -> None:
+        self._is_valid()
+        object.__setattr__(self, "_executor", ThreadPoolExecutor(max_workers=self.max_workers))
+
+    def _is_valid(self) -> bool:
+        if not isinstance(self.cache_path, Path):
+            raise TypeError("cache_path is not Path.")
+        if not isinstance(self.size, int):
+            raise TypeError("size is not int.")
+        if not isinstance(self.max_workers, int):
+            raise TypeError("max_workers is not int.")
+        if self.size <= 0:
+            raise ValueError("size must be 0 < size.")
+        if self.max_workers <= 0:
+            raise ValueError("max_workers must be 0 < max_workers.")
+        return True
+
+    @classmethod
+    def thumbnail_name(cls, img_filename: str) -> str:
+        """メディアのファイル名からサムネイルのファイル名を返す
+
+        Args:
+            img_filename (str): メディアのファイル名
+
+        Returns:
+            str: サムネイルのファイル名
+        """
+        return img_filename + thumbnail_format()[1]
+
+    @classmethod
+    def thumbnail_url(cls, img_filename: str | None, default: str, prefix: str = ".") -> str:
+        """htmlから参照するサムネイルのパスを返す
+
+        サムネイルが作成されていない場合は default を返す
+
+        Args:
+            img_filename (str | None): メディアのファイル名
+            default (str): サムネイルが存在しない場合に返す値（リモートのサムネイルURL）
+            prefix (str): html出力先から THUMBNAIL_PATH の親ディレクトリへの相対パス
+
+        Returns:
+            str: htmlから参照するサムネイルのパス
+        """
+        if not img_filename:
+            return default
+        name = cls.thumbnail_name(img_filename)
+        if not (Path(cls.THUMBNAIL_PATH) / name).is_file():
+            return default
+        return f"{prefix}/{cls.THUMBNAIL_URL_BASE}/{name}"
+
+    def create(self, media_path: Path) -> Path | None:
+        """メディアからサムネイルを作成する
+
+        JPEGは draft() でデコード時に縮小し、それ以外は reduce() で整数倍に粗く縮小してから仕上げる
+
+        Args:
+            media_path (Path): 保存済メディアのパス
+
+        Returns:
+            Path | None: 作成したサムネイルのパス、作成できなかった場合はNone
+        """
+        thumbnail_path = self.cache_path / self.thumbnail_name(media_path.name)
+        if thumbnail_path.is_file():
+            return thumbnail_path
+        try:
+            with Image.open(media_path) as image:
+                if image.format == "JPEG":
+                    # DCTスケーリングで目的サイズ以上の最小サイズにデコードする
+                    image.draft("RGB", (self.size, self.size))
+                else:
+                    # パレット画像などは reduce() できないため先に変換する
+                    if image.mode not in ("RGB", "RGBA"):
+                        image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+                    factor = min(image.width, image.height) // self.size
+                    if factor >= 2:
+                        image = image.reduce(factor)
+                image.thumbnail((self.size, self.size))
+                if image.mode not in ("RGB", "RGBA"):
+                    image = image.convert("RGB")
+                thumbnail_format_name = thumbnail_format()[0]
+                if thumbnail_format_name == "JPEG" and image.mode != "RGB":
+                    image = image.convert("RGB")
+
+                self.cache_path.mkdir(parents=True, exist_ok=True)
+                tmp_path = thumbnail_path.with_name(thumbnail_path.name + ".tmp")
+                image.save(tmp_path, format=thumbnail_format_name, quality=80)
+                tmp_path.replace(thumbnail_path)
+        except (Image.UnidentifiedImageError, OSError, ValueError):
+            logger.debug(f"{media_path.name} -> thumbnail skipped.")
+            return None
+        return thumbnail_path
+
+    def submit(self, media_path: Path) -> Future:
+        """サムネイル作成をワーカーに依頼する
+
+        Args:
+            media_path (Path): 保存済メディアのパス
+
+        Returns:
+            Future: サムネイル作成結果を表すFuture
+        """
+        future = self._executor.submit(self.create, media_path)
+        with self._lock:
+            self._futures.append(future)
+        return future
+
+    def wait(self) -> list[Path]:
+        """依頼済のサムネイル作成がすべて完了するまで待つ
+
+        Returns:
+            list[Path]: 作成できたサムネイルのパスリスト
+        """
+        with self._lock:
+            futures = list(self._futures)
+            self._futures.clear()
+        result = []
+        for future in futures:
+            thumbnail_path = future.result()
+            if thumbnail_path:
+                result.append(thumbnail_path)
+        return result
+
+    def shutdown(self) -> None:
+        """ワーカーを終了する"""
+        self.wait()
+        self._executor.shutdown()
+
+
+if __name__ == "__main__":
+    import sys
+
+    thumbnail_cache = ThumbnailCache(Path(ThumbnailCache.THUMBNAIL_PATH))
+    for media_path in Path(sys.argv[1] if len(sys.argv) > 1 else "./media").glob("*"):
+        thumbnail_cache.submit(media_path)
+    print(len(thumbnail_cache.wait()))
+    thumbnail_cache.shutdown()
@@ -1,4 +1,5 @@
 import enum
+import importlib
 from typing import Any
 
 
@@ -45,5 +46,40 @@ def find_values(
     return result[0]
 
 
+class LazyImport:
+    """初めて使われたときに import するモジュール（またはその属性）の代理
+
+    起動時に必ずしも使わない重い依存（通知、外部サイトのフェッチャー、Pillowなど）を
+    モジュールの先頭で import せずに済ませるために使う
+    属性参照か呼び出しで初めて import し、以降は import 済の対象に委譲する
+    モジュール変数として置くため、テストではこれまで通り mock.patch で差し替えられる
+
+    Args:
+        module_name (str): import するモジュール名
+        attr_name (str): モジュールから取り出す属性名、空ならモジュール自体
+    """
+
+    def __init__(self, module_name: str, attr_name: str = "") -> None:
+        self._module_name = module_name
+        self._attr_name = attr_name
+        self._target = None
+
+    def _load(self) -> Any:
+        if self._target is None:
+            module = importlib.import_module(self._module_name)
+            self._target = getattr(module, self._attr_name) if self._attr_name else module
+        return self._target
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._load(), name)
+
+    def __call__(self, *args, **kwargs) -> Any:
+        return self._load()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        target = f"{self._module_name}.{self._attr_name}" if self._attr_name else self._module_name
+        return f"LazyImport({target})"
+
+
 if __name__ == "__main__":
     pass
@@ -0,0 +1,132 @@
+import shutil
+import sys
+import unittest
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+
+from benchmarks.archive import ARCHIVE_SITES, ArchiveGenerator, ArchiveSpec
+
+
+class TestArchiveSpec(unittest.TestCase):
+    def test_init(self):
+        spec = ArchiveSpec(seed=1, fav_num=10)
+        self.assertEqual(1, spec.seed)
+        self.assertEqual(10, spec.fav_num)
+
+        with self.assertRaises(TypeError):
+            ArchiveSpec(fav_num="invalid_fav_num")
+        with self.assertRaises(ValueError):
+            ArchiveSpec(author_num=-1)
+        with self.assertRaises(ValueError):
+            ArchiveSpec(media_size=0)
+
+
+class TestArchiveGenerator(unittest.TestCase):
+    def setUp(self):
+        self.TBP = Path("./tests/benchmarks/archive")
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+        self.spec = ArchiveSpec(
+            seed=1,
+            fav_num=30,
+            retweet_num=20,
+            external_link_num=15,
+            media_file_num=10,
+            author_num=5,
+            work_num=3,
+            media_size=16,
+        )
+
+    def tearDown(self):
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+
+    def select_rows(self, base_path: Path, query: str) -> list[tuple]:
+        engine = create_engine(f"sqlite:///{base_path / 'db/PG_DB.db'}")
+        try:
+            with engine.connect() as conn:
+                return [tuple(row) for row in conn.execute(text(query))]
+        finally:
+            engine.dispose()
+
+    def list_tree(self, base_path: Path) -> list[tuple]:
+        return sorted(
+            (str(sp.relative_to(base_path)), sp.read_bytes() if sp.is_file() else b"", sp.stat().st_mtime)
+            for sp in base_path.glob("**/*")
+            if sp.suffix != ".db"
+            and ".media_store" not in sp.parts
+            and sp.name != "config.json"
+            # 更新日時を固定していない直下のディレクトリ（DB、保存先、サイトごとの保存先）は除く
+            and sp.parent != base_path
+        )
+
+    def test_generate(self):
+        base_path = self.TBP / "first"
+        generator = ArchiveGenerator(self.spec, base_path)
+        actual = generator.generate()
+        self.assertEqual(30, actual["Fav"])
+        self.assertEqual(20, actual["RT"])
+        self.assertEqual(15, actual["ExternalLink"])
+        self.assertEqual(10, actual["Fav_files"])
+        self.assertEqual(10, actual["RT_files"])
+        self.assertTrue((base_path / "config.json").is_file())
+
+        # 新しい方から media_file_num 件のメディアのみ保存先にファイルがあり、ストアの実体へのリンクになっている
+        rows = self.select_rows(
+            base_path, "select img_filename, is_exist_saved_file, saved_localpath from Media where source = 'Fav'"
+        )
+        self.assertEqual([0] * 20 + [1] * 10, [row[1] for row in rows])
+        save_path = base_path / "twitterFav"
+        self.assertEqual({row[0] for row in rows[20:]}, {sp.name for sp in save_path.iterdir()})
+        self.assertTrue(all(sp.stat().st_nlink == 2 for sp in save_path.iterdir()))
+        stored_num = self.select_rows(base_path, "select count(*) from StoredMedia")[0][0]
+        self.assertEqual(20, stored_num)
+
+        # 作品は {作者名}({作者ID})/{作品タイトル}({作品ID}) の形式で配置する
+        for site in ARCHIVE_SITES:
+            site_path = Path(generator.config[site.config_key]["save_base_path"])
+            author_list = list(site_path.iterdir())
+            self.assertEqual(5, len(author_list))
+            for author_path in author_list:
+                self.assertRegex(author_path.name, r"^.+\([0-9]+\)$")
+                for work_path in author_path.iterdir():
+                    self.assertRegex(work_path.name, r"^.+\([0-9]+\)(\.jpg)?$")
+                    if work_path.is_dir():
+                        page_list = sorted(p.name for p in work_path.iterdir())
+                        self.assertEqual(f"{work_path.name}_{site.page_start:03}.jpg", page_list[0])
+
+        # 外部リンクは各サイトの作品ページURL
+        url_list = [row[0] for row in self.select_rows(base_path, "select external_link_url from ExternalLink")]
+        prefix_list = tuple(site.url_format.format("") for site in ARCHIVE_SITES)
+        self.assertTrue(all(url.startswith(prefix_list) for url in url_list))
+
+        # 同じシードと規模からは同じアーカイブを生成する
+        other_path = self.TBP / "second"
+        self.assertEqual(actual, ArchiveGenerator(self.spec, other_path).generate())
+        self.assertEqual(self.list_tree(base_path), self.list_tree(other_path))
+        query = "select source, img_filename, url, tweet_id, created_at, user_name, tweet_text from Media"
+        self.assertEqual(self.select_rows(base_path, query), self.select_rows(other_path, query))
+        query = "select external_link_url, tweet_id, tweet_text from ExternalLink"
+        self.assertEqual(self.select_rows(base_path, query), self.select_rows(other_path, query))
+
+        # シードが異なれば異なるアーカイブになる
+        spec = ArchiveSpec(**(vars(self.spec) | {"seed": 2}))
+        ArchiveGenerator(spec, self.TBP / "third").generate()
+        self.assertNotEqual(self.list_tree(base_path), self.list_tree(self.TBP / "third"))
+
+        # 空でないディレクトリには生成しない
+        with self.assertRaises(ValueError):
+            ArchiveGenerator(self.spec, base_path).generate()
+
+    def test_init(self):
+        with self.assertRaises(TypeError):
+            ArchiveGenerator("invalid_spec", self.TBP)
+        with self.assertRaises(TypeError):
+            ArchiveGenerator(self.spec, "invalid_base_path")
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
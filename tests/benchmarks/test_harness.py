@@ -0,0 +1,203 @@
+import shutil
+import sys
+import unittest
+from pathlib import Path
+
+import orjson
+from mock import patch
+
+from benchmarks.harness import (
+    BenchmarkResult,
+    BenchmarkRunner,
+    Comparison,
+    collect_benchmarks,
+    compare_reports,
+    format_comparison,
+    run_benchmark_class,
+    save_report,
+)
+
+
+class SampleBench:
+    SIZE = 10
+
+    def __init__(self):
+        self.calls = []
+
+    def setup_class(self):
+        self.calls.append("setup_class")
+
+    def teardown_class(self):
+        self.calls.append("teardown_class")
+
+    def setup(self):
+        self.calls.append("setup")
+
+    def teardown(self):
+        self.calls.append("teardown")
+
+    def time_a(self):
+        self.calls.append(f"time_a:{self.SIZE}")
+
+    def time_b(self):
+        self.calls.append("time_b")
+
+
+class TestHarness(unittest.TestCase):
+    def setUp(self):
+        self.TBP = Path("./tests/benchmarks/results")
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+
+    def tearDown(self):
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+
+    def test_benchmark_result(self):
+        result = BenchmarkResult("bench_sample.SampleBench.time_a", [3.0, 1.0, 2.0])
+        expect = {"repeat": 3, "min": 1.0, "median": 2.0, "mean": 2.0, "stdev": 1.0, "samples": [3.0, 1.0, 2.0]}
+        self.assertEqual(expect, result.to_dict())
+        self.assertEqual(0.0, BenchmarkResult("name", [1.0]).to_dict()["stdev"])
+
+        with self.assertRaises(TypeError):
+            BenchmarkResult(-1, [1.0])
+        with self.assertRaises(TypeError):
+            BenchmarkResult("name", "invalid_samples")
+        with self.assertRaises(ValueError):
+            BenchmarkResult("name", [])
+
+    def test_comparison(self):
+        comparison = Comparison("name", 1.0, 1.2)
+        self.assertAlmostEqual(1.2, comparison.ratio)
+        self.assertTrue(comparison.is_regression(0.1))
+        self.assertFalse(comparison.is_regression(0.3))
+
+        # 片方にしか無いベンチマークは比較しない
+        self.assertIsNone(Comparison("name", None, 1.0).ratio)
+        self.assertIsNone(Comparison("name", 1.0, None).ratio)
+        self.assertFalse(Comparison("name", None, 1.0).is_regression(0.1))
+
+    def test_run_benchmark_class(self):
+        mock_perf_counter = self.enterContext(patch("benchmarks.harness.time.perf_counter"))
+        mock_perf_counter.side_effect = [0.0, 1.0, 0.0, 3.0, 0.0, 2.0, 0.0, 4.0]
+        instance_list = []
+
+        class RecordedBench(SampleBench):
+            def __init__(self):
+                super().__init__()
+                instance_list.append(self)
+
+        RecordedBench.__module__ = "benchmarks.bench_sample"
+        actual = run_benchmark_class(RecordedBench, 2, {"SIZE": 100, "UNKNOWN": 1})
+        expect = [
+            BenchmarkResult("bench_sample.RecordedBench.time_a", [1.0, 3.0]),
+            BenchmarkResult("bench_sample.RecordedBench.time_b", [2.0, 4.0]),
+        ]
+        self.assertEqual(expect, actual)
+
+        # setup_class/teardown_class は1回だけ、setup/teardown は計測ごとに呼ぶ
+        expect_calls = ["setup_class"]
+        expect_calls += ["setup", "time_a:100", "teardown"] * 2
+        expect_calls += ["setup", "time_b", "teardown"] * 2
+        expect_calls += ["teardown_class"]
+        self.assertEqual(expect_calls, instance_list[0].calls)
+        self.assertFalse(hasattr(instance_list[0], "UNKNOWN"))
+
+        # 名前で絞り込む
+        mock_perf_counter.side_effect = [0.0, 1.0]
+        actual = run_benchmark_class(RecordedBench, 1, {}, "time_b")
+        self.assertEqual(["bench_sample.RecordedBench.time_b"], [result.name for result in actual])
+        self.assertEqual([], run_benchmark_class(RecordedBench, 1, {}, "no_match"))
+
+        # 計測中に例外が発生しても teardown_class を呼ぶ
+        class ErrorBench(RecordedBench):
+            def time_a(self):
+                raise ValueError
+
+        mock_perf_counter.side_effect = [0.0]
+        with self.assertRaises(ValueError):
+            run_benchmark_class(ErrorBench, 1, {})
+        self.assertEqual("teardown_class", instance_list[-1].calls[-1])
+
+    def test_benchmark_runner_create(self):
+        runner = BenchmarkRunner.create(3, ["ROW_NUM=1000000", "TWEET_NUM=100"], "bench_db")
+        self.assertEqual(BenchmarkRunner(3, {"ROW_NUM": 1000000, "TWEET_NUM": 100}, "bench_db"), runner)
+
+        with self.assertRaises(ValueError):
+            BenchmarkRunner.create(3, ["ROW_NUM"])
+        with self.assertRaises(ValueError):
+            BenchmarkRunner.create(3, ["ROW_NUM=many"])
+        with self.assertRaises(ValueError):
+            BenchmarkRunner(0)
+        with self.assertRaises(TypeError):
+            BenchmarkRunner("invalid_repeat")
+
+    def test_compare_reports(self):
+        base = {"results": {"a": {"median": 1.0}, "b": {"median": 2.0}}}
+        target = {"results": {"a": {"median": 1.5}, "c": {"median": 1.0}}}
+        actual = compare_reports(base, target)
+        expect = [Comparison("a", 1.0, 1.5), Comparison("b", 2.0, None), Comparison("c", None, 1.0)]
+        self.assertEqual(expect, actual)
+
+        formatted = format_comparison(actual, 0.1).splitlines()
+        self.assertEqual(4, len(formatted))
+        self.assertTrue(formatted[1].startswith("a "))
+        self.assertTrue(formatted[1].endswith("1.50 REGRESSION"))
+        self.assertNotIn("REGRESSION", formatted[2])
+
+    def test_save_report(self):
+        report = {"commit": "abc1234", "results": {"a": {"median": 1.0}}}
+        path = save_report(report, self.TBP / "result.json")
+        self.assertEqual(report, orjson.loads(path.read_bytes()))
+
+        # 保存先を指定しない場合は日時とコミットをファイル名にする
+        self.enterContext(patch("benchmarks.harness.RESULT_DIR", self.TBP))
+        path = save_report(report)
+        self.assertEqual(self.TBP, path.parent)
+        self.assertTrue(path.name.endswith("_abc1234.json"))
+
+    def test_run_all_benchmarks(self):
+        # 全てのベンチマークが最小の規模で最後まで実行できる
+        self.enterContext(patch("media_gathering.crawler.logger"))
+        self.enterContext(patch("media_gathering.fav_crawler.logger"))
+        params = {
+            "TWEET_NUM": 20,
+            "ROW_NUM": 50,
+            "OPERATION_NUM": 5,
+            "FLAG_NUM": 10,
+            "FILE_NUM": 20,
+            "DIR_NUM": 2,
+            "MEDIA_NUM": 2,
+            "MEDIA_SIZE": 1024,
+            "FAV_NUM": 30,
+            "RETWEET_NUM": 10,
+            "EXTERNAL_LINK_NUM": 10,
+            "MEDIA_FILE_NUM": 10,
+            "AUTHOR_NUM": 3,
+            "WORK_NUM": 2,
+            "RESOLVE_NUM": 2,
+        }
+        class_list = collect_benchmarks()
+        module_names = {cls.__module__ for cls in class_list}
+        self.assertEqual(
+            {
+                "benchmarks.bench_archive",
+                "benchmarks.bench_crawler",
+                "benchmarks.bench_db_controller",
+                "benchmarks.bench_parser",
+            },
+            module_names,
+        )
+
+        report = BenchmarkRunner(1, params).run(class_list, log=lambda message: None)
+        self.assertEqual(params, report["params"])
+        self.assertIn("bench_parser.LikeParserBench.time_parse_to_TweetInfo", report["results"])
+        self.assertIn("bench_crawler.TweetMediaSaverBench.time_tweet_media_saver", report["results"])
+        self.assertIn("bench_archive.ArchiveBench.time_write_gallery", report["results"])
+        self.assertTrue(all(result["repeat"] == 1 for result in report["results"].values()))
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,209 @@
+import shutil
+import sys
+import unittest
+from pathlib import Path
+
+import orjson
+from jinja2 import Template
+from mock import MagicMock, patch
+
+from media_gathering.db_controller_base import DBControllerBase
+from media_gathering.html_writer.gallery_writer import GalleryWriter
+from media_gathering.thumbnail_cache import ThumbnailCache
+from media_gathering.util import Result
+
+
+class TestGalleryWriter(unittest.TestCase):
+    def setUp(self):
+        self.TBP = Path("./tests/html_writer/gallery")
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+        self.fav_gallery_path = self.TBP / "FavGallery"
+        self.rt_gallery_path = self.TBP / "RetweetGallery"
+        self.enterContext(patch.object(GalleryWriter, "FAV_GALLERY_PATH", str(self.fav_gallery_path)))
+        self.enterContext(patch.object(GalleryWriter, "RETWEET_GALLERY_PATH", str(self.rt_gallery_path)))
+
+    def tearDown(self):
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+
+    def _make_db_controller(self, record_num: int) -> tuple[MagicMock, list[dict]]:
+        records = [
+            {
+                "id": i,
+                "url": f"dummy_url_{i}",
+                "url_thumbnail": f"dummy_url_thumbnail_{i}",
+                "tweet_url": f"dummy_tweet_url_{i}",
+            }
+            for i in range(1, record_num + 1)
+        ]
+
+        def select_gallery_since(last_id: int, limit: int) -> list[dict]:
+            return [r for r in records if r["id"] > last_id][:limit]
+
+        db_controller = MagicMock(spec=DBControllerBase)
+        db_controller.select_gallery_since.side_effect = select_gallery_since
+        return db_controller, records
+
+    def _to_row(self, record: dict) -> dict:
+        return {"url": record["url"], "url_thumbnail": record["url_thumbnail"], "tweet_url": record["tweet_url"]}
+
+    def test_init(self):
+        db_controller = MagicMock(spec=DBControllerBase)
+        gallery_writer = GalleryWriter("Fav", db_controller, 100, 128)
+        self.assertEqual("Fav", gallery_writer.op_type)
+        self.assertEqual(db_controller, gallery_writer.db_controller)
+        self.assertEqual(100, gallery_writer.shard_size)
+        self.assertEqual(128, gallery_writer.pic_width)
+        self.assertIsInstance(gallery_writer.template, Template)
+        self.assertEqual("../pointer.png", GalleryWriter.POINTER_PATH)
+        self.assertEqual("gallery.txt", GalleryWriter.TEMPLATE_NAME)
+        self.assertEqual(2, GalleryWriter.MANIFEST_VERSION)
+
+        gallery_writer = GalleryWriter("RT", db_controller)
+        self.assertEqual(500, gallery_writer.shard_size)
+        self.assertEqual(256, gallery_writer.pic_width)
+
+        with self.assertRaises(TypeError):
+            gallery_writer = GalleryWriter(-1, db_controller)
+        with self.assertRaises(TypeError):
+            gallery_writer = GalleryWriter("Fav", "invalid_db_controller")
+        with self.assertRaises(TypeError):
+            gallery_writer = GalleryWriter("Fav", db_controller, "invalid_shard_size")
+        with self.assertRaises(TypeError):
+            gallery_writer = GalleryWriter("Fav", db_controller, 100, "invalid_pic_width")
+        with self.assertRaises(ValueError):
+            gallery_writer = GalleryWriter("invalid_op_type", db_controller)
+        with self.assertRaises(ValueError):
+            gallery_writer = GalleryWriter("Fav", db_controller, 0)
+        with self.assertRaises(ValueError):
+            gallery_writer = GalleryWriter("Fav", db_controller, 100, -1)
+
+    def test_get_gallery_path(self):
+        self.assertEqual(self.fav_gallery_path, GalleryWriter.get_gallery_path("Fav"))
+        self.assertEqual(self.rt_gallery_path, GalleryWriter.get_gallery_path("RT"))
+        self.assertIsNone(GalleryWriter.get_gallery_path("invalid_op_type"))
+
+    def test_jsonp(self):
+        path = self.TBP / "sample.js"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        args = [3, [{"url": "dummy_url\n", "tweet_url": "</script>"}]]
+        data = GalleryWriter.dump_jsonp("MediaGathering.shard", args)
+        self.assertTrue(data.startswith(b"MediaGathering.shard(\n"))
+        self.assertTrue(data.endswith(b"\n);\n"))
+        path.write_bytes(data)
+        self.assertEqual(args, GalleryWriter.load_jsonp(path))
+
+    def test_write_gallery(self):
+        db_controller, records = self._make_db_controller(7)
+        gallery_writer = GalleryWriter("Fav", db_controller, 3)
+
+        def load_shard(index: int) -> list[dict]:
+            actual_index, rows = GalleryWriter.load_jsonp(GalleryWriter.shard_path(self.fav_gallery_path, index))
+            self.assertEqual(index, actual_index)
+            return rows
+
+        def load_manifest() -> dict:
+            manifest = orjson.loads((self.fav_gallery_path / "manifest.json").read_bytes())
+            self.assertEqual([manifest], GalleryWriter.load_jsonp(self.fav_gallery_path / "manifest.js"))
+            return manifest
+
+        # 初回は全件を出力する
+        actual = gallery_writer.write_gallery()
+        self.assertEqual(Result.success, actual)
+        self.assertEqual([self._to_row(r) for r in records[0:3]], load_shard(0))
+        self.assertEqual([self._to_row(r) for r in records[3:6]], load_shard(1))
+        self.assertEqual([self._to_row(r) for r in records[6:7]], load_shard(2))
+        self.assertEqual({"version": 2, "shard_size": 3, "shard_count": 3, "total": 7, "last_id": 7}, load_manifest())
+        html = (self.fav_gallery_path / "index.html").read_text(encoding="utf-8")
+        self.assertIn("<title>FavMediaGathering</title>", html)
+        self.assertIn("IntersectionObserver", html)
+        self.assertIn('<script src="manifest.js"></script>', html)
+
+        # 追加が無ければシャードは書き換えない
+        shard_mtimes = [GalleryWriter.shard_path(self.fav_gallery_path, i).stat().st_mtime_ns for i in range(3)]
+        with patch("media_gathering.html_writer.gallery_writer.Path.write_bytes") as mock_write_bytes:
+            actual = gallery_writer.write_gallery()
+            self.assertEqual(Result.success, actual)
+            written = [c.args[0] for c in mock_write_bytes.call_args_list]
+            self.assertEqual(2, len(written))  # manifest.json と manifest.js のみ
+        self.assertEqual({"version": 2, "shard_size": 3, "shard_count": 3, "total": 7, "last_id": 7}, load_manifest())
+
+        # 追加分は末尾のシャードにのみ書き込む
+        records.extend([
+            {"id": i, "url": f"dummy_url_{i}", "url_thumbnail": f"dummy_url_thumbnail_{i}", "tweet_url": f"t_{i}"}
+            for i in range(8, 12)
+        ])
+        actual = gallery_writer.write_gallery()
+        self.assertEqual(Result.success, actual)
+        new_mtimes = [GalleryWriter.shard_path(self.fav_gallery_path, i).stat().st_mtime_ns for i in range(2)]
+        self.assertEqual(shard_mtimes[:2], new_mtimes)
+        self.assertEqual([self._to_row(r) for r in records[6:9]], load_shard(2))
+        self.assertEqual([self._to_row(r) for r in records[9:11]], load_shard(3))
+        self.assertEqual(
+            {"version": 2, "shard_size": 3, "shard_count": 4, "total": 11, "last_id": 11}, load_manifest()
+        )
+        db_controller.select_gallery_since.assert_called_with(11, 3)
+
+        # force 指定時とシャードサイズ変更時は作り直す
+        actual = gallery_writer.write_gallery(force=True)
+        self.assertEqual(Result.success, actual)
+        self.assertEqual(
+            {"version": 2, "shard_size": 3, "shard_count": 4, "total": 11, "last_id": 11}, load_manifest()
+        )
+
+        # manifest のバージョンが古い場合も作り直す
+        manifest = orjson.loads((self.fav_gallery_path / "manifest.json").read_bytes())
+        manifest["version"] = 1
+        (self.fav_gallery_path / "manifest.json").write_bytes(orjson.dumps(manifest))
+        actual = gallery_writer.write_gallery()
+        self.assertEqual(Result.success, actual)
+        self.assertEqual(
+            {"version": 2, "shard_size": 3, "shard_count": 4, "total": 11, "last_id": 11}, load_manifest()
+        )
+
+        gallery_writer = GalleryWriter("Fav", db_controller, 5)
+        actual = gallery_writer.write_gallery()
+        self.assertEqual(Result.success, actual)
+        self.assertEqual(
+            {"version": 2, "shard_size": 5, "shard_count": 3, "total": 11, "last_id": 11}, load_manifest()
+        )
+        self.assertFalse(GalleryWriter.shard_path(self.fav_gallery_path, 3).exists())
+        self.assertEqual([self._to_row(r) for r in records[10:11]], load_shard(2))
+
+        # レコードが無い場合
+        db_controller, records = self._make_db_controller(0)
+        gallery_writer = GalleryWriter("RT", db_controller)
+        actual = gallery_writer.write_gallery()
+        self.assertEqual(Result.success, actual)
+        manifest = orjson.loads((self.rt_gallery_path / "manifest.json").read_bytes())
+        self.assertEqual({"version": 2, "shard_size": 500, "shard_count": 0, "total": 0, "last_id": 0}, manifest)
+        self.assertIn("<title>RetweetMediaGathering</title>", (self.rt_gallery_path / "index.html").read_text())
+
+        gallery_writer.op_type = "invalid_op_type"
+        actual = gallery_writer.write_gallery()
+        self.assertEqual(Result.failed, actual)
+
+    def test_write_gallery_local_thumbnail(self):
+        thumbnail_path = self.TBP / "thumbnails"
+        self.enterContext(patch.object(ThumbnailCache, "THUMBNAIL_PATH", str(thumbnail_path)))
+        db_controller, records = self._make_db_controller(2)
+        records[0]["img_filename"] = "sample_1.jpg"
+        records[1]["img_filename"] = "sample_2.mp4"
+        thumbnail_path.mkdir(parents=True, exist_ok=True)
+        (thumbnail_path / ThumbnailCache.thumbnail_name("sample_1.jpg")).touch()
+
+        # ローカルにサムネイルがあるものはそちらを参照し、無いものはリモートのURLのまま
+        gallery_writer = GalleryWriter("Fav", db_controller)
+        actual = gallery_writer.write_gallery()
+        self.assertEqual(Result.success, actual)
+        _, rows = GalleryWriter.load_jsonp(GalleryWriter.shard_path(self.fav_gallery_path, 0))
+        expect = "../thumbnails/" + ThumbnailCache.thumbnail_name("sample_1.jpg")
+        self.assertEqual(expect, rows[0]["url_thumbnail"])
+        self.assertEqual("dummy_url_thumbnail_2", rows[1]["url_thumbnail"])
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -1,3 +1,5 @@
+import os
+import shutil
 import sys
 import unittest
 from contextlib import ExitStack
@@ -12,6 +14,15 @@ from media_gathering.util import Result
 
 
 class TestHtmlWriter(unittest.TestCase):
+    def setUp(self):
+        self.TBP = Path("./tests/html_writer/html")
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+
+    def tearDown(self):
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+
     def test_init(self):
         op_type = "Fav"
         db_controller = MagicMock(spec=DBControllerBase)
@@ -25,7 +36,12 @@ class TestHtmlWriter(unittest.TestCase):
         self.assertEqual(limit, html_writer.limit)
         self.assertEqual(column_num, html_writer.column_num)
         self.assertEqual(pic_width, html_writer.pic_width)
-        self.assertEqual(template, html_writer.template)
+        self.assertIsInstance(html_writer.template, Template)
+        self.assertEqual(template, Path(html_writer.template.filename).read_text(encoding="utf-8"))
+        # コンパイル済テンプレートはインスタンス間で共有される
+        self.assertIs(html_writer.template, HtmlWriter("RT", db_controller).template)
+        self.assertEqual("template.txt", HtmlWriter.TEMPLATE_NAME)
+        self.assertEqual(".fingerprint", HtmlWriter.FINGERPRINT_SUFFIX)
         self.assertEqual("./pointer.png", HtmlWriter.POINTER_PATH)
         self.assertEqual("./html/FavMediaGathering.html", HtmlWriter.FAV_HTML_PATH)
         self.assertEqual("./html/RetweetMediaGathering.html", HtmlWriter.RETWEET_HTML_PATH)
@@ -49,52 +65,111 @@ class TestHtmlWriter(unittest.TestCase):
         with self.assertRaises(ValueError):
             html_writer = HtmlWriter(op_type, db_controller, limit, column_num, -1)
 
+    def test_get_save_path(self):
+        self.assertEqual(Path("./html/FavMediaGathering.html"), HtmlWriter.get_save_path("Fav"))
+        self.assertEqual(Path("./html/RetweetMediaGathering.html"), HtmlWriter.get_save_path("RT"))
+        self.assertIsNone(HtmlWriter.get_save_path("invalid_op_type"))
+
+    def test_make_fingerprint(self):
+        db_controller = MagicMock(spec=DBControllerBase)
+        html_writer = HtmlWriter("Fav", db_controller)
+        record = {"url": "dummy_url", "url_thumbnail": "dummy_url_thumbnail", "tweet_url": "dummy_tweet_url"}
+
+        actual = html_writer.make_fingerprint([record])
+        self.assertEqual(actual, html_writer.make_fingerprint([record]))
+        self.assertNotEqual(actual, html_writer.make_fingerprint([]))
+        self.assertNotEqual(actual, HtmlWriter("Fav", db_controller, column_num=3).make_fingerprint([record]))
+
     def test_write_result_html(self):
         with ExitStack() as stack:
-            mock_write_text = stack.enter_context(patch("media_gathering.html_writer.html_writer.Path.write_text"))
+            fav_html_path = self.TBP / "FavMediaGathering.html"
+            rt_html_path = self.TBP / "RetweetMediaGathering.html"
+            stack.enter_context(patch.object(HtmlWriter, "FAV_HTML_PATH", str(fav_html_path)))
+            stack.enter_context(patch.object(HtmlWriter, "RETWEET_HTML_PATH", str(rt_html_path)))
+            mock_replace = stack.enter_context(
+                patch("media_gathering.html_writer.html_writer.os.replace", side_effect=os.replace)
+            )
 
             record = {"url": "dummy_url", "url_thumbnail": "dummy_url_thumbnail", "tweet_url": "dummy_tweet_url"}
+            record_list = [record]
             db_controller = MagicMock(spec=DBControllerBase)
-            db_controller.select.side_effect = lambda limit: [record]
+            db_controller.select.side_effect = lambda limit: record_list
             html_writer = HtmlWriter("Fav", db_controller)
 
+            def make_html(record_list: list[dict]) -> str:
+                source_list = [
+                    {
+                        "url": record["url"],
+                        "url_thumbnail": record["url_thumbnail"],
+                        "tweet_url": record["tweet_url"],
+                    }
+                    for record in record_list
+                ]
+                column_num = 6
+                pic_width = 256
+                template_file = (Path(__file__).parent / "template/template.txt").read_text(encoding="utf-8")
+                template: Template = Template(source=template_file)
+                return template.render(
+                    source_list=source_list,
+                    column_num=column_num,
+                    pic_width=pic_width,
+                    pointer_path=HtmlWriter.POINTER_PATH,
+                )
+
+            # 初回は出力する
             actual = html_writer.write_result_html()
             self.assertEqual(Result.success, actual)
+            self.assertEqual(make_html(record_list), fav_html_path.read_text(encoding="utf-8"))
+            fingerprint_path = self.TBP / "FavMediaGathering.html.fingerprint"
+            self.assertEqual(html_writer.make_fingerprint(record_list), fingerprint_path.read_text(encoding="utf-8"))
+            # 一時ファイルを経由して置き換える
+            tmp_path = self.TBP / "FavMediaGathering.html.tmp"
+            mock_replace.assert_called_once_with(tmp_path, fav_html_path)
+            self.assertFalse(tmp_path.exists())
+            mock_replace.reset_mock()
 
-            record_list = [record]
-            source_list = [
-                {
-                    "url": record["url"],
-                    "url_thumbnail": record["url_thumbnail"],
-                    "tweet_url": record["tweet_url"],
-                }
-                for record in record_list
-            ]
-            column_num = 6
-            pic_width = 256
-            template_file = (Path(__file__).parent / "template/template.txt").read_text(encoding="utf-8")
-            template: Template = Template(source=template_file)
-            html = template.render(
-                source_list=source_list,
-                column_num=column_num,
-                pic_width=pic_width,
-                pointer_path=HtmlWriter.POINTER_PATH,
-            )
-            mock_write_text.assert_called_once_with(html, encoding="utf-8")
-            mock_write_text.reset_mock()
+            # 最新レコードが変わっていなければ出力しない
+            actual = html_writer.write_result_html()
+            self.assertEqual(Result.success, actual)
+            mock_replace.assert_not_called()
+
+            # force 指定時は出力する
+            actual = html_writer.write_result_html(force=True)
+            self.assertEqual(Result.success, actual)
+            mock_replace.assert_called_once()
+            mock_replace.reset_mock()
+
+            # 最新レコードが変わっていれば出力する
+            record_2 = {
+                "url": "dummy_url_2",
+                "url_thumbnail": "dummy_url_thumbnail_2",
+                "tweet_url": "dummy_tweet_url_2",
+            }
+            record_list = [record_2, record]
+            actual = html_writer.write_result_html()
+            self.assertEqual(Result.success, actual)
+            mock_replace.assert_called_once()
+            self.assertEqual(make_html(record_list), fav_html_path.read_text(encoding="utf-8"))
+            mock_replace.reset_mock()
+
+            # htmlが削除されていれば出力する
+            fav_html_path.unlink()
+            actual = html_writer.write_result_html()
+            self.assertEqual(Result.success, actual)
+            self.assertTrue(fav_html_path.is_file())
+            mock_replace.reset_mock()
 
             html_writer = HtmlWriter("RT", db_controller)
             actual = html_writer.write_result_html()
             self.assertEqual(Result.success, actual)
-            mock_write_text.assert_called_once_with(html, encoding="utf-8")
-            mock_write_text.reset_mock()
+            self.assertEqual(make_html(record_list), rt_html_path.read_text(encoding="utf-8"))
+            mock_replace.reset_mock()
 
             html_writer = HtmlWriter("Fav", db_controller)
             html_writer.op_type = "Invalid_op_type"
-            actual = html_writer.write_result_html()
+            actual = html_writer.write_result_html(force=True)
             self.assertEqual(Result.failed, actual)
-            mock_write_text.assert_not_called()
-            mock_write_text.reset_mock()
+            mock_replace.assert_not_called()
 
 
 if __name__ == "__main__":
@@ -11,6 +11,7 @@ from pathlib import Path
 
 from mock import MagicMock, mock_open, patch
 
+from media_gathering.link_search.downloaded_index import DownloadedIndex
 from media_gathering.link_search.nico_seiga.authorid import Authorid
 from media_gathering.link_search.nico_seiga.authorname import Authorname
 from media_gathering.link_search.nico_seiga.illustname import Illustname
@@ -45,12 +46,14 @@ class TestNicoSeigaDownloader(unittest.TestCase):
                 patch("media_gathering.link_search.nico_seiga.nico_seiga_session.NicoSeigaSession._is_valid")
             )
             session = NicoSeigaSession("username", "password")
+        downloaded_index = MagicMock(spec=DownloadedIndex)
 
-        downloader = NicoSeigaDownloader(nicoseiga_url, base_path, session)
+        downloader = NicoSeigaDownloader(nicoseiga_url, base_path, session, downloaded_index)
 
         self.assertEqual(nicoseiga_url, downloader.nicoseiga_url)
         self.assertEqual(base_path, downloader.base_path)
         self.assertEqual(session, downloader.session)
+        self.assertEqual(downloaded_index, downloader.downloaded_index)
 
     def test_is_valid(self):
         nicoseiga_url = NicoSeigaURL.create("https://seiga.nicovideo.jp/seiga/im11111111")
@@ -64,8 +67,9 @@ class TestNicoSeigaDownloader(unittest.TestCase):
                 patch("media_gathering.link_search.nico_seiga.nico_seiga_session.NicoSeigaSession._is_valid")
             )
             session = NicoSeigaSession("username", "password")
+        downloaded_index = MagicMock(spec=DownloadedIndex)
 
-        downloader = NicoSeigaDownloader(nicoseiga_url, base_path, session)
+        downloader = NicoSeigaDownloader(nicoseiga_url, base_path, session, downloaded_index)
 
         # 正常系
         self.assertEqual(True, downloader._is_valid())
@@ -73,15 +77,19 @@ class TestNicoSeigaDownloader(unittest.TestCase):
         # 異常系
         # 作品ページ指定が不正
         with self.assertRaises(TypeError):
-            downloader = NicoSeigaDownloader("invalid args", base_path, session)
+            downloader = NicoSeigaDownloader("invalid args", base_path, session, downloaded_index)
 
         # 保存ディレクトリベースパス指定が不正
         with self.assertRaises(TypeError):
-            downloader = NicoSeigaDownloader(nicoseiga_url, "invalid args", session)
+            downloader = NicoSeigaDownloader(nicoseiga_url, "invalid args", session, downloaded_index)
 
         # セッション指定が不正
         with self.assertRaises(TypeError):
-            downloader = NicoSeigaDownloader(nicoseiga_url, base_path, "invalid args")
+            downloader = NicoSeigaDownloader(nicoseiga_url, base_path, "invalid args", downloaded_index)
+
+        # DL済インデックス指定が不正
+        with self.assertRaises(TypeError):
+            downloader = NicoSeigaDownloader(nicoseiga_url, base_path, session, "invalid args")
 
     def test_download(self):
         nicoseiga_url = NicoSeigaURL.create("https://seiga.nicovideo.jp/seiga/im11111111")
@@ -94,11 +102,12 @@ class TestNicoSeigaDownloader(unittest.TestCase):
         save_directory_path = NicoSeigaSaveDirectoryPath.create(illust_info, base_path)
 
         session = MagicMock()
-        session.get_author_id.side_effect = lambda id: author_id
-        session.get_illust_title.side_effect = lambda id: illust_name
-        session.get_author_name.side_effect = lambda id: author_name
+        session.get_illust_info.side_effect = lambda id: illust_info
         session.get_source_url.side_effect = lambda id: None
         session.get_illust_binary.side_effect = lambda url: b"\x89\x50\x4e\x47\x0d\x0a\x1a\x0a"
+        index_path = base_path / ".test_downloaded_index"
+        index_path.unlink(missing_ok=True)
+        downloaded_index = DownloadedIndex(index_path)
         with ExitStack() as stack:
             m_is_valid = stack.enter_context(
                 patch("media_gathering.link_search.nico_seiga.nico_seiga_downloader.NicoSeigaDownloader._is_valid")
@@ -110,20 +119,25 @@ class TestNicoSeigaDownloader(unittest.TestCase):
             )
 
             # 初回DL想定
-            downloader = NicoSeigaDownloader(nicoseiga_url, base_path, session)
+            downloader = NicoSeigaDownloader(nicoseiga_url, base_path, session, downloaded_index)
             expect = DownloadResult.SUCCESS
             actual = downloader.download()
             self.assertEqual(expect, actual)
 
             # 2回目DL想定
+            # DL済インデックスで判定するため静画情報は取得しない
+            session.reset_mock()
             expect = DownloadResult.PASSED
             actual = downloader.download()
             self.assertEqual(expect, actual)
+            session.get_illust_info.assert_not_called()
+            session.get_illust_binary.assert_not_called()
 
             # 後始末
             sd_path = save_directory_path.path
             if sd_path.parent.exists():
                 shutil.rmtree(sd_path.parent)
+            index_path.unlink(missing_ok=True)
 
 
 if __name__ == "__main__":
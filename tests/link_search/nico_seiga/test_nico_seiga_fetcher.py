@@ -36,6 +36,9 @@ class TestNicoSeigaFetcher(unittest.TestCase):
             m_session = stack.enter_context(
                 patch("media_gathering.link_search.nico_seiga.nico_seiga_fetcher.NicoSeigaSession")
             )
+            m_downloaded_index = stack.enter_context(
+                patch("media_gathering.link_search.nico_seiga.nico_seiga_fetcher.DownloadedIndex")
+            )
 
             username = Username("ユーザー1_ID")
             password = Password("ユーザー1_PW")
@@ -47,6 +50,8 @@ class TestNicoSeigaFetcher(unittest.TestCase):
             m_session.assert_called_once_with(username, password)
             self.assertEqual(True, hasattr(actual, "base_path"))
             self.assertEqual(base_path, actual.base_path)
+            m_downloaded_index.create.assert_called_once_with(base_path, "nico_seiga")
+            self.assertEqual(m_downloaded_index.create.return_value, actual.downloaded_index)
 
             # 異常系
             with self.assertRaises(TypeError):
@@ -61,6 +66,9 @@ class TestNicoSeigaFetcher(unittest.TestCase):
             m_session = stack.enter_context(
                 patch("media_gathering.link_search.nico_seiga.nico_seiga_fetcher.NicoSeigaSession")
             )
+            m_downloaded_index = stack.enter_context(
+                patch("media_gathering.link_search.nico_seiga.nico_seiga_fetcher.DownloadedIndex")
+            )
 
             username = Username("ユーザー1_ID")
             password = Password("ユーザー1_PW")
@@ -84,6 +92,9 @@ class TestNicoSeigaFetcher(unittest.TestCase):
             m_session = stack.enter_context(
                 patch("media_gathering.link_search.nico_seiga.nico_seiga_fetcher.NicoSeigaSession")
             )
+            m_downloaded_index = stack.enter_context(
+                patch("media_gathering.link_search.nico_seiga.nico_seiga_fetcher.DownloadedIndex")
+            )
             m_downloader = stack.enter_context(
                 patch("media_gathering.link_search.nico_seiga.nico_seiga_fetcher.NicoSeigaDownloader")
             )
@@ -97,7 +108,7 @@ class TestNicoSeigaFetcher(unittest.TestCase):
             nicoseiga_url = NicoSeigaURL.create(illust_url)
             actual = fetcher.fetch(illust_url)
             self.assertEqual(None, actual)
-            m_downloader.assert_called_once_with(nicoseiga_url, base_path, fetcher.session)
+            m_downloader.assert_called_once_with(nicoseiga_url, base_path, fetcher.session, fetcher.downloaded_index)
             m_downloader().download.assert_called_once_with()
 
 
@@ -14,6 +14,7 @@ from media_gathering.link_search.nico_seiga.authorid import Authorid
 from media_gathering.link_search.nico_seiga.authorname import Authorname
 from media_gathering.link_search.nico_seiga.illustid import Illustid
 from media_gathering.link_search.nico_seiga.illustname import Illustname
+from media_gathering.link_search.nico_seiga.nico_seiga_info import NicoSeigaInfo
 from media_gathering.link_search.nico_seiga.nico_seiga_session import NicoSeigaSession
 from media_gathering.link_search.password import Password
 from media_gathering.link_search.url import URL
@@ -24,7 +25,7 @@ class TestNicoSeigaSession(unittest.TestCase):
     def _get_session(self):
         with ExitStack() as stack:
             mock_session = stack.enter_context(
-                patch("media_gathering.link_search.nico_seiga.nico_seiga_session.httpx.Client")
+                patch("media_gathering.link_search.nico_seiga.nico_seiga_session.HttpClientRegistry.get")
             )
             mock_is_valid = stack.enter_context(
                 patch("media_gathering.link_search.nico_seiga.nico_seiga_session.NicoSeigaSession._is_valid")
@@ -50,7 +51,7 @@ class TestNicoSeigaSession(unittest.TestCase):
             return_get = MagicMock()
             return_get.get = return_get_html
 
-            mock_session.side_effect = lambda follow_redirects, timeout, transport: return_get
+            mock_session.side_effect = lambda site: return_get if site == "nico_seiga" else None
             username = Username("dummy_name")
             password = Password("dummy_pass")
             return NicoSeigaSession(username, password)
@@ -71,6 +72,9 @@ class TestNicoSeigaSession(unittest.TestCase):
         self.assertEqual(IMAGE_INFO_API_ENDPOINT_BASE, session.IMAGE_INFO_API_ENDPOINT_BASE)
         self.assertEqual(USERNAME_API_ENDPOINT_BASE, session.USERNAME_API_ENDPOINT_BASE)
         self.assertEqual(IMAGE_SOUECE_API_ENDPOINT_BASE, session.IMAGE_SOUECE_API_ENDPOINT_BASE)
+        self.assertEqual(256, session.AUTHOR_NAME_CACHE_SIZE)
+        self.assertEqual(60 * 60, session.AUTHOR_NAME_CACHE_TTL)
+        self.assertEqual({}, dict(session._author_name_cache))
 
     def test_is_valid(self):
         session = self._get_session()
@@ -97,6 +101,24 @@ class TestNicoSeigaSession(unittest.TestCase):
         self.assertEqual(call.post(session.LOGIN_ENDPOINT, data=params, headers=session.HEADERS), mock_calls[0])
         self.assertEqual(call.post().raise_for_status(), mock_calls[1])
 
+    def test_get_illust_info(self):
+        session = self._get_session()
+        session_mock: MagicMock = session._session
+        session_mock.get = MagicMock(side_effect=session_mock.get)
+        illust_id = Illustid(12345678)
+
+        expect = NicoSeigaInfo(illust_id, Illustname("title_1"), Authorid(1234567), Authorname("author_name_1"))
+        actual = session.get_illust_info(illust_id)
+        self.assertEqual(expect, actual)
+        self.assertEqual(2, session_mock.get.call_count)
+
+        # 同じ作者の2作品目は静画情報の取得のみ
+        session_mock.get.reset_mock()
+        actual = session.get_illust_info(Illustid(12345679))
+        self.assertEqual(1, session_mock.get.call_count)
+        info_url = session.IMAGE_INFO_API_ENDPOINT_BASE + "12345679"
+        session_mock.get.assert_called_once_with(info_url, headers=session.HEADERS)
+
     def test_get_author_id(self):
         session = self._get_session()
         illust_id = Illustid(12345678)
@@ -113,6 +135,38 @@ class TestNicoSeigaSession(unittest.TestCase):
         actual = session.get_author_name(author_id)
         self.assertEqual(expect, actual)
 
+    def test_get_author_name_cache(self):
+        session = self._get_session()
+        session_mock: MagicMock = session._session
+        session_mock.get = MagicMock(side_effect=session_mock.get)
+        author_id = Authorid(1234567)
+
+        with patch("media_gathering.link_search.nico_seiga.nico_seiga_session.time.monotonic") as mock_monotonic:
+            # 初回は取得してキャッシュする
+            mock_monotonic.return_value = 1000.0
+            expect = Authorname("author_name_1")
+            actual = session.get_author_name(author_id)
+            self.assertEqual(expect, actual)
+            self.assertEqual(1, session_mock.get.call_count)
+
+            # 有効期間内はキャッシュを使う
+            mock_monotonic.return_value = 1000.0 + session.AUTHOR_NAME_CACHE_TTL - 1
+            actual = session.get_author_name(author_id)
+            self.assertEqual(expect, actual)
+            self.assertEqual(1, session_mock.get.call_count)
+
+            # 有効期間を過ぎたら再取得する
+            mock_monotonic.return_value = 1000.0 + session.AUTHOR_NAME_CACHE_TTL
+            actual = session.get_author_name(author_id)
+            self.assertEqual(expect, actual)
+            self.assertEqual(2, session_mock.get.call_count)
+
+            # 最大保持数を超えたら古いものから捨てる
+            object.__setattr__(session, "AUTHOR_NAME_CACHE_SIZE", 2)
+            session.get_author_name(Authorid(1))
+            session.get_author_name(Authorid(2))
+            self.assertEqual([1, 2], list(session._author_name_cache.keys()))
+
     def test_get_illust_title(self):
         session = self._get_session()
         illust_id = Illustid(12345678)
@@ -7,7 +7,7 @@ from contextlib import ExitStack
 import httpx
 from mock import MagicMock, call, patch
 
-from media_gathering.link_search.nijie.nijie_cookie import NijieCookie
+from media_gathering.link_search.nijie.nijie_cookie import NijieCookie, NijieCookieExpiredError
 
 
 class TestNijieCookie(unittest.TestCase):
@@ -26,20 +26,24 @@ class TestNijieCookie(unittest.TestCase):
 
     def test_is_valid(self):
         with ExitStack() as stack:
-            mock_get = stack.enter_context(patch("media_gathering.link_search.nijie.nijie_cookie.httpx.get"))
+            mock_registry = stack.enter_context(
+                patch("media_gathering.link_search.nijie.nijie_cookie.HttpClientRegistry.get")
+            )
+            mock_get = mock_registry.return_value.get
             NIJIE_TOP_URL = "http://nijie.info/index.php"
             mock_res = MagicMock()
             mock_res.status_code = 200
             mock_res.url = NIJIE_TOP_URL
             mock_res.text = "ニジエ - nijie"
-            mock_get.side_effect = lambda url, headers, cookies, follow_redirects: mock_res
+            mock_get.side_effect = lambda url, headers, cookies: mock_res
 
             headers = {"headers": "dummy_headers"}
             cookies = httpx.Cookies()
             cookies.set(name="dummy_name", value="dummy_value")
             nijie_cookie = NijieCookie(cookies, headers)
 
-            mock_get.assert_called_once_with(NIJIE_TOP_URL, headers=headers, cookies=cookies, follow_redirects=True)
+            mock_registry.assert_called_once_with("nijie")
+            mock_get.assert_called_once_with(NIJIE_TOP_URL, headers=headers, cookies=cookies)
             r_calls = mock_res.mock_calls
             self.assertEqual(1, len(r_calls))
             self.assertEqual(call.raise_for_status(), r_calls[0])
@@ -58,6 +62,31 @@ class TestNijieCookie(unittest.TestCase):
             with self.assertRaises(TypeError):
                 nijie_cookie = NijieCookie("invalid_cookies_type", headers)
 
+            # 確認を省略する場合はトップページをGETしない
+            mock_get.reset_mock()
+            mock_res.status_code = 404
+            cookies.set(name="dummy_name", value="dummy_value")
+            nijie_cookie = NijieCookie(cookies, headers, _skip_validation=True)
+            mock_get.assert_not_called()
+            self.assertEqual(cookies, nijie_cookie._cookies)
+            self.assertEqual(headers, nijie_cookie._headers)
+
+            # 確認を省略する場合でも型と空チェックは行う
+            with self.assertRaises(ValueError):
+                nijie_cookie = NijieCookie(httpx.Cookies(), headers, _skip_validation=True)
+
+    def test_is_age_check_response(self):
+        mock_res = MagicMock()
+        mock_res.url = "https://nijie.info/age_jump.php?url=%2Fview.php%3Fid%3D12345678"
+        self.assertTrue(NijieCookie.is_age_check_response(mock_res))
+        mock_res.url = httpx.URL("http://nijie.info/age_jump.php?url=")
+        self.assertTrue(NijieCookie.is_age_check_response(mock_res))
+        mock_res.url = "https://nijie.info/view.php?id=12345678"
+        self.assertFalse(NijieCookie.is_age_check_response(mock_res))
+
+    def test_NijieCookieExpiredError(self):
+        self.assertTrue(issubclass(NijieCookieExpiredError, ValueError))
+
 
 if __name__ == "__main__":
     if sys.argv:
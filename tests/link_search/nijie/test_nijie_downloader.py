@@ -6,11 +6,16 @@ import unittest
 from contextlib import ExitStack
 from pathlib import Path
 
+import httpx
 from mock import MagicMock, patch
 
-from media_gathering.link_search.nijie.nijie_cookie import NijieCookie
+from media_gathering.http_client_registry import MeteredTransport
+from media_gathering.link_search.downloaded_index import DownloadedIndex
+from media_gathering.link_search.nijie.nijie_cookie import NijieCookie, NijieCookieExpiredError
 from media_gathering.link_search.nijie.nijie_downloader import DownloadResult, NijieDownloader
 from media_gathering.link_search.nijie.nijie_url import NijieURL
+from media_gathering.link_search.rate_limiter import RateLimiter
+from media_gathering.metrics import Metrics, collect
 
 
 class TestNijieDownloader(unittest.TestCase):
@@ -21,6 +26,7 @@ class TestNijieDownloader(unittest.TestCase):
         rmdir = [p for p in self.TBP.glob("*") if p.is_dir() and p.name != "__pycache__"]
         for p in rmdir:
             shutil.rmtree(p)
+        (self.TBP / ".test_downloaded_index").unlink(missing_ok=True)
 
     def test_DownloadResult(self):
         expect = ["SUCCESS", "PASSED"]
@@ -31,42 +37,54 @@ class TestNijieDownloader(unittest.TestCase):
         nijie_url = NijieURL.create("http://nijie.info/view_popup.php?id=12345678")
         base_path = Path(self.TBP)
         cookies = MagicMock(spec=NijieCookie)
+        downloaded_index = MagicMock(spec=DownloadedIndex)
+        session = MagicMock(spec=httpx.Client)
+        rate_limiter = RateLimiter(0)
 
-        actual = NijieDownloader(nijie_url, base_path, cookies)
+        actual = NijieDownloader(nijie_url, base_path, cookies, downloaded_index, session, rate_limiter)
 
         self.assertEqual(nijie_url, actual.nijie_url)
         self.assertEqual(base_path, actual.base_path)
         self.assertEqual(cookies, actual.cookies)
+        self.assertEqual(downloaded_index, actual.downloaded_index)
+        self.assertEqual(session, actual.session)
+        self.assertEqual(rate_limiter, actual.rate_limiter)
 
     def test_is_valid(self):
         nijie_url = NijieURL.create("http://nijie.info/view_popup.php?id=12345678")
         base_path = Path(self.TBP)
         cookies = MagicMock(spec=NijieCookie)
+        downloaded_index = MagicMock(spec=DownloadedIndex)
+        session = MagicMock(spec=httpx.Client)
+        rate_limiter = RateLimiter(0)
 
-        actual = NijieDownloader(nijie_url, base_path, cookies)
+        actual = NijieDownloader(nijie_url, base_path, cookies, downloaded_index, session, rate_limiter)
 
         self.assertTrue(actual._is_valid())
 
         with self.assertRaises(TypeError):
-            actual = NijieDownloader("invalid argument", base_path, cookies)
+            actual = NijieDownloader("invalid argument", base_path, cookies, downloaded_index, session, rate_limiter)
         with self.assertRaises(TypeError):
-            actual = NijieDownloader(nijie_url, "invalid argument", cookies)
+            actual = NijieDownloader(nijie_url, "invalid argument", cookies, downloaded_index, session, rate_limiter)
         with self.assertRaises(TypeError):
-            actual = NijieDownloader(nijie_url, base_path, "invalid argument")
+            actual = NijieDownloader(nijie_url, base_path, "invalid argument", downloaded_index, session, rate_limiter)
+        with self.assertRaises(TypeError):
+            actual = NijieDownloader(nijie_url, base_path, cookies, "invalid argument", session, rate_limiter)
+        with self.assertRaises(TypeError):
+            actual = NijieDownloader(nijie_url, base_path, cookies, downloaded_index, "invalid argument", rate_limiter)
+        with self.assertRaises(TypeError):
+            actual = NijieDownloader(nijie_url, base_path, cookies, downloaded_index, session, "invalid argument")
 
     def test_download(self):
         with ExitStack() as stack:
-            mock_session = stack.enter_context(
-                patch("media_gathering.link_search.nijie.nijie_downloader.httpx.Client")
-            )
             mock_logger_info = stack.enter_context(
                 patch("media_gathering.link_search.nijie.nijie_downloader.logger.info")
             )
-            mock_sleep = stack.enter_context(patch("media_gathering.link_search.nijie.nijie_downloader.sleep"))
 
             work_id = 10000000
 
             mock_res = MagicMock()
+            mock_res.url = f"https://nijie.info/view.php?id={work_id}"
             mock_res.text = """
                 <title>作品名1 | 作者名1 | ニジエ</title>
                 <div id="img_filter" data-index='0'>
@@ -76,25 +94,34 @@ class TestNijieDownloader(unittest.TestCase):
                 </div>
             """
             mock_res.content = b"dummy_content"
-            mock_get = MagicMock()
+            mock_get = MagicMock(spec=httpx.Client)
             mock_get.get.side_effect = lambda url, headers, cookies: mock_res
-            mock_session.side_effect = lambda follow_redirects, timeout, transport: mock_get
+            rate_limiter = MagicMock(spec=RateLimiter)
 
             nijie_url = NijieURL.create(f"http://nijie.info/view_popup.php?id={work_id}")
             base_path = Path(self.TBP)
             cookies = MagicMock(spec=NijieCookie)
             cookies._headers = {"dummy_headers": "dummy_headers"}
             cookies._cookies = {"dummy_cookies": "dummy_cookies"}
+            downloaded_index = DownloadedIndex(base_path / ".test_downloaded_index")
 
             # 一枚絵初回DL想定
-            actual = NijieDownloader(nijie_url, base_path, cookies).download()
+            actual = NijieDownloader(
+                nijie_url, base_path, cookies, downloaded_index, mock_get, rate_limiter
+            ).download()
             expect = DownloadResult.SUCCESS
             self.assertIs(expect, actual)
 
             # 一枚絵2回目DL想定
-            actual = NijieDownloader(nijie_url, base_path, cookies).download()
+            # DL済インデックスで判定するため作品ページは取得しない
+            mock_get.get.reset_mock()
+            actual = NijieDownloader(
+                nijie_url, base_path, cookies, downloaded_index, mock_get, rate_limiter
+            ).download()
             expect = DownloadResult.PASSED
             self.assertIs(expect, actual)
+            mock_get.get.assert_not_called()
+            self.assertIn(work_id, downloaded_index)
 
             # 漫画形式初回DL想定
             work_id = 20000000
@@ -118,17 +145,71 @@ class TestNijieDownloader(unittest.TestCase):
                 <img src="//pic.nijie.net/04/nijie/23m02/24/22222222/illust/sample_04.jpg" border="0" />
                 </a></div>
             """
-            actual = NijieDownloader(nijie_url, base_path, cookies).download()
+            actual = NijieDownloader(
+                nijie_url, base_path, cookies, downloaded_index, mock_get, rate_limiter
+            ).download()
             expect = DownloadResult.SUCCESS
             self.assertIs(expect, actual)
+            # 各ページのDL前にリクエスト間隔の制限を行う
+            self.assertEqual(5, rate_limiter.wait.call_count)
+            self.assertEqual(4, len(list(base_path.glob("*/作品名2(20000000)/作品名2(20000000)_*.jpg"))))
 
             # 漫画形式2回目DL想定
-            actual = NijieDownloader(nijie_url, base_path, cookies).download()
+            actual = NijieDownloader(
+                nijie_url, base_path, cookies, downloaded_index, mock_get, rate_limiter
+            ).download()
             expect = DownloadResult.PASSED
             self.assertIs(expect, actual)
 
+            # クッキーが失効していて年齢確認画面に飛ばされた場合
+            work_id = 30000000
+            nijie_url = NijieURL.create(f"http://nijie.info/view_popup.php?id={work_id}")
+            mock_res.url = "https://nijie.info/age_jump.php?url=%2Fview.php%3Fid%3D30000000"
+            with self.assertRaises(NijieCookieExpiredError):
+                actual = NijieDownloader(
+                    nijie_url, base_path, cookies, downloaded_index, mock_get, rate_limiter
+                ).download()
+            self.assertNotIn(work_id, downloaded_index)
+
             # 後始末
 
+    def test_download_metrics(self):
+        """並行DLした各ページが実行中のクロールの計測値に記録されることをチェックする"""
+        work_id = 20000000
+        html = "<title>作品名2 | 作者名2 | ニジエ</title>" + "".join(
+            f"""
+            <div id="img_filter" data-index='0'>
+            <a href="javascript:void(0);">
+            <img src="//pic.nijie.net/04/nijie/23m02/24/22222222/illust/sample_{i:02}.jpg" border="0" />
+            </a></div>
+            """
+            for i in range(1, 5)
+        )
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.host == "nijie.info":
+                return httpx.Response(200, text=html)
+            return httpx.Response(200, content=iter([b"dummy_content"]))
+
+        client = httpx.Client(transport=MeteredTransport(httpx.MockTransport(handler)))
+        self.addCleanup(client.close)
+        nijie_url = NijieURL.create(f"http://nijie.info/view_popup.php?id={work_id}")
+        base_path = Path(self.TBP)
+        cookies = MagicMock(spec=NijieCookie)
+        cookies._headers = {}
+        cookies._cookies = {}
+        downloaded_index = DownloadedIndex(base_path / ".test_downloaded_index")
+        rate_limiter = MagicMock(spec=RateLimiter)
+
+        metrics = Metrics()
+        with patch("media_gathering.link_search.nijie.nijie_downloader.logger.info"), collect(metrics):
+            actual = NijieDownloader(nijie_url, base_path, cookies, downloaded_index, client, rate_limiter).download()
+        self.assertIs(DownloadResult.SUCCESS, actual)
+        self.assertEqual(2, metrics.get_counter("http_requests_total", host="nijie.info", status=200))
+        self.assertEqual(4, metrics.get_counter("http_requests_total", host="pic.nijie.net", status=200))
+        expect = 4 * len(b"dummy_content")
+        self.assertEqual(expect, metrics.get_counter("http_response_bytes_total", host="pic.nijie.net"))
+
 
 if __name__ == "__main__":
     if sys.argv:
@@ -7,8 +7,12 @@ from contextlib import ExitStack
 from pathlib import Path
 
 import httpx
+import orjson
 from mock import MagicMock, call, mock_open, patch
 
+from media_gathering.http_client_registry import HttpClientRegistry
+from media_gathering.link_search.nijie.nijie_cookie import NijieCookieExpiredError
+from media_gathering.link_search.nijie.nijie_downloader import DownloadResult
 from media_gathering.link_search.nijie.nijie_fetcher import NijieFetcher
 from media_gathering.link_search.nijie.nijie_url import NijieURL
 from media_gathering.link_search.password import Password
@@ -30,6 +34,9 @@ class TestNijieFetcher(unittest.TestCase):
             self.mock_login = stack.enter_context(
                 patch("media_gathering.link_search.nijie.nijie_fetcher.NijieFetcher.login")
             )
+            self.mock_downloaded_index = stack.enter_context(
+                patch("media_gathering.link_search.nijie.nijie_fetcher.DownloadedIndex")
+            )
 
             self.username = Username("ユーザー1_ID")
             self.password = Password("ユーザー1_PW")
@@ -45,6 +52,14 @@ class TestNijieFetcher(unittest.TestCase):
         self.mock_login.assert_called_once_with(self.username, self.password)
         self.assertTrue(hasattr(actual, "base_path"))
         self.assertEqual(self.base_path, actual.base_path)
+        self.assertEqual(self.username, actual.username)
+        self.assertEqual(self.password, actual.password)
+        self.assertEqual(24 * 60 * 60, actual.cookie_validation_window)
+        self.mock_downloaded_index.create.assert_called_once_with(self.base_path, "nijie")
+        self.assertEqual(self.mock_downloaded_index.create.return_value, actual.downloaded_index)
+        self.assertIsInstance(actual.session, httpx.Client)
+        self.assertIs(HttpClientRegistry.get("nijie"), actual.session)
+        self.assertEqual(0.5, actual.rate_limiter.interval)
 
         expect = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/88.0.4324.190 Safari/537.36"
@@ -52,6 +67,8 @@ class TestNijieFetcher(unittest.TestCase):
         self.assertEqual(expect, actual.HEADERS)
         expect = "./config/nijie_cookie.json"
         self.assertEqual(expect, actual.NIJIE_COOKIE_PATH)
+        expect = "./config/nijie_cookie_meta.json"
+        self.assertEqual(expect, actual.NIJIE_COOKIE_META_PATH)
 
         # 異常系
         with self.assertRaises(TypeError):
@@ -60,18 +77,25 @@ class TestNijieFetcher(unittest.TestCase):
             actual = NijieFetcher(self.username, "invalid args", self.base_path)
         with self.assertRaises(TypeError):
             actual = NijieFetcher(self.username, self.password, "invalid args")
+        with self.assertRaises(TypeError):
+            actual = NijieFetcher(self.username, self.password, self.base_path, "invalid args")
 
     def test_login(self):
         fetcher = self._get_instance()
         ncp = self.TBP / fetcher.NIJIE_COOKIE_PATH
         object.__setattr__(fetcher, "NIJIE_COOKIE_PATH", str(ncp))
+        ncmp = self.TBP / fetcher.NIJIE_COOKIE_META_PATH
+        object.__setattr__(fetcher, "NIJIE_COOKIE_META_PATH", str(ncmp))
 
         with ExitStack() as stack:
             mock_path_open = stack.enter_context(
                 patch("media_gathering.link_search.nijie.nijie_fetcher.Path.open", mock_open())
             )
-            mock_get = stack.enter_context(patch("media_gathering.link_search.nijie.nijie_fetcher.httpx.get"))
-            mock_post = stack.enter_context(patch("media_gathering.link_search.nijie.nijie_fetcher.httpx.post"))
+            mock_registry = stack.enter_context(
+                patch("media_gathering.link_search.nijie.nijie_fetcher.HttpClientRegistry.get")
+            )
+            mock_get = mock_registry.return_value.get
+            mock_post = mock_registry.return_value.post
             mock_nijie_cookie = stack.enter_context(
                 patch("media_gathering.link_search.nijie.nijie_fetcher.NijieCookie")
             )
@@ -83,7 +107,7 @@ class TestNijieFetcher(unittest.TestCase):
 
             mock_get_res = MagicMock()
             mock_get_res.url = "https://nijie.info/for_login_url?url=for_login_url"
-            mock_get.side_effect = lambda url, headers, follow_redirects: mock_get_res
+            mock_get.side_effect = lambda url, headers: mock_get_res
 
             jar = httpx.Cookies()
             jar.set(
@@ -94,14 +118,13 @@ class TestNijieFetcher(unittest.TestCase):
             )
             mock_post_res = MagicMock()
             mock_post_res.cookies = jar
-            mock_post.side_effect = lambda url, data, follow_redirects: mock_post_res
+            mock_post.side_effect = lambda url, data: mock_post_res
 
             mock_nijie_cookie.side_effect = lambda cookies, headers: "dummy_nijie_cookies"
             actual = fetcher.login(self.username, self.password)
 
-            mock_get.assert_called_once_with(
-                "https://nijie.info/age_jump.php?url=", headers=fetcher.HEADERS, follow_redirects=True
-            )
+            mock_registry.assert_called_once_with("nijie")
+            mock_get.assert_called_once_with("https://nijie.info/age_jump.php?url=", headers=fetcher.HEADERS)
             mock_get_res.raise_for_status.assert_called_once_with()
 
             payload = {
@@ -111,7 +134,7 @@ class TestNijieFetcher(unittest.TestCase):
                 "ticket": "",
                 "url": "for_login_url",
             }
-            mock_post.assert_called_once_with("https://nijie.info/login_int.php", data=payload, follow_redirects=True)
+            mock_post.assert_called_once_with("https://nijie.info/login_int.php", data=payload)
             mock_post_res.raise_for_status.assert_called_once_with()
             mock_nijie_cookie.assert_called_once_with(jar, fetcher.HEADERS)
 
@@ -156,6 +179,98 @@ class TestNijieFetcher(unittest.TestCase):
             with self.assertRaises(TypeError):
                 actual = fetcher.login(self.username, "invalid argument")
 
+    def test_login_with_validated_at(self):
+        fetcher = self._get_instance()
+        ncp = self.TBP / fetcher.NIJIE_COOKIE_PATH
+        object.__setattr__(fetcher, "NIJIE_COOKIE_PATH", str(ncp))
+        ncmp = self.TBP / fetcher.NIJIE_COOKIE_META_PATH
+        object.__setattr__(fetcher, "NIJIE_COOKIE_META_PATH", str(ncmp))
+
+        now = 1700000000.0
+        cookies_dict = [
+            {
+                "name": "dummy_name",
+                "value": "dummy_value",
+                "expires": int(now) + 3600,
+                "path": "/",
+                "domain": ".dummy.domain",
+            }
+        ]
+        jar = httpx.Cookies()
+        jar.set(name="dummy_name", value="dummy_value", path="/", domain=".dummy.domain")
+
+        def write_cookies(validated_at: float | None) -> None:
+            ncp.parent.mkdir(parents=True, exist_ok=True)
+            ncp.write_bytes(orjson.dumps(cookies_dict))
+            ncmp.unlink(missing_ok=True)
+            if validated_at is not None:
+                ncmp.write_bytes(orjson.dumps({"validated_at": validated_at, "expires": int(now) + 3600}))
+
+        with ExitStack() as stack:
+            mock_time = stack.enter_context(patch("media_gathering.link_search.nijie.nijie_fetcher.time.time"))
+            mock_nijie_cookie = stack.enter_context(
+                patch("media_gathering.link_search.nijie.nijie_fetcher.NijieCookie")
+            )
+            mock_time.return_value = now
+
+            # 確認期間内ならトップページへの確認を省略する
+            write_cookies(now - 60)
+            actual = fetcher.login(self.username, self.password)
+            mock_nijie_cookie.assert_called_once_with(jar, fetcher.HEADERS, _skip_validation=True)
+            self.assertEqual(mock_nijie_cookie.return_value, actual)
+
+            # 確認期間を過ぎていれば確認し直し、確認時刻を更新する
+            mock_nijie_cookie.reset_mock()
+            write_cookies(now - fetcher.cookie_validation_window)
+            actual = fetcher.login(self.username, self.password)
+            mock_nijie_cookie.assert_called_once_with(jar, fetcher.HEADERS)
+            meta = orjson.loads(ncmp.read_bytes())
+            self.assertEqual({"validated_at": now, "expires": int(now) + 3600}, meta)
+
+            # 確認結果が無い場合も確認する
+            mock_nijie_cookie.reset_mock()
+            write_cookies(None)
+            actual = fetcher.login(self.username, self.password)
+            mock_nijie_cookie.assert_called_once_with(jar, fetcher.HEADERS)
+
+            # クッキーの有効期限が切れていれば確認期間内でも確認する
+            mock_nijie_cookie.reset_mock()
+            write_cookies(now - 60)
+            mock_time.return_value = now + 7200
+            actual = fetcher.login(self.username, self.password)
+            mock_nijie_cookie.assert_called_once_with(jar, fetcher.HEADERS)
+
+        if ncp.exists():
+            shutil.rmtree(ncp.parent)
+
+    def test_relogin(self):
+        fetcher = self._get_instance()
+        ncp = self.TBP / fetcher.NIJIE_COOKIE_PATH
+        object.__setattr__(fetcher, "NIJIE_COOKIE_PATH", str(ncp))
+        ncmp = self.TBP / fetcher.NIJIE_COOKIE_META_PATH
+        object.__setattr__(fetcher, "NIJIE_COOKIE_META_PATH", str(ncmp))
+        ncp.parent.mkdir(parents=True, exist_ok=True)
+        ncp.touch()
+        ncmp.touch()
+
+        with ExitStack() as stack:
+            mock_login = stack.enter_context(
+                patch("media_gathering.link_search.nijie.nijie_fetcher.NijieFetcher.login")
+            )
+            mock_login.return_value = "relogin_cookies"
+
+            actual = fetcher.relogin()
+
+            # 保存済クッキーと確認結果は破棄してからログインする
+            self.assertFalse(ncp.exists())
+            self.assertFalse(ncmp.exists())
+            mock_login.assert_called_once_with(self.username, self.password)
+            self.assertEqual("relogin_cookies", actual)
+            self.assertEqual("relogin_cookies", fetcher.cookies)
+
+        if ncp.parent.exists():
+            shutil.rmtree(ncp.parent)
+
     def test_is_target_url(self):
         fetcher = self._get_instance()
 
@@ -193,9 +308,36 @@ class TestNijieFetcher(unittest.TestCase):
 
             f_calls = mock_nijie_downloader.mock_calls
             self.assertEqual(2, len(f_calls))
-            self.assertEqual(call(NijieURL.create(url), fetcher.base_path, fetcher.cookies), f_calls[0])
+            self.assertEqual(
+                call(
+                    NijieURL.create(url),
+                    fetcher.base_path,
+                    fetcher.cookies,
+                    fetcher.downloaded_index,
+                    fetcher.session,
+                    fetcher.rate_limiter,
+                ),
+                f_calls[0],
+            )
             self.assertEqual(call().download(), f_calls[1])
 
+            # クッキーが失効していた場合は再ログインして一度だけ再試行する
+            mock_relogin = stack.enter_context(
+                patch("media_gathering.link_search.nijie.nijie_fetcher.NijieFetcher.relogin")
+            )
+            mock_nijie_downloader.reset_mock()
+            mock_nijie_downloader.return_value.download.side_effect = [NijieCookieExpiredError, DownloadResult.SUCCESS]
+            actual = fetcher.fetch(url)
+            mock_relogin.assert_called_once_with()
+            self.assertEqual(2, mock_nijie_downloader.return_value.download.call_count)
+
+            # 再試行でも失効していた場合は送出する
+            mock_relogin.reset_mock()
+            mock_nijie_downloader.return_value.download.side_effect = NijieCookieExpiredError
+            with self.assertRaises(NijieCookieExpiredError):
+                actual = fetcher.fetch(url)
+            mock_relogin.assert_called_once_with()
+
             with self.assertRaises(TypeError):
                 actual = fetcher.fetch(-1)
 
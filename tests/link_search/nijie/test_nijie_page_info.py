@@ -98,6 +98,46 @@ class TestNijiePageInfo(unittest.TestCase):
         with self.assertRaises(TypeError):
             actual = NijiePageInfo.create(-1, int(author_id.id))
 
+    def test_create_from_html(self):
+        html = """
+            <html><head><title>作品名1 | 作者名1 | ニジエ</title></head>
+            <body>
+            <div id="header"><img src="//nijie.info/pic/logo/nijie_logo.png" /></div>
+            <div id="img_filter" data-index='0'>
+            <a href="javascript:void(0);">
+            <img src="//pic.nijie.net/04/nijie/23m02/24/11111111/illust/sample_01.jpg" border="0" />
+            </a>
+            </div>
+            <div id="img_filter" data-index='1'>
+            <a href="javascript:void(0);">
+            <img src="//pic.nijie.net/04/nijie/23m02/24/11111111/illust/sample_02.jpg" border="0" />
+            </a>
+            </div>
+            </body></html>
+        """
+        author_id = Authorid(11111111)
+        actual = NijiePageInfo.create_from_html(html, int(author_id.id))
+
+        # 解析対象外のdivに含まれるimgは無視される
+        urls = [
+            "http://pic.nijie.net/04/nijie/23m02/24/11111111/illust/sample_01.jpg",
+            "http://pic.nijie.net/04/nijie/23m02/24/11111111/illust/sample_02.jpg",
+        ]
+        source_list = NijieSourceList.create(urls)
+        author_name = Authorname("作者名1")
+        illust_name = Worktitle("作品名1")
+        expect = NijiePageInfo(source_list, author_name, author_id, illust_name)
+        self.assertEqual(expect, actual)
+
+        # 全体を解析した場合と結果が一致する
+        soup = BeautifulSoup(html, "html.parser")
+        self.assertEqual(NijiePageInfo.create(soup, int(author_id.id)), actual)
+
+        with self.assertRaises(ValueError):
+            actual = NijiePageInfo.create_from_html("", int(author_id.id))
+        with self.assertRaises(TypeError):
+            actual = NijiePageInfo.create_from_html(-1, int(author_id.id))
+
 
 if __name__ == "__main__":
     if sys.argv:
@@ -23,6 +23,9 @@ class TestPixivFetcher(unittest.TestCase):
     def get_instance(self):
         with ExitStack() as stack:
             m_login = stack.enter_context(patch("media_gathering.link_search.pixiv.pixiv_fetcher.PixivFetcher.login"))
+            m_downloaded_index = stack.enter_context(
+                patch("media_gathering.link_search.pixiv.pixiv_fetcher.DownloadedIndex")
+            )
             username = Username("ユーザー1_ID")
             password = Password("ユーザー1_PW")
             base_path = Path(self.TBP)
@@ -34,6 +37,9 @@ class TestPixivFetcher(unittest.TestCase):
     def test_PixivFetcher(self):
         with ExitStack() as stack:
             m_login = stack.enter_context(patch("media_gathering.link_search.pixiv.pixiv_fetcher.PixivFetcher.login"))
+            m_downloaded_index = stack.enter_context(
+                patch("media_gathering.link_search.pixiv.pixiv_fetcher.DownloadedIndex")
+            )
 
             REFRESH_TOKEN_PATH = "./config/refresh_token.ini"
             username = Username("ユーザー1_ID")
@@ -47,6 +53,12 @@ class TestPixivFetcher(unittest.TestCase):
             self.assertEqual(True, hasattr(actual, "base_path"))
             self.assertEqual(base_path, actual.base_path)
             self.assertEqual(REFRESH_TOKEN_PATH, actual.REFRESH_TOKEN_PATH)
+            m_downloaded_index.create.assert_called_once()
+            self.assertEqual((base_path, "pixiv"), m_downloaded_index.create.call_args.args[:2])
+            is_target = m_downloaded_index.create.call_args.args[2]
+            self.assertTrue(is_target(Path("作者名1(1)/作品名1(2).png")))
+            self.assertFalse(is_target(Path("作者名1(1)/小説名1(3).txt")))
+            self.assertEqual(m_downloaded_index.create.return_value, actual.downloaded_index)
 
             # 異常系
             with self.assertRaises(TypeError):
@@ -125,9 +137,24 @@ class TestPixivFetcher(unittest.TestCase):
             m_pixiv_source_list.create.assert_called_once_with(fetcher.aapi, pixiv_work_url)
             m_pixiv_save_directory_path.create.assert_called_once_with(fetcher.aapi, pixiv_work_url, fetcher.base_path)
             m_downloader.assert_called_once_with(
-                fetcher.aapi, m_pixiv_source_list.create(), m_pixiv_save_directory_path.create()
+                fetcher.aapi,
+                m_pixiv_source_list.create(),
+                m_pixiv_save_directory_path.create(),
+                fetcher.downloaded_index,
             )
             m_downloader().download.assert_called_once_with()
+            fetcher.downloaded_index.__contains__.assert_called_once_with(86704541)
+
+            # DL済の作品はAPIを呼ばず、保存先も探索しない
+            m_pixiv_source_list.reset_mock()
+            m_pixiv_save_directory_path.reset_mock()
+            m_downloader.reset_mock()
+            fetcher.downloaded_index.__contains__.return_value = True
+            actual = fetcher.fetch(work_url)
+            self.assertEqual(None, actual)
+            m_pixiv_source_list.create.assert_not_called()
+            m_pixiv_save_directory_path.create.assert_not_called()
+            m_downloader.assert_not_called()
 
 
 if __name__ == "__main__":
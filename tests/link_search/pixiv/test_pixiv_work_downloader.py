@@ -9,6 +9,7 @@ from pathlib import Path
 from mock import MagicMock, call, patch
 from pixivpy3 import AppPixivAPI
 
+from media_gathering.link_search.downloaded_index import DownloadedIndex
 from media_gathering.link_search.pixiv.pixiv_save_directory_path import PixivSaveDirectoryPath
 from media_gathering.link_search.pixiv.pixiv_source_list import PixivSourceList
 from media_gathering.link_search.pixiv.pixiv_work_downloader import DownloadResult, PixivWorkDownloader
@@ -40,28 +41,33 @@ class TestPixivWorkDownloader(unittest.TestCase):
         aapi = MagicMock(spec=AppPixivAPI)
         source_list = MagicMock(spec=PixivSourceList)
         save_directory_path = MagicMock(spec=PixivSaveDirectoryPath)
+        downloaded_index = MagicMock(spec=DownloadedIndex)
 
-        actual = PixivWorkDownloader(aapi, source_list, save_directory_path)
+        actual = PixivWorkDownloader(aapi, source_list, save_directory_path, downloaded_index)
 
         self.assertEqual(aapi, actual.aapi)
         self.assertEqual(source_list, actual.source_list)
         self.assertEqual(save_directory_path, actual.save_directory_path)
+        self.assertEqual(downloaded_index, actual.downloaded_index)
 
     def test_is_valid(self):
         aapi = MagicMock(spec=AppPixivAPI)
         source_list = MagicMock(spec=PixivSourceList)
         save_directory_path = MagicMock(spec=PixivSaveDirectoryPath)
+        downloaded_index = MagicMock(spec=DownloadedIndex)
 
-        actual = PixivWorkDownloader(aapi, source_list, save_directory_path)
+        actual = PixivWorkDownloader(aapi, source_list, save_directory_path, downloaded_index)
 
         self.assertTrue(actual._is_valid())
 
         with self.assertRaises(TypeError):
-            actual = PixivWorkDownloader("invalid argument", source_list, save_directory_path)
+            actual = PixivWorkDownloader("invalid argument", source_list, save_directory_path, downloaded_index)
         with self.assertRaises(TypeError):
-            actual = PixivWorkDownloader(aapi, "invalid argument", save_directory_path)
+            actual = PixivWorkDownloader(aapi, "invalid argument", save_directory_path, downloaded_index)
         with self.assertRaises(TypeError):
-            actual = PixivWorkDownloader(aapi, source_list, "invalid argument")
+            actual = PixivWorkDownloader(aapi, source_list, "invalid argument", downloaded_index)
+        with self.assertRaises(TypeError):
+            actual = PixivWorkDownloader(aapi, source_list, save_directory_path, "invalid argument")
 
     def test_download(self):
         with ExitStack() as stack:
@@ -82,10 +88,13 @@ class TestPixivWorkDownloader(unittest.TestCase):
             if sd_path.parent.is_dir():
                 shutil.rmtree(sd_path.parent)
             save_directory_path = PixivSaveDirectoryPath(sd_path)
+            index_path = base_path / ".test_downloaded_index"
+            index_path.unlink(missing_ok=True)
+            downloaded_index = DownloadedIndex(index_path)
 
             aapi = self.mock_aapi()
 
-            actual = PixivWorkDownloader(aapi, source_list, save_directory_path).download()
+            actual = PixivWorkDownloader(aapi, source_list, save_directory_path, downloaded_index).download()
             expect = DownloadResult.SUCCESS
             self.assertIs(expect, actual)
 
@@ -101,15 +110,24 @@ class TestPixivWorkDownloader(unittest.TestCase):
             aapi.reset_mock()
             mock_ugoira.reset_mock()
 
-            actual = PixivWorkDownloader(aapi, source_list, save_directory_path).download()
+            actual = PixivWorkDownloader(aapi, source_list, save_directory_path, downloaded_index).download()
             expect = DownloadResult.PASSED
             self.assertIs(expect, actual)
             aapi.assert_not_called()
             mock_ugoira.assert_not_called()
+            self.assertIn(work_id.id, downloaded_index)
 
             if sd_path.parent.is_dir():
                 shutil.rmtree(sd_path.parent)
 
+            # DL済インデックスに記録済ならファイルが無くてもスキップ
+            actual = PixivWorkDownloader(aapi, source_list, save_directory_path, downloaded_index).download()
+            expect = DownloadResult.PASSED
+            self.assertIs(expect, actual)
+            aapi.assert_not_called()
+            index_path.unlink(missing_ok=True)
+            downloaded_index = DownloadedIndex(index_path)
+
             # 漫画形式
             source_url_base = (
                 "https://i.pximg.net/c/600x1200_90/img-master/img/2023/03/01/00/00/00/12345678_p{}_master1200.jpg"
@@ -117,7 +135,7 @@ class TestPixivWorkDownloader(unittest.TestCase):
             source_urls = [URL(source_url_base.format(i)) for i in range(10)]
             source_list = PixivSourceList(source_urls)
 
-            actual = PixivWorkDownloader(aapi, source_list, save_directory_path).download()
+            actual = PixivWorkDownloader(aapi, source_list, save_directory_path, downloaded_index).download()
             expect = DownloadResult.SUCCESS
             self.assertIs(expect, actual)
 
@@ -129,18 +147,22 @@ class TestPixivWorkDownloader(unittest.TestCase):
             mock_ugoira.assert_not_called()
             aapi.reset_mock()
 
-            actual = PixivWorkDownloader(aapi, source_list, save_directory_path).download()
+            actual = PixivWorkDownloader(aapi, source_list, save_directory_path, downloaded_index).download()
             expect = DownloadResult.PASSED
             self.assertIs(expect, actual)
             aapi.assert_not_called()
             mock_ugoira.assert_not_called()
 
             # 異常系
+            downloaded_index = DownloadedIndex(index_path)
             with self.assertRaises(ValueError):
-                actual = PixivWorkDownloader(aapi, PixivSourceList([]), save_directory_path).download()
+                actual = PixivWorkDownloader(
+                    aapi, PixivSourceList([]), save_directory_path, downloaded_index
+                ).download()
 
             if sd_path.parent.is_dir():
                 shutil.rmtree(sd_path.parent)
+            index_path.unlink(missing_ok=True)
 
 
 if __name__ == "__main__":
@@ -10,6 +10,7 @@ from bs4 import BeautifulSoup
 from mock import MagicMock, call, patch
 from pixivpy3 import AppPixivAPI
 
+from media_gathering.link_search.downloaded_index import DownloadedIndex
 from media_gathering.link_search.pixiv_novel.authorid import Authorid
 from media_gathering.link_search.pixiv_novel.authorname import Authorname
 from media_gathering.link_search.pixiv_novel.novelid import Novelid
@@ -62,28 +63,33 @@ class TestPixivNovelDownloader(unittest.TestCase):
         aapi = MagicMock(spec=AppPixivAPI)
         novel_url = MagicMock(spec=PixivNovelURL)
         save_directory_path = MagicMock(spec=PixivNovelSaveDirectoryPath)
+        downloaded_index = MagicMock(spec=DownloadedIndex)
 
-        actual = PixivNovelDownloader(aapi, novel_url, save_directory_path)
+        actual = PixivNovelDownloader(aapi, novel_url, save_directory_path, downloaded_index)
 
         self.assertEqual(aapi, actual.aapi)
         self.assertEqual(novel_url, actual.novel_url)
         self.assertEqual(save_directory_path, actual.save_directory_path)
+        self.assertEqual(downloaded_index, actual.downloaded_index)
 
     def test_is_valid(self):
         aapi = MagicMock(spec=AppPixivAPI)
         novel_url = MagicMock(spec=PixivNovelURL)
         save_directory_path = MagicMock(spec=PixivNovelSaveDirectoryPath)
+        downloaded_index = MagicMock(spec=DownloadedIndex)
 
-        actual = PixivNovelDownloader(aapi, novel_url, save_directory_path)
+        actual = PixivNovelDownloader(aapi, novel_url, save_directory_path, downloaded_index)
 
         self.assertTrue(actual._is_valid())
 
         with self.assertRaises(TypeError):
-            actual = PixivNovelDownloader("invalid argument", novel_url, save_directory_path)
+            actual = PixivNovelDownloader("invalid argument", novel_url, save_directory_path, downloaded_index)
         with self.assertRaises(TypeError):
-            actual = PixivNovelDownloader(aapi, "invalid argument", save_directory_path)
+            actual = PixivNovelDownloader(aapi, "invalid argument", save_directory_path, downloaded_index)
         with self.assertRaises(TypeError):
-            actual = PixivNovelDownloader(aapi, novel_url, "invalid argument")
+            actual = PixivNovelDownloader(aapi, novel_url, "invalid argument", downloaded_index)
+        with self.assertRaises(TypeError):
+            actual = PixivNovelDownloader(aapi, novel_url, save_directory_path, "invalid argument")
 
     def test_download(self):
         with ExitStack() as stack:
@@ -98,10 +104,13 @@ class TestPixivNovelDownloader(unittest.TestCase):
             if sd_path.parent.is_dir():
                 shutil.rmtree(sd_path.parent)
             save_directory_path = PixivNovelSaveDirectoryPath(sd_path)
+            index_path = base_path / ".test_downloaded_index"
+            index_path.unlink(missing_ok=True)
+            downloaded_index = DownloadedIndex(index_path)
 
             aapi = self.mock_aapi()
 
-            actual = PixivNovelDownloader(aapi, novel_url, save_directory_path).download()
+            actual = PixivNovelDownloader(aapi, novel_url, save_directory_path, downloaded_index).download()
             expect = DownloadResult.SUCCESS
             self.assertIs(expect, actual)
 
@@ -124,29 +133,34 @@ class TestPixivNovelDownloader(unittest.TestCase):
                 f"text_length:{len(text)}\n"
             )
             soup = BeautifulSoup(f"novel {novel_id}'s caption.", "html.parser")
-            caption = f"[caption]\n" f"{soup.prettify()}\n"
+            caption = f"[caption]\n{soup.prettify()}\n"
             expect = info_tag + "\n" + caption + "\n[text]\n" + f"novel {novel_id}'s main text.\n"
             self.assertEqual(expect, actual)
 
-            actual = PixivNovelDownloader(aapi, novel_url, save_directory_path).download()
+            actual = PixivNovelDownloader(aapi, novel_url, save_directory_path, downloaded_index).download()
             expect = DownloadResult.PASSED
             self.assertIs(expect, actual)
+            aapi.assert_not_called()
+            self.assertIn(novel_id, downloaded_index)
             aapi.reset_mock()
 
+            downloaded_index = DownloadedIndex(index_path)
+            (sd_path.parent / name).unlink()
             with self.assertRaises(ValueError):
                 r = MagicMock()
                 r.error = True
                 aapi.novel_text.side_effect = lambda novel_id: r
-                actual = PixivNovelDownloader(aapi, novel_url, save_directory_path).download()
+                actual = PixivNovelDownloader(aapi, novel_url, save_directory_path, downloaded_index).download()
 
             with self.assertRaises(ValueError):
                 r = MagicMock()
                 r.error = True
                 aapi.novel_detail.side_effect = lambda novel_id: r
-                actual = PixivNovelDownloader(aapi, novel_url, save_directory_path).download()
+                actual = PixivNovelDownloader(aapi, novel_url, save_directory_path, downloaded_index).download()
 
             if sd_path.parent.is_dir():
                 shutil.rmtree(sd_path.parent)
+            index_path.unlink(missing_ok=True)
 
 
 if __name__ == "__main__":
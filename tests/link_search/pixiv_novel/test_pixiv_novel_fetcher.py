@@ -25,6 +25,9 @@ class TestPixivNovelFetcher(unittest.TestCase):
             self.mock_login = stack.enter_context(
                 patch("media_gathering.link_search.pixiv_novel.pixiv_novel_fetcher.PixivNovelFetcher.login")
             )
+            self.mock_downloaded_index = stack.enter_context(
+                patch("media_gathering.link_search.pixiv_novel.pixiv_novel_fetcher.DownloadedIndex")
+            )
 
             username = Username("ユーザー1_ID")
             password = Password("ユーザー1_PW")
@@ -38,6 +41,9 @@ class TestPixivNovelFetcher(unittest.TestCase):
             mock_login = stack.enter_context(
                 patch("media_gathering.link_search.pixiv_novel.pixiv_novel_fetcher.PixivNovelFetcher.login")
             )
+            mock_downloaded_index = stack.enter_context(
+                patch("media_gathering.link_search.pixiv_novel.pixiv_novel_fetcher.DownloadedIndex")
+            )
 
             REFRESH_TOKEN_PATH = "./config/refresh_token.ini"
             username = Username("ユーザー1_ID")
@@ -50,6 +56,9 @@ class TestPixivNovelFetcher(unittest.TestCase):
             self.assertTrue(hasattr(fetcher, "base_path"))
             self.assertEqual(base_path, fetcher.base_path)
             self.assertEqual(REFRESH_TOKEN_PATH, fetcher.REFRESH_TOKEN_PATH)
+            mock_downloaded_index.create.assert_called_once()
+            self.assertEqual((base_path, "pixiv_novel"), mock_downloaded_index.create.call_args.args[:2])
+            self.assertEqual(mock_downloaded_index.create.return_value, fetcher.downloaded_index)
 
             with self.assertRaises(TypeError):
                 fetcher = PixivNovelFetcher("invalid args", password, base_path)
@@ -124,7 +133,7 @@ class TestPixivNovelFetcher(unittest.TestCase):
 
             novel_url = PixivNovelURL.create(work_url)
             mock_save_directory_path.assert_called_once_with(fetcher.aapi, novel_url, fetcher.base_path)
-            mock_downloader.assert_called_once_with(fetcher.aapi, novel_url, str(self.TBP))
+            mock_downloader.assert_called_once_with(fetcher.aapi, novel_url, str(self.TBP), fetcher.downloaded_index)
             mock_downloader().download.assert_called_once_with()
 
 
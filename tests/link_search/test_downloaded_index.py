@@ -0,0 +1,97 @@
+"""DownloadedIndex のテスト
+
+DL済作品IDのインデックスを表すクラスをテストする
+"""
+
+import shutil
+import sys
+import unittest
+from pathlib import Path
+
+from media_gathering.link_search.downloaded_index import DownloadedIndex
+
+
+class TestDownloadedIndex(unittest.TestCase):
+    def setUp(self):
+        self.TBP = Path("./tests/link_search/downloaded_index_test")
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+        self.TBP.mkdir(parents=True, exist_ok=True)
+
+    def tearDown(self):
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+
+    def test_DownloadedIndex(self):
+        index_path = self.TBP / ".test_downloaded_index"
+        downloaded_index = DownloadedIndex(index_path)
+        self.assertEqual(index_path, downloaded_index.path)
+        self.assertEqual(0, len(downloaded_index))
+        self.assertEqual(".{}_downloaded_index", DownloadedIndex.INDEX_FILE_NAME)
+
+        with self.assertRaises(TypeError):
+            downloaded_index = DownloadedIndex("invalid_path")
+        with self.assertRaises(TypeError):
+            downloaded_index = DownloadedIndex(index_path, "invalid_ids")
+
+    def test_add(self):
+        index_path = self.TBP / ".test_downloaded_index"
+        downloaded_index = DownloadedIndex(index_path)
+
+        self.assertNotIn(12345678, downloaded_index)
+        downloaded_index.add(12345678)
+        self.assertIn(12345678, downloaded_index)
+        self.assertEqual("12345678\n", index_path.read_text(encoding="utf-8"))
+
+        # 重複して追加してもファイルには追記されない
+        downloaded_index.add(12345678)
+        downloaded_index.add(22222222)
+        self.assertEqual(2, len(downloaded_index))
+        self.assertEqual("12345678\n22222222\n", index_path.read_text(encoding="utf-8"))
+
+        with self.assertRaises(TypeError):
+            downloaded_index.add("invalid_work_id")
+
+    def test_create(self):
+        # 既存の保存ディレクトリから作成する
+        (self.TBP / "作者名1(11111111)/作品名1(10000001)").mkdir(parents=True)
+        (self.TBP / "作者名1(11111111)/作品名1(10000001)/作品名1(10000001)_001.png").touch()
+        (self.TBP / "作者名1(11111111)/作品名2(10000002).png").touch()
+        (self.TBP / "作者名1(11111111)/小説名1(20000001).txt").touch()
+        (self.TBP / "作者名2(22222222)/作品名3(10000003).jpg").parent.mkdir(parents=True)
+        (self.TBP / "作者名2(22222222)/作品名3(10000003).jpg").touch()
+        (self.TBP / "作者名2(22222222)/invalid_name.jpg").touch()
+
+        downloaded_index = DownloadedIndex.create(self.TBP, "test")
+        index_path = self.TBP / ".test_downloaded_index"
+        self.assertEqual(index_path, downloaded_index.path)
+        self.assertTrue(index_path.is_file())
+        expect = {10000001, 10000002, 10000003, 20000001}
+        self.assertEqual(expect, downloaded_index._ids)
+        self.assertNotIn(11111111, downloaded_index)
+
+        # 判定関数で対象を絞り込む
+        downloaded_index = DownloadedIndex.create(self.TBP, "image", lambda p: p.suffix != ".txt")
+        self.assertEqual({10000001, 10000002, 10000003}, downloaded_index._ids)
+
+        # インデックスファイルが存在する場合はディレクトリを走査しない
+        shutil.rmtree(self.TBP / "作者名1(11111111)")
+        downloaded_index = DownloadedIndex.create(self.TBP, "test")
+        self.assertEqual(expect, downloaded_index._ids)
+
+        # 保存ディレクトリが存在しない場合
+        base_path = self.TBP / "not_exist"
+        downloaded_index = DownloadedIndex.create(base_path, "test")
+        self.assertEqual(0, len(downloaded_index))
+        self.assertTrue((base_path / ".test_downloaded_index").is_file())
+
+        with self.assertRaises(TypeError):
+            downloaded_index = DownloadedIndex.create("invalid_base_path", "test")
+        with self.assertRaises(ValueError):
+            downloaded_index = DownloadedIndex.create(self.TBP, "")
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,61 @@
+"""RateLimiter のテスト
+
+リクエスト間隔を制限するクラスをテストする
+"""
+
+import sys
+import unittest
+from contextlib import ExitStack
+
+from mock import patch
+
+from media_gathering.link_search.rate_limiter import RateLimiter
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_RateLimiter(self):
+        rate_limiter = RateLimiter(0.5)
+        self.assertEqual(0.5, rate_limiter.interval)
+
+        rate_limiter = RateLimiter(0)
+        self.assertEqual(0, rate_limiter.interval)
+
+        with self.assertRaises(TypeError):
+            rate_limiter = RateLimiter("invalid_interval")
+        with self.assertRaises(ValueError):
+            rate_limiter = RateLimiter(-1)
+
+    def test_wait(self):
+        with ExitStack() as stack:
+            mock_monotonic = stack.enter_context(patch("media_gathering.link_search.rate_limiter.time.monotonic"))
+            mock_sleep = stack.enter_context(patch("media_gathering.link_search.rate_limiter.time.sleep"))
+
+            rate_limiter = RateLimiter(0.5)
+
+            # 初回は待機しない
+            mock_monotonic.return_value = 100.0
+            rate_limiter.wait()
+            mock_sleep.assert_not_called()
+
+            # 間隔が足りない場合は不足分だけ待機する
+            mock_monotonic.return_value = 100.2
+            rate_limiter.wait()
+            mock_sleep.assert_called_once()
+            self.assertAlmostEqual(0.3, mock_sleep.call_args.args[0])
+
+            # 連続して呼ばれた場合は予約済の枠の後ろに並ぶ
+            mock_sleep.reset_mock()
+            rate_limiter.wait()
+            self.assertAlmostEqual(0.8, mock_sleep.call_args.args[0])
+
+            # 十分に時間が空いていれば待機しない
+            mock_sleep.reset_mock()
+            mock_monotonic.return_value = 200.0
+            rate_limiter.wait()
+            mock_sleep.assert_not_called()
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,183 @@
+import shutil
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import orjson
+from mock import MagicMock, call, patch
+
+from media_gathering.account_crawl import crawl_accounts, crawl_shard, get_auth_token, shard_account_list
+from media_gathering.util import Result
+
+
+class TestAccountCrawl(unittest.TestCase):
+    def setUp(self):
+        self.mock_logger = self.enterContext(patch("media_gathering.account_crawl.logger"))
+        self.base_path = Path("./tests/save/")
+        shutil.rmtree(self.base_path, ignore_errors=True)
+        self.base_path.mkdir(parents=True, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.base_path, ignore_errors=True)
+
+    def _make_account(self, name: str, auth_token: str | None = None) -> dict:
+        account = {
+            "name": name,
+            "save_directory": {
+                "save_fav_path": f"tests/save/{name}/twitterFav",
+                "save_retweet_path": f"tests/save/{name}/twitterRetweet",
+            },
+            "db": {"save_file_name": f"PG_DB_{name}.db"},
+        }
+        if auth_token is not None:
+            account["twitter_api_client"] = {"auth_token": auth_token}
+        return account
+
+    def _make_crawler_class(self) -> MagicMock:
+        crawler_class = MagicMock()
+        crawler_class.__name__ = "FavCrawler"
+        crawler_class.return_value.prune_media_store = True
+        return crawler_class
+
+    def test_get_auth_token(self):
+        self.assertEqual("token_a", get_auth_token(self._make_account("a", "token_a")))
+        self.assertEqual("", get_auth_token(self._make_account("a")))
+
+    def test_shard_account_list(self):
+        account_list = [self._make_account(f"account_{i}", f"token_{i % 3}") for i in range(9)]
+        shard_list = shard_account_list(account_list, 2)
+        self.assertLessEqual(len(shard_list), 2)
+        self.assertEqual(9, sum(len(shard) for shard in shard_list))
+
+        # 同じ認証情報のアカウントは同じシャードに入る
+        for i in range(3):
+            shard_index_set = {
+                index
+                for index, shard in enumerate(shard_list)
+                for account in shard
+                if get_auth_token(account) == f"token_{i}"
+            }
+            self.assertEqual(1, len(shard_index_set))
+
+        # 振り分けは実行のたびに変わらない
+        self.assertEqual(shard_list, shard_account_list(account_list, 2))
+
+        # 空のシャードは返さない
+        self.assertEqual([account_list[:1]], shard_account_list(account_list[:1], 4))
+        self.assertEqual([], shard_account_list([], 4))
+
+        with self.assertRaises(ValueError):
+            shard_account_list(account_list, 0)
+
+    def test_crawl_shard(self):
+        mock_time = self.enterContext(patch("media_gathering.account_crawl.time"))
+        mock_time.monotonic.return_value = 100.0
+        fav_crawler_class = self._make_crawler_class()
+        rt_crawler_class = self._make_crawler_class()
+        rt_crawler_class.__name__ = "RetweetCrawler"
+        account_list = [self._make_account("a", "token_a"), self._make_account("b", "token_b")]
+        fav_crawler_class.return_value.prune_candidate_set = {"f" * 64}
+        rt_crawler_class.return_value.prune_candidate_set = {"0" * 64, "f" * 64}
+
+        # ストアの整理対象は全クローラーの分をまとめて返す
+        actual = crawl_shard([fav_crawler_class, rt_crawler_class], account_list, 60)
+        self.assertEqual(([], ["0" * 64, "f" * 64]), actual)
+
+        # 最初に作成した外部リンク探索機構を使い回す
+        fav_crawler = fav_crawler_class.return_value
+        rt_crawler = rt_crawler_class.return_value
+        self.assertEqual(
+            [call(None, None, account_list[0]), call(rt_crawler.lsb, None, account_list[1])],
+            fav_crawler_class.call_args_list,
+        )
+        self.assertEqual(
+            [call(fav_crawler.lsb, None, account_list[0]), call(fav_crawler.lsb, None, account_list[1])],
+            rt_crawler_class.call_args_list,
+        )
+        self.assertEqual(2, fav_crawler.crawl.call_count)
+        self.assertEqual(2, rt_crawler.crawl.call_count)
+        self.assertFalse(fav_crawler.prune_media_store)
+        self.assertFalse(rt_crawler.prune_media_store)
+
+        # 同じ認証情報での2回目以降のクロールは間隔を空ける
+        self.assertEqual([call(60.0), call(60.0)], mock_time.sleep.call_args_list)
+
+        # 失敗しても残りのアカウントはクロールする
+        mock_time.reset_mock()
+        fav_crawler_class.reset_mock()
+        error = ValueError("crawl failed")
+        fav_crawler_class.side_effect = [error, fav_crawler]
+        actual = crawl_shard([fav_crawler_class], account_list, 0)
+        self.assertEqual((["a:FavCrawler"], ["f" * 64]), actual)
+        self.assertEqual(2, fav_crawler_class.call_count)
+        self.mock_logger.error.assert_called_once_with("a FavCrawler crawl failed.", exc_info=error)
+        mock_time.sleep.assert_not_called()
+
+    def test_crawl_accounts(self):
+        mock_media_store = self.enterContext(patch("media_gathering.account_crawl.MediaStore"))
+        mock_db_controller = self.enterContext(patch("media_gathering.account_crawl.FavDBController"))
+        mock_prune_store = self.enterContext(patch("media_gathering.account_crawl.Crawler.prune_store"))
+        mock_executor = self.enterContext(
+            patch("media_gathering.account_crawl.ProcessPoolExecutor", side_effect=ThreadPoolExecutor)
+        )
+        mock_configure_logging = self.enterContext(patch("media_gathering.account_crawl.configure_logging"))
+        mock_crawl_shard = self.enterContext(patch("media_gathering.account_crawl.crawl_shard"))
+        mock_crawl_shard.side_effect = lambda crawler_class_list, shard, interval: ([], [shard[0]["name"]])
+
+        config = orjson.loads(Path("./config/config_sample.json").read_bytes())
+        account_list = [self._make_account(f"account_{i}", f"token_{i}") for i in range(4)]
+        config["accounts"] = {"workers": 2, "rate_limit_interval_seconds": 30, "account_list": account_list}
+        config_path = self.base_path / "config.json"
+        config_path.write_bytes(orjson.dumps(config))
+        self.enterContext(patch("media_gathering.crawler.Crawler.CONFIG_FILE_NAME", str(config_path)))
+        crawler_class_list = [self._make_crawler_class()]
+
+        actual = crawl_accounts(crawler_class_list)
+        self.assertEqual(Result.success, actual)
+        shard_list = shard_account_list(account_list, 2)
+        self.assertEqual(len(shard_list), mock_crawl_shard.call_count)
+        for shard in shard_list:
+            mock_crawl_shard.assert_any_call(crawler_class_list, shard, 30)
+        # ワーカーは起動時にログ設定を読み込む
+        mock_executor.assert_called_once_with(max_workers=len(shard_list), initializer=mock_configure_logging)
+        mock_configure_logging.assert_called()
+
+        # ストアの整理は全てのクロールが終わってから1回だけ行う
+        # 整理対象は各ワーカーが削除したメディアの実体のみで、参照はストアの実体の記録を元の設定のDBから引く
+        mock_media_store.assert_called_once_with(Path(config["save_directory"]["save_store_path"]))
+        mock_db_controller.assert_called_once_with(Path(config["db"]["save_path"]) / config["db"]["save_file_name"])
+        mock_prune_store.assert_called_once_with(
+            mock_media_store.return_value, mock_db_controller.return_value, {shard[0]["name"] for shard in shard_list}
+        )
+
+        # 失敗したクロールがあれば Result.failed
+        mock_crawl_shard.side_effect = lambda crawler_class_list, shard, interval: ([shard[0]["name"]], [])
+        actual = crawl_accounts(crawler_class_list)
+        self.assertEqual(Result.failed, actual)
+
+        # ワーカー自体が失敗した場合
+        mock_crawl_shard.side_effect = ValueError("worker failed")
+        actual = crawl_accounts(crawler_class_list)
+        self.assertEqual(Result.failed, actual)
+
+        # アカウント名が重複している場合
+        mock_crawl_shard.reset_mock()
+        config["accounts"]["account_list"] = [self._make_account("a"), self._make_account("a")]
+        config_path.write_bytes(orjson.dumps(config))
+        with self.assertRaises(ValueError):
+            crawl_accounts(crawler_class_list)
+        mock_crawl_shard.assert_not_called()
+
+        # アカウントが無い場合は何もしない
+        config["accounts"]["account_list"] = []
+        config_path.write_bytes(orjson.dumps(config))
+        actual = crawl_accounts(crawler_class_list)
+        self.assertEqual(Result.success, actual)
+        mock_crawl_shard.assert_not_called()
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,132 @@
+import hashlib
+import shutil
+import sys
+import unittest
+from pathlib import Path
+
+from mock import patch
+
+from media_gathering.blob_store import BlobStore
+
+
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.TBP = Path("./tests/blob_store")
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+        self.db_fullpath = self.TBP / "PG_DB_blob.db"
+        self.media_path = self.TBP / "media"
+        self.media_path.mkdir(parents=True, exist_ok=True)
+
+    def tearDown(self):
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+
+    def _make_store(self) -> BlobStore:
+        blob_store = BlobStore(self.db_fullpath)
+        self.addCleanup(blob_store.close)
+        return blob_store
+
+    def test_BlobStore(self):
+        blob_store = BlobStore(self.db_fullpath)
+        self.assertEqual(self.db_fullpath, blob_store.db_fullpath)
+        # 使用するまでファイルは作成しない
+        self.assertFalse(self.db_fullpath.exists())
+        with self.assertRaises(TypeError):
+            blob_store = BlobStore("invalid_db_fullpath")
+
+    def test_blob_db_path(self):
+        actual = BlobStore.blob_db_path(Path("./tests/db/PG_DB.db"))
+        self.assertEqual(Path("./tests/db/PG_DB_blob.db"), actual)
+
+    def test_connect(self):
+        blob_store = self._make_store()
+        conn = blob_store.connect()
+        self.assertIs(conn, blob_store.connect())
+        self.assertTrue(self.db_fullpath.is_file())
+        rows = conn.execute("pragma table_info(Blob)").fetchall()
+        self.assertEqual(["id", "sha256", "size", "data"], [row[1] for row in rows])
+
+        blob_store.close()
+        self.assertIsNot(conn, blob_store.connect())
+
+    def test_put(self):
+        blob_store = self._make_store()
+        content = b"sample_media_content" * 10
+        media_file = self.media_path / "sample.jpg"
+        media_file.write_bytes(content)
+        sha256 = hashlib.sha256(content).hexdigest()
+
+        # チャンクごとに書き込まれる
+        with patch.object(BlobStore, "CHUNK_SIZE", 16):
+            blob_id = blob_store.put(media_file, sha256)
+        self.assertEqual(content, blob_store.get(blob_id))
+        self.assertEqual(blob_id, blob_store.find(sha256))
+        row = blob_store.connect().execute("select sha256, size from Blob where id = ?", (blob_id,)).fetchone()
+        self.assertEqual((sha256, len(content)), row)
+
+        # 同じ内容なら書き込まずに同じ id を返す
+        another_file = self.media_path / "another.jpg"
+        another_file.write_bytes(content)
+        self.assertEqual(blob_id, blob_store.put(another_file))
+        self.assertEqual(1, blob_store.connect().execute("select count(*) from Blob").fetchone()[0])
+
+        # 異なる内容なら新しく書き込む
+        another_file.write_bytes(b"another_media_content")
+        another_id = blob_store.put(another_file)
+        self.assertNotEqual(blob_id, another_id)
+        self.assertEqual(b"another_media_content", blob_store.get(another_id))
+
+        # 書き込み途中で失敗した場合は行を残さない
+        broken_file = self.media_path / "broken.jpg"
+        broken_file.write_bytes(b"broken_media_content")
+        with patch.object(Path, "stat") as mock_stat:
+            mock_stat.return_value.st_size = 1
+            with self.assertRaises(ValueError):
+                blob_store.put(broken_file)
+        self.assertEqual(2, blob_store.connect().execute("select count(*) from Blob").fetchone()[0])
+
+    def test_put_other_instance(self):
+        # 別のインスタンスが同じ内容を先に保存していても、重複エラーにならず同じ id を返す
+        blob_store = self._make_store()
+        other_store = self._make_store()
+        content = b"sample_media_content" * 10
+        media_file = self.media_path / "sample.jpg"
+        media_file.write_bytes(content)
+        sha256 = hashlib.sha256(content).hexdigest()
+        blob_id = other_store.put(media_file, sha256)
+
+        # 存在確認の後に他方が挿入した場合を再現する
+        find = BlobStore.find
+        with patch.object(BlobStore, "find", autospec=True) as mock_find:
+            mock_find.side_effect = [None, blob_id]
+            self.assertEqual(blob_id, blob_store.put(media_file, sha256))
+            mock_find.side_effect = [None, blob_id]
+            self.assertEqual(blob_id, blob_store.put_bytes(content))
+        self.assertEqual(blob_id, find(blob_store, sha256))
+        self.assertEqual(content, blob_store.get(blob_id))
+        self.assertEqual(1, blob_store.connect().execute("select count(*) from Blob").fetchone()[0])
+
+    def test_put_bytes(self):
+        blob_store = self._make_store()
+        blob_id = blob_store.put_bytes(b"sample")
+        self.assertEqual(b"sample", blob_store.get(blob_id))
+        self.assertEqual(blob_id, blob_store.find(hashlib.sha256(b"sample").hexdigest()))
+        self.assertEqual(blob_id, blob_store.put_bytes(b"sample"))
+        self.assertNotEqual(blob_id, blob_store.put_bytes(b"another"))
+
+    def test_iter_chunks(self):
+        blob_store = self._make_store()
+        content = bytes(range(256)) * 4
+        blob_id = blob_store.put_bytes(content)
+        with patch.object(BlobStore, "CHUNK_SIZE", 100):
+            actual = list(blob_store.iter_chunks(blob_id))
+        self.assertEqual(11, len(actual))
+        self.assertEqual(content, b"".join(actual))
+        self.assertIsNone(blob_store.find("0" * 64))
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,146 @@
+import hashlib
+import shutil
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+from mock import MagicMock, patch
+
+from media_gathering.blob_store import BlobStore
+from media_gathering.concurrent_crawl import crawl_all
+from media_gathering.media_archive import MediaArchive
+from media_gathering.util import Result
+
+
+class TestConcurrentCrawl(unittest.TestCase):
+    def setUp(self):
+        self.mock_logger = self.enterContext(patch("media_gathering.concurrent_crawl.logger"))
+
+    def _make_crawler_class(self, crawl_type: str) -> MagicMock:
+        crawler_class = MagicMock()
+        crawler_class.return_value.type = crawl_type
+        crawler_class.return_value.prune_media_store = True
+        crawler_class.return_value.prune_candidate_set = set()
+        return crawler_class
+
+    def test_crawl_all(self):
+        fav_crawler_class = self._make_crawler_class("Fav")
+        rt_crawler_class = self._make_crawler_class("RT")
+        fav_crawler = fav_crawler_class.return_value
+        rt_crawler = rt_crawler_class.return_value
+
+        # 両方のクロールが同時に実行されていることを確認する
+        barrier = threading.Barrier(2, timeout=10)
+        fav_crawler.crawl.side_effect = lambda: barrier.wait()
+        rt_crawler.crawl.side_effect = lambda: barrier.wait()
+        fav_crawler.prune_candidate_set = {"0" * 64}
+        rt_crawler.prune_candidate_set = {"f" * 64}
+
+        actual = crawl_all(fav_crawler_class, rt_crawler_class)
+        self.assertEqual(Result.success, actual)
+
+        # RT は Fav の外部リンク探索機構とDBエンジンを共有する
+        fav_crawler_class.assert_called_once_with()
+        rt_crawler_class.assert_called_once_with(fav_crawler.lsb, fav_crawler.db_cont.engine)
+        fav_crawler.crawl.assert_called_once_with()
+        rt_crawler.crawl.assert_called_once_with()
+
+        # ストアの整理は両方のクロールが終わってから、両方の整理対象をまとめて1回だけ行う
+        self.assertFalse(fav_crawler.prune_media_store)
+        self.assertFalse(rt_crawler.prune_media_store)
+        fav_crawler.prune_store.assert_called_once_with(
+            fav_crawler.media_store, fav_crawler.store_db_cont, {"0" * 64, "f" * 64}
+        )
+        rt_crawler.prune_store.assert_not_called()
+        self.assertFalse(fav_crawler.resume)
+        self.assertFalse(rt_crawler.resume)
+        self.assertIsNone(fav_crawler.profiler)
+        self.assertIsNone(rt_crawler.profiler)
+
+    def test_crawl_all_shared_files(self):
+        # Fav と RT が同じブロブストアとアーカイブに同時に書き込んでも失敗せず、内容が壊れない
+        TBP = Path("./tests/concurrent_crawl")
+        if TBP.exists():
+            shutil.rmtree(TBP)
+        self.addCleanup(shutil.rmtree, TBP, ignore_errors=True)
+        media_path = TBP / "media"
+        media_path.mkdir(parents=True, exist_ok=True)
+        shared_media = media_path / "shared.jpg"
+        shared_media.write_bytes(b"shared_media_content" * 10)
+        sha256 = hashlib.sha256(shared_media.read_bytes()).hexdigest()
+
+        crawler_class_list = [self._make_crawler_class("Fav"), self._make_crawler_class("RT")]
+        archived_list = []
+        barrier = threading.Barrier(2, timeout=10)
+        for n, crawler_class in enumerate(crawler_class_list):
+            crawler = crawler_class.return_value
+            # 実際のクローラーと同じく、同じ設定からそれぞれ作成する
+            crawler.blob_store = BlobStore(TBP / "PG_DB_blob.db")
+            crawler.media_archive = MediaArchive(TBP / "archive", 2000)
+            self.addCleanup(crawler.blob_store.close)
+            self.addCleanup(crawler.media_archive.close)
+            archive_list = []
+            for i in range(20):
+                archive_media = media_path / f"archive_{n}_{i}.jpg"
+                archive_media.write_bytes(bytes([n * 50 + i]) * (100 + i))
+                archive_list.append(archive_media)
+            archived_list.extend(archive_list)
+
+            def crawl(crawler=crawler, archive_list=archive_list):
+                barrier.wait()
+                crawler.blob_store.put(shared_media, sha256)
+                crawler.media_archive.archive(archive_list)
+
+            crawler.crawl.side_effect = crawl
+
+        actual = crawl_all(*crawler_class_list)
+        self.assertEqual(Result.success, actual)
+        self.mock_logger.error.assert_not_called()
+
+        blob_store = BlobStore(TBP / "PG_DB_blob.db")
+        self.addCleanup(blob_store.close)
+        self.assertEqual(1, blob_store.connect().execute("select count(*) from Blob").fetchone()[0])
+        self.assertEqual(shared_media.read_bytes(), blob_store.get(blob_store.find(sha256)))
+        media_archive = MediaArchive(TBP / "archive")
+        self.addCleanup(media_archive.close)
+        for archive_media in archived_list:
+            self.assertEqual(archive_media.read_bytes(), media_archive.read(archive_media.name))
+
+    def test_crawl_all_resume(self):
+        fav_crawler_class = self._make_crawler_class("Fav")
+        rt_crawler_class = self._make_crawler_class("RT")
+        actual = crawl_all(fav_crawler_class, rt_crawler_class, True)
+        self.assertEqual(Result.success, actual)
+        self.assertTrue(fav_crawler_class.return_value.resume)
+        self.assertTrue(rt_crawler_class.return_value.resume)
+
+    def test_crawl_all_profile(self):
+        fav_crawler_class = self._make_crawler_class("Fav")
+        rt_crawler_class = self._make_crawler_class("RT")
+        profiler = MagicMock()
+        actual = crawl_all(fav_crawler_class, rt_crawler_class, False, profiler)
+        self.assertEqual(Result.success, actual)
+        self.assertIs(profiler, fav_crawler_class.return_value.profiler)
+        self.assertIs(profiler, rt_crawler_class.return_value.profiler)
+
+    def test_crawl_all_failed(self):
+        fav_crawler_class = self._make_crawler_class("Fav")
+        rt_crawler_class = self._make_crawler_class("RT")
+        fav_crawler = fav_crawler_class.return_value
+        rt_crawler = rt_crawler_class.return_value
+
+        # 片方が失敗してももう片方は最後まで実行する
+        error = ValueError("crawl failed")
+        rt_crawler.crawl.side_effect = error
+        actual = crawl_all(fav_crawler_class, rt_crawler_class)
+        self.assertEqual(Result.failed, actual)
+        fav_crawler.crawl.assert_called_once_with()
+        self.mock_logger.error.assert_called_once_with("RT crawl failed.", exc_info=error)
+        fav_crawler.prune_store.assert_called_once()
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
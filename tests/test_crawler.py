@@ -1,3 +1,5 @@
+import hashlib
+import os
 import shutil
 import sys
 import time
@@ -8,12 +10,20 @@ from pathlib import Path
 from unittest.mock import call
 
 import freezegun
+import httpx
 import orjson
-from mock import MagicMock, patch
+from mock import ANY, MagicMock, patch
+from sqlalchemy import select
 
+from media_gathering.blob_store import BlobStore
 from media_gathering.crawler import Crawler, MediaSaveResult
-from media_gathering.model import ExternalLink
+from media_gathering.fav_db_controller import FavDBController
+from media_gathering.job_retry_policy import JobRetryPolicy
+from media_gathering.media_archive import MediaArchive
+from media_gathering.media_store import MediaStore
+from media_gathering.model import DownloadJob, ExternalLink, StoredMedia
 from media_gathering.tac.tweet_info import TweetInfo
+from media_gathering.thumbnail_cache import ThumbnailCache
 from media_gathering.util import Result
 
 
@@ -26,9 +36,11 @@ class ConcreteCrawler(Crawler):
     def __init__(
         self,
         config_file_name: str = "./config/config_sample.json",
+        link_searcher=None,
+        account=None,
     ) -> None:
         Crawler.CONFIG_FILE_NAME = config_file_name
-        super().__init__()
+        super().__init__(link_searcher, account)
 
     def is_post(self) -> bool:
         return self.config["notification"]["is_post_fav_done_reply"]
@@ -125,10 +137,20 @@ class TestCrawler(unittest.TestCase):
                 self.assertEqual(None, instance.db_cont)
                 self.assertEqual(Path(), instance.save_path)
                 self.assertEqual("", instance.type)
+                self.assertIsNone(instance.fetcher)
+                self.assertTrue(instance.prune_media_store)
                 self.assertEqual(0, instance.add_cnt)
                 self.assertEqual(0, instance.del_cnt)
                 self.assertEqual([], instance.add_url_list)
                 self.assertEqual([], instance.del_url_list)
+                self.assertEqual(Path(ThumbnailCache.THUMBNAIL_PATH), instance.thumbnail_cache.cache_path)
+                store_path = Path(config["save_directory"]["save_store_path"])
+                self.assertEqual(MediaStore(store_path), instance.media_store)
+                db_fullpath = Path(config["db"]["save_path"]) / config["db"]["save_file_name"]
+                self.assertEqual(BlobStore(BlobStore.blob_db_path(db_fullpath)), instance.blob_store)
+                self.assertIsNone(instance.media_archive)
+                self.assertEqual(JobRetryPolicy.create(config.get("job_queue", {})), instance.retry_policy)
+                self.assertEqual(config["job_queue"]["retry_job_limit"], instance.retry_job_limit)
                 mock_lsr.assert_called_once_with()
                 mock_notification.assert_not_called()
             else:
@@ -161,6 +183,35 @@ class TestCrawler(unittest.TestCase):
                         instance = ConcreteCrawler(str(self.config_file_path))
                 post_run(params, instance)
 
+        # アーカイブを有効にした場合
+        mock_validate_config_file.side_effect = None
+        config = orjson.loads(self.config_file_path.read_bytes())
+        config["archive"]["archive_media_flag"] = True
+        config["archive"]["archive_pack_size_mb"] = 1
+        config_file_path = self.base_path / "config_archive.json"
+        config_file_path.write_bytes(orjson.dumps(config))
+        instance = ConcreteCrawler(str(config_file_path))
+        expect = MediaArchive(Path(config["archive"]["archive_path"]), 1024 * 1024)
+        self.assertEqual(expect, instance.media_archive)
+
+        # 外部リンク探索機構を共有する場合はログインし直さない
+        mock_lsr.reset_mock()
+        link_searcher = MagicMock()
+        instance = ConcreteCrawler(str(self.config_file_path), link_searcher)
+        self.assertIs(link_searcher, instance.lsb)
+        mock_lsr.assert_not_called()
+
+    def test_reset_counter(self):
+        crawler = self._get_instance()
+        crawler.add_cnt = 1
+        crawler.del_cnt = 2
+        crawler.add_url_list = ["add_url"]
+        crawler.del_url_list = ["del_url"]
+        crawler.reset_counter()
+        self.assertEqual(
+            (0, 0, [], []), (crawler.add_cnt, crawler.del_cnt, crawler.add_url_list, crawler.del_url_list)
+        )
+
     def test_validate_config_file(self):
         mock_notification = self.enterContext(patch("media_gathering.crawler.notification"))
         mock_lsr = self.enterContext(patch("media_gathering.crawler.Crawler.link_search_register"))
@@ -217,6 +268,91 @@ class TestCrawler(unittest.TestCase):
                     with self.assertRaises(params.result):
                         instance = ConcreteCrawler(params.config_file_path)
 
+    def _make_account(self, name: str) -> dict:
+        return {
+            "name": name,
+            "twitter_api_client": {"ct0": f"{name}_ct0", "auth_token": f"{name}_auth_token"},
+            "save_directory": {
+                "save_fav_path": f"tests/save/{name}/twitterFav",
+                "save_retweet_path": f"tests/save/{name}/twitterRetweet",
+            },
+            "db": {"save_file_name": f"PG_DB_{name}.db"},
+        }
+
+    def test_get_store_path(self):
+        config = {"save_fav_path": "tests/save/twitterFav", "save_store_path": "tests/save/store"}
+        self.assertEqual(Path("tests/save/store"), Crawler.get_store_path(config))
+        del config["save_store_path"]
+        self.assertEqual(Path("tests/save/.media_store"), Crawler.get_store_path(config))
+
+    def test_merge_account_config(self):
+        config = orjson.loads(self.config_file_path.read_bytes())
+        account = self._make_account("sub")
+        actual = Crawler.merge_account_config(config, account)
+
+        # 項目内のキー単位で上書きし、元の設定は変更しない
+        self.assertEqual("sub_ct0", actual["twitter_api_client"]["ct0"])
+        self.assertEqual(config["twitter_api_client"]["target_id"], actual["twitter_api_client"]["target_id"])
+        self.assertEqual("tests/save/sub/twitterFav", actual["save_directory"]["save_fav_path"])
+        self.assertEqual("PG_DB_sub.db", actual["db"]["save_file_name"])
+        self.assertEqual(config["db"]["save_path"], actual["db"]["save_path"])
+        self.assertEqual(orjson.loads(self.config_file_path.read_bytes()), config)
+        # ストアは元の設定のものを共有する
+        expect = str(Crawler.get_store_path(config["save_directory"]))
+        self.assertEqual(expect, actual["save_directory"]["save_store_path"])
+        del config["save_directory"]["save_store_path"]
+        actual = Crawler.merge_account_config(config, account)
+        expect = str(Crawler.get_store_path(config["save_directory"]))
+        self.assertEqual(expect, actual["save_directory"]["save_store_path"])
+
+        # 不正なアカウント
+        error_account_list = [
+            {**account, "name": ""},
+            {key: value for key, value in account.items() if key != "name"},
+            {**account, "notification": {}},
+            {**account, "save_directory": {"save_fav_path": "tests/save/sub/twitterFav"}},
+            {key: value for key, value in account.items() if key != "db"},
+        ]
+        for error_account in error_account_list:
+            with self.assertRaises(ValueError):
+                Crawler.merge_account_config(config, error_account)
+
+    def test_init_account(self):
+        mock_notification = self.enterContext(patch("media_gathering.crawler.notification"))
+        mock_validate_config_file = self.enterContext(patch("media_gathering.crawler.Crawler.validate_config_file"))
+        mock_lsr = self.enterContext(patch("media_gathering.crawler.Crawler.link_search_register"))
+        config = orjson.loads(self.config_file_path.read_bytes())
+        config["twitter_api_client"]["target_screen_name"] = "target_screen_name"
+        config["twitter_api_client"]["target_id"] = 11111
+        config_file_path = self.base_path / "config_account.json"
+        config_file_path.write_bytes(orjson.dumps(config))
+
+        account = self._make_account("sub")
+        instance = ConcreteCrawler(str(config_file_path), None, account)
+        self.assertEqual("sub", instance.account_name)
+        self.assertEqual(Crawler.merge_account_config(config, account), instance.config)
+        self.assertTrue(Path("tests/save/sub/twitterFav").is_dir())
+        self.assertEqual(MediaStore(Path(config["save_directory"]["save_store_path"])), instance.media_store)
+        expect = Path(config["db"]["save_path"]) / config["db"]["save_file_name"]
+        self.assertEqual(expect, instance.store_db_fullpath)
+
+        # アカウントの認証情報もダミー値のままではいけない
+        account["twitter_api_client"]["ct0"] = "dummy_ct0"
+        with self.assertRaises(ValueError):
+            instance = ConcreteCrawler(str(config_file_path), None, account)
+
+        # アカウント指定が無い場合
+        instance = ConcreteCrawler(str(config_file_path))
+        self.assertEqual("", instance.account_name)
+        self.assertEqual(expect, instance.store_db_fullpath)
+
+    def test_store_db_cont(self):
+        instance = self._get_instance()
+        instance.db_cont = MagicMock()
+        self.assertIs(instance.db_cont, instance.store_db_cont)
+        instance._store_db_cont = MagicMock()
+        self.assertIs(instance._store_db_cont, instance.store_db_cont)
+
     def test_link_search_register(self):
         mock_notification = self.enterContext(patch("media_gathering.crawler.notification"))
         mock_validate_config_file = self.enterContext(patch("media_gathering.crawler.Crawler.validate_config_file"))
@@ -245,10 +381,16 @@ class TestCrawler(unittest.TestCase):
         mock_get_exist_filelist = self.enterContext(patch("media_gathering.crawler.Crawler.get_exist_filelist"))
         mock_get_media_url = self.enterContext(patch("media_gathering.crawler.Crawler.get_media_url"))
         mock_update_db_exist_mark = self.enterContext(patch("media_gathering.crawler.Crawler.update_db_exist_mark"))
+        mock_prune_store = self.enterContext(patch("media_gathering.crawler.Crawler.prune_store"))
+        # 整理対象の集合は呼び出し後にクリアされるため、呼び出し時点の写しを記録する
+        prune_store_calls = []
+        mock_prune_store.side_effect = lambda media_store, store_db_cont, sha256_set: prune_store_calls.append(
+            call(media_store, store_db_cont, set(sha256_set))
+        )
 
         mock_get_media_url.side_effect = lambda filename: f"http://video.url.sample/{filename}"
         save_path = self.base_path / "exist"
-        Params = namedtuple("Params", ["photo_num", "video_num", "holding_file_num", "result", "msg"])
+        Params = namedtuple("Params", ["photo_num", "video_num", "holding_file_num", "is_archive", "result", "msg"])
 
         def pre_run(params: Params) -> None:
             self._init_directory(save_path)
@@ -272,6 +414,7 @@ class TestCrawler(unittest.TestCase):
             expect_del_url_list = []
             expect_add_img_filename = []
             expect_get_media_url_call = []
+            expect_archive = []
             for i, file in enumerate(prepared_file):
                 url = ""
                 file_path = Path(file)
@@ -287,6 +430,7 @@ class TestCrawler(unittest.TestCase):
 
                 if i > params.holding_file_num:
                     self.assertFalse(file_path.exists())
+                    expect_archive.append(file_path)
                     expect_del_cnt += 1
                     expect_del_url_list.append(url)
                 else:
@@ -296,22 +440,94 @@ class TestCrawler(unittest.TestCase):
             self.assertEqual(expect_del_url_list, instance.del_url_list)
             mock_update_db_exist_mark.assert_called_once_with(expect_add_img_filename)
             self.assertEqual(expect_get_media_url_call, mock_get_media_url.mock_calls)
+            if params.is_archive:
+                # 削除するメディアはアーカイブに格納してから削除する
+                instance.media_archive.archive.assert_called_once_with(expect_archive)
+            # 削除したメディアが参照していた実体を整理対象にする
+            instance.db_cont.select_stored_media_from_localpath.assert_called_once_with([
+                str(path.absolute()) for path in expect_archive
+            ])
 
         params_list = [
-            Params(5, 0, 5, Result.success, "All photo, no shrink"),
-            Params(0, 5, 5, Result.success, "All video, no shrink"),
-            Params(2, 3, 5, Result.success, "Mix, no shrink"),
-            Params(10, 0, 5, Result.success, "All photo, shrink done"),
-            Params(0, 10, 5, Result.success, "All video, shrink done"),
-            Params(5, 5, 5, Result.success, "Mix, shrink done"),
+            Params(5, 0, 5, False, Result.success, "All photo, no shrink"),
+            Params(0, 5, 5, False, Result.success, "All video, no shrink"),
+            Params(2, 3, 5, False, Result.success, "Mix, no shrink"),
+            Params(10, 0, 5, False, Result.success, "All photo, shrink done"),
+            Params(0, 10, 5, False, Result.success, "All video, shrink done"),
+            Params(5, 5, 5, False, Result.success, "Mix, shrink done"),
+            Params(5, 5, 5, True, Result.success, "Mix, shrink done with archive"),
         ]
         for params in params_list:
             with self.subTest(params.msg):
+                mock_prune_store.reset_mock()
                 instance = self._get_instance()
+                instance.media_store = MagicMock()
+                instance.db_cont = MagicMock()
+                instance.db_cont.select_stored_media_from_localpath.side_effect = lambda path_list: [
+                    {"sha256": f"{i % 2:064}"} for i, _ in enumerate(path_list)
+                ]
+                if params.is_archive:
+                    instance.media_archive = MagicMock()
+                    instance.media_archive.archive.side_effect = lambda path_list: [
+                        self.assertTrue(path.exists()) for path in path_list
+                    ]
                 pre_run(params)
                 actual = instance.shrink_folder(params.holding_file_num)
                 self.assertEqual(params.result, actual)
                 post_run(params, instance)
+                del_num = max(params.photo_num + params.video_num - params.holding_file_num - 1, 0)
+                expect_sha256_set = {f"{i % 2:064}" for i in range(del_num)}
+                self.assertEqual(1, mock_prune_store.call_count)
+                self.assertEqual(
+                    call(instance.media_store, instance.db_cont, expect_sha256_set), prune_store_calls[-1]
+                )
+                self.assertEqual(set(), instance.prune_candidate_set)
+
+        # 並行してクロールする場合はストアの整理を呼び出し側に任せ、整理対象を残しておく
+        mock_prune_store.reset_mock()
+        instance = self._get_instance()
+        instance.media_store = MagicMock()
+        instance.db_cont = MagicMock()
+        instance.db_cont.select_stored_media_from_localpath.side_effect = lambda path_list: [{"sha256": "f" * 64}]
+        instance.prune_media_store = False
+        pre_run(params_list[3])
+        instance.shrink_folder(5)
+        mock_prune_store.assert_not_called()
+        self.assertEqual({"f" * 64}, instance.prune_candidate_set)
+
+    def test_prune_store(self):
+        instance = self._get_instance()
+        db_cont = FavDBController(self.base_path / "PG_DB.db")
+        self.addCleanup(db_cont.engine.dispose)
+        save_path = self.base_path / "prune"
+        self._init_directory(save_path)
+
+        # ハードリンクできずにコピーした保存先から参照されている実体
+        sha256_copied, object_path_copied, _ = instance.media_store.save([b"copied media"])
+        copied_path = (save_path / "copied.jpg").absolute()
+        with patch("media_gathering.media_store.os.link", side_effect=OSError):
+            with patch.object(MediaStore, "reflink", side_effect=OSError):
+                self.assertEqual("copy", MediaStore.link(object_path_copied, copied_path))
+        # どの保存先からも参照されなくなった実体
+        sha256_removed, object_path_removed, _ = instance.media_store.save([b"removed media"])
+        removed_path = (save_path / "removed.jpg").absolute()
+        MediaStore.link(object_path_removed, removed_path)
+        removed_path.unlink()
+        db_cont.upsert_stored_media([
+            StoredMedia(sha256_copied, "copied_url", str(copied_path), 12, ""),
+            StoredMedia(sha256_removed, "removed_url", str(removed_path), 13, ""),
+        ])
+
+        actual = instance.prune_store(instance.media_store, db_cont, {sha256_copied, sha256_removed})
+        self.assertEqual(1, actual)
+        self.assertTrue(object_path_copied.is_file())
+        self.assertFalse(object_path_removed.exists())
+
+        # コピーした保存先も削除されれば整理する
+        copied_path.unlink()
+        actual = instance.prune_store(instance.media_store, db_cont, {sha256_copied})
+        self.assertEqual(1, actual)
+        self.assertFalse(object_path_copied.exists())
 
     def test_update_db_exist_mark(self):
         instance = self._get_instance()
@@ -346,6 +562,7 @@ class TestCrawler(unittest.TestCase):
 
     def test_end_of_process(self):
         mock_html_writer = self.enterContext(patch("media_gathering.crawler.HtmlWriter"))
+        mock_gallery_writer = self.enterContext(patch("media_gathering.crawler.GalleryWriter"))
         mock_discord_notify = self.enterContext(patch("media_gathering.crawler.Crawler.post_discord_notify"))
         mock_line_notify = self.enterContext(patch("media_gathering.crawler.Crawler.post_line_notify"))
         mock_slack_notify = self.enterContext(patch("media_gathering.crawler.Crawler.post_slack_notify"))
@@ -377,6 +594,9 @@ class TestCrawler(unittest.TestCase):
             instance.config["notification"]["is_post_fav_done_reply"] = params.notification
 
             mock_html_writer.reset_mock()
+            mock_html_writer.get_save_path.return_value.is_file.return_value = True
+            mock_gallery_writer.reset_mock()
+            mock_gallery_writer.get_gallery_path.return_value.__truediv__.return_value.is_file.return_value = True
             mock_discord_notify.reset_mock(side_effect=True)
             mock_line_notify.reset_mock(side_effect=True)
             mock_slack_notify.reset_mock(side_effect=True)
@@ -393,12 +613,23 @@ class TestCrawler(unittest.TestCase):
             return instance
 
         def post_run(params: Params, instance: ConcreteCrawler):
-            self.assertEqual(
-                [call(instance.type, instance.db_cont), call().write_result_html()], mock_html_writer.mock_calls
-            )
             done_msg = instance.make_done_message()
             add_cnt = len(params.add_url_list)
             del_cnt = len(params.del_url_list)
+            # 追加も削除も無く既にhtmlが存在する場合は出力しない
+            mock_html_writer.get_save_path.assert_called_once_with(instance.type)
+            writer_calls = [c for c in mock_html_writer.mock_calls if not c[0].startswith("get_save_path")]
+            if add_cnt != 0 or del_cnt != 0:
+                self.assertEqual([call(instance.type, instance.db_cont), call().write_result_html()], writer_calls)
+            else:
+                self.assertEqual([], writer_calls)
+            # ギャラリーは追加があった場合のみ追記する
+            mock_gallery_writer.get_gallery_path.assert_called_once_with(instance.type)
+            if add_cnt != 0:
+                mock_gallery_writer.assert_called_once_with(instance.type, instance.db_cont)
+                mock_gallery_writer.return_value.write_gallery.assert_called_once_with()
+            else:
+                mock_gallery_writer.assert_not_called()
             if add_cnt != 0 or del_cnt != 0:
                 if params.notification:
                     ct0 = instance.config["twitter_api_client"]["ct0"]
@@ -443,8 +674,30 @@ class TestCrawler(unittest.TestCase):
             self.assertEqual(params.result, actual)
             post_run(params, instance)
 
+        # htmlが存在しない場合は追加も削除も無くても出力する
+        instance = pre_run(params_list[0], self._get_instance())
+        mock_html_writer.get_save_path.return_value.is_file.return_value = False
+        mock_gallery_writer.get_gallery_path.return_value.__truediv__.return_value.is_file.return_value = False
+        actual = instance.end_of_process()
+        self.assertEqual(Result.success, actual)
+        mock_html_writer.assert_called_once_with(instance.type, instance.db_cont)
+        mock_html_writer.return_value.write_result_html.assert_called_once_with()
+        mock_gallery_writer.assert_called_once_with(instance.type, instance.db_cont)
+        mock_gallery_writer.return_value.write_gallery.assert_called_once_with()
+
+        # アカウント指定時はhtmlを出力しない
+        mock_html_writer.reset_mock()
+        mock_gallery_writer.reset_mock()
+        instance = pre_run(params_list[0], self._get_instance())
+        instance.account_name = "sub"
+        actual = instance.end_of_process()
+        self.assertEqual(Result.success, actual)
+        mock_html_writer.assert_not_called()
+        mock_gallery_writer.assert_not_called()
+
     def test_post_discord_notify(self):
-        mock_req = self.enterContext(patch("media_gathering.crawler.httpx.post"))
+        mock_registry = self.enterContext(patch("media_gathering.crawler.HttpClientRegistry.get"))
+        mock_req = mock_registry.return_value.post
 
         instance = self._get_instance()
         url = instance.config["discord_webhook_url"]["webhook_url"]
@@ -498,9 +751,11 @@ class TestCrawler(unittest.TestCase):
         self.assertEqual(Result.success, actual)
         mock_req.assert_called_once_with(url, headers=headers, data=orjson.dumps(payload).decode())
         mock_req.reset_mock()
+        mock_registry.assert_called_with("discord")
 
     def test_post_line_notify(self):
-        mock_req = self.enterContext(patch("media_gathering.crawler.httpx.post"))
+        mock_registry = self.enterContext(patch("media_gathering.crawler.HttpClientRegistry.get"))
+        mock_req = mock_registry.return_value.post
 
         instance = self._get_instance()
 
@@ -512,6 +767,7 @@ class TestCrawler(unittest.TestCase):
         actual = instance.post_line_notify(str)
         self.assertEqual(Result.success, actual)
         mock_req.assert_called_once_with(url, headers=headers, params=payload)
+        mock_registry.assert_called_once_with("line")
 
     def test_post_slack_notify(self):
         mock_ssl = self.enterContext(patch("media_gathering.crawler.ssl"))
@@ -530,7 +786,7 @@ class TestCrawler(unittest.TestCase):
 
     def test_tweet_media_saver(self):
         mock_freezegun = freezegun.freeze_time("2024-06-23 12:34:56")
-        mock_client = self.enterContext(patch("media_gathering.crawler.httpx.Client"))
+        mock_client = self.enterContext(patch("media_gathering.crawler.HttpClientRegistry.get"))
         atime = 1719107372
         mtime = 1719107372
 
@@ -563,6 +819,9 @@ class TestCrawler(unittest.TestCase):
                 params = params._replace(session=mock_client.return_value)
 
             instance.db_cont = MagicMock()
+            instance.thumbnail_cache = MagicMock()
+            instance.blob_store = MagicMock()
+            instance.blob_store.put.return_value = 1
             if params.is_skip:
                 instance.db_cont.select_from_media_url.side_effect = lambda file_name: [file_name]
             else:
@@ -571,16 +830,21 @@ class TestCrawler(unittest.TestCase):
             if params.is_exist:
                 (instance.save_path / tweet_info.media_filename).write_bytes(tweet_info.media_filename.encode())
 
+            instance.db_cont.select_stored_media_from_url.side_effect = lambda url: []
+            instance.db_cont.select_seen_media.side_effect = lambda file_name: []
+
             if params.is_fetch_error:
-                mock_client.return_value.get.side_effect = ValueError
+                mock_client.return_value.stream.side_effect = ValueError
             else:
 
-                def return_get(url_orig: str, timeout: int) -> MagicMock:
+                def return_stream(method: str, url_orig: str, timeout: int) -> MagicMock:
                     r = MagicMock()
-                    r.content = url_orig.encode() if params.is_valid_size else bytes()
-                    return r
+                    r.iter_bytes.return_value = [url_orig.encode()] if params.is_valid_size else []
+                    stream = MagicMock()
+                    stream.__enter__.return_value = r
+                    return stream
 
-                mock_client.return_value.get.side_effect = return_get
+                mock_client.return_value.stream.side_effect = return_stream
             mock_client.reset_mock()
             return tweet_info, instance, params
 
@@ -594,13 +858,23 @@ class TestCrawler(unittest.TestCase):
 
             instance.db_cont.select_from_media_url.assert_called_once_with(file_name)
             if params.is_skip or params.is_exist:
-                mock_client.return_value.get.assert_not_called()
+                mock_client.return_value.stream.assert_not_called()
                 instance.db_cont.upsert.assert_not_called()
                 return
 
-            mock_client.return_value.get.assert_called_once_with(url_orig, timeout=60)
+            mock_client.return_value.stream.assert_called_once_with("GET", url_orig, timeout=60)
             if params.is_fetch_error:
                 instance.db_cont.upsert.assert_not_called()
+                # 再試行ジョブに記録する
+                instance.db_cont.record_job_failure.assert_called_once_with(
+                    DownloadJob.MEDIA,
+                    instance.type,
+                    url_orig,
+                    tweet_info.to_dict(),
+                    repr(ValueError()),
+                    instance.retry_policy,
+                    False,
+                )
                 return
             self.assertEqual([url_orig], instance.add_url_list)
 
@@ -621,28 +895,53 @@ class TestCrawler(unittest.TestCase):
                 "saved_localpath": str(save_file_fullpath),
                 "saved_created_at": datetime.now().strftime(dts_format),
             }
-            media_size = -1
-            save_blob_flag = params.is_save_blob
-            if save_blob_flag:
-                params_dict["media_blob"] = save_file_fullpath.read_bytes()
-                media_size = len(params_dict["media_blob"])
-                params_dict["media_size"] = media_size
-            else:
-                params_dict["media_blob"] = None
-                media_size = save_file_fullpath.stat().st_size
-                params_dict["media_size"] = media_size
-
-            if media_size <= 0:
+            if not params.is_valid_size:
                 instance.db_cont.upsert.assert_not_called()
+                instance.thumbnail_cache.submit.assert_not_called()
+                instance.blob_store.put.assert_not_called()
+                # 空のファイルは残さず、再試行ジョブに記録する
+                self.assertFalse(save_file_fullpath.exists())
+                instance.db_cont.record_job_failure.assert_called_once_with(
+                    DownloadJob.MEDIA,
+                    instance.type,
+                    url_orig,
+                    tweet_info.to_dict(),
+                    "0 byte file",
+                    instance.retry_policy,
+                )
                 return
+            instance.db_cont.record_job_failure.assert_not_called()
+
+            media_size = save_file_fullpath.stat().st_size
+            params_dict["media_size"] = media_size
+            params_dict["media_blob"] = None
+            params_dict["blob_id"] = None
+
+            # メディア本体はブロブストアに保存し、メタデータの行は id で参照する
+            sha256 = hashlib.sha256(url_orig.encode()).hexdigest()
+            if params.is_save_blob:
+                params_dict["blob_id"] = 1
+                instance.blob_store.put.assert_called_once_with(save_file_fullpath, sha256)
+            else:
+                instance.blob_store.put.assert_not_called()
             instance.db_cont.upsert.assert_called_once_with(params_dict)
+            instance.thumbnail_cache.submit.assert_called_once_with(save_file_fullpath)
 
             self.assertEqual(1, instance.add_cnt)
 
+            # 保存先はストアの実体を参照している
+            object_path = instance.media_store.object_path(sha256)
             self.assertTrue(save_file_fullpath.is_file())
+            self.assertTrue(os.path.samefile(object_path, save_file_fullpath))
             dst_path = Path(instance.config["save_permanent"]["save_permanent_media_path"])
-            dst_path = dst_path / save_file_fullpath.name
+            dst_path = (dst_path / save_file_fullpath.name).absolute()
             self.assertEqual(params.is_permanent, dst_path.is_file())
+            saved_created_at = params_dict["saved_created_at"]
+            expect = [StoredMedia(sha256, url_orig, str(save_file_fullpath), media_size, saved_created_at)]
+            if params.is_permanent:
+                self.assertTrue(os.path.samefile(object_path, dst_path))
+                expect.append(StoredMedia(sha256, url_orig, str(dst_path), media_size, saved_created_at))
+            instance.db_cont.upsert_stored_media.assert_called_once_with(expect)
 
         params_list = [
             Params(None, False, False, False, False, True, True, MediaSaveResult.success, "success case"),
@@ -662,12 +961,102 @@ class TestCrawler(unittest.TestCase):
                 self.assertEqual(params.result, actual)
                 post_run(instance, params)
 
+    def test_find_local_media(self):
+        instance = self._get_instance()
+        instance.db_cont = MagicMock()
+        url_orig, file_name = "sample_media_url", "sample.jpg"
+
+        # ストアに実体がある場合
+        sha256, object_path, _ = instance.media_store.save([b"stored media"])
+        instance.db_cont.select_stored_media_from_url.side_effect = lambda url: [{"sha256": sha256}]
+        actual = instance.find_local_media(url_orig, file_name)
+        self.assertEqual((sha256, object_path), actual)
+        instance.db_cont.select_stored_media_from_url.assert_called_once_with(url_orig)
+        instance.db_cont.select_seen_media.assert_not_called()
+
+        # ストアに無く、もう一方のテーブルに保存済のファイルがある場合は取り込む
+        instance.db_cont.reset_mock()
+        object_path.unlink()
+        fav_path = Path(instance.config["save_directory"]["save_fav_path"])
+        self._init_directory(fav_path)
+        seen_path = (fav_path / file_name).absolute()
+        seen_path.write_bytes(b"seen media")
+        instance.db_cont.select_stored_media_from_url.side_effect = lambda url: []
+        instance.db_cont.select_seen_media.side_effect = lambda filename: [
+            {"source": "Fav", "img_filename": filename, "url": url_orig, "saved_localpath": None},
+            {"source": "Fav", "img_filename": filename, "url": url_orig, "saved_localpath": str(seen_path)},
+        ]
+        actual = instance.find_local_media(url_orig, file_name)
+        sha256 = hashlib.sha256(b"seen media").hexdigest()
+        self.assertEqual((sha256, instance.media_store.object_path(sha256)), actual)
+        self.assertTrue(os.path.samefile(seen_path, actual[1]))
+        instance.db_cont.select_seen_media.assert_called_once_with(file_name)
+        upsert_args = instance.db_cont.upsert_stored_media.call_args.args[0]
+        self.assertEqual([StoredMedia(sha256, url_orig, str(seen_path), 10, "")], upsert_args)
+        self.assertEqual(sha256, upsert_args[0].sha256)
+
+        # どこにも無い場合
+        seen_path.unlink()
+        actual = instance.find_local_media(url_orig, file_name)
+        self.assertIsNone(actual)
+
+        # 保存先から削除済でもアーカイブにあればストアに取り込む
+        instance.media_archive = MagicMock()
+        instance.media_archive.read.side_effect = lambda name: b"archived media"
+        actual = instance.find_local_media(url_orig, file_name)
+        sha256 = hashlib.sha256(b"archived media").hexdigest()
+        self.assertEqual((sha256, instance.media_store.object_path(sha256)), actual)
+        self.assertEqual(b"archived media", actual[1].read_bytes())
+        instance.media_archive.read.assert_called_once_with(file_name)
+
+        instance.media_archive.read.side_effect = lambda name: None
+        actual = instance.find_local_media(url_orig, file_name)
+        self.assertIsNone(actual)
+
+    def test_tweet_media_saver_from_local(self):
+        mock_client = self.enterContext(patch("media_gathering.crawler.HttpClientRegistry.get"))
+        instance = self._get_instance()
+        instance.save_path = Path(instance.config["save_directory"]["save_retweet_path"])
+        self._init_directory(instance.save_path)
+        instance.thumbnail_cache = MagicMock()
+        instance.db_cont = MagicMock()
+        instance.db_cont.select_from_media_url.side_effect = lambda file_name: []
+
+        # 他の保存先で取得済のメディアはダウンロードせずにローカルの実体を参照する
+        tweet_info = self._make_tweet_info(1)
+        sha256, object_path, _ = instance.media_store.save([b"stored media"])
+        mock_find_local_media = self.enterContext(patch("media_gathering.crawler.Crawler.find_local_media"))
+        mock_find_local_media.return_value = (sha256, object_path)
+        actual = instance.tweet_media_saver(tweet_info, 0, 0)
+        self.assertEqual(MediaSaveResult.success, actual)
+        mock_client.return_value.stream.assert_not_called()
+        save_file_fullpath = (instance.save_path / tweet_info.media_filename).absolute()
+        self.assertTrue(os.path.samefile(object_path, save_file_fullpath))
+        mock_find_local_media.assert_called_once_with(tweet_info.media_url, tweet_info.media_filename)
+        # 自身のテーブルにはレコードを追加する
+        instance.db_cont.upsert.assert_called_once()
+
+        # ローカルに無い場合はダウンロードする
+        tweet_info = self._make_tweet_info(2)
+        object_path.unlink()
+        mock_find_local_media.return_value = None
+        r = MagicMock()
+        r.iter_bytes.return_value = [b"stored media"]
+        mock_client.return_value.stream.return_value.__enter__.return_value = r
+        actual = instance.tweet_media_saver(tweet_info, 0, 0)
+        self.assertEqual(MediaSaveResult.success, actual)
+        mock_client.return_value.stream.assert_called_once_with("GET", tweet_info.media_url, timeout=60)
+        save_file_fullpath = (instance.save_path / tweet_info.media_filename).absolute()
+        self.assertTrue(os.path.samefile(object_path, save_file_fullpath))
+
     def test_interpret_tweets(self):
         mock_freezegun = freezegun.freeze_time("2024-06-23 12:34:56")
         mock_tweet_media_saver = self.enterContext(patch("media_gathering.crawler.Crawler.tweet_media_saver"))
-        mock_client = self.enterContext(patch("media_gathering.crawler.httpx.Client"))
+        mock_client = self.enterContext(patch("media_gathering.crawler.HttpClientRegistry.get"))
 
+        mock_tweet_media_saver.return_value = MediaSaveResult.success
         crawler = self._get_instance()
+        crawler.thumbnail_cache = MagicMock()
 
         session = mock_client.return_value
         tweet_info_list = [self._make_tweet_info(i) for i in range(1, 5)]
@@ -691,7 +1080,15 @@ class TestCrawler(unittest.TestCase):
 
         actual = crawler.interpret_tweets(tweet_info_list)
         self.assertEqual(Result.success, actual)
+        mock_client.assert_called_once_with("twitter")
         self.assertEqual(expect_args_list, mock_tweet_media_saver.mock_calls[: len(expect_args_list)])
+        crawler.thumbnail_cache.wait.assert_called_once_with()
+        self.assertEqual(4, crawler.metrics.get_counter("media_total", result="success"))
+
+        # 1件処理するごとに処理済件数を通知する
+        on_progress = MagicMock()
+        actual = crawler.interpret_tweets(tweet_info_list, on_progress)
+        self.assertEqual([call(i) for i in range(1, 5)], on_progress.mock_calls)
 
         mock_tweet_media_saver.side_effect = lambda tweet_info, atime, mtime, session: MediaSaveResult.failed
         actual = crawler.interpret_tweets(tweet_info_list)
@@ -745,9 +1142,370 @@ class TestCrawler(unittest.TestCase):
             with self.subTest(params.msg):
                 instance = self._get_instance()
                 instance, external_link_list = pre_run(instance, params)
-                actual = instance.trace_external_link(external_link_list)
+                on_progress = MagicMock()
+                actual = instance.trace_external_link(external_link_list, on_progress)
                 self.assertEqual(params.result, actual)
                 post_run(instance, params)
+                # スキップした場合も処理済件数を通知する
+                self.assertEqual([call(i) for i in range(1, 5)], on_progress.mock_calls)
+
+    def test_tweet_media_saver_removed(self):
+        mock_client = self.enterContext(patch("media_gathering.crawler.HttpClientRegistry.get"))
+        instance = self._get_instance()
+        instance.save_path = self.base_path / "removed"
+        instance.db_cont = MagicMock()
+        instance.db_cont.select_from_media_url.side_effect = lambda file_name: []
+        instance.db_cont.select_stored_media_from_url.side_effect = lambda url: []
+        instance.db_cont.select_seen_media.side_effect = lambda file_name: []
+        tweet_info = self._make_tweet_info(1)
+
+        # 削除済のメディアは再試行しない
+        for status_code, is_removed in [(404, True), (410, True), (503, False)]:
+            instance.db_cont.record_job_failure.reset_mock()
+            request = httpx.Request("GET", tweet_info.media_url)
+            response = httpx.Response(status_code, request=request)
+            error = httpx.HTTPStatusError("error", request=request, response=response)
+            mock_client.return_value.stream.side_effect = error
+            actual = instance.tweet_media_saver(tweet_info, 0, 0)
+            self.assertEqual(MediaSaveResult.failed, actual)
+            args = instance.db_cont.record_job_failure.call_args.args
+            self.assertEqual(is_removed, args[-1])
+
+    def test_tweet_media_saver_empty(self):
+        mock_client = self.enterContext(patch("media_gathering.crawler.HttpClientRegistry.get"))
+        instance = self._get_instance()
+        instance.type = "Fav"
+        instance.save_path = self.base_path / "empty"
+        self._init_directory(instance.save_path)
+        instance.db_cont = FavDBController(self.base_path / "PG_DB.db")
+        self.addCleanup(instance.db_cont.engine.dispose)
+        instance.thumbnail_cache = MagicMock()
+        instance.retry_policy = JobRetryPolicy(60, 60, 3)
+        tweet_info = self._make_tweet_info(1)
+
+        # 取得できたメディアが空の場合
+        response = MagicMock()
+        response.iter_bytes.return_value = []
+        mock_client.return_value.stream.return_value.__enter__.return_value = response
+
+        # 空のメディアは再試行ジョブに記録し、再試行のたびに失敗回数が増えて打ち切られる
+        with freezegun.freeze_time("2022-10-24 10:00:00"):
+            actual = instance.tweet_media_saver(tweet_info, 0, 0)
+        self.assertEqual(MediaSaveResult.failed, actual)
+        self.assertFalse((instance.save_path / tweet_info.media_filename).exists())
+        expect = [(DownloadJob.PENDING, 1), (DownloadJob.PENDING, 2), (DownloadJob.DEAD, 3)]
+        for minute, (state, attempt) in enumerate(expect, start=1):
+            with instance.db_cont.engine.connect() as conn:
+                job = conn.execute(select(DownloadJob.state, DownloadJob.attempt, DownloadJob.last_error)).one()
+            self.assertEqual((state, attempt, "0 byte file"), tuple(job))
+            with freezegun.freeze_time(f"2022-10-24 10:{minute:02}:30"):
+                instance.retry_jobs()
+        self.assertEqual(3, mock_client.return_value.stream.call_count)
+        self.assertEqual([], instance.db_cont.select_due_jobs("Fav", datetime(2022, 10, 25), 10))
+
+    def test_get_media_timestamp(self):
+        instance = self._get_instance()
+        tweet_info = self._make_tweet_info(1)
+        expect = time.mktime(time.strptime(tweet_info.created_at, "%Y-%m-%d %H:%M:%S"))
+        self.assertEqual(expect, instance.get_media_timestamp(tweet_info))
+
+    def test_fetch_external_link(self):
+        instance = self._get_instance()
+        instance.db_cont = MagicMock()
+        instance.lsb = MagicMock()
+        external_link = self._make_external_link(1)
+        url = external_link.external_link_url
+
+        actual = instance.fetch_external_link(external_link)
+        self.assertEqual(Result.success, actual)
+        instance.lsb.fetch.assert_called_once_with(url)
+        instance.db_cont.upsert_external_link.assert_called_once_with([external_link])
+        instance.db_cont.complete_job.assert_called_once_with(DownloadJob.EXTERNAL_LINK, instance.type, url)
+        instance.db_cont.record_job_failure.assert_not_called()
+
+        # 失敗した場合は再試行ジョブに記録し、例外は送出しない
+        instance.db_cont.reset_mock()
+        error = ValueError("fetch failed")
+        instance.lsb.fetch.side_effect = error
+        actual = instance.fetch_external_link(external_link)
+        self.assertEqual(Result.failed, actual)
+        instance.db_cont.upsert_external_link.assert_not_called()
+        instance.db_cont.complete_job.assert_not_called()
+        instance.db_cont.record_job_failure.assert_called_once_with(
+            DownloadJob.EXTERNAL_LINK, instance.type, url, external_link.to_dict(), repr(error), instance.retry_policy
+        )
+
+    def test_trace_external_link_failed(self):
+        instance = self._get_instance()
+        instance.db_cont = MagicMock()
+        instance.lsb = MagicMock()
+        instance.db_cont.select_external_link.side_effect = lambda url: []
+        instance.lsb.can_fetch.side_effect = lambda url: True
+        external_link_list = [
+            ExternalLink.create({**self._make_external_link(i).to_dict(), "external_link_url": url})
+            for i, url in enumerate([
+                "https://failed.example.com/1",
+                "https://ok.example.com/1",
+                "https://failed.example.com/2",
+                "https://ok.example.com/2",
+            ])
+        ]
+        instance.lsb.fetch.side_effect = lambda url: url.startswith("https://failed") and 1 / 0
+
+        # 失敗したサイトへの以降のリンクは取得を試みずに後回しにする
+        with freezegun.freeze_time("2022-10-24 10:00:00"):
+            actual = instance.trace_external_link(external_link_list)
+        self.assertEqual(Result.success, actual)
+        self.assertEqual(
+            [call("https://failed.example.com/1"), call("https://ok.example.com/1"), call("https://ok.example.com/2")],
+            instance.lsb.fetch.mock_calls,
+        )
+        self.assertEqual(
+            [call([external_link_list[1]]), call([external_link_list[3]])],
+            instance.db_cont.upsert_external_link.mock_calls,
+        )
+        instance.db_cont.record_job_failure.assert_called_once()
+        instance.db_cont.enqueue_job.assert_called_once_with(
+            DownloadJob.EXTERNAL_LINK,
+            instance.type,
+            "https://failed.example.com/2",
+            external_link_list[2].to_dict(),
+            datetime(2022, 10, 24, 10, 0, 0),
+        )
+
+    def test_retry_jobs(self):
+        mock_saver = self.enterContext(patch("media_gathering.crawler.Crawler.tweet_media_saver"))
+        mock_fetch_external_link = self.enterContext(patch("media_gathering.crawler.Crawler.fetch_external_link"))
+        instance = self._get_instance()
+        instance.type = "Fav"
+        instance.db_cont = MagicMock()
+        instance.thumbnail_cache = MagicMock()
+        instance.retry_job_limit = 10
+
+        def make_job(job_type: str, url: str, payload: dict) -> dict:
+            return {"job_type": job_type, "url": url, "payload": orjson.dumps(payload).decode()}
+
+        tweet_info_list = [self._make_tweet_info(i) for i in range(1, 3)]
+        external_link_list = [
+            ExternalLink.create({**self._make_external_link(i).to_dict(), "external_link_url": url})
+            for i, url in enumerate([
+                "https://failed.example.com/1",
+                "https://failed.example.com/2",
+                "https://ok.example.com/1",
+            ])
+        ]
+        job_list = [make_job(DownloadJob.MEDIA, t.media_url, t.to_dict()) for t in tweet_info_list]
+        job_list += [make_job(DownloadJob.EXTERNAL_LINK, e.external_link_url, e.to_dict()) for e in external_link_list]
+        instance.db_cont.select_due_jobs.return_value = job_list
+        mock_saver.side_effect = [MediaSaveResult.success, MediaSaveResult.failed]
+        mock_fetch_external_link.side_effect = lambda e: (
+            Result.failed if e.external_link_url.startswith("https://failed") else Result.success
+        )
+
+        with freezegun.freeze_time("2022-10-24 10:00:00"):
+            actual = instance.retry_jobs()
+        self.assertEqual(4, actual)
+        instance.db_cont.select_due_jobs.assert_called_once_with("Fav", datetime(2022, 10, 24, 10, 0, 0), 10)
+
+        # メディアは成功したものだけ完了にする（失敗は tweet_media_saver の中で記録される）
+        timestamp_list = [instance.get_media_timestamp(t) for t in tweet_info_list]
+        self.assertEqual(
+            [call(t, timestamp, timestamp) for t, timestamp in zip(tweet_info_list, timestamp_list)],
+            mock_saver.mock_calls,
+        )
+        instance.db_cont.complete_job.assert_called_once_with(DownloadJob.MEDIA, "Fav", tweet_info_list[0].media_url)
+
+        # 外部リンクは失敗したサイトへの以降の再試行を行わない
+        self.assertEqual(
+            [call(external_link_list[0]), call(external_link_list[2])], mock_fetch_external_link.mock_calls
+        )
+        instance.thumbnail_cache.wait.assert_called_once_with()
+
+    def test_make_checkpoint_callback(self):
+        instance = self._get_instance()
+        instance.type = "Fav"
+        instance.db_cont = MagicMock()
+        instance.CHECKPOINT_INTERVAL = 10
+
+        # 間隔ごとと最後の1件でのみ記録する
+        on_progress = instance.make_checkpoint_callback(5, 25, "media_index")
+        for count in range(1, 26):
+            on_progress(count)
+        self.assertEqual(
+            [call("Fav", media_index=15), call("Fav", media_index=25), call("Fav", media_index=30)],
+            instance.db_cont.update_checkpoint.mock_calls,
+        )
+
+    def test_crawl_stages(self):
+        mock_interpret_tweets = self.enterContext(patch("media_gathering.crawler.Crawler.interpret_tweets"))
+        mock_trace_external_link = self.enterContext(patch("media_gathering.crawler.Crawler.trace_external_link"))
+        mock_retry_jobs = self.enterContext(patch("media_gathering.crawler.Crawler.retry_jobs"))
+        mock_shrink_folder = self.enterContext(patch("media_gathering.crawler.Crawler.shrink_folder"))
+        mock_end_of_process = self.enterContext(patch("media_gathering.crawler.Crawler.end_of_process"))
+
+        Params = namedtuple(
+            "Params", ["resume", "checkpoint", "is_fetch", "media_index", "external_link_index", "msg"]
+        )
+        checkpoint = {
+            "source": "Fav",
+            "fetched_tweets": ["checkpoint_tweets"],
+            "media_index": 2,
+            "external_link_index": 1,
+            "created_at": "2022-10-24 10:00:00",
+            "updated_at": "2022-10-24 10:30:00",
+        }
+        params_list = [
+            Params(False, checkpoint, True, 0, 0, "not resume"),
+            Params(True, None, True, 0, 0, "resume without checkpoint"),
+            Params(True, checkpoint, False, 2, 1, "resume from checkpoint"),
+        ]
+        for params in params_list:
+            with self.subTest(params.msg):
+                mock_interpret_tweets.reset_mock()
+                mock_trace_external_link.reset_mock()
+                mock_retry_jobs.reset_mock()
+                mock_shrink_folder.reset_mock()
+                mock_end_of_process.reset_mock()
+
+                instance = self._get_instance()
+                instance.type = "Fav"
+                instance.resume = params.resume
+                instance.lsb = MagicMock()
+                instance.db_cont = MagicMock()
+                instance.db_cont.select_checkpoint.return_value = params.checkpoint
+                tweet_info_list = [self._make_tweet_info(i) for i in range(1, 5)]
+                external_link_list = [self._make_external_link(i) for i in range(1, 5)]
+                parser_class = MagicMock()
+                parser_class.return_value.parse_to_TweetInfo.return_value = tweet_info_list
+                parser_class.return_value.parse_to_ExternalLink.return_value = external_link_list
+                fetch = MagicMock(return_value=["fetched_tweets"])
+
+                actual = instance.crawl_stages(fetch, parser_class)
+                self.assertEqual(Result.success, actual)
+
+                if params.is_fetch:
+                    fetch.assert_called_once_with()
+                    instance.db_cont.save_checkpoint.assert_called_once_with("Fav", ["fetched_tweets"])
+                    parser_class.assert_called_once_with(["fetched_tweets"], instance.lsb)
+                else:
+                    fetch.assert_not_called()
+                    instance.db_cont.save_checkpoint.assert_not_called()
+                    parser_class.assert_called_once_with(["checkpoint_tweets"], instance.lsb)
+                if params.resume:
+                    instance.db_cont.select_checkpoint.assert_called_once_with("Fav")
+                else:
+                    instance.db_cont.select_checkpoint.assert_not_called()
+
+                # 処理済の分は飛ばして続きから処理する
+                mock_interpret_tweets.assert_called_once()
+                args = mock_interpret_tweets.call_args.args
+                self.assertEqual(tweet_info_list[params.media_index :], args[0])
+                args[1](len(args[0]))
+                instance.db_cont.update_checkpoint.assert_called_once_with("Fav", media_index=4)
+
+                instance.db_cont.update_checkpoint.reset_mock()
+                mock_trace_external_link.assert_called_once()
+                args = mock_trace_external_link.call_args.args
+                self.assertEqual(external_link_list[params.external_link_index :], args[0])
+                args[1](len(args[0]))
+                instance.db_cont.update_checkpoint.assert_called_once_with("Fav", external_link_index=4)
+
+                mock_retry_jobs.assert_called_once_with()
+                mock_shrink_folder.assert_called_once_with(int(instance.config["holding"]["holding_file_num"]))
+                mock_end_of_process.assert_called_once_with()
+                instance.db_cont.delete_checkpoint.assert_called_once_with("Fav")
+
+                # 段階ごとの処理時間を計測して実行サマリーを保存する
+                stage_list = ["download", "end_of_process", "external_link", "parse", "retry", "shrink"]
+                if params.is_fetch:
+                    stage_list.insert(3, "fetch")
+                    self.assertEqual(1, instance.metrics.get_counter("tweets_fetched_total"))
+                histograms = instance.metrics.to_dict()["histograms"]
+                self.assertEqual(stage_list, [h["labels"]["stage"] for h in histograms])
+                instance.db_cont.insert_crawl_run.assert_called_once_with(
+                    "Fav", ANY, ANY, "success", instance.metrics.to_dict()
+                )
+                self.assertIsNone(instance.profiler)
+
+        # 途中で異常終了した場合はチェックポイントを残す
+        instance.resume = False
+        instance.db_cont.reset_mock()
+        mock_trace_external_link.side_effect = ValueError
+        with self.assertRaises(ValueError):
+            instance.crawl_stages(fetch, parser_class)
+        instance.db_cont.delete_checkpoint.assert_not_called()
+        instance.db_cont.insert_crawl_run.assert_called_once_with("Fav", ANY, ANY, "failed", ANY)
+
+        # プロファイラが設定されていればクロール全体をプロファイルする
+        mock_trace_external_link.side_effect = None
+        instance.profiler = MagicMock()
+        self.assertEqual(Result.success, instance.crawl_stages(fetch, parser_class))
+        instance.profiler.profile.assert_called_once_with("Fav")
+        stage_list = [c.args[0] for c in instance.profiler.stage.call_args_list]
+        self.assertEqual(
+            ["fetch", "parse", "download", "external_link", "retry", "shrink", "end_of_process"], stage_list
+        )
+
+    def test_stage_timer(self):
+        instance = self._get_instance()
+        with instance.stage_timer("download"):
+            pass
+        self.assertEqual(["download"], [h["labels"]["stage"] for h in instance.metrics.to_dict()["histograms"]])
+
+        # プロファイラが設定されていれば段階を通知する
+        instance.profiler = MagicMock()
+        with instance.stage_timer("shrink"):
+            instance.profiler.stage.assert_called_once_with("shrink")
+            instance.profiler.stage.return_value.__enter__.assert_called_once_with()
+        instance.profiler.stage.return_value.__exit__.assert_called_once()
+
+    def test_profile(self):
+        instance = self._get_instance()
+        instance.type = "Fav"
+        with instance.profile():
+            pass
+
+        instance.profiler = MagicMock()
+        with instance.profile():
+            instance.profiler.profile.assert_called_once_with("Fav")
+        instance.profiler.profile.return_value.__exit__.assert_called_once()
+
+        instance.profiler.reset_mock()
+        instance.account_name = "sub_account"
+        with instance.profile():
+            pass
+        instance.profiler.profile.assert_called_once_with("Fav_sub_account")
+
+    def test_export_metrics(self):
+        instance = self._get_instance()
+        instance.type = "Fav"
+        instance.db_cont = MagicMock()
+        instance.metrics.inc("media_total", result="success")
+        started_at = datetime(2022, 10, 24, 10, 0, 0)
+        finished_at = datetime(2022, 10, 24, 10, 5, 0)
+
+        # 書き出し先が設定されていなければDBへの保存のみ行う
+        instance.metrics_textfile_directory = ""
+        instance.export_metrics(started_at, finished_at, Result.success)
+        instance.db_cont.insert_crawl_run.assert_called_once_with(
+            "Fav", started_at, finished_at, "success", instance.metrics.to_dict()
+        )
+        self.assertEqual([], list(self.base_path.glob("**/*.prom")))
+
+        instance.metrics_textfile_directory = str(self.base_path / "metrics")
+        instance.export_metrics(started_at, finished_at, Result.failed)
+        path = self.base_path / "metrics" / "media_gathering_Fav.prom"
+        self.assertEqual(instance.metrics.to_prometheus(source="Fav", account=""), path.read_text(encoding="utf-8"))
+
+        # アカウント指定時はアカウントごとに書き出す
+        instance.account_name = "sub_account"
+        instance.export_metrics(started_at, finished_at, Result.success)
+        path = self.base_path / "metrics" / "media_gathering_Fav_sub_account.prom"
+        self.assertIn('account="sub_account"', path.read_text(encoding="utf-8"))
+
+        # 書き出しに失敗しても例外は送出しない
+        instance.db_cont.insert_crawl_run.side_effect = ValueError
+        instance.export_metrics(started_at, finished_at, Result.success)
 
 
 if __name__ == "__main__":
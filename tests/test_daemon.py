@@ -0,0 +1,179 @@
+import sys
+import unittest
+from pathlib import Path
+
+import orjson
+from mock import MagicMock, patch
+
+from media_gathering.daemon import CrawlDaemon, CrawlJob
+from media_gathering.profiler import CrawlProfiler
+from media_gathering.util import Result
+
+
+class TestCrawlDaemon(unittest.TestCase):
+    def setUp(self):
+        self.mock_logger = self.enterContext(patch("media_gathering.daemon.logger"))
+
+    def _make_job(self, crawl_type: str, interval: float = 60) -> CrawlJob:
+        return CrawlJob(crawl_type, MagicMock(), interval)
+
+    def test_CrawlJob(self):
+        crawler_factory = MagicMock()
+        job = CrawlJob("Fav", crawler_factory, 60)
+        self.assertEqual("Fav", job.crawl_type)
+        self.assertEqual(crawler_factory, job.crawler_factory)
+        self.assertEqual(60, job.interval)
+        with self.assertRaises(TypeError):
+            job = CrawlJob(-1, crawler_factory, 60)
+        with self.assertRaises(TypeError):
+            job = CrawlJob("Fav", "invalid_crawler_factory", 60)
+        with self.assertRaises(TypeError):
+            job = CrawlJob("Fav", crawler_factory, "invalid_interval")
+        with self.assertRaises(ValueError):
+            job = CrawlJob("Fav", crawler_factory, 0)
+
+    def test_CrawlDaemon(self):
+        job_list = [self._make_job("Fav"), self._make_job("RT")]
+        daemon = CrawlDaemon(job_list, 10)
+        self.assertEqual(job_list, daemon.job_list)
+        self.assertEqual(10, daemon.jitter)
+        self.assertEqual({}, daemon.next_run)
+        with self.assertRaises(TypeError):
+            daemon = CrawlDaemon("invalid_job_list")
+        with self.assertRaises(TypeError):
+            daemon = CrawlDaemon(["invalid_job"])
+        with self.assertRaises(ValueError):
+            daemon = CrawlDaemon([])
+        with self.assertRaises(TypeError):
+            daemon = CrawlDaemon(job_list, "invalid_jitter")
+        with self.assertRaises(ValueError):
+            daemon = CrawlDaemon(job_list, -1)
+        with self.assertRaises(TypeError):
+            daemon = CrawlDaemon(job_list, 10, "invalid_profiler")
+
+    def test_create(self):
+        config = orjson.loads(Path("./config/config_sample.json").read_bytes())
+        mock_fav_crawler = MagicMock()
+        mock_rt_crawler = MagicMock()
+
+        with patch("media_gathering.daemon.Path.read_bytes", return_value=orjson.dumps(config)):
+            daemon = CrawlDaemon.create({"Fav": mock_fav_crawler, "RT": mock_rt_crawler})
+        expect = [CrawlJob("Fav", mock_fav_crawler, 60 * 60), CrawlJob("RT", mock_rt_crawler, 60 * 60)]
+        self.assertEqual(expect, daemon.job_list)
+        self.assertEqual(5 * 60, daemon.jitter)
+        self.assertIsNone(daemon.profiler)
+
+        profiler = CrawlProfiler(CrawlProfiler.CPU, Path("./tests/profile"))
+        with patch("media_gathering.daemon.Path.read_bytes", return_value=orjson.dumps(config)):
+            daemon = CrawlDaemon.create({"Fav": mock_fav_crawler}, profiler)
+        self.assertIs(profiler, daemon.profiler)
+
+        # 実行間隔が 0 のクロールは実行しない
+        config["daemon"]["retweet_interval_minutes"] = 0
+        with patch("media_gathering.daemon.Path.read_bytes", return_value=orjson.dumps(config)):
+            daemon = CrawlDaemon.create({"Fav": mock_fav_crawler, "RT": mock_rt_crawler})
+        self.assertEqual([CrawlJob("Fav", mock_fav_crawler, 60 * 60)], daemon.job_list)
+
+        # 設定が無い場合はデフォルト値を使う
+        del config["daemon"]
+        with patch("media_gathering.daemon.Path.read_bytes", return_value=orjson.dumps(config)):
+            daemon = CrawlDaemon.create({"RT": mock_rt_crawler})
+        self.assertEqual([CrawlJob("RT", mock_rt_crawler, 60 * 60)], daemon.job_list)
+
+    def test_run_job(self):
+        job = self._make_job("Fav")
+        daemon = CrawlDaemon([job])
+
+        # クローラーは初回のみ作成し、以降は使い回す
+        self.assertEqual(Result.success, daemon.run_job(job))
+        self.assertEqual(Result.success, daemon.run_job(job))
+        job.crawler_factory.assert_called_once_with()
+        self.assertEqual(2, job.crawler_factory.return_value.crawl.call_count)
+
+        # 失敗した場合は次回クローラーを作り直す
+        job.crawler_factory.return_value.crawl.side_effect = ValueError
+        self.assertEqual(Result.failed, daemon.run_job(job))
+        self.mock_logger.exception.assert_called_once()
+        job.crawler_factory.return_value.crawl.side_effect = None
+        self.assertEqual(Result.success, daemon.run_job(job))
+        self.assertEqual(2, job.crawler_factory.call_count)
+
+        # クローラーの作成に失敗した場合も同様
+        job.crawler_factory.side_effect = KeyError
+        daemon = CrawlDaemon([job])
+        self.assertEqual(Result.failed, daemon.run_job(job))
+
+    def test_request_profile(self):
+        fav_job = self._make_job("Fav")
+        rt_job = self._make_job("RT")
+        profiler = CrawlProfiler(CrawlProfiler.CPU, Path("./tests/profile"))
+        requested_profiler = CrawlProfiler(CrawlProfiler.MEMORY, Path("./tests/profile"))
+        daemon = CrawlDaemon([fav_job, rt_job], 0, profiler)
+        fav_crawler = fav_job.crawler_factory.return_value
+        rt_crawler = rt_job.crawler_factory.return_value
+
+        # 要求が無ければ毎回のクロールのプロファイラを使う
+        daemon.run_job(fav_job)
+        self.assertIs(profiler, fav_crawler.profiler)
+
+        # 要求されたプロファイラは各ジョブの次回のクロールで1回だけ使う
+        daemon.request_profile(requested_profiler)
+        self.mock_logger.info.assert_called_with("Profile (mem) requested for the next crawl")
+        daemon.run_job(fav_job)
+        self.assertIs(requested_profiler, fav_crawler.profiler)
+        daemon.run_job(fav_job)
+        self.assertIs(profiler, fav_crawler.profiler)
+        daemon.run_job(rt_job)
+        self.assertIs(requested_profiler, rt_crawler.profiler)
+
+        daemon = CrawlDaemon([fav_job])
+        daemon.run_job(fav_job)
+        self.assertIsNone(fav_crawler.profiler)
+
+    def test_run_pending(self):
+        mock_monotonic = self.enterContext(patch("media_gathering.daemon.time.monotonic"))
+        mock_uniform = self.enterContext(patch("media_gathering.daemon.random.uniform"))
+        fav_job = self._make_job("Fav", 100)
+        rt_job = self._make_job("RT", 200)
+        daemon = CrawlDaemon([fav_job, rt_job], 10)
+
+        # 初回はすべて実行し、終了時刻に実行間隔と揺らぎを加えた時刻を次回実行時刻とする
+        mock_monotonic.return_value = 1005
+        mock_uniform.return_value = 3
+        self.assertEqual(["Fav", "RT"], daemon.run_pending(1000))
+        mock_uniform.assert_called_with(0, 10)
+        self.assertEqual({"Fav": 1108, "RT": 1208}, daemon.next_run)
+
+        # 実行時刻を過ぎたものだけ実行する
+        self.assertEqual([], daemon.run_pending(1107))
+        mock_monotonic.return_value = 1110
+        self.assertEqual(["Fav"], daemon.run_pending(1108))
+        self.assertEqual({"Fav": 1213, "RT": 1208}, daemon.next_run)
+        self.assertEqual(2, fav_job.crawler_factory.return_value.crawl.call_count)
+        self.assertEqual(1, rt_job.crawler_factory.return_value.crawl.call_count)
+
+        # 停止後は実行しない
+        daemon.stop()
+        self.assertEqual([], daemon.run_pending(2000))
+
+    def test_run(self):
+        fav_job = self._make_job("Fav", 0.01)
+        rt_job = self._make_job("RT", 60)
+        daemon = CrawlDaemon([fav_job, rt_job])
+
+        # Fav を 3 回実行したら停止する
+        def crawl():
+            if fav_job.crawler_factory.return_value.crawl.call_count >= 3:
+                daemon.stop()
+
+        fav_job.crawler_factory.return_value.crawl.side_effect = crawl
+        daemon.run()
+        self.assertEqual(3, fav_job.crawler_factory.return_value.crawl.call_count)
+        self.assertEqual(1, rt_job.crawler_factory.return_value.crawl.call_count)
+        fav_job.crawler_factory.assert_called_once_with()
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
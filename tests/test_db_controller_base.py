@@ -1,14 +1,30 @@
 import re
 import sys
+import threading
 import unittest
 from datetime import date, datetime, timedelta
+from pathlib import Path
 
 from freezegun import freeze_time
+from mock import patch
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, undefer
 
+from media_gathering.blob_store import BlobStore
 from media_gathering.db_controller_base import DBControllerBase
-from media_gathering.model import Base, DeleteTarget, ExternalLink
+from media_gathering.job_retry_policy import JobRetryPolicy
+from media_gathering.model import (
+    Base,
+    CrawlCheckpoint,
+    CrawlRun,
+    DeleteTarget,
+    DownloadJob,
+    ExternalLink,
+    Favorite,
+    Media,
+    Retweet,
+    StoredMedia,
+)
 
 
 class ConcreteDBControllerBase(DBControllerBase):
@@ -17,8 +33,8 @@ class ConcreteDBControllerBase(DBControllerBase):
     DBControllerBase()の抽象クラスメソッドを最低限実装したテスト用の派生クラス
     """
 
-    def __init__(self, db_fullpath=":memory:"):
-        super().__init__(db_fullpath)
+    def __init__(self, db_fullpath=":memory:", engine=None):
+        super().__init__(db_fullpath, engine)
 
     def upsert(self, params: dict) -> None:
         return 0
@@ -26,6 +42,9 @@ class ConcreteDBControllerBase(DBControllerBase):
     def select(self, limit=300) -> list[dict]:
         return ["select called"]
 
+    def select_gallery_since(self, last_id: int = 0, limit: int = 1000) -> list[dict]:
+        return ["select_gallery_since called"]
+
     def select_from_media_url(self, filename) -> list[dict]:
         return ["select_from_media_url called"]
 
@@ -302,6 +321,615 @@ class TestDBController(unittest.TestCase):
             expect = [e.to_dict() for e in expect]
             self.assertEqual(expect, actual)
 
+    def test_select_seen_media(self):
+        """お気に入り/リツイートをまたいだSELECTをチェックする"""
+        controlar = ConcreteDBControllerBase()
+        controlar.engine = self.engine
+
+        def make_record(model: type, filename: str) -> Favorite | Retweet:
+            args = [f"{filename}_{k}" for k in ["url", "url_thumbnail", "tweet_id", "tweet_url", "created_at"]]
+            args += [f"{filename}_{k}" for k in ["user_id", "user_name", "screan_name", "tweet_text", "tweet_via"]]
+            return model(True, filename, *args, f"{model.__name__}/{filename}", "saved_created_at", 1, None)
+
+        self.session.add_all([
+            make_record(Favorite, "both.jpg"),
+            make_record(Favorite, "fav_only.jpg"),
+            make_record(Retweet, "both.jpg"),
+            make_record(Retweet, "rt_only.jpg"),
+        ])
+        self.session.commit()
+
+        actual = controlar.select_seen_media("both.jpg")
+        expect = [
+            {
+                "source": "Fav",
+                "img_filename": "both.jpg",
+                "url": "both.jpg_url",
+                "saved_localpath": "Favorite/both.jpg",
+            },
+            {
+                "source": "RT",
+                "img_filename": "both.jpg",
+                "url": "both.jpg_url",
+                "saved_localpath": "Retweet/both.jpg",
+            },
+        ]
+        self.assertEqual(expect, actual)
+        self.assertEqual(["RT"], [r["source"] for r in controlar.select_seen_media("rt_only.jpg")])
+        self.assertEqual(["Fav"], [r["source"] for r in controlar.select_seen_media("fav_only.jpg")])
+        self.assertEqual([], controlar.select_seen_media("not_seen.jpg"))
+
+    def test_shared_engine(self):
+        """エンジンを共有したコントローラーから並行して書き込めることをチェックする"""
+        db_path = Path("./tests/shared_PG_DB.db")
+        db_path.unlink(missing_ok=True)
+        self.addCleanup(db_path.unlink, missing_ok=True)
+
+        controlar = ConcreteDBControllerBase(str(db_path))
+        self.addCleanup(controlar.engine.dispose)
+        with controlar.engine.connect() as conn:
+            busy_timeout = conn.exec_driver_sql("pragma busy_timeout").scalar()
+        self.assertEqual(DBControllerBase.BUSY_TIMEOUT * 1000, busy_timeout)
+
+        # 共有したエンジンはテーブル等の作成済として扱う
+        with patch.object(DBControllerBase, "ensure_columns") as mock_ensure_columns:
+            shared_controlar = ConcreteDBControllerBase(str(db_path), controlar.engine)
+            mock_ensure_columns.assert_not_called()
+        self.assertIs(controlar.engine, shared_controlar.engine)
+
+        errors = []
+
+        def upsert(c: DBControllerBase, start: int) -> None:
+            try:
+                for i in range(start, start + 50):
+                    c.upsert_external_link([self._make_external_link_sample(i)])
+            except Exception as e:
+                errors.append(e)
+
+        threads = [
+            threading.Thread(target=upsert, args=(controlar, 0)),
+            threading.Thread(target=upsert, args=(shared_controlar, 50)),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+        with controlar.engine.connect() as conn:
+            self.assertEqual(100, conn.exec_driver_sql("select count(*) from ExternalLink").scalar())
+
+    def test_migrate_legacy_media_table(self):
+        """旧 Favorite/Retweet テーブルからの移行をチェックする"""
+        db_path = Path("./tests/legacy_PG_DB.db")
+        db_path.unlink(missing_ok=True)
+        self.addCleanup(db_path.unlink, missing_ok=True)
+        blob_path = BlobStore.blob_db_path(db_path)
+        blob_path.unlink(missing_ok=True)
+        self.addCleanup(blob_path.unlink, missing_ok=True)
+
+        columns = [
+            "[is_exist_saved_file] BOOLEAN DEFAULT 'True'",
+            "[img_filename] TEXT NOT NULL UNIQUE",
+            "[url] TEXT NOT NULL UNIQUE",
+            "[url_thumbnail] TEXT NOT NULL UNIQUE",
+            "[tweet_id] TEXT NOT NULL",
+            "[tweet_url] TEXT NOT NULL",
+            "[created_at] TEXT",
+            "[user_id] TEXT NOT NULL",
+            "[user_name] TEXT NOT NULL",
+            "[screan_name] TEXT NOT NULL",
+            "[tweet_text] TEXT",
+            "[tweet_via] TEXT",
+            "[saved_localpath] TEXT",
+            "[saved_created_at] TEXT",
+            "[media_size] INTEGER",
+            "[media_blob] BLOB",
+        ]
+        legacy_engine = create_engine(f"sqlite:///{db_path}")
+        with legacy_engine.begin() as conn:
+            for table_name in ["Favorite", "Retweet"]:
+                conn.exec_driver_sql(
+                    f"create table {table_name} ([id] INTEGER, {', '.join(columns)}, PRIMARY KEY([id]))"
+                )
+            records = [("Favorite", 3, "fav.jpg"), ("Favorite", 5, "both.jpg"), ("Retweet", 1, "both.jpg")]
+            records.append(("Retweet", 2, "rt.jpg"))
+            for table_name, i, name in records:
+                values = (name, f"url_{name}", f"thumb_{name}", *[f"{table_name}_{k}" for k in range(10)], b"blob")
+                conn.exec_driver_sql(f"insert into {table_name} values ({i}, 1, {', '.join('?' * 13)}, 1, ?)", values)
+        legacy_engine.dispose()
+
+        controlar = ConcreteDBControllerBase(str(db_path))
+        Session = sessionmaker(bind=controlar.engine)
+        session = Session()
+        # Favorite は id を引き継ぎ、Retweet は後ろに振り直される
+        actual = [(r.id, r.source, r.img_filename) for r in session.query(Media).order_by(Media.id).all()]
+        expect = [
+            (3, "Fav", "fav.jpg"),
+            (5, "Fav", "both.jpg"),
+            (6, "RT", "both.jpg"),
+            (7, "RT", "rt.jpg"),
+        ]
+        self.assertEqual(expect, actual)
+        # 旧形式のメディア本体は同じ場所のブロブストアに移行される
+        record = session.query(Retweet).options(undefer(Retweet.media_blob)).filter_by(img_filename="both.jpg").one()
+        self.assertIsNone(record.media_blob)
+        blob_store = BlobStore(BlobStore.blob_db_path(db_path))
+        self.assertEqual(b"blob", blob_store.get(record.blob_id))
+        blob_store.close()
+        self.assertEqual(2, len(controlar.select_seen_media("both.jpg")))
+        session.close()
+
+        # 旧テーブル名は互換ビューとして参照できる
+        with controlar.engine.connect() as conn:
+            kinds = dict(conn.exec_driver_sql("select name, type from sqlite_master").fetchall())
+            self.assertEqual("view", kinds["Favorite"])
+            self.assertEqual("view", kinds["Retweet"])
+            rows = conn.exec_driver_sql("select id, img_filename from Retweet order by id").fetchall()
+            self.assertEqual([(6, "both.jpg"), (7, "rt.jpg")], rows)
+
+        # 移行済のDBに対しては何もしない
+        controlar.engine.dispose()
+        controlar = ConcreteDBControllerBase(str(db_path))
+        with controlar.engine.connect() as conn:
+            self.assertEqual(4, conn.exec_driver_sql("select count(*) from Media").scalar())
+        controlar.engine.dispose()
+
+    def test_ensure_indexes(self):
+        """既存DBへのインデックス追加をチェックする"""
+        db_path = Path("./tests/index_PG_DB.db")
+        db_path.unlink(missing_ok=True)
+        self.addCleanup(db_path.unlink, missing_ok=True)
+
+        # 新規作成時は create_all で作成済
+        controlar = ConcreteDBControllerBase(str(db_path))
+        self.assertEqual([], controlar.ensure_indexes())
+
+        # インデックスが無い既存DBには後から作成する
+        with controlar.engine.begin() as conn:
+            conn.exec_driver_sql("drop index ix_ExternalLink_external_link_url_tweet_url")
+            conn.exec_driver_sql("drop index ix_Media_tweet_id")
+        controlar.engine.dispose()
+        controlar = ConcreteDBControllerBase(str(db_path))
+        with controlar.engine.connect() as conn:
+            rows = conn.exec_driver_sql("select name from sqlite_master where type = 'index'").fetchall()
+        index_names = {name for (name,) in rows}
+        self.assertIn("ix_ExternalLink_external_link_url_tweet_url", index_names)
+        self.assertIn("ix_Media_tweet_id", index_names)
+
+        with controlar.engine.begin() as conn:
+            conn.exec_driver_sql("drop index ix_DeleteTarget_delete_done_created_at")
+        self.assertEqual(["ix_DeleteTarget_delete_done_created_at"], controlar.ensure_indexes())
+        controlar.engine.dispose()
+
+    def test_ensure_columns(self):
+        """既存DBへの列追加をチェックする"""
+        db_path = Path("./tests/column_PG_DB.db")
+        db_path.unlink(missing_ok=True)
+        self.addCleanup(db_path.unlink, missing_ok=True)
+
+        # 新規作成時は create_all で作成済
+        controlar = ConcreteDBControllerBase(str(db_path))
+        self.assertEqual([], controlar.ensure_columns())
+
+        # 列が無い既存DBには後から追加する
+        with controlar.engine.begin() as conn:
+            conn.exec_driver_sql("drop view Favorite")
+            conn.exec_driver_sql("drop view Retweet")
+            conn.exec_driver_sql("alter table Media drop column blob_id")
+        controlar.engine.dispose()
+        controlar = ConcreteDBControllerBase(str(db_path))
+        with controlar.engine.connect() as conn:
+            rows = conn.exec_driver_sql("pragma table_info(Media)").fetchall()
+        self.assertIn(("blob_id", "INTEGER"), [(row[1], row[2]) for row in rows])
+        self.assertEqual([], controlar.ensure_columns())
+        controlar.engine.dispose()
+
+    def test_move_media_blob(self):
+        """media_blob からブロブストアへの移行をチェックする"""
+        controlar = ConcreteDBControllerBase()
+        controlar.engine = self.engine
+        blob_path = Path("./tests/move_PG_DB_blob.db")
+        blob_path.unlink(missing_ok=True)
+        self.addCleanup(blob_path.unlink, missing_ok=True)
+        blob_store = BlobStore(blob_path)
+        self.addCleanup(blob_store.close)
+
+        def make_record(model: type, filename: str, media_blob: bytes | None) -> Favorite | Retweet:
+            args = [f"{filename}_{k}" for k in ["url", "url_thumbnail", "tweet_id", "tweet_url", "created_at"]]
+            args += [f"{filename}_{k}" for k in ["user_id", "user_name", "screan_name", "tweet_text", "tweet_via"]]
+            return model(True, filename, *args, filename, "saved_created_at", 1, media_blob)
+
+        # 同じ内容のメディア本体はブロブストアでは1つにまとまる
+        expect = {"fav_1.jpg": b"blob_1", "fav_2.jpg": b"blob_2", "rt_1.jpg": b"blob_1", "rt_2.jpg": None}
+        self.session.add_all([
+            make_record(Favorite if filename.startswith("fav") else Retweet, filename, media_blob)
+            for filename, media_blob in expect.items()
+        ])
+        self.session.commit()
+
+        actual = controlar.move_media_blob(blob_store, limit=2)
+        self.assertEqual(3, actual)
+
+        Session = sessionmaker(bind=self.engine)
+        session = Session()
+        records = session.query(Media).options(undefer(Media.media_blob)).all()
+        self.assertEqual(len(expect), len(records))
+        for record in records:
+            self.assertIsNone(record.media_blob)
+            if expect[record.img_filename] is None:
+                self.assertIsNone(record.blob_id)
+            else:
+                self.assertEqual(expect[record.img_filename], blob_store.get(record.blob_id))
+        blob_ids = {r.img_filename: r.blob_id for r in records}
+        self.assertEqual(blob_ids["fav_1.jpg"], blob_ids["rt_1.jpg"])
+        session.close()
+        self.assertEqual(0, controlar.move_media_blob(blob_store))
+
+    def test_migrate_media_blob(self):
+        """DBを開く際のブロブストアへの移行をチェックする"""
+        db_path = Path("./tests/migrate_PG_DB.db")
+        blob_path = BlobStore.blob_db_path(db_path)
+        for path in [db_path, blob_path]:
+            path.unlink(missing_ok=True)
+            self.addCleanup(path.unlink, missing_ok=True)
+
+        # 移行対象が無い場合はブロブストアを作成しない
+        controlar = ConcreteDBControllerBase(str(db_path))
+        self.assertEqual(0, controlar.migrate_media_blob())
+        self.assertFalse(blob_path.exists())
+
+        Session = sessionmaker(bind=controlar.engine)
+        session = Session()
+        args = [f"fav_{k}" for k in ["url", "url_thumbnail", "tweet_id", "tweet_url", "created_at", "user_id"]]
+        args += [f"fav_{k}" for k in ["user_name", "screan_name", "tweet_text", "tweet_via", "saved_localpath"]]
+        session.add(Favorite(True, "fav.jpg", *args, "saved_created_at", 1, b"blob"))
+        session.commit()
+        session.close()
+        controlar.engine.dispose()
+
+        # 開き直すと移行される
+        controlar = ConcreteDBControllerBase(str(db_path))
+        session = Session(bind=controlar.engine)
+        record = session.query(Media).options(undefer(Media.media_blob)).one()
+        self.assertIsNone(record.media_blob)
+        blob_store = BlobStore(blob_path)
+        self.assertEqual(b"blob", blob_store.get(record.blob_id))
+        blob_store.close()
+        session.close()
+        self.assertEqual(0, controlar.migrate_media_blob())
+        controlar.engine.dispose()
+
+    def _make_search_sample(self, controlar: DBControllerBase) -> None:
+        def make_record(model: type, i: int, tweet_text: str, screan_name: str) -> Favorite | Retweet:
+            args = [f"{i}_{k}" for k in ["url", "url_thumbnail", "tweet_id", "tweet_url", "created_at", "user_id"]]
+            args += ["user_name", screan_name, tweet_text, "tweet_via", f"saved_localpath_{i}"]
+            return model(True, f"{i}.jpg", *args, "saved_created_at", 1, None)
+
+        Session = sessionmaker(bind=controlar.engine)
+        session = Session()
+        session.add_all([
+            make_record(Favorite, 1, "今日は猫を撫でた", "cat_lover"),
+            make_record(Favorite, 2, "Cat picture 100%_done", "dog_lover"),
+            make_record(Retweet, 3, "猫カフェに行った", "cafe"),
+            make_record(Retweet, 4, "犬の散歩", "cat_lover"),
+        ])
+        session.add(self._make_external_link_sample(1))
+        session.query(ExternalLink).one().tweet_text = "猫カフェの外部リンク"
+        session.commit()
+        session.close()
+
+    def test_ensure_search_index(self):
+        """全文検索インデックスの作成と追従をチェックする"""
+        db_path = Path("./tests/search_PG_DB.db")
+        db_path.unlink(missing_ok=True)
+        self.addCleanup(db_path.unlink, missing_ok=True)
+
+        controlar = ConcreteDBControllerBase(str(db_path))
+        self.assertEqual([], controlar.ensure_search_index())
+        self._make_search_sample(controlar)
+        self.assertEqual([4, 2, 1], [r["id"] for r in controlar.search("lover")])
+
+        # 更新と削除に追従する
+        Session = sessionmaker(bind=controlar.engine)
+        session = Session()
+        session.query(Media).filter_by(id=4).one().screan_name = "dog"
+        session.delete(session.query(Media).filter_by(id=1).one())
+        session.commit()
+        session.close()
+        self.assertEqual([2], [r["id"] for r in controlar.search("lover")])
+
+        # インデックスが無い既存DBには後から作成し、既存レコードから作り直す
+        with controlar.engine.begin() as conn:
+            conn.exec_driver_sql("drop table MediaSearch")
+            conn.exec_driver_sql("drop trigger ExternalLinkSearch_au")
+        controlar.engine.dispose()
+        controlar = ConcreteDBControllerBase(str(db_path))
+        self.assertEqual([2], [r["id"] for r in controlar.search("lover")])
+        self.assertEqual([1], [r["id"] for r in controlar.search("外部リンク", source="ExternalLink")])
+        with controlar.engine.connect() as conn:
+            rows = conn.exec_driver_sql("select name from sqlite_master where type = 'trigger'").fetchall()
+        trigger_names = {name for (name,) in rows}
+        for index_name in ["MediaSearch", "ExternalLinkSearch"]:
+            for suffix in ["ai", "ad", "au"]:
+                self.assertIn(f"{index_name}_{suffix}", trigger_names)
+        self.assertEqual([], controlar.ensure_search_index())
+        controlar.engine.dispose()
+
+    def test_search(self):
+        """全文検索をチェックする"""
+        controlar = ConcreteDBControllerBase()
+        self._make_search_sample(controlar)
+
+        actual = controlar.search("猫カフェ")
+        expect = [
+            {
+                "id": 3,
+                "source": "RT",
+                "img_filename": "3.jpg",
+                "url": "3_url",
+                "url_thumbnail": "3_url_thumbnail",
+                "saved_localpath": "saved_localpath_3",
+                "tweet_id": "3_tweet_id",
+                "tweet_url": "3_tweet_url",
+                "created_at": "3_created_at",
+                "user_id": "3_user_id",
+                "user_name": "user_name",
+                "screan_name": "cafe",
+                "tweet_text": "猫カフェに行った",
+            }
+        ]
+        self.assertEqual(expect, actual)
+
+        # 3文字未満の検索語は部分一致、大文字小文字は区別しない
+        self.assertEqual([3, 1], [r["id"] for r in controlar.search("猫")])
+        self.assertEqual([4, 2, 1], [r["id"] for r in controlar.search("CAT")])
+        self.assertEqual([2], [r["id"] for r in controlar.search("%_")])
+        self.assertEqual([], controlar.search("_x"))
+        # すべての検索語を含むものを対象とする
+        self.assertEqual([1], [r["id"] for r in controlar.search("猫 cat_lover")])
+        self.assertEqual([], controlar.search('猫 "dog'))
+        self.assertEqual([], controlar.search(" "))
+
+        # source で絞り込む
+        self.assertEqual([1], [r["id"] for r in controlar.search("猫", source="Fav")])
+        self.assertEqual([3], [r["id"] for r in controlar.search("猫", source="RT")])
+        actual = controlar.search("猫カフェ", source="ExternalLink")
+        self.assertEqual(
+            [(1, "ExternalLink", "expanded_url_01")], [(r["id"], r["source"], r["external_link_url"]) for r in actual]
+        )
+
+        # cursor で続きを取得する
+        self.assertEqual([4, 2], [r["id"] for r in controlar.search("cat", limit=2)])
+        self.assertEqual([1], [r["id"] for r in controlar.search("cat", limit=2, cursor=2)])
+
+        with self.assertRaises(ValueError):
+            controlar.search("猫", source="invalid_source")
+        with self.assertRaises(ValueError):
+            controlar.search("猫", limit=0)
+
+    def _make_stored_media_sample(self, i: int, digest: int) -> StoredMedia:
+        return StoredMedia(
+            f"{digest:064x}", f"url_{digest}", f"saved_localpath_{i}", digest + 1, "2022-10-24 10:30:00"
+        )
+
+    def test_upsert_stored_media(self):
+        """StoredMediaへのUPSERTをチェックする"""
+        controlar = ConcreteDBControllerBase()
+        controlar.engine = self.engine
+
+        # insert
+        # 同じ実体を複数の保存先から参照する
+        stored_media_list = [self._make_stored_media_sample(i, i // 2) for i in range(5)]
+        expect = [self._make_stored_media_sample(i, i // 2).to_dict() for i in range(5)]
+        controlar.upsert_stored_media(stored_media_list)
+
+        actual = [r.to_dict() for r in self.session.query(StoredMedia).all()]
+        for a in actual:
+            del a["id"]
+        for e in expect:
+            del e["id"]
+        self.assertEqual(expect, actual)
+
+        # update
+        stored_media_list = [self._make_stored_media_sample(0, 9)]
+        controlar.upsert_stored_media(stored_media_list)
+        self.session.expire_all()
+        actual = self.session.query(StoredMedia).filter_by(saved_localpath="saved_localpath_0").all()
+        self.assertEqual(1, len(actual))
+        self.assertEqual(f"{9:064x}", actual[0].sha256)
+        self.assertEqual(5, self.session.query(StoredMedia).count())
+
+    def test_select_stored_media(self):
+        """StoredMediaへのSELECTをチェックする"""
+        controlar = ConcreteDBControllerBase()
+        controlar.engine = self.engine
+
+        stored_media_list = [self._make_stored_media_sample(i, i // 2) for i in range(5)]
+        controlar.upsert_stored_media(stored_media_list)
+        expect = [r.to_dict() for r in self.session.query(StoredMedia).all()]
+
+        actual = controlar.select_stored_media_from_sha256(f"{1:064x}")
+        self.assertEqual(expect[2:4], actual)
+        actual = controlar.select_stored_media_from_url("url_2")
+        self.assertEqual(expect[4:5], actual)
+        self.assertEqual([], controlar.select_stored_media_from_url("invalid_url"))
+
+        # 保存先パスのリストで引く（変数の上限を超えないよう分割して問い合わせる）
+        saved_localpath_list = ["saved_localpath_1", "invalid_saved_localpath", "saved_localpath_3"]
+        actual = controlar.select_stored_media_from_localpath(saved_localpath_list * 300)
+        self.assertEqual([expect[1], expect[3]], sorted({r["id"]: r for r in actual}.values(), key=lambda r: r["id"]))
+        self.assertEqual([], controlar.select_stored_media_from_localpath([]))
+
+    def test_record_job_failure(self):
+        """DownloadJobへの失敗の記録をチェックする"""
+        controlar = ConcreteDBControllerBase()
+        controlar.engine = self.engine
+        retry_policy = JobRetryPolicy(60, 150, 4)
+        payload = {"media_url": "url_1"}
+
+        def record(url: str = "url_1", permanent: bool = False) -> dict:
+            return controlar.record_job_failure(
+                DownloadJob.MEDIA, "Fav", url, payload, "error", retry_policy, permanent
+            )
+
+        # 未登録なら登録し、失敗回数に応じて再試行日時を遅らせる
+        with freeze_time("2022-10-24 10:00:00"):
+            actual = record()
+        self.assertEqual(DownloadJob.PENDING, actual["state"])
+        self.assertEqual(1, actual["attempt"])
+        self.assertEqual("2022-10-24 10:01:00", actual["next_retry_at"])
+        self.assertEqual('{"media_url":"url_1"}', actual["payload"])
+        self.assertEqual("error", actual["last_error"])
+        self.assertEqual("2022-10-24 10:00:00", actual["created_at"])
+
+        with freeze_time("2022-10-24 11:00:00"):
+            actual = record()
+        self.assertEqual(2, actual["attempt"])
+        self.assertEqual("2022-10-24 11:02:00", actual["next_retry_at"])
+        self.assertEqual("2022-10-24 10:00:00", actual["created_at"])
+        self.assertEqual("2022-10-24 11:00:00", actual["updated_at"])
+
+        # 再試行間隔は上限で頭打ちになる
+        with freeze_time("2022-10-24 12:00:00"):
+            actual = record()
+        self.assertEqual(3, actual["attempt"])
+        self.assertEqual("2022-10-24 12:02:30", actual["next_retry_at"])
+
+        # 失敗回数の上限に達したら再試行を打ち切る
+        actual = record()
+        self.assertEqual(DownloadJob.DEAD, actual["state"])
+        self.assertEqual(4, actual["attempt"])
+        self.assertEqual(1, self.session.query(DownloadJob).count())
+
+        # 再試行しても成功しない失敗は1回目で打ち切る
+        actual = record("url_2", True)
+        self.assertEqual(DownloadJob.DEAD, actual["state"])
+        self.assertEqual(1, actual["attempt"])
+
+        # 完了後に再び失敗した場合は数え直す
+        controlar.complete_job(DownloadJob.MEDIA, "Fav", "url_2")
+        actual = record("url_2")
+        self.assertEqual(DownloadJob.PENDING, actual["state"])
+        self.assertEqual(1, actual["attempt"])
+
+        # 長いエラー内容は切り詰める
+        actual = controlar.record_job_failure(DownloadJob.MEDIA, "Fav", "url_3", payload, "e" * 1000, retry_policy)
+        self.assertEqual(512, len(actual["last_error"]))
+
+    def test_enqueue_job(self):
+        """DownloadJobへの登録をチェックする"""
+        controlar = ConcreteDBControllerBase()
+        controlar.engine = self.engine
+        next_retry_at = datetime(2022, 10, 24, 10, 0, 0)
+
+        controlar.enqueue_job(DownloadJob.EXTERNAL_LINK, "Fav", "url_1", {"k": "v"}, next_retry_at)
+        actual = self.session.query(DownloadJob).one().to_dict()
+        self.assertEqual(DownloadJob.PENDING, actual["state"])
+        self.assertEqual(0, actual["attempt"])
+        self.assertEqual("2022-10-24 10:00:00", actual["next_retry_at"])
+
+        # 登録済のジョブは変更しない
+        controlar.enqueue_job(DownloadJob.EXTERNAL_LINK, "Fav", "url_1", {"k": "v2"}, next_retry_at + timedelta(1))
+        self.session.expire_all()
+        self.assertEqual(actual, self.session.query(DownloadJob).one().to_dict())
+
+    def test_select_due_jobs(self):
+        """DownloadJobからの再試行対象のSELECTと完了をチェックする"""
+        controlar = ConcreteDBControllerBase()
+        controlar.engine = self.engine
+        base = datetime(2022, 10, 24, 10, 0, 0)
+        for i in range(4):
+            controlar.enqueue_job(DownloadJob.MEDIA, "Fav", f"url_{i}", {}, base + timedelta(minutes=3 - i))
+        controlar.enqueue_job(DownloadJob.MEDIA, "RT", "url_rt", {}, base)
+
+        # 再試行日時を過ぎたものを再試行日時の昇順で返す
+        actual = controlar.select_due_jobs("Fav", base + timedelta(minutes=2))
+        self.assertEqual(["url_3", "url_2", "url_1"], [r["url"] for r in actual])
+        actual = controlar.select_due_jobs("Fav", base + timedelta(minutes=2), 2)
+        self.assertEqual(["url_3", "url_2"], [r["url"] for r in actual])
+        actual = controlar.select_due_jobs("RT", base)
+        self.assertEqual(["url_rt"], [r["url"] for r in actual])
+
+        # 完了したジョブは返さない
+        controlar.complete_job(DownloadJob.MEDIA, "Fav", "url_3")
+        controlar.complete_job(DownloadJob.MEDIA, "Fav", "invalid_url")
+        actual = controlar.select_due_jobs("Fav", base + timedelta(minutes=2))
+        self.assertEqual(["url_2", "url_1"], [r["url"] for r in actual])
+        self.assertEqual(DownloadJob.DONE, self.session.query(DownloadJob).filter_by(url="url_3").one().state)
+
+    def test_checkpoint(self):
+        """CrawlCheckpointの保存、更新、SELECT、削除をチェックする"""
+        controlar = ConcreteDBControllerBase()
+        controlar.engine = self.engine
+        self.assertIsNone(controlar.select_checkpoint("Fav"))
+
+        fetched_tweets = [{"rest_id": f"{i:05}", "legacy": {"full_text": f"tweet_text_{i:02}"}} for i in range(3)]
+        with freeze_time("2022-10-24 10:00:00"):
+            controlar.save_checkpoint("Fav", fetched_tweets)
+        controlar.save_checkpoint("RT", [])
+
+        # 取得したツイートは圧縮して保存する
+        record = self.session.query(CrawlCheckpoint).filter_by(source="Fav").one()
+        self.assertIsInstance(record.fetched_tweets, bytes)
+        actual = controlar.select_checkpoint("Fav")
+        expect = {
+            "id": record.id,
+            "source": "Fav",
+            "fetched_tweets": fetched_tweets,
+            "media_index": 0,
+            "external_link_index": 0,
+            "created_at": "2022-10-24 10:00:00",
+            "updated_at": "2022-10-24 10:00:00",
+        }
+        self.assertEqual(expect, actual)
+
+        # 指定した処理済件数だけ更新する
+        with freeze_time("2022-10-24 10:30:00"):
+            controlar.update_checkpoint("Fav", media_index=10)
+            controlar.update_checkpoint("Fav", external_link_index=2)
+        actual = controlar.select_checkpoint("Fav")
+        expect |= {"media_index": 10, "external_link_index": 2, "updated_at": "2022-10-24 10:30:00"}
+        self.assertEqual(expect, actual)
+        self.assertEqual(0, controlar.select_checkpoint("RT")["media_index"])
+
+        # 保存し直すと処理済件数は0に戻る
+        controlar.save_checkpoint("Fav", fetched_tweets[:1])
+        actual = controlar.select_checkpoint("Fav")
+        self.assertEqual(
+            (fetched_tweets[:1], 0, 0),
+            (actual["fetched_tweets"], actual["media_index"], actual["external_link_index"]),
+        )
+        self.assertEqual(2, self.session.query(CrawlCheckpoint).count())
+
+        controlar.delete_checkpoint("Fav")
+        self.assertIsNone(controlar.select_checkpoint("Fav"))
+        self.assertIsNotNone(controlar.select_checkpoint("RT"))
+
+    def test_crawl_run(self):
+        """CrawlRunへの保存とSELECTをチェックする"""
+        controlar = ConcreteDBControllerBase()
+        controlar.engine = self.engine
+        self.assertEqual([], controlar.select_crawl_runs("Fav"))
+
+        base = datetime(2022, 10, 24, 10, 0, 0)
+        for i in range(3):
+            summary = {"counters": [{"name": "media_total", "labels": {}, "value": i}], "histograms": []}
+            started_at = base + timedelta(hours=i)
+            controlar.insert_crawl_run("Fav", started_at, started_at + timedelta(minutes=5), "success", summary)
+        controlar.insert_crawl_run("RT", base, base, "failed", {})
+        self.assertEqual(4, self.session.query(CrawlRun).count())
+
+        # 新しい順に summary を展開して返す
+        actual = controlar.select_crawl_runs("Fav")
+        self.assertEqual([2, 1, 0], [r["summary"]["counters"][0]["value"] for r in actual])
+        self.assertEqual("2022-10-24 12:00:00", actual[0]["started_at"])
+        self.assertEqual("2022-10-24 12:05:00", actual[0]["finished_at"])
+        self.assertEqual("success", actual[0]["result"])
+        actual = controlar.select_crawl_runs("Fav", 2)
+        self.assertEqual(["2022-10-24 12:00:00", "2022-10-24 11:00:00"], [r["started_at"] for r in actual])
+        actual = controlar.select_crawl_runs("RT")
+        self.assertEqual([("failed", {})], [(r["result"], r["summary"]) for r in actual])
+
 
 if __name__ == "__main__":
     if sys.argv:
@@ -132,7 +132,7 @@ class TestFavDBController(unittest.TestCase):
     def test_QuerySample(self):
         """クエリテストサンプル"""
         expect = [self.f]
-        actual = self.session.query(Favorite).all()
+        actual = self.session.query(Favorite).order_by(Favorite.id).all()
         self.assertEqual(actual, expect)
 
     def test_upsert(self):
@@ -161,7 +161,7 @@ class TestFavDBController(unittest.TestCase):
         r2.id = "2"
         r3.id = "3"
         expect = [self.f, r3, r2]
-        actual = self.session.query(Favorite).all()
+        actual = self.session.query(Favorite).order_by(Favorite.id).all()
         self.assertEqual(expect, actual)
 
     def test_select(self):
@@ -177,6 +177,43 @@ class TestFavDBController(unittest.TestCase):
         expect = [self.f.to_dict()]
         self.assertEqual(expect, actual)
 
+    def test_select_gallery_since(self):
+        """Favoriteからギャラリー表示用の列のSELECTをチェックする"""
+        # engineをテスト用インメモリテーブルに置き換える
+        controlar = FavDBController(TEST_DB_FULLPATH)
+        controlar.engine = self.engine
+
+        # サンプル生成
+        records = [self.f]
+        for i in range(3):
+            img_url_s = f"http://www.img.filename.sample.com/media/sample_{i}.png"
+            record = self._Favorite_sample_factory(img_url_s)
+            self.session.add(record)
+            records.append(record)
+        self.session.commit()
+
+        def to_gallery_dict(r: Favorite) -> dict:
+            return {
+                "id": r.id,
+                "img_filename": r.img_filename,
+                "url": r.url,
+                "url_thumbnail": r.url_thumbnail,
+                "tweet_url": r.tweet_url,
+            }
+
+        # id の昇順で取得する
+        actual = controlar.select_gallery_since()
+        expect = [to_gallery_dict(r) for r in records]
+        self.assertEqual(expect, actual)
+
+        # last_id より後のレコードのみ、limit 件まで取得する
+        actual = controlar.select_gallery_since(records[0].id, 2)
+        expect = [to_gallery_dict(r) for r in records[1:3]]
+        self.assertEqual(expect, actual)
+
+        actual = controlar.select_gallery_since(records[-1].id)
+        self.assertEqual([], actual)
+
     def test_select_from_media_url(self):
         """Favoriteからfilenameを条件としてのSELECTをチェックする"""
         # engineをテスト用インメモリテーブルに置き換える
@@ -249,7 +286,7 @@ class TestFavDBController(unittest.TestCase):
 
         # フラグクリア前チェック
         expect = [self.f] + r
-        actual = self.session.query(Favorite).all()
+        actual = self.session.query(Favorite).order_by(Favorite.id).all()
         self.assertEqual(expect, actual)
 
         # フラグクリア
@@ -260,7 +297,7 @@ class TestFavDBController(unittest.TestCase):
         for t in r:
             t.is_exist_saved_file = False
         expect = [self.f] + r
-        actual = self.session.query(Favorite).all()
+        actual = self.session.query(Favorite).order_by(Favorite.id).all()
         self.assertEqual(expect, actual)
 
 
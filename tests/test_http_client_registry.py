@@ -0,0 +1,186 @@
+import sys
+import unittest
+
+import httpx
+from mock import patch
+
+from media_gathering.http_client_registry import (
+    HttpClientRegistry,
+    MeteredTransport,
+    RetryPolicy,
+    RetryTransport,
+)
+from media_gathering.metrics import Metrics, collect
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_RetryPolicy(self):
+        policy = RetryPolicy()
+        self.assertEqual(3, policy.retries)
+        self.assertEqual(0.5, policy.backoff_factor)
+        self.assertEqual(30.0, policy.max_backoff)
+        self.assertEqual(frozenset({429, 500, 502, 503, 504}), policy.RETRY_STATUS_CODES)
+        self.assertEqual(frozenset({"GET", "HEAD", "OPTIONS"}), policy.RETRY_METHODS)
+
+        with self.assertRaises(TypeError):
+            policy = RetryPolicy("invalid_retries")
+        with self.assertRaises(TypeError):
+            policy = RetryPolicy(3, "invalid_backoff_factor")
+        with self.assertRaises(TypeError):
+            policy = RetryPolicy(3, 0.5, "invalid_max_backoff")
+        with self.assertRaises(ValueError):
+            policy = RetryPolicy(-1)
+
+    def test_is_retryable(self):
+        policy = RetryPolicy()
+        get_request = httpx.Request("GET", "https://example.com/")
+        post_request = httpx.Request("POST", "https://example.com/")
+        self.assertTrue(policy.is_retryable(get_request, httpx.Response(503)))
+        self.assertTrue(policy.is_retryable(get_request, httpx.Response(429)))
+        self.assertFalse(policy.is_retryable(get_request, httpx.Response(200)))
+        self.assertFalse(policy.is_retryable(get_request, httpx.Response(404)))
+        # 冪等でないメソッドはリトライしない
+        self.assertFalse(policy.is_retryable(post_request, httpx.Response(503)))
+
+    def test_backoff(self):
+        policy = RetryPolicy(3, 0.5, 3.0)
+        self.assertEqual([0.5, 1.0, 2.0, 3.0], [policy.backoff(i) for i in range(4)])
+
+        # Retry-After が秒数で指定されていればそちらを優先する
+        response = httpx.Response(429, headers={"Retry-After": "2"})
+        self.assertEqual(2.0, policy.backoff(0, response))
+        response = httpx.Response(429, headers={"Retry-After": "120"})
+        self.assertEqual(3.0, policy.backoff(0, response))
+        response = httpx.Response(429, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+        self.assertEqual(0.5, policy.backoff(0, response))
+
+
+class TestRetryTransport(unittest.TestCase):
+    def _make_transport(self, status_codes: list[int], policy: RetryPolicy) -> tuple[RetryTransport, list]:
+        requested = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            requested.append(request)
+            return httpx.Response(status_codes[len(requested) - 1])
+
+        return RetryTransport(httpx.MockTransport(handler), policy), requested
+
+    def test_handle_request(self):
+        mock_sleep = self.enterContext(patch("media_gathering.http_client_registry.time.sleep"))
+        policy = RetryPolicy(3, 0.5, 30.0)
+
+        # 一時的なエラーの後に成功する
+        transport, requested = self._make_transport([503, 502, 200], policy)
+        with httpx.Client(transport=transport) as client:
+            response = client.get("https://example.com/")
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(3, len(requested))
+        self.assertEqual([0.5, 1.0], [c.args[0] for c in mock_sleep.call_args_list])
+
+        # リトライ回数を超えた場合は最後のレスポンスを返す
+        mock_sleep.reset_mock()
+        transport, requested = self._make_transport([503, 503, 503, 503], policy)
+        with httpx.Client(transport=transport) as client:
+            response = client.get("https://example.com/")
+        self.assertEqual(503, response.status_code)
+        self.assertEqual(4, len(requested))
+        self.assertEqual(3, mock_sleep.call_count)
+
+        # リトライ対象外
+        mock_sleep.reset_mock()
+        transport, requested = self._make_transport([503], policy)
+        with httpx.Client(transport=transport) as client:
+            response = client.post("https://example.com/")
+        self.assertEqual(503, response.status_code)
+        self.assertEqual(1, len(requested))
+        mock_sleep.assert_not_called()
+
+
+class TestMeteredTransport(unittest.TestCase):
+    def test_handle_request(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            if request.url.host == "error.example.com":
+                raise httpx.ConnectError("connect failed")
+            return httpx.Response(200 if request.url.path == "/" else 404, content=iter([b"x" * 500] * 2))
+
+        metrics = Metrics()
+        with httpx.Client(transport=MeteredTransport(httpx.MockTransport(handler))) as client:
+            # 計測値を有効にしていない場合は何も記録しない
+            client.get("https://example.com/")
+            self.assertEqual({"counters": [], "histograms": []}, metrics.to_dict())
+
+            with collect(metrics):
+                client.get("https://example.com/")
+                client.get("https://example.com/missing")
+                with client.stream("GET", "https://other.example.com/") as response:
+                    for _ in response.iter_bytes(chunk_size=100):
+                        pass
+                with self.assertRaises(httpx.ConnectError):
+                    client.get("https://error.example.com/")
+
+        self.assertEqual(1, metrics.get_counter("http_requests_total", host="example.com", status=200))
+        self.assertEqual(1, metrics.get_counter("http_requests_total", host="example.com", status=404))
+        self.assertEqual(1, metrics.get_counter("http_requests_total", host="other.example.com", status=200))
+        self.assertEqual(1, metrics.get_counter("http_requests_total", host="error.example.com", status="error"))
+        self.assertEqual(2000, metrics.get_counter("http_response_bytes_total", host="example.com"))
+        self.assertEqual(1000, metrics.get_counter("http_response_bytes_total", host="other.example.com"))
+        histograms = {h["labels"]["host"]: h["count"] for h in metrics.to_dict()["histograms"]}
+        self.assertEqual({"example.com": 2, "other.example.com": 1}, histograms)
+
+
+class TestHttpClientRegistry(unittest.TestCase):
+    def setUp(self):
+        HttpClientRegistry.close_all()
+
+    def tearDown(self):
+        HttpClientRegistry.close_all()
+
+    def test_create_client(self):
+        client = HttpClientRegistry.create_client()
+        self.assertIsInstance(client, httpx.Client)
+        self.assertTrue(client.follow_redirects)
+        self.assertEqual(httpx.Timeout(60.0), client.timeout)
+        self.assertIsInstance(client._transport, RetryTransport)
+        self.assertIsInstance(client._transport._transport, MeteredTransport)
+        client.close()
+
+    def test_get(self):
+        client = HttpClientRegistry.get("site_a")
+        self.assertIsInstance(client, httpx.Client)
+
+        # 同じサイトには同じクライアントを返す
+        self.assertIs(client, HttpClientRegistry.get("site_a"))
+        # サイトが異なればコネクションプールも別
+        self.assertIsNot(client, HttpClientRegistry.get("site_b"))
+
+        # 閉じられていた場合は作り直す
+        client.close()
+        actual = HttpClientRegistry.get("site_a")
+        self.assertIsNot(client, actual)
+        self.assertFalse(actual.is_closed)
+
+        with self.assertRaises(ValueError):
+            client = HttpClientRegistry.get("")
+        with self.assertRaises(ValueError):
+            client = HttpClientRegistry.get(-1)
+
+    def test_close(self):
+        client_a = HttpClientRegistry.get("site_a")
+        client_b = HttpClientRegistry.get("site_b")
+
+        HttpClientRegistry.close("site_a")
+        self.assertTrue(client_a.is_closed)
+        self.assertFalse(client_b.is_closed)
+
+        # 登録されていないサイトを指定してもエラーにならない
+        HttpClientRegistry.close("not_registered")
+
+        HttpClientRegistry.close_all()
+        self.assertTrue(client_b.is_closed)
+        self.assertEqual({}, HttpClientRegistry._clients)
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,50 @@
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+
+class TestImportTime(unittest.TestCase):
+    """起動時に重い依存を import していないかを -X importtime の出力で確認する"""
+
+    # 使うときまで import しない依存
+    LAZY_MODULES = ["plyer", "slack_sdk", "jinja2", "pixivpy3", "bs4", "PIL", "xmltodict", "twitter", "tweeterpy"]
+
+    def _importtime(self, args: list[str]) -> dict[str, int]:
+        """python -X importtime の結果をモジュール名と累積 import 時間[us]の辞書で返す"""
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", *args], capture_output=True, text=True, check=True, timeout=60
+        )
+        import_time = {}
+        for line in result.stderr.splitlines():
+            if not line.startswith("import time:") or "|" not in line:
+                continue
+            _, cumulative, module_name = line.split("|")
+            if cumulative.strip().isdigit():
+                import_time[module_name.strip()] = int(cumulative)
+        return import_time
+
+    def assertNotImported(self, import_time: dict[str, int]) -> None:
+        imported = sorted({name.split(".")[0] for name in import_time} & set(self.LAZY_MODULES))
+        total = max(import_time.values()) / 1000
+        self.assertEqual([], imported, f"{imported} imported at startup ({total:.0f} ms).")
+
+    def test_crawler_import(self):
+        code = "import logging, media_gathering.crawler; print(len(logging.root.handlers))"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, timeout=60)
+        # import しただけではログ設定を読み込まない
+        self.assertEqual("0", result.stdout.strip())
+        self.assertNotImported(self._importtime(["-c", "import media_gathering.crawler"]))
+
+    def test_main_help(self):
+        import_time = self._importtime([str(Path("./src/main.py")), "--help"])
+        self.assertNotImported(import_time)
+        # ヘルプ表示だけならDBもクローラーも import しない
+        self.assertNotIn("sqlalchemy", import_time)
+        self.assertNotIn("media_gathering.crawler", import_time)
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
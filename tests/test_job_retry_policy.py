@@ -0,0 +1,50 @@
+import sys
+import unittest
+
+from media_gathering.job_retry_policy import JobRetryPolicy
+
+
+class TestJobRetryPolicy(unittest.TestCase):
+    def test_init(self):
+        actual = JobRetryPolicy()
+        self.assertEqual(600.0, actual.base_delay)
+        self.assertEqual(86400.0, actual.max_delay)
+        self.assertEqual(8, actual.max_attempts)
+
+        actual = JobRetryPolicy(1, 2, 3)
+        self.assertEqual((1, 2, 3), (actual.base_delay, actual.max_delay, actual.max_attempts))
+
+        with self.assertRaises(TypeError):
+            actual = JobRetryPolicy("invalid", 2, 3)
+        with self.assertRaises(TypeError):
+            actual = JobRetryPolicy(1, "invalid", 3)
+        with self.assertRaises(TypeError):
+            actual = JobRetryPolicy(1, 2, 3.0)
+        with self.assertRaises(ValueError):
+            actual = JobRetryPolicy(-1, 2, 3)
+        with self.assertRaises(ValueError):
+            actual = JobRetryPolicy(3, 2, 3)
+        with self.assertRaises(ValueError):
+            actual = JobRetryPolicy(1, 2, 0)
+
+    def test_create(self):
+        actual = JobRetryPolicy.create({})
+        self.assertEqual(JobRetryPolicy(600, 86400, 8), actual)
+        config = {"base_delay_minutes": 1, "max_delay_minutes": 30, "max_attempts": 5}
+        actual = JobRetryPolicy.create(config)
+        self.assertEqual(JobRetryPolicy(60, 1800, 5), actual)
+
+    def test_delay(self):
+        retry_policy = JobRetryPolicy(10, 50, 5)
+        actual = [retry_policy.delay(attempt) for attempt in range(1, 7)]
+        self.assertEqual([10, 20, 40, 50, None, None], actual)
+
+        # 失敗回数が大きくても桁あふれしない
+        retry_policy = JobRetryPolicy(10, 50, 100000)
+        self.assertEqual(50, retry_policy.delay(99999))
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
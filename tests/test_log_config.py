@@ -0,0 +1,61 @@
+import logging
+import sys
+import unittest
+from logging import getLogger
+from pathlib import Path
+
+from media_gathering.log_config import LOGGING_INI_PATH, configure_logging, get_log_directory
+
+
+class TestLogConfig(unittest.TestCase):
+    def setUp(self):
+        # ルートロガーとライブラリのロガーの状態を戻す
+        root_handlers = list(logging.root.handlers)
+        root_level = logging.root.level
+        library_logger = getLogger("sample_library")
+        library_logger.disabled = False
+        getLogger("media_gathering.sample")
+
+        def restore():
+            for handler in logging.root.handlers:
+                if handler not in root_handlers:
+                    handler.close()
+            logging.root.handlers = root_handlers
+            logging.root.setLevel(root_level)
+            library_logger.disabled = False
+
+        self.addCleanup(restore)
+
+    def test_configure_logging(self):
+        self.assertEqual("./log/logging.ini", LOGGING_INI_PATH)
+        configure_logging()
+
+        # logging.ini の設定が読み込まれる
+        self.assertEqual(logging.INFO, logging.root.level)
+        self.assertEqual(2, len(logging.root.handlers))
+
+        # 既存のライブラリのロガーは無効化する
+        self.assertTrue(getLogger("sample_library").disabled)
+        self.assertFalse(getLogger("media_gathering.sample").disabled)
+
+        # 後から作成されたライブラリのロガーはハンドラのフィルタで抑制する
+        later_record = logging.LogRecord("later_library", logging.INFO, __file__, 1, "message", None, None)
+        own_record = logging.LogRecord("media_gathering.sample", logging.INFO, __file__, 1, "message", None, None)
+        for handler in logging.root.handlers:
+            self.assertFalse(handler.filter(later_record))
+            self.assertTrue(handler.filter(own_record))
+
+    def test_get_log_directory(self):
+        # ファイルに出力していない場合はカレントディレクトリ
+        logging.root.handlers = [logging.StreamHandler()]
+        self.assertEqual(Path("."), get_log_directory())
+
+        # ログファイル（./log.txt）と同じディレクトリ
+        configure_logging()
+        self.assertEqual(Path("./log.txt").absolute().parent, get_log_directory())
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,204 @@
+import os
+import shutil
+import sys
+import threading
+import unittest
+import zlib
+from pathlib import Path
+
+from mock import patch
+
+from media_gathering import media_archive
+from media_gathering.media_archive import MediaArchive
+from media_gathering.run_lock import RunLock
+
+
+class TestMediaArchive(unittest.TestCase):
+    def setUp(self):
+        self.TBP = Path("./tests/media_archive")
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+        self.archive_path = self.TBP / "archive"
+        self.save_path = self.TBP / "save"
+        self.save_path.mkdir(parents=True, exist_ok=True)
+
+    def tearDown(self):
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+
+    def _make_archive(self, pack_size: int = 1024 * 1024) -> MediaArchive:
+        archive = MediaArchive(self.archive_path, pack_size)
+        self.addCleanup(archive.close)
+        return archive
+
+    def _make_media(self, name: str, content: bytes, mtime: float = 1719107372) -> Path:
+        media_path = self.save_path / name
+        media_path.write_bytes(content)
+        os.utime(media_path, (mtime, mtime))
+        return media_path
+
+    def test_MediaArchive(self):
+        archive = MediaArchive(self.archive_path)
+        self.assertEqual(self.archive_path, archive.archive_path)
+        self.assertEqual(1024 * 1024 * 1024, archive.pack_size)
+        # 使用するまでディレクトリは作成しない
+        self.assertFalse(self.archive_path.exists())
+        with self.assertRaises(TypeError):
+            archive = MediaArchive("invalid_archive_path")
+        with self.assertRaises(TypeError):
+            archive = MediaArchive(self.archive_path, "invalid_pack_size")
+        with self.assertRaises(ValueError):
+            archive = MediaArchive(self.archive_path, 0)
+
+    def test_pack_path(self):
+        archive = MediaArchive(self.archive_path)
+        self.assertEqual(self.archive_path / "pack_00003.pack", archive.pack_path(3))
+
+    def test_compress(self):
+        data = b"sample" * 100
+        with patch.object(MediaArchive, "CODEC", "zlib"):
+            compressed = MediaArchive.compress(data)
+        self.assertEqual(zlib.compress(data), compressed)
+        self.assertEqual(data, MediaArchive.decompress(compressed, "zlib"))
+        self.assertEqual(data, MediaArchive.decompress(data, "raw"))
+        with self.assertRaises(ValueError):
+            MediaArchive.decompress(data, "invalid_codec")
+        with patch.object(media_archive, "zstandard", None):
+            with self.assertRaises(ValueError):
+                MediaArchive.decompress(data, "zstd")
+
+    @unittest.skipIf(media_archive.zstandard is None, "zstandard is not installed.")
+    def test_compress_zstd(self):
+        data = b"sample" * 100
+        with patch.object(MediaArchive, "CODEC", "zstd"):
+            compressed = MediaArchive.compress(data)
+        self.assertEqual(data, MediaArchive.decompress(compressed, "zstd"))
+
+    def test_archive(self):
+        archive = self._make_archive()
+        jpg = self._make_media("photo.jpg", b"jpeg_content" * 10)
+        png = self._make_media("photo.png", b"png_content" * 100)
+        mp4 = self._make_media("video.mp4", b"mp4_content" * 10)
+        empty = self._make_media("empty.jpg", b"")
+        missing = self.save_path / "missing.jpg"
+
+        actual = archive.archive([jpg, png, mp4, empty, missing])
+        self.assertEqual([jpg, png, mp4], actual)
+        self.assertEqual([archive.pack_path(0)], sorted(self.archive_path.glob("*.pack")))
+
+        # 圧縮済の形式はそのまま、それ以外は圧縮して連続して格納する
+        record_jpg = archive.find("photo.jpg")
+        record_png = archive.find("photo.png")
+        record_mp4 = archive.find("video.mp4")
+        self.assertEqual(("raw", 0, 120), (record_jpg["codec"], record_jpg["offset"], record_jpg["size"]))
+        self.assertEqual(MediaArchive.CODEC, record_png["codec"])
+        self.assertEqual(1100, record_png["media_size"])
+        self.assertLess(record_png["size"], record_png["media_size"])
+        self.assertEqual(120, record_png["offset"])
+        self.assertEqual(("raw", 120 + record_png["size"]), (record_mp4["codec"], record_mp4["offset"]))
+        self.assertEqual(1719107372, record_jpg["mtime"])
+        self.assertIsNone(archive.find("empty.jpg"))
+
+        # アーカイブ済のファイル名は追記しない
+        pack_size = archive.pack_path(0).stat().st_size
+        self.assertEqual([jpg], archive.archive([jpg]))
+        self.assertEqual(pack_size, archive.pack_path(0).stat().st_size)
+
+    def test_archive_rolling(self):
+        archive = self._make_archive(pack_size=250)
+        media_path_list = [self._make_media(f"photo_{i}.jpg", bytes([i]) * 100) for i in range(3)]
+        archive.archive(media_path_list)
+
+        # pack_size を超える場合は次のパックに格納する
+        self.assertEqual((0, 0), (archive.find("photo_0.jpg")["pack_no"], archive.find("photo_0.jpg")["offset"]))
+        self.assertEqual((0, 100), (archive.find("photo_1.jpg")["pack_no"], archive.find("photo_1.jpg")["offset"]))
+        self.assertEqual((1, 0), (archive.find("photo_2.jpg")["pack_no"], archive.find("photo_2.jpg")["offset"]))
+
+        # 続きは最後のパックに追記し、pack_size より大きいメディアは新しいパックに単独で格納する
+        large = self._make_media("large.jpg", b"l" * 300)
+        small = self._make_media("small.jpg", b"s" * 100)
+        archive.archive([small, large])
+        self.assertEqual((1, 100), (archive.find("small.jpg")["pack_no"], archive.find("small.jpg")["offset"]))
+        self.assertEqual((2, 0), (archive.find("large.jpg")["pack_no"], archive.find("large.jpg")["offset"]))
+        self.assertEqual(3, len(list(self.archive_path.glob("*.pack"))))
+        for i in range(3):
+            self.assertEqual(bytes([i]) * 100, archive.read(f"photo_{i}.jpg"))
+        self.assertEqual(b"l" * 300, archive.read("large.jpg"))
+
+    def test_archive_concurrent(self):
+        # 同じアーカイブを開いた別インスタンスから同時に追記しても、各メディアの位置が正しく記録される
+        archive_list = [self._make_archive(pack_size=2000), self._make_archive(pack_size=2000)]
+        media_path_lists = [
+            [self._make_media(f"photo_{n}_{i}.jpg", bytes([n * 50 + i]) * (100 + i)) for i in range(20)]
+            for n in range(2)
+        ]
+        threads = [
+            threading.Thread(target=archive.archive, args=(media_path_list,))
+            for archive, media_path_list in zip(archive_list, media_path_lists)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        another = self._make_archive()
+        for media_path_list in media_path_lists:
+            for media_path in media_path_list:
+                self.assertEqual(media_path.read_bytes(), another.read(media_path.name))
+        self.assertTrue((self.archive_path / "archive.lock").is_file())
+
+    def test_archive_wait_lock(self):
+        # 他がロックを保持している間は追記を待つ
+        archive = self._make_archive()
+        jpg = self._make_media("photo.jpg", b"jpeg_content" * 10)
+        archive.connect()
+        other_lock = RunLock(self.archive_path / "archive.lock")
+        self.assertTrue(other_lock.acquire())
+        thread = threading.Thread(target=archive.archive, args=([jpg],))
+        thread.start()
+        thread.join(timeout=0.5)
+        self.assertTrue(thread.is_alive())
+        self.assertIsNone(archive.find("photo.jpg"))
+
+        other_lock.release()
+        thread.join(timeout=10)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(b"jpeg_content" * 10, archive.read("photo.jpg"))
+
+    def test_read(self):
+        archive = self._make_archive()
+        jpg = self._make_media("photo.jpg", b"jpeg_content" * 10)
+        png = self._make_media("photo.png", b"png_content" * 100)
+        archive.archive([jpg, png])
+        self.assertEqual(b"jpeg_content" * 10, archive.read("photo.jpg"))
+        self.assertEqual(b"png_content" * 100, archive.read("photo.png"))
+        self.assertIsNone(archive.read("not_archived.jpg"))
+
+        # 追記後もマップし直して読み出せる
+        mp4 = self._make_media("video.mp4", b"mp4_content" * 10)
+        archive.archive([mp4])
+        self.assertEqual(b"mp4_content" * 10, archive.read("video.mp4"))
+
+        # 別のインスタンスからも読み出せる
+        archive.close()
+        another = self._make_archive()
+        self.assertEqual(b"png_content" * 100, another.read("photo.png"))
+
+    def test_restore(self):
+        archive = self._make_archive()
+        png = self._make_media("photo.png", b"png_content" * 100, mtime=1700000000)
+        archive.archive([png])
+        png.unlink()
+
+        dst_path = self.save_path / "restored" / "photo.png"
+        actual = archive.restore("photo.png", dst_path)
+        self.assertEqual(dst_path, actual)
+        self.assertEqual(b"png_content" * 100, dst_path.read_bytes())
+        self.assertEqual(1700000000, dst_path.stat().st_mtime)
+        self.assertIsNone(archive.restore("not_archived.png", dst_path))
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
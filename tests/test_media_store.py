@@ -0,0 +1,179 @@
+import hashlib
+import os
+import shutil
+import sys
+import unittest
+from pathlib import Path
+
+from mock import patch
+
+from media_gathering.media_store import MediaStore
+
+
+class TestMediaStore(unittest.TestCase):
+    def setUp(self):
+        self.TBP = Path("./tests/media_store")
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+        self.store_path = self.TBP / "store"
+        self.save_path = self.TBP / "save"
+        self.save_path.mkdir(parents=True, exist_ok=True)
+
+    def tearDown(self):
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+
+    def test_MediaStore(self):
+        media_store = MediaStore(self.store_path)
+        self.assertEqual(self.store_path, media_store.store_path)
+        with self.assertRaises(TypeError):
+            media_store = MediaStore("invalid_store_path")
+
+    def test_object_path(self):
+        media_store = MediaStore(self.store_path)
+        sha256 = hashlib.sha256(b"sample").hexdigest()
+        self.assertEqual(self.store_path / sha256[:2] / sha256, media_store.object_path(sha256))
+
+    def test_save(self):
+        media_store = MediaStore(self.store_path)
+        chunks = [b"sample_", b"media_", b"content"]
+        expect_sha256 = hashlib.sha256(b"".join(chunks)).hexdigest()
+        sha256, object_path, media_size = media_store.save(iter(chunks))
+        self.assertEqual(expect_sha256, sha256)
+        self.assertEqual(media_store.object_path(sha256), object_path)
+        self.assertEqual(len(b"".join(chunks)), media_size)
+        self.assertEqual(b"".join(chunks), object_path.read_bytes())
+
+        # 同じ内容なら実体は1つのまま
+        mtime = object_path.stat().st_mtime_ns
+        actual = media_store.save([b"sample_media_content"])
+        self.assertEqual((sha256, object_path, media_size), actual)
+        self.assertEqual(mtime, object_path.stat().st_mtime_ns)
+        self.assertEqual([object_path], [p for p in self.store_path.glob("**/*") if p.is_file()])
+
+        # 受信中に失敗した場合は一時ファイルを残さない
+        def broken_chunks():
+            yield b"broken"
+            raise ValueError
+
+        with self.assertRaises(ValueError):
+            media_store.save(broken_chunks())
+        self.assertEqual([], list(self.store_path.glob("*.tmp")))
+
+    def test_adopt(self):
+        media_store = MediaStore(self.store_path)
+        media_path = self.save_path / "sample.jpg"
+        media_path.write_bytes(b"sample")
+        sha256 = hashlib.sha256(b"sample").hexdigest()
+
+        # 保存済のファイル自体をストアの実体とする
+        actual = media_store.adopt(media_path)
+        self.assertEqual((sha256, media_store.object_path(sha256), 6), actual)
+        self.assertTrue(os.path.samefile(media_path, actual[1]))
+
+        # 同じ内容の実体が既にある場合はそのまま
+        another_path = self.save_path / "another.jpg"
+        another_path.write_bytes(b"sample")
+        actual = media_store.adopt(another_path)
+        self.assertEqual((sha256, media_store.object_path(sha256), 6), actual)
+        self.assertFalse(os.path.samefile(another_path, actual[1]))
+
+    def test_link(self):
+        media_store = MediaStore(self.store_path)
+        _, object_path, _ = media_store.save([b"sample"])
+
+        dst_path = self.save_path / "sample.jpg"
+        actual = MediaStore.link(object_path, dst_path)
+        self.assertEqual("hardlink", actual)
+        self.assertTrue(os.path.samefile(object_path, dst_path))
+        self.assertEqual(2, object_path.stat().st_nlink)
+
+        # 既に同じ実体を参照している場合は何もしない
+        actual = MediaStore.link(object_path, dst_path)
+        self.assertEqual("hardlink", actual)
+        self.assertEqual(2, object_path.stat().st_nlink)
+
+        # 別の内容のファイルがある場合は置き換える
+        dst_path.unlink()
+        dst_path.write_bytes(b"another")
+        actual = MediaStore.link(object_path, dst_path)
+        self.assertEqual("hardlink", actual)
+        self.assertEqual(b"sample", dst_path.read_bytes())
+
+        # ハードリンクが張れない場合は reflink、それも不可能ならコピーする
+        dst_path.unlink()
+        with patch("media_gathering.media_store.os.link", side_effect=OSError):
+            with patch.object(MediaStore, "reflink") as mock_reflink:
+                mock_reflink.side_effect = lambda src, dst: dst.write_bytes(src.read_bytes())
+                actual = MediaStore.link(object_path, dst_path)
+                self.assertEqual("reflink", actual)
+                mock_reflink.assert_called_once()
+            dst_path.unlink()
+            with patch.object(MediaStore, "reflink", side_effect=OSError):
+                actual = MediaStore.link(object_path, dst_path)
+                self.assertEqual("copy", actual)
+        self.assertEqual(b"sample", dst_path.read_bytes())
+        self.assertFalse(os.path.samefile(object_path, dst_path))
+        self.assertEqual([dst_path], list(self.save_path.glob("*")))
+
+    def test_reflink(self):
+        media_store = MediaStore(self.store_path)
+        _, object_path, _ = media_store.save([b"sample"])
+        dst_path = self.save_path / "sample.jpg"
+        try:
+            MediaStore.reflink(object_path, dst_path)
+        except OSError:
+            # reflink 非対応のファイルシステムでは作りかけのファイルを残さない
+            self.assertFalse(dst_path.exists())
+        else:
+            self.assertEqual(b"sample", dst_path.read_bytes())
+
+        with patch("media_gathering.media_store.fcntl", None):
+            with self.assertRaises(OSError):
+                MediaStore.reflink(object_path, dst_path)
+
+    def test_prune(self):
+        media_store = MediaStore(self.store_path)
+        sha256_1, object_path_1, _ = media_store.save([b"sample_1"])
+        sha256_2, object_path_2, _ = media_store.save([b"sample_2"])
+        sha256_3, object_path_3, _ = media_store.save([b"sample_3"])
+        saved_path_1 = self.save_path / "sample_1.jpg"
+        saved_path_2 = self.save_path / "sample_2.jpg"
+        MediaStore.link(object_path_1, saved_path_1)
+        MediaStore.link(object_path_2, saved_path_2)
+        reference_dict = {sha256_1: [str(saved_path_1)], sha256_2: [str(saved_path_2)]}
+
+        self.assertEqual(0, media_store.prune(reference_dict))
+        saved_path_2.unlink()
+        self.assertEqual(1, media_store.prune(reference_dict))
+        self.assertTrue(object_path_1.is_file())
+        self.assertFalse(object_path_2.exists())
+
+        # 整理対象に含まれない実体は参照されていなくても削除しない（ストア全体は走査しない）
+        self.assertTrue(object_path_3.is_file())
+        # 既に無い実体は数えない
+        self.assertEqual(0, media_store.prune({sha256_2: []}))
+
+    def test_prune_copied(self):
+        # ハードリンクできずにコピーした保存先から参照されている実体は削除しない
+        media_store = MediaStore(self.store_path)
+        sha256, object_path, _ = media_store.save([b"sample"])
+        saved_path = self.save_path / "sample.jpg"
+        with patch("media_gathering.media_store.os.link", side_effect=OSError):
+            with patch.object(MediaStore, "reflink", side_effect=OSError):
+                self.assertEqual("copy", MediaStore.link(object_path, saved_path))
+        self.assertEqual(1, object_path.stat().st_nlink)
+
+        self.assertEqual(0, media_store.prune({sha256: [str(saved_path)]}))
+        self.assertTrue(object_path.is_file())
+
+        # コピーした保存先も無くなれば削除する
+        saved_path.unlink()
+        self.assertEqual(1, media_store.prune({sha256: [str(saved_path)]}))
+        self.assertFalse(object_path.exists())
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,161 @@
+import shutil
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+from mock import patch
+
+from media_gathering.metrics import Histogram, Metrics, collect, current_metrics
+
+
+class TestHistogram(unittest.TestCase):
+    def test_observe(self):
+        histogram = Histogram((1.0, 5.0))
+        for value in [0.5, 1.0, 3.0, 10.0]:
+            histogram.observe(value)
+        self.assertEqual([2, 1, 1], histogram.bucket_counts)
+        self.assertEqual([2, 3, 4], histogram.cumulative_counts())
+        self.assertEqual(4, histogram.count)
+        self.assertEqual(14.5, histogram.sum)
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.TBP = Path("./tests/metrics")
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+
+    def tearDown(self):
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+
+    def test_inc(self):
+        metrics = Metrics()
+        metrics.inc("media_total", result="success")
+        metrics.inc("media_total", 2, result="success")
+        metrics.inc("media_total", result="failed")
+        self.assertEqual(3, metrics.get_counter("media_total", result="success"))
+        self.assertEqual(1, metrics.get_counter("media_total", result="failed"))
+        self.assertEqual(0, metrics.get_counter("media_total", result="past_done"))
+
+        # ラベルの順序と値の型によらず同じカウンタになる
+        metrics.inc("http_requests_total", host="example.com", status=200)
+        metrics.inc("http_requests_total", status="200", host="example.com")
+        self.assertEqual(2, metrics.get_counter("http_requests_total", host="example.com", status=200))
+
+    def test_inc_thread_safe(self):
+        metrics = Metrics()
+
+        def worker():
+            for _ in range(1000):
+                metrics.inc("count")
+
+        thread_list = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in thread_list:
+            thread.start()
+        for thread in thread_list:
+            thread.join()
+        self.assertEqual(4000, metrics.get_counter("count"))
+
+    def test_timer(self):
+        mock_perf_counter = self.enterContext(patch("media_gathering.metrics.time.perf_counter"))
+        mock_perf_counter.side_effect = [10.0, 12.5, 20.0, 20.5]
+        metrics = Metrics()
+        with metrics.timer("crawl_stage_seconds", stage="fetch"):
+            pass
+
+        # 例外で抜けた場合も記録する
+        with self.assertRaises(ValueError):
+            with metrics.timer("crawl_stage_seconds", stage="fetch"):
+                raise ValueError
+        expect = [{"name": "crawl_stage_seconds", "labels": {"stage": "fetch"}, "count": 2, "sum": 3.0}]
+        self.assertEqual(expect, metrics.to_dict()["histograms"])
+
+    def test_to_dict(self):
+        metrics = Metrics()
+        self.assertEqual({"counters": [], "histograms": []}, metrics.to_dict())
+
+        metrics.inc("media_total", result="success")
+        metrics.inc("media_bytes_total", 1024)
+        metrics.observe("db_upsert_seconds", 0.5)
+        metrics.observe("db_upsert_seconds", 0.25)
+        expect = {
+            "counters": [
+                {"name": "media_bytes_total", "labels": {}, "value": 1024},
+                {"name": "media_total", "labels": {"result": "success"}, "value": 1},
+            ],
+            "histograms": [{"name": "db_upsert_seconds", "labels": {}, "count": 2, "sum": 0.75}],
+        }
+        self.assertEqual(expect, metrics.to_dict())
+
+    def test_to_prometheus(self):
+        metrics = Metrics()
+        metrics.BUCKETS = (0.1, 1.0)
+        metrics.inc("media_total", result="success")
+        metrics.inc("media_total", 2, result="failed")
+        metrics.observe("crawl_stage_seconds", 0.5, stage="fetch")
+        metrics.observe("crawl_stage_seconds", 2.0, stage="fetch")
+
+        actual = metrics.to_prometheus(source="Fav", account='a"b')
+        expect = "\n".join([
+            "# TYPE media_gathering_media_total counter",
+            'media_gathering_media_total{account="a\\"b",source="Fav",result="failed"} 2',
+            'media_gathering_media_total{account="a\\"b",source="Fav",result="success"} 1',
+            "# TYPE media_gathering_crawl_stage_seconds histogram",
+            'media_gathering_crawl_stage_seconds_bucket{account="a\\"b",source="Fav",stage="fetch",le="0.1"} 0',
+            'media_gathering_crawl_stage_seconds_bucket{account="a\\"b",source="Fav",stage="fetch",le="1.0"} 1',
+            'media_gathering_crawl_stage_seconds_bucket{account="a\\"b",source="Fav",stage="fetch",le="+Inf"} 2',
+            'media_gathering_crawl_stage_seconds_sum{account="a\\"b",source="Fav",stage="fetch"} 2.5',
+            'media_gathering_crawl_stage_seconds_count{account="a\\"b",source="Fav",stage="fetch"} 2',
+        ])
+        self.assertEqual(expect + "\n", actual)
+
+        # ラベルが無い場合は波括弧を付けない
+        metrics = Metrics()
+        metrics.inc("retry_jobs_total", 3)
+        self.assertEqual(
+            "# TYPE media_gathering_retry_jobs_total counter\nmedia_gathering_retry_jobs_total 3\n",
+            metrics.to_prometheus(),
+        )
+
+    def test_write_textfile(self):
+        metrics = Metrics()
+        metrics.inc("retry_jobs_total", 3)
+        path = self.TBP / "media_gathering_Fav.prom"
+        metrics.write_textfile(path, source="Fav")
+        self.assertEqual(metrics.to_prometheus(source="Fav"), path.read_text(encoding="utf-8"))
+
+        # 書き出し後に一時ファイルは残らない
+        metrics.inc("retry_jobs_total", 1)
+        metrics.write_textfile(path, source="Fav")
+        self.assertIn('retry_jobs_total{source="Fav"} 4', path.read_text(encoding="utf-8"))
+        self.assertEqual([path], list(self.TBP.iterdir()))
+
+    def test_collect(self):
+        self.assertIsNone(current_metrics())
+        metrics = Metrics()
+        with collect(metrics) as actual:
+            self.assertIs(metrics, actual)
+            self.assertIs(metrics, current_metrics())
+
+            # スレッドごとに別のレジストリを有効にできる
+            other_metrics = Metrics()
+            result = []
+
+            def worker():
+                with collect(other_metrics):
+                    result.append(current_metrics())
+
+            thread = threading.Thread(target=worker)
+            thread.start()
+            thread.join()
+            self.assertEqual([other_metrics], result)
+            self.assertIs(metrics, current_metrics())
+        self.assertIsNone(current_metrics())
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
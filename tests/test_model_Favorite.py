@@ -1,7 +1,7 @@
 import sys
 import unittest
 
-from media_gathering.model import Favorite
+from media_gathering.model import Favorite, Retweet
 
 
 class TestModelFavorite(unittest.TestCase):
@@ -92,6 +92,15 @@ class TestModelFavorite(unittest.TestCase):
         self.assertEqual(saved_created_at, actual.saved_created_at)
         self.assertEqual(media_size, actual.media_size)
         self.assertEqual(media_blob, actual.media_blob)
+        self.assertIsNone(actual.blob_id)
+
+        # メディア本体はブロブストアの id で参照する
+        args = [is_exist_saved_file, img_filename, url, url_thumbnail, tweet_id, tweet_url, created_at, user_id]
+        args += [user_name, screan_name, tweet_text, tweet_via, saved_localpath, saved_created_at, media_size]
+        actual = Favorite(*args, None, 1)
+        self.assertEqual(1, actual.blob_id)
+        with self.assertRaises(TypeError):
+            actual = Favorite(*args, None, "invalid_blob_id")
 
         params = {
             "is_exist_saved_file": is_exist_saved_file,
@@ -172,6 +181,11 @@ class TestModelFavorite(unittest.TestCase):
         self.assertFalse(record_1 == "not_equal_instance")
         self.assertFalse(record_1 == -1)
 
+        # 同じメディアでも source が異なれば別レコード
+        self.assertEqual("Fav", record_1.source)
+        record_retweet = Retweet.create(record_1.to_dict())
+        self.assertFalse(record_1 == record_retweet)
+
     def test_to_dict(self):
         record = self.make_instance(1)
         actual = record.to_dict()
@@ -193,6 +207,7 @@ class TestModelFavorite(unittest.TestCase):
             "saved_created_at": "saved_created_at",
             "media_size": 1,
             "media_blob": None,
+            "blob_id": None,
         }
         self.assertEqual(expect, actual)
 
@@ -201,6 +216,10 @@ class TestModelFavorite(unittest.TestCase):
         actual = Favorite.create(record.to_dict())
         self.assertEqual(record.to_dict(), actual.to_dict())
 
+        record.blob_id = 1
+        actual = Favorite.create(record.to_dict())
+        self.assertEqual(1, actual.blob_id)
+
         with self.assertRaises(ValueError):
             actual = Favorite.create({"invalid_key": "invalid_value"})
 
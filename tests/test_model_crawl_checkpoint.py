@@ -0,0 +1,79 @@
+import sys
+import unittest
+
+from media_gathering.model import CrawlCheckpoint
+
+
+class TestModelCrawlCheckpoint(unittest.TestCase):
+    def make_instance(self, source: str) -> CrawlCheckpoint:
+        return CrawlCheckpoint(source, b"fetched_tweets", 1, 2, "2022-10-24 09:00:00", "2022-10-24 09:30:00")
+
+    def test_init(self):
+        params = {
+            "source": "Fav",
+            "fetched_tweets": b"fetched_tweets",
+            "media_index": 3,
+            "external_link_index": 4,
+            "created_at": "2022-10-24 09:00:00",
+            "updated_at": "2022-10-24 09:30:00",
+        }
+        actual = CrawlCheckpoint(*params.values())
+        for k, v in params.items():
+            self.assertEqual(v, getattr(actual, k))
+
+        with self.assertRaises(ValueError):
+            actual = CrawlCheckpoint(*{**params, "media_index": -1}.values())
+        with self.assertRaises(ValueError):
+            actual = CrawlCheckpoint(*{**params, "external_link_index": -1}.values())
+
+        for k in params.keys():
+            invalid_value = "invalid" if k.endswith("_index") else -1
+            with self.assertRaises(TypeError):
+                actual = CrawlCheckpoint(*{**params, k: invalid_value}.values())
+
+    def test_repr(self):
+        # 取得したツイートは大きいため表示しない
+        record = self.make_instance("Fav")
+        columns = ", ".join([f"{k}={v}" for k, v in record.__dict__.items() if k[0] != "_" and k != "fetched_tweets"])
+        expect = f"<{record.__class__.__name__}({columns})>"
+        actual = repr(record)
+        self.assertEqual(expect, actual)
+        self.assertNotIn("fetched_tweets", actual)
+
+    def test_eq(self):
+        record_1 = self.make_instance("Fav")
+        record_2 = self.make_instance("RT")
+        record_another_1 = self.make_instance("Fav")
+
+        self.assertTrue(record_1 == record_another_1)
+        self.assertFalse(record_1 == record_2)
+        self.assertFalse(record_1 == "not_equal_instance")
+        self.assertFalse(record_1 == -1)
+
+    def test_to_dict(self):
+        record = self.make_instance("Fav")
+        actual = record.to_dict()
+        expect = {
+            "id": None,
+            "source": "Fav",
+            "fetched_tweets": b"fetched_tweets",
+            "media_index": 1,
+            "external_link_index": 2,
+            "created_at": "2022-10-24 09:00:00",
+            "updated_at": "2022-10-24 09:30:00",
+        }
+        self.assertEqual(expect, actual)
+
+    def test_to_create(self):
+        record = self.make_instance("Fav")
+        actual = CrawlCheckpoint.create(record.to_dict())
+        self.assertEqual(record.to_dict(), actual.to_dict())
+
+        with self.assertRaises(ValueError):
+            actual = CrawlCheckpoint.create({"invalid_key": "invalid_value"})
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
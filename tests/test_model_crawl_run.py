@@ -0,0 +1,74 @@
+import sys
+import unittest
+
+from media_gathering.model import CrawlRun
+
+
+class TestModelCrawlRun(unittest.TestCase):
+    def make_instance(self, index: int) -> CrawlRun:
+        return CrawlRun(
+            "Fav", f"2022-10-24 09:00:{index:02}", f"2022-10-24 09:30:{index:02}", "success", '{"counters":[]}'
+        )
+
+    def test_init(self):
+        params = {
+            "source": "RT",
+            "started_at": "2022-10-24 09:00:00",
+            "finished_at": "2022-10-24 09:30:00",
+            "result": "failed",
+            "summary": '{"counters":[],"histograms":[]}',
+        }
+        actual = CrawlRun(*params.values())
+        for k, v in params.items():
+            self.assertEqual(v, getattr(actual, k))
+
+        with self.assertRaises(ValueError):
+            actual = CrawlRun(*{**params, "finished_at": "2022-10-24 08:59:59"}.values())
+
+        for k in params.keys():
+            with self.assertRaises(TypeError):
+                actual = CrawlRun(*{**params, k: -1}.values())
+
+    def test_repr(self):
+        record = self.make_instance(1)
+        columns = ", ".join([f"{k}={v}" for k, v in record.__dict__.items() if k[0] != "_"])
+        expect = f"<{record.__class__.__name__}({columns})>"
+        actual = repr(record)
+        self.assertEqual(expect, actual)
+
+    def test_eq(self):
+        record_1 = self.make_instance(1)
+        record_2 = self.make_instance(2)
+        record_another_1 = self.make_instance(1)
+
+        self.assertTrue(record_1 == record_another_1)
+        self.assertFalse(record_1 == record_2)
+        self.assertFalse(record_1 == "not_equal_instance")
+        self.assertFalse(record_1 == -1)
+
+    def test_to_dict(self):
+        record = self.make_instance(1)
+        actual = record.to_dict()
+        expect = {
+            "id": None,
+            "source": "Fav",
+            "started_at": "2022-10-24 09:00:01",
+            "finished_at": "2022-10-24 09:30:01",
+            "result": "success",
+            "summary": '{"counters":[]}',
+        }
+        self.assertEqual(expect, actual)
+
+    def test_to_create(self):
+        record = self.make_instance(1)
+        actual = CrawlRun.create(record.to_dict())
+        self.assertEqual(record.to_dict(), actual.to_dict())
+
+        with self.assertRaises(ValueError):
+            actual = CrawlRun.create({"invalid_key": "invalid_value"})
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
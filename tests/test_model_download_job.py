@@ -0,0 +1,98 @@
+import sys
+import unittest
+
+from media_gathering.model import DownloadJob
+
+
+class TestModelDownloadJob(unittest.TestCase):
+    def make_instance(self, index: int) -> DownloadJob:
+        return DownloadJob(
+            DownloadJob.MEDIA,
+            "Fav",
+            f"url_{index}",
+            "{}",
+            DownloadJob.PENDING,
+            index,
+            "2022-10-24 10:00:00",
+            "error",
+            "2022-10-24 09:00:00",
+            "2022-10-24 09:30:00",
+        )
+
+    def test_init(self):
+        params = {
+            "job_type": DownloadJob.EXTERNAL_LINK,
+            "source": "RT",
+            "url": "url",
+            "payload": '{"key":"value"}',
+            "state": DownloadJob.DEAD,
+            "attempt": 3,
+            "next_retry_at": "2022-10-24 10:00:00",
+            "last_error": "error",
+            "created_at": "2022-10-24 09:00:00",
+            "updated_at": "2022-10-24 09:30:00",
+        }
+        actual = DownloadJob(*params.values())
+        for k, v in params.items():
+            self.assertEqual(v, getattr(actual, k))
+
+        with self.assertRaises(ValueError):
+            actual = DownloadJob(*{**params, "job_type": "invalid"}.values())
+        with self.assertRaises(ValueError):
+            actual = DownloadJob(*{**params, "state": "invalid"}.values())
+        with self.assertRaises(ValueError):
+            actual = DownloadJob(*{**params, "attempt": -1}.values())
+
+        for k in params.keys():
+            invalid_value = "invalid" if k == "attempt" else -1
+            with self.assertRaises(TypeError):
+                actual = DownloadJob(*{**params, k: invalid_value}.values())
+
+    def test_repr(self):
+        record = self.make_instance(1)
+        columns = ", ".join([f"{k}={v}" for k, v in record.__dict__.items() if k[0] != "_"])
+        expect = f"<{record.__class__.__name__}({columns})>"
+        actual = repr(record)
+        self.assertEqual(expect, actual)
+
+    def test_eq(self):
+        record_1 = self.make_instance(1)
+        record_2 = self.make_instance(2)
+        record_another_1 = self.make_instance(1)
+
+        self.assertTrue(record_1 == record_another_1)
+        self.assertFalse(record_1 == record_2)
+        self.assertFalse(record_1 == "not_equal_instance")
+        self.assertFalse(record_1 == -1)
+
+    def test_to_dict(self):
+        record = self.make_instance(1)
+        actual = record.to_dict()
+        expect = {
+            "id": None,
+            "job_type": DownloadJob.MEDIA,
+            "source": "Fav",
+            "url": "url_1",
+            "payload": "{}",
+            "state": DownloadJob.PENDING,
+            "attempt": 1,
+            "next_retry_at": "2022-10-24 10:00:00",
+            "last_error": "error",
+            "created_at": "2022-10-24 09:00:00",
+            "updated_at": "2022-10-24 09:30:00",
+        }
+        self.assertEqual(expect, actual)
+
+    def test_to_create(self):
+        record = self.make_instance(1)
+        actual = DownloadJob.create(record.to_dict())
+        self.assertEqual(record.to_dict(), actual.to_dict())
+
+        with self.assertRaises(ValueError):
+            actual = DownloadJob.create({"invalid_key": "invalid_value"})
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,95 @@
+import sys
+import unittest
+
+from media_gathering.model import StoredMedia
+
+
+class TestModelStoredMedia(unittest.TestCase):
+    def make_instance(self, index: int) -> StoredMedia:
+        sha256 = f"{index:064x}"
+        url = f"url_{index}"
+        saved_localpath = f"saved_localpath_{index}"
+        media_size = index + 1
+        saved_created_at = "saved_created_at"
+        return StoredMedia(sha256, url, saved_localpath, media_size, saved_created_at)
+
+    def test_init(self):
+        sha256 = "0" * 64
+        url = "url"
+        saved_localpath = "saved_localpath"
+        media_size = 0
+        saved_created_at = "saved_created_at"
+        actual = StoredMedia(sha256, url, saved_localpath, media_size, saved_created_at)
+        self.assertEqual(sha256, actual.sha256)
+        self.assertEqual(url, actual.url)
+        self.assertEqual(saved_localpath, actual.saved_localpath)
+        self.assertEqual(media_size, actual.media_size)
+        self.assertEqual(saved_created_at, actual.saved_created_at)
+
+        with self.assertRaises(ValueError):
+            actual = StoredMedia("invalid_sha256", url, saved_localpath, media_size, saved_created_at)
+        with self.assertRaises(ValueError):
+            actual = StoredMedia(sha256, url, saved_localpath, -1, saved_created_at)
+
+        params = {
+            "sha256": sha256,
+            "url": url,
+            "saved_localpath": saved_localpath,
+            "media_size": media_size,
+            "saved_created_at": saved_created_at,
+        }
+        for k in reversed(params.keys()):
+            params[k] = f"invalid_{k}" if k == "media_size" else -1
+            with self.assertRaises(TypeError):
+                actual = StoredMedia(
+                    params["sha256"],
+                    params["url"],
+                    params["saved_localpath"],
+                    params["media_size"],
+                    params["saved_created_at"],
+                )
+
+    def test_repr(self):
+        record = self.make_instance(1)
+        columns = ", ".join([f"{k}={v}" for k, v in record.__dict__.items() if k[0] != "_"])
+        expect = f"<{record.__class__.__name__}({columns})>"
+        actual = repr(record)
+        self.assertEqual(expect, actual)
+
+    def test_eq(self):
+        record_1 = self.make_instance(1)
+        record_2 = self.make_instance(2)
+        record_another_1 = self.make_instance(1)
+
+        self.assertTrue(record_1 == record_another_1)
+        self.assertFalse(record_1 == record_2)
+        self.assertFalse(record_1 == "not_equal_instance")
+        self.assertFalse(record_1 == -1)
+
+    def test_to_dict(self):
+        index = 1
+        record = self.make_instance(index)
+        actual = record.to_dict()
+        expect = {
+            "id": None,
+            "sha256": f"{index:064x}",
+            "url": f"url_{index}",
+            "saved_localpath": f"saved_localpath_{index}",
+            "media_size": index + 1,
+            "saved_created_at": "saved_created_at",
+        }
+        self.assertEqual(expect, actual)
+
+    def test_to_create(self):
+        record = self.make_instance(1)
+        actual = StoredMedia.create(record.to_dict())
+        self.assertEqual(record.to_dict(), actual.to_dict())
+
+        with self.assertRaises(ValueError):
+            actual = StoredMedia.create({"invalid_key": "invalid_value"})
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,146 @@
+import pstats
+import shutil
+import sys
+import threading
+import tracemalloc
+import unittest
+from pathlib import Path
+
+from freezegun import freeze_time
+from mock import patch
+
+from media_gathering.profiler import CrawlProfiler
+
+
+class TestCrawlProfiler(unittest.TestCase):
+    def setUp(self):
+        self.mock_logger = self.enterContext(patch("media_gathering.profiler.logger"))
+        self.TBP = Path("./tests/profile")
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+
+    def tearDown(self):
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+
+    def test_init(self):
+        profiler = CrawlProfiler(CrawlProfiler.CPU, self.TBP)
+        self.assertEqual("cpu", profiler.mode)
+        self.assertEqual(self.TBP, profiler.output_dir)
+        # 出力先は結果を書き出すまで作成しない
+        self.assertFalse(self.TBP.exists())
+
+        with self.assertRaises(TypeError):
+            profiler = CrawlProfiler(-1, self.TBP)
+        with self.assertRaises(TypeError):
+            profiler = CrawlProfiler(CrawlProfiler.CPU, "invalid_output_dir")
+        with self.assertRaises(ValueError):
+            profiler = CrawlProfiler("invalid_mode", self.TBP)
+
+    def test_make_output_path(self):
+        profiler = CrawlProfiler(CrawlProfiler.MEMORY, self.TBP)
+        with freeze_time("2022-10-24 10:00:00"):
+            actual = profiler.make_output_path("Fav", ".txt")
+        self.assertEqual(self.TBP / "profile_Fav_mem_20221024_100000.txt", actual)
+
+    def test_profile_cpu(self):
+        profiler = CrawlProfiler(CrawlProfiler.CPU, self.TBP)
+        with freeze_time("2022-10-24 10:00:00", tick=True):
+            with profiler.profile("Fav"):
+                sorted(range(1000), key=lambda i: -i)
+
+        # .prof と累積時間の上位の一覧を書き出す
+        prof_path = self.TBP / "profile_Fav_cpu_20221024_100000.prof"
+        self.assertTrue(prof_path.is_file())
+        self.assertGreater(pstats.Stats(str(prof_path)).total_calls, 0)
+        self.assertIn("cumulative", prof_path.with_suffix(".txt").read_text(encoding="utf-8"))
+        self.mock_logger.info.assert_called_with(f"Profile result -> {prof_path}")
+
+        # 例外で抜けた場合も書き出す
+        shutil.rmtree(self.TBP)
+        with self.assertRaises(ValueError):
+            with profiler.profile("RT"):
+                raise ValueError
+        self.assertEqual(1, len(list(self.TBP.glob("profile_RT_cpu_*.prof"))))
+
+    def test_profile_memory(self):
+        profiler = CrawlProfiler(CrawlProfiler.MEMORY, self.TBP)
+        self.assertFalse(tracemalloc.is_tracing())
+        with profiler.profile("Fav"):
+            self.assertTrue(tracemalloc.is_tracing())
+            with profiler.stage("download"):
+                data = [bytes(1024) for _ in range(1000)]
+            with profiler.stage("shrink"):
+                pass
+        del data
+        self.assertFalse(tracemalloc.is_tracing())
+
+        # 段階ごとの割り当ての増分と、最後に全体の割り当ての上位を書き出す
+        report_path_list = list(self.TBP.glob("profile_Fav_mem_*.txt"))
+        self.assertEqual(1, len(report_path_list))
+        report = report_path_list[0].read_text(encoding="utf-8")
+        self.assertTrue(report.startswith("memory profile: Fav\n"))
+        download_report = report[report.index("[download]") : report.index("[shrink]")]
+        self.assertIn(f"{Path(__file__).name}:", download_report)
+        self.assertIn("[total]", report)
+        self.assertLess(report.index("[shrink]"), report.index("[total]"))
+
+        # 他で開始した tracemalloc は止めない
+        tracemalloc.start()
+        try:
+            with profiler.profile("RT"):
+                pass
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+
+    def test_stage(self):
+        # プロファイル中でない場合、cpu の場合は何もしない
+        profiler = CrawlProfiler(CrawlProfiler.MEMORY, self.TBP)
+        with profiler.stage("download"):
+            pass
+        self.assertFalse(tracemalloc.is_tracing())
+        profiler = CrawlProfiler(CrawlProfiler.CPU, self.TBP)
+        with profiler.profile("Fav"):
+            with profiler.stage("download"):
+                pass
+        self.assertEqual([], list(self.TBP.glob("*_mem_*")))
+
+        # プロファイル中のスレッド以外からの段階は記録しない
+        profiler = CrawlProfiler(CrawlProfiler.MEMORY, self.TBP)
+        with profiler.profile("RT"):
+
+            def worker():
+                with profiler.stage("other_thread"):
+                    pass
+
+            thread = threading.Thread(target=worker)
+            thread.start()
+            thread.join()
+        report_path = next(self.TBP.glob("profile_RT_mem_*.txt"))
+        self.assertNotIn("[other_thread]", report_path.read_text(encoding="utf-8"))
+
+    def test_profile_skipped(self):
+        # 他のクロールのプロファイル中はプロファイルせずに実行する
+        profiler = CrawlProfiler(CrawlProfiler.CPU, self.TBP)
+        other_profiler = CrawlProfiler(CrawlProfiler.MEMORY, self.TBP)
+        executed = []
+        with profiler.profile("Fav"):
+            with other_profiler.profile("RT"):
+                executed.append("RT")
+        self.assertEqual(["RT"], executed)
+        self.mock_logger.warning.assert_called_once_with(
+            "Profile (mem) RT crawl -> skipped (another crawl is being profiled)"
+        )
+        self.assertEqual([], list(self.TBP.glob("profile_RT_*")))
+
+        # 終了後は再びプロファイルできる
+        with other_profiler.profile("RT"):
+            pass
+        self.assertEqual(1, len(list(self.TBP.glob("profile_RT_mem_*.txt"))))
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,199 @@
+import re
+import sys
+import unittest
+from collections.abc import Callable
+from datetime import datetime
+
+from freezegun import freeze_time
+from sqlalchemy import event
+
+from media_gathering.fav_db_controller import FavDBController
+from media_gathering.job_retry_policy import JobRetryPolicy
+from media_gathering.model import DownloadJob, ExternalLink, StoredMedia
+from media_gathering.retweet_db_controller import RetweetDBController
+
+
+class TestQueryPlan(unittest.TestCase):
+    """コントローラーが発行するクエリがインデックスを使うかを EXPLAIN QUERY PLAN で確認する"""
+
+    # インデックスを使わない全件走査
+    FULL_SCAN_PATTERN = re.compile(r"^SCAN (\w+)(?! USING)")
+
+    def setUp(self):
+        self.fav_controller = FavDBController(":memory:")
+        self.rt_controller = RetweetDBController(":memory:")
+
+    def _make_params(self, i: int) -> dict:
+        return {
+            "is_exist_saved_file": True,
+            "img_filename": f"sample_{i}.jpg",
+            "url": f"sample_{i}_url",
+            "url_thumbnail": f"sample_{i}_url_thumbnail",
+            "tweet_id": f"{i:05}",
+            "tweet_url": f"{i:05}_tweet_url",
+            "created_at": f"2022-10-21 10:00:{i:02}",
+            "user_id": "user_id",
+            "user_name": "user_name",
+            "screan_name": "screan_name",
+            "tweet_text": "tweet_text",
+            "tweet_via": "tweet_via",
+            "saved_localpath": f"saved_localpath_{i}",
+            "saved_created_at": "2022-10-21 10:00:00",
+            "media_size": 1,
+            "media_blob": None,
+        }
+
+    def _make_external_link(self, i: int) -> ExternalLink:
+        return ExternalLink(
+            f"external_link_{i}_url",
+            f"{i:05}",
+            f"{i:05}_tweet_url",
+            "2022-10-21 10:00:00",
+            "user_id",
+            "user_name",
+            "screan_name",
+            "tweet_text",
+            "tweet_via",
+            "2022-10-21 10:00:00",
+            "pixiv",
+        )
+
+    def _explain(self, controller: FavDBController, func: Callable[[], object]) -> list[tuple[str, list[str]]]:
+        """func 実行中に発行された SELECT/UPDATE/DELETE 文とそのクエリプランを返す"""
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+                statements.append((statement, parameters))
+
+        event.listen(controller.engine, "before_cursor_execute", record)
+        try:
+            func()
+        finally:
+            event.remove(controller.engine, "before_cursor_execute", record)
+
+        result = []
+        with controller.engine.connect() as conn:
+            for statement, parameters in statements:
+                rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+                result.append((statement, [row[-1] for row in rows]))
+        return result
+
+    def assertUseIndex(self, controller: FavDBController, func: Callable[[], object], index_name: str) -> None:
+        plans = self._explain(controller, func)
+        self.assertNotEqual([], plans)
+        details = [detail for _, plan in plans for detail in plan]
+        for statement, plan in plans:
+            for detail in plan:
+                if "VIRTUAL TABLE" in detail:
+                    # 全文検索インデックスは MATCH で絞り込む
+                    self.assertIn("INDEX", detail, statement)
+                    continue
+                self.assertIsNone(self.FULL_SCAN_PATTERN.match(detail), f"{detail}\n{statement}")
+                self.assertNotIn("USE TEMP B-TREE", detail, statement)
+        self.assertTrue(any(index_name in detail for detail in details), f"{index_name} not in {details}")
+
+    def test_media_query_plan(self):
+        for controller in [self.fav_controller, self.rt_controller]:
+            with self.subTest(controller.__class__.__name__):
+                controller.upsert(self._make_params(1))
+                self.assertUseIndex(controller, lambda: controller.upsert(self._make_params(2)), "sqlite_autoindex")
+                self.assertUseIndex(controller, lambda: controller.select(10), "ix_Media_source_id")
+                self.assertUseIndex(controller, lambda: controller.select_gallery_since(1, 10), "ix_Media_source_id")
+                self.assertUseIndex(
+                    controller, lambda: controller.select_from_media_url("sample_1.jpg"), "sqlite_autoindex"
+                )
+                self.assertUseIndex(
+                    controller, lambda: controller.update_flag(["sample_1.jpg"], 1), "sqlite_autoindex"
+                )
+                self.assertUseIndex(controller, controller.clear_flag, "ix_Media_source_is_exist_saved_file")
+                self.assertUseIndex(
+                    controller, lambda: controller.select_seen_media("sample_1.jpg"), "sqlite_autoindex"
+                )
+
+    def test_external_link_query_plan(self):
+        controller = self.fav_controller
+        controller.upsert_external_link([self._make_external_link(1)])
+        index_name = "ix_ExternalLink_external_link_url_tweet_url"
+        self.assertUseIndex(
+            controller, lambda: controller.upsert_external_link([self._make_external_link(1)]), index_name
+        )
+        self.assertUseIndex(controller, lambda: controller.select_external_link("external_link_1_url"), index_name)
+
+    def test_delete_target_query_plan(self):
+        controller = self.fav_controller
+        tweet = {"data": {"id": "12345", "text": "2022-10-21 Process Done !!\nadd 1 new images. delete 0 old images."}}
+        with freeze_time("2022-10-21 10:00:00"):
+            controller.upsert_del(tweet)
+        self.assertUseIndex(controller, lambda: controller.upsert_del(tweet), "sqlite_autoindex_DeleteTarget")
+        self.assertUseIndex(controller, controller.update_del, "ix_DeleteTarget_delete_done_created_at")
+
+    def test_stored_media_query_plan(self):
+        controller = self.fav_controller
+        sha256 = "0" * 64
+
+        def upsert():
+            controller.upsert_stored_media([StoredMedia(sha256, "url", "saved_localpath", 1, "")])
+
+        upsert()
+        self.assertUseIndex(controller, upsert, "sqlite_autoindex_StoredMedia")
+        self.assertUseIndex(controller, lambda: controller.select_stored_media_from_url("url"), "ix_StoredMedia_url")
+        self.assertUseIndex(
+            controller, lambda: controller.select_stored_media_from_sha256(sha256), "ix_StoredMedia_sha256"
+        )
+        self.assertUseIndex(
+            controller,
+            lambda: controller.select_stored_media_from_localpath(["saved_localpath"]),
+            "sqlite_autoindex_StoredMedia",
+        )
+
+    def test_download_job_query_plan(self):
+        controller = self.fav_controller
+        retry_policy = JobRetryPolicy()
+
+        def record():
+            controller.record_job_failure(DownloadJob.MEDIA, "Fav", "url", {}, "error", retry_policy)
+
+        record()
+        unique_index = "sqlite_autoindex_DownloadJob"
+        self.assertUseIndex(controller, record, unique_index)
+        self.assertUseIndex(
+            controller,
+            lambda: controller.enqueue_job(DownloadJob.MEDIA, "Fav", "url", {}, datetime.now()),
+            unique_index,
+        )
+        self.assertUseIndex(controller, lambda: controller.complete_job(DownloadJob.MEDIA, "Fav", "url"), unique_index)
+        self.assertUseIndex(
+            controller,
+            lambda: controller.select_due_jobs("Fav", datetime.now()),
+            "ix_DownloadJob_state_source_next_retry_at",
+        )
+
+    def test_crawl_run_query_plan(self):
+        controller = self.fav_controller
+        controller.insert_crawl_run("Fav", datetime.now(), datetime.now(), "success", {})
+        self.assertUseIndex(controller, lambda: controller.select_crawl_runs("Fav"), "ix_CrawlRun_source_started_at")
+
+    def test_search_query_plan(self):
+        controller = self.fav_controller
+        controller.upsert(self._make_params(1))
+        controller.upsert_external_link([self._make_external_link(1)])
+        self.assertUseIndex(controller, lambda: controller.search("tweet_text"), "INTEGER PRIMARY KEY")
+        self.assertUseIndex(controller, lambda: controller.search("tweet_text", "Fav", 10, 5), "INTEGER PRIMARY KEY")
+        self.assertUseIndex(controller, lambda: controller.search("tweet_text", "ExternalLink"), "INTEGER PRIMARY KEY")
+
+    def test_tweet_columns_indexed(self):
+        controller = self.fav_controller
+        with controller.engine.connect() as conn:
+            plan = conn.exec_driver_sql("EXPLAIN QUERY PLAN select * from Media where tweet_id = ?", ("1",)).fetchall()
+            self.assertIn("ix_Media_tweet_id", plan[0][-1])
+            plan = conn.exec_driver_sql(
+                "EXPLAIN QUERY PLAN select * from Media where source = ? order by created_at desc", ("Fav",)
+            ).fetchall()
+            self.assertIn("ix_Media_source_created_at", plan[0][-1])
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -5,7 +5,7 @@ from pathlib import Path
 
 import orjson
 from freezegun import freeze_time
-from mock import MagicMock, patch
+from mock import ANY, MagicMock, call, patch
 
 from media_gathering.retweet_crawler import RetweetCrawler
 from media_gathering.util import Result
@@ -40,7 +40,7 @@ class TestRetweetCrawler(unittest.TestCase):
         save_path = Path(config["save_path"])
         self.assertTrue(save_path.is_dir())
         db_fullpath = save_path / config["save_file_name"]
-        mock_rt_db_controller.assert_called_once_with(db_fullpath)
+        mock_rt_db_controller.assert_called_once_with(db_fullpath, None)
         self.assertEqual(mock_rt_db_controller.return_value, instance.db_cont)
 
         config = expect_config["save_permanent"]
@@ -50,6 +50,39 @@ class TestRetweetCrawler(unittest.TestCase):
         self.assertEqual(Path(expect_config["save_directory"]["save_retweet_path"]), instance.save_path)
         self.assertEqual("RT", instance.type)
 
+        # 外部リンク探索機構とDBエンジンを共有する
+        mock_rt_db_controller.reset_mock()
+        mock_lsr.reset_mock()
+        link_searcher = MagicMock()
+        engine = MagicMock()
+        instance = RetweetCrawler(link_searcher, engine)
+        self.assertIs(link_searcher, instance.lsb)
+        mock_lsr.assert_not_called()
+        mock_rt_db_controller.assert_called_once_with(db_fullpath, engine)
+
+        # アカウント指定時はアカウントのDBを使い、ストアの実体の記録は元の設定のDBで共有する
+        mock_rt_db_controller.reset_mock()
+        account = {
+            "name": "sub",
+            "twitter_api_client": {
+                "ct0": "sub_ct0",
+                "auth_token": "sub_auth_token",
+                "target_screen_name": "sub_screen_name",
+                "target_id": 11111,
+            },
+            "save_directory": {
+                "save_fav_path": "tests/save/sub/twitterFav",
+                "save_retweet_path": "tests/save/sub/twitterRetweet",
+            },
+            "db": {"save_file_name": "PG_DB_sub.db"},
+        }
+        instance = RetweetCrawler(link_searcher, None, account)
+        self.assertEqual(
+            [call(save_path / "PG_DB_sub.db", None), call(db_fullpath)], mock_rt_db_controller.call_args_list
+        )
+        self.assertIs(mock_rt_db_controller.return_value, instance._store_db_cont)
+        self.assertEqual(Path(account["save_directory"]["save_retweet_path"]), instance.save_path)
+
         mock_rt_db_controller.side_effect = KeyError
         with self.assertRaises(KeyError):
             instance = RetweetCrawler()
@@ -95,6 +128,7 @@ class TestRetweetCrawler(unittest.TestCase):
         mock_trace_external_link = self.enterContext(
             patch("media_gathering.retweet_crawler.RetweetCrawler.trace_external_link")
         )
+        mock_retry_jobs = self.enterContext(patch("media_gathering.retweet_crawler.RetweetCrawler.retry_jobs"))
         mock_shrink_folder = self.enterContext(patch("media_gathering.retweet_crawler.RetweetCrawler.shrink_folder"))
         mock_end_of_process = self.enterContext(patch("media_gathering.retweet_crawler.RetweetCrawler.end_of_process"))
 
@@ -123,14 +157,29 @@ class TestRetweetCrawler(unittest.TestCase):
 
         mock_parser.assert_any_call(["fetched_tweets"], instance.lsb)
         mock_parser().parse_to_TweetInfo.assert_called_once_with()
-        mock_interpret_tweets.assert_called_once_with(["to_convert_TweetInfo"])
+        mock_interpret_tweets.assert_called_once_with(["to_convert_TweetInfo"], ANY)
 
         mock_parser().parse_to_ExternalLink.assert_called_once_with()
-        mock_trace_external_link.assert_called_once_with(["to_convert_ExternalLink"])
+        mock_trace_external_link.assert_called_once_with(["to_convert_ExternalLink"], ANY)
 
+        mock_retry_jobs.assert_called_once_with()
         mock_shrink_folder.assert_called_once_with(int(instance.config["holding"]["holding_file_num"]))
         mock_end_of_process.assert_called_once_with()
 
+        # 取得したツイートをチェックポイントに記録し、完了したら削除する
+        instance.db_cont.select_checkpoint.assert_not_called()
+        instance.db_cont.save_checkpoint.assert_called_once_with("RT", ["fetched_tweets"])
+        instance.db_cont.delete_checkpoint.assert_called_once_with("RT")
+
+        # 2回目以降は作成済のフェッチャーを使い回し、追加削除カウントは初期化する
+        instance.add_cnt = 1
+        instance.add_url_list = ["add_url"]
+        res = instance.crawl()
+        self.assertEqual(Result.success, res)
+        mock_tac_like_fetcher.assert_called_once()
+        self.assertEqual(2, mock_rt_instance.fetch.call_count)
+        self.assertEqual((0, []), (instance.add_cnt, instance.add_url_list))
+
 
 if __name__ == "__main__":
     if sys.argv:
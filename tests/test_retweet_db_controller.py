@@ -131,7 +131,7 @@ class TestRetweetDBController(unittest.TestCase):
     def test_QuerySample(self):
         """クエリテストサンプル"""
         expect = [self.rt]
-        actual = self.session.query(Retweet).all()
+        actual = self.session.query(Retweet).order_by(Retweet.id).all()
         self.assertEqual(actual, expect)
 
     def test_upsert(self):
@@ -160,7 +160,7 @@ class TestRetweetDBController(unittest.TestCase):
         r2.id = "2"
         r3.id = "3"
         expect = [self.rt, r3, r2]
-        actual = self.session.query(Retweet).all()
+        actual = self.session.query(Retweet).order_by(Retweet.id).all()
         self.assertEqual(expect, actual)
 
     def test_select(self):
@@ -176,6 +176,43 @@ class TestRetweetDBController(unittest.TestCase):
         expect = [self.rt.to_dict()]
         self.assertEqual(expect, actual)
 
+    def test_select_gallery_since(self):
+        """Retweetからギャラリー表示用の列のSELECTをチェックする"""
+        # engineをテスト用インメモリテーブルに置き換える
+        controlar = RetweetDBController(TEST_DB_FULLPATH)
+        controlar.engine = self.engine
+
+        # サンプル生成
+        records = [self.rt]
+        for i in range(3):
+            img_url_s = f"http://www.img.filename.sample.com/media/sample_{i}.png"
+            record = self._Retweet_sample_factory(img_url_s)
+            self.session.add(record)
+            records.append(record)
+        self.session.commit()
+
+        def to_gallery_dict(r: Retweet) -> dict:
+            return {
+                "id": r.id,
+                "img_filename": r.img_filename,
+                "url": r.url,
+                "url_thumbnail": r.url_thumbnail,
+                "tweet_url": r.tweet_url,
+            }
+
+        # id の昇順で取得する
+        actual = controlar.select_gallery_since()
+        expect = [to_gallery_dict(r) for r in records]
+        self.assertEqual(expect, actual)
+
+        # last_id より後のレコードのみ、limit 件まで取得する
+        actual = controlar.select_gallery_since(records[0].id, 2)
+        expect = [to_gallery_dict(r) for r in records[1:3]]
+        self.assertEqual(expect, actual)
+
+        actual = controlar.select_gallery_since(records[-1].id)
+        self.assertEqual([], actual)
+
     def test_select_from_media_url(self):
         """Retweetからfilenameを条件としてのSELECTをチェックする"""
         # engineをテスト用インメモリテーブルに置き換える
@@ -248,7 +285,7 @@ class TestRetweetDBController(unittest.TestCase):
 
         # フラグクリア前チェック
         expect = [self.rt] + r
-        actual = self.session.query(Retweet).all()
+        actual = self.session.query(Retweet).order_by(Retweet.id).all()
         self.assertEqual(expect, actual)
 
         # フラグクリア
@@ -259,7 +296,7 @@ class TestRetweetDBController(unittest.TestCase):
         for t in r:
             t.is_exist_saved_file = False
         expect = [self.rt] + r
-        actual = self.session.query(Retweet).all()
+        actual = self.session.query(Retweet).order_by(Retweet.id).all()
         self.assertEqual(expect, actual)
 
 
@@ -0,0 +1,77 @@
+import os
+import shutil
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+from media_gathering.run_lock import RunLock
+
+
+class TestRunLock(unittest.TestCase):
+    def setUp(self):
+        self.TBP = Path("./tests/run_lock")
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+        self.lock_path = self.TBP / "prevent_multiple_run"
+
+    def tearDown(self):
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+
+    def _acquire_in_other_process(self) -> bool:
+        code = (
+            "from pathlib import Path; from media_gathering.run_lock import RunLock; "
+            f"print(RunLock(Path({str(self.lock_path)!r})).acquire())"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True, timeout=60)
+        return result.stdout.strip() == "True"
+
+    def test_RunLock(self):
+        run_lock = RunLock(self.lock_path)
+        self.assertEqual(self.lock_path, run_lock.lock_path)
+        self.assertFalse(run_lock.is_locked)
+        # 取得するまでファイルは作成しない
+        self.assertFalse(self.lock_path.exists())
+        with self.assertRaises(TypeError):
+            run_lock = RunLock("invalid_lock_path")
+
+    def test_acquire(self):
+        with RunLock(self.lock_path) as run_lock:
+            self.assertTrue(run_lock.acquire())
+            self.assertTrue(run_lock.is_locked)
+            self.assertEqual(str(os.getpid()), self.lock_path.read_text())
+            # 取得済なら何度呼んでも True
+            self.assertTrue(run_lock.acquire())
+
+            # 他のプロセスからは取得できない
+            self.assertFalse(self._acquire_in_other_process())
+
+        # 解放後はロックファイルを残したまま取得できる
+        self.assertFalse(run_lock.is_locked)
+        self.assertTrue(self.lock_path.is_file())
+        self.assertTrue(self._acquire_in_other_process())
+
+        # 解放済のロックを解放しても何もしない
+        run_lock.release()
+        self.assertFalse(run_lock.is_locked)
+
+    def test_acquire_blocking(self):
+        code = (
+            "from pathlib import Path; from media_gathering.run_lock import RunLock; "
+            f"print(RunLock(Path({str(self.lock_path)!r})).acquire(blocking=True))"
+        )
+        with RunLock(self.lock_path) as run_lock:
+            self.assertTrue(run_lock.acquire())
+            # blocking を指定すると解放されるまで待つ
+            process = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE, text=True)
+            with self.assertRaises(subprocess.TimeoutExpired):
+                process.wait(timeout=1)
+        stdout, _ = process.communicate(timeout=60)
+        self.assertEqual("True", stdout.strip())
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -0,0 +1,133 @@
+import shutil
+import sys
+import unittest
+from pathlib import Path
+
+from mock import patch
+from PIL import Image, JpegImagePlugin
+
+from media_gathering.thumbnail_cache import THUMBNAIL_FORMAT, THUMBNAIL_SUFFIX, ThumbnailCache
+
+
+class TestThumbnailCache(unittest.TestCase):
+    def setUp(self):
+        self.TBP = Path("./tests/thumbnail_cache")
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+        self.media_path = self.TBP / "media"
+        self.media_path.mkdir(parents=True, exist_ok=True)
+        self.cache_path = self.TBP / "thumbnails"
+
+    def tearDown(self):
+        if self.TBP.exists():
+            shutil.rmtree(self.TBP)
+
+    def _make_image(self, name: str, size: tuple[int, int], mode: str = "RGB") -> Path:
+        path = self.media_path / name
+        Image.new(mode, size, "red" if mode != "P" else 1).save(path)
+        return path
+
+    def test_ThumbnailCache(self):
+        thumbnail_cache = ThumbnailCache(self.cache_path)
+        self.assertEqual(self.cache_path, thumbnail_cache.cache_path)
+        self.assertEqual(256, thumbnail_cache.size)
+        self.assertEqual(4, thumbnail_cache.max_workers)
+        self.assertEqual("./html/thumbnails", ThumbnailCache.THUMBNAIL_PATH)
+        self.assertEqual("thumbnails", ThumbnailCache.THUMBNAIL_URL_BASE)
+        thumbnail_cache.shutdown()
+
+        with self.assertRaises(TypeError):
+            thumbnail_cache = ThumbnailCache("invalid_cache_path")
+        with self.assertRaises(TypeError):
+            thumbnail_cache = ThumbnailCache(self.cache_path, "invalid_size")
+        with self.assertRaises(TypeError):
+            thumbnail_cache = ThumbnailCache(self.cache_path, 256, "invalid_max_workers")
+        with self.assertRaises(ValueError):
+            thumbnail_cache = ThumbnailCache(self.cache_path, 0)
+        with self.assertRaises(ValueError):
+            thumbnail_cache = ThumbnailCache(self.cache_path, 256, 0)
+
+    def test_thumbnail_name(self):
+        self.assertEqual("sample.jpg" + THUMBNAIL_SUFFIX, ThumbnailCache.thumbnail_name("sample.jpg"))
+
+    def test_thumbnail_url(self):
+        self.enterContext(patch.object(ThumbnailCache, "THUMBNAIL_PATH", str(self.cache_path)))
+        default = "https://pbs.twimg.com/media/sample.jpg:large"
+
+        # サムネイルが無ければリモートのURLを返す
+        self.assertEqual(default, ThumbnailCache.thumbnail_url("sample.jpg", default))
+        self.assertEqual(default, ThumbnailCache.thumbnail_url(None, default))
+
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+        (self.cache_path / ThumbnailCache.thumbnail_name("sample.jpg")).touch()
+        expect = f"./thumbnails/sample.jpg{THUMBNAIL_SUFFIX}"
+        self.assertEqual(expect, ThumbnailCache.thumbnail_url("sample.jpg", default))
+        expect = f"../thumbnails/sample.jpg{THUMBNAIL_SUFFIX}"
+        self.assertEqual(expect, ThumbnailCache.thumbnail_url("sample.jpg", default, ".."))
+
+    def test_create(self):
+        thumbnail_cache = ThumbnailCache(self.cache_path, 64)
+
+        # JPEGは draft() を使って縮小する
+        media_path = self._make_image("sample.jpg", (1024, 512))
+        draft = JpegImagePlugin.JpegImageFile.draft
+        with patch.object(JpegImagePlugin.JpegImageFile, "draft", autospec=True) as mock_draft:
+            mock_draft.side_effect = draft
+            actual = thumbnail_cache.create(media_path)
+            # thumbnail() 内部でも呼ばれるため最初の呼び出しを確認する
+            self.assertEqual(("RGB", (64, 64)), mock_draft.call_args_list[0].args[1:])
+        self.assertEqual(self.cache_path / f"sample.jpg{THUMBNAIL_SUFFIX}", actual)
+        with Image.open(actual) as image:
+            self.assertEqual(THUMBNAIL_FORMAT, image.format)
+            self.assertEqual((64, 32), image.size)
+
+        # 作成済なら作り直さない
+        mtime = actual.stat().st_mtime_ns
+        self.assertEqual(actual, thumbnail_cache.create(media_path))
+        self.assertEqual(mtime, actual.stat().st_mtime_ns)
+
+        # JPEG以外は reduce() で粗く縮小する
+        media_path = self._make_image("sample.png", (512, 1024), "RGBA")
+        with patch("media_gathering.thumbnail_cache.Image.Image.reduce", autospec=True) as mock_reduce:
+            mock_reduce.side_effect = lambda image, factor: Image.new("RGBA", (512 // factor, 1024 // factor))
+            actual = thumbnail_cache.create(media_path)
+            mock_reduce.assert_called_once()
+            self.assertEqual(8, mock_reduce.call_args.args[1])
+        with Image.open(actual) as image:
+            self.assertEqual((32, 64), image.size)
+
+        # パレット画像も変換して保存できる
+        media_path = self._make_image("sample.gif", (128, 128), "P")
+        actual = thumbnail_cache.create(media_path)
+        self.assertTrue(actual.is_file())
+
+        # 画像として読み込めないメディアは作成しない
+        media_path = self.media_path / "sample.mp4"
+        media_path.write_bytes(b"dummy video")
+        self.assertIsNone(thumbnail_cache.create(media_path))
+        self.assertIsNone(thumbnail_cache.create(self.media_path / "not_exist.jpg"))
+        self.assertFalse((self.cache_path / f"sample.mp4{THUMBNAIL_SUFFIX}").exists())
+        self.assertEqual([], list(self.cache_path.glob("*.tmp")))
+        thumbnail_cache.shutdown()
+
+    def test_submit_and_wait(self):
+        thumbnail_cache = ThumbnailCache(self.cache_path, 64, 2)
+        media_path_list = [self._make_image(f"sample_{i}.jpg", (256, 256)) for i in range(5)]
+        (self.media_path / "sample.mp4").write_bytes(b"dummy video")
+        media_path_list.append(self.media_path / "sample.mp4")
+
+        futures = [thumbnail_cache.submit(media_path) for media_path in media_path_list]
+        actual = thumbnail_cache.wait()
+        expect = [self.cache_path / f"sample_{i}.jpg{THUMBNAIL_SUFFIX}" for i in range(5)]
+        self.assertEqual(expect, actual)
+        self.assertTrue(all(future.done() for future in futures))
+
+        # 待機済のものは再度待たない
+        self.assertEqual([], thumbnail_cache.wait())
+        thumbnail_cache.shutdown()
+
+
+if __name__ == "__main__":
+    if sys.argv:
+        del sys.argv[1:]
+    unittest.main(warnings="ignore")
@@ -4,7 +4,7 @@ from pathlib import Path
 
 import orjson
 
-from media_gathering.util import Result, find_values
+from media_gathering.util import LazyImport, Result, find_values
 
 
 class TestUtil(unittest.TestCase):
@@ -12,6 +12,32 @@ class TestUtil(unittest.TestCase):
         self.assertEqual(True, hasattr(Result, "success"))
         self.assertEqual(True, hasattr(Result, "failed"))
 
+    def test_LazyImport(self):
+        # 使われるまで import しない
+        module_name = "media_gathering.link_search.pixiv.pixiv_fetcher"
+        lazy_module = LazyImport(module_name)
+        lazy_class = LazyImport(module_name, "PixivFetcher")
+        self.assertIsNone(lazy_class._target)
+        self.assertEqual(f"LazyImport({module_name})", repr(lazy_module))
+        self.assertEqual(f"LazyImport({module_name}.PixivFetcher)", repr(lazy_class))
+
+        # 属性参照で import し、以降は同じ対象に委譲する
+        self.assertEqual("PixivFetcher", lazy_class.__name__)
+        self.assertIn(module_name, sys.modules)
+        self.assertIs(sys.modules[module_name].PixivFetcher, lazy_class._target)
+        self.assertIs(lazy_class._target, lazy_module.PixivFetcher)
+
+        # 呼び出しは対象の呼び出しに委譲する
+        lazy_func = LazyImport("orjson", "dumps")
+        self.assertEqual(b'{"key":"value"}', lazy_func({"key": "value"}))
+
+        # 存在しないモジュール、属性は使ったときにエラーになる
+        lazy_missing = LazyImport("media_gathering.not_exist_module")
+        with self.assertRaises(ModuleNotFoundError):
+            lazy_missing.attr
+        with self.assertRaises(AttributeError):
+            LazyImport("orjson", "not_exist_attr")()
+
     def test_find_values(self):
         cache_filepath = Path("./tests/cache/test_notes_with_reactions.json")
         sample_dict = orjson.loads(cache_filepath.read_bytes()).get("result")